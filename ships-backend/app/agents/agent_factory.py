@@ -12,18 +12,28 @@ Each agent is created with:
 - Message trimming to control token usage
 """
 
-from typing import Optional, Dict, Any, List, Literal
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Literal, Iterator, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import trim_messages
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
 
 from app.core.llm_factory import LLMFactory
+from app.services.message_history import MessageHistory
+# Load the sub-agent packages before the tools: tools.planner imports
+# sub_agents.planner, whose __init__ imports tools.planner back - entered
+# from the tools side first, that cycle fails with an ImportError
+import app.agents.sub_agents  # noqa: F401
 from app.agents.tools.planner import PLANNER_TOOLS
 from app.agents.tools.coder import CODER_TOOLS
 from app.agents.tools.validator import VALIDATOR_TOOLS
 from app.agents.tools.fixer import FIXER_TOOLS
 
+logger = logging.getLogger("ships.agent_factory")
+
 
 # Token limits for message trimming (per agent type)
 TOKEN_LIMITS = {
@@ -38,31 +48,25 @@ def create_message_trimmer(max_tokens: int = 20000):
     """
     Create a pre_model_hook that trims messages to stay under token limit.
     
+    Token counts are cached per message and the kept window is maintained
+    incrementally (see app/services/message_history.py). The task message
+    is always kept; tool calls are never separated from their results.
+    
     Args:
-        max_tokens: Maximum tokens to keep in message history
+        max_tokens: Maximum tokens of message history after the task message
         
     Returns:
         A callable pre_model_hook function
     """
+    history = MessageHistory(max_tokens)
+    
     def pre_model_hook(state):
         """Trim messages before each LLM call to control tokens."""
-        messages = state.get("messages", [])
-        
-        # Use trim_messages to keep most recent, staying under limit
-        # Token approximation: ~4 characters = 1 token
-        trimmed = trim_messages(
-            messages,
-            strategy="last",
-            max_tokens=max_tokens,
-            token_counter=lambda msgs: sum(len(str(m.content)) // 4 for m in msgs),
-            start_on="human",   # Keep starting from a human message
-            include_system=True,
-        )
-        
         # Return trimmed messages under llm_input_messages key
         # This sends trimmed to LLM without modifying state
-        return {"llm_input_messages": trimmed}
+        return {"llm_input_messages": history.trim(state.get("messages", []))}
     
+    pre_model_hook.history = history  # Stats for diagnostics
     return pre_model_hook
 
 
@@ -70,6 +74,185 @@ def create_message_trimmer(max_tokens: int = 20000):
 from app.prompts import AGENT_PROMPTS
 
 
+# ============================================================================
+# AGENT / LLM CLIENT POOL
+# ============================================================================
+
+class AgentPool:
+    """
+    Reusable agent instances and LLM clients.
+    
+    Graph nodes used to build a fresh Planner/Coder/Validator/Fixer (and a new
+    ChatGoogleGenerativeAI client + HTTP stack + system prompt) on every call.
+    A 3-attempt fix loop alone constructed more than a dozen clients.
+    
+    - LLM clients are shared, keyed by (agent_type, reasoning_level, cached_content).
+      They hold no per-call state, so concurrent runs can use the same client.
+    - Agents are leased exclusively: an idle instance is handed out (or a new
+      one built), and returned to the pool after the call. Agents still keep a
+      little per-call state on `self` (injected context, regenerated prompt),
+      so `reset_run_state()` is called on release. All per-run inputs come
+      from the `invoke()` arguments.
+    
+    Singleton: use `AgentPool.get_instance()` or the module-level `agent_pool`.
+    
+    Usage:
+        with agent_pool.lease(Coder) as coder:
+            result = await coder.invoke(state)
+    """
+    
+    _instance = None
+    
+    def __init__(self, max_idle_per_key: int = 4, max_llm_clients: int = 64):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_llm_clients = max_llm_clients
+        
+        self._llms: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._idle: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self._llm_hits = 0
+        self._llm_misses = 0
+        self._agents_created = 0
+        self._agents_reused = 0
+    
+    @classmethod
+    def get_instance(cls) -> "AgentPool":
+        if cls._instance is None:
+            cls._instance = AgentPool()
+        return cls._instance
+    
+    def get_llm(
+        self,
+        agent_type: str,
+        reasoning_level: str = "standard",
+        cached_content: Optional[str] = None,
+        thinking_level: Optional[str] = None,
+        model: Optional[str] = None,
+    ):
+        """
+        Get a shared LLM client (built once per key via LLMFactory).
+        
+        Args:
+            agent_type: LLMFactory agent type
+            reasoning_level: 'standard' or 'high'
+            cached_content: Optional Gemini explicit cache name
+            thinking_level: Optional per-invocation thinking level (model_policy.py)
+            model: Optional per-invocation model name (model_policy.py)
+            
+        Returns:
+            Configured (thinking-bound) ChatGoogleGenerativeAI runnable
+        """
+        key = (agent_type, reasoning_level, cached_content, thinking_level, model)
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is not None:
+                self._llms.move_to_end(key)
+                self._llm_hits += 1
+                return llm
+        
+        llm = LLMFactory.get_model(
+            agent_type, reasoning_level, cached_content=cached_content,
+            thinking_level=thinking_level, model=model,
+        )
+        
+        with self._lock:
+            # Another caller may have built it meanwhile - keep the first one
+            existing = self._llms.get(key)
+            if existing is not None:
+                self._llm_hits += 1
+                return existing
+            self._llms[key] = llm
+            self._llm_misses += 1
+            # Cache names rotate per project; don't grow without bound
+            while len(self._llms) > self.max_llm_clients:
+                self._llms.popitem(last=False)
+        
+        logger.debug(f"[AGENT_POOL] 🔌 New LLM client for {key[0]}/{key[1]} (cached_content={bool(cached_content)})")
+        return llm
+    
+    @staticmethod
+    def _key(agent_cls: type, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+        try:
+            key = (agent_cls, tuple(sorted(kwargs.items())))
+            hash(key)
+            return key
+        except TypeError:
+            return None  # Unhashable args (e.g. config objects) - not poolable
+    
+    def acquire(self, agent_cls: type, **kwargs):
+        """
+        Take an idle instance of agent_cls (built with kwargs) or create one.
+        
+        Must be paired with release(); prefer `lease()`.
+        """
+        key = self._key(agent_cls, kwargs)
+        if key is not None:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    self._agents_reused += 1
+                    return idle.pop()
+        
+        agent = agent_cls(**kwargs)
+        with self._lock:
+            self._agents_created += 1
+        logger.debug(f"[AGENT_POOL] 🆕 Created {agent_cls.__name__}")
+        return agent
+    
+    def release(self, agent, agent_cls: type, **kwargs) -> None:
+        """Return a leased agent to the pool (dropped if the pool is full)."""
+        key = self._key(agent_cls, kwargs)
+        if key is None:
+            return
+        
+        reset = getattr(agent, "reset_run_state", None)
+        if reset is not None:
+            try:
+                reset()
+            except Exception as e:
+                # Don't put a half-reset agent back in circulation
+                logger.warning(f"[AGENT_POOL] ⚠️ Dropping {agent_cls.__name__}, reset failed: {e}")
+                return
+        
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(agent)
+    
+    @contextmanager
+    def lease(self, agent_cls: type, **kwargs) -> Iterator[Any]:
+        """Exclusive use of a pooled agent for one call."""
+        agent = self.acquire(agent_cls, **kwargs)
+        try:
+            yield agent
+        finally:
+            self.release(agent, agent_cls, **kwargs)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool metrics for diagnostics."""
+        with self._lock:
+            return {
+                "llm_clients": len(self._llms),
+                "llm_hits": self._llm_hits,
+                "llm_misses": self._llm_misses,
+                "agents_created": self._agents_created,
+                "agents_reused": self._agents_reused,
+                "agents_idle": sum(len(v) for v in self._idle.values()),
+            }
+    
+    def clear(self) -> None:
+        """Drop all pooled agents and clients (tests / key rotation)."""
+        with self._lock:
+            self._llms.clear()
+            self._idle.clear()
+
+
+# Global instance
+agent_pool = AgentPool.get_instance()
+
+
 
 class AgentFactory:
     """
@@ -121,8 +304,8 @@ class AgentFactory:
             "orchestrator": "mini" # Orchestrator uses fast reasoning
         }
         
-        # Create the LLM using LLMFactory (handles model names and API key)
-        llm = LLMFactory.get_model(
+        # Shared LLM client (LLMFactory handles model names and API key)
+        llm = agent_pool.get_llm(
             llm_type_map.get(agent_type, "mini"),
             cached_content=cached_content
         )
@@ -18,7 +18,6 @@ import time
 
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
-from app.core.llm_factory import LLMFactory
 from app.graphs.state import AgentState
 from app.artifacts import (
     ArtifactManager,
@@ -91,12 +90,15 @@ class BaseAgent(ABC):
         self.name = name
         self.agent_type = agent_type
         self.reasoning_level = reasoning_level
-        self.llm = LLMFactory.get_model(
+        # Shared client from the agent pool (one per type/level/cache)
+        from app.agents.agent_factory import agent_pool
+        self.llm = agent_pool.get_llm(
             agent_type, 
             reasoning_level,
             cached_content=cached_content
         )
         self.system_prompt = self._get_system_prompt()
+        self._base_system_prompt = self.system_prompt
         self._artifact_manager = artifact_manager
         
         # Get the enum type for logging
@@ -115,6 +117,15 @@ class BaseAgent(ABC):
         """Set the artifact manager."""
         self._artifact_manager = manager
     
+    def reset_run_state(self) -> None:
+        """
+        Drop per-run state so a pooled instance can serve the next call.
+        
+        Called by AgentPool when an agent is returned. Subclasses that keep
+        run context on `self` should clear it and call super().
+        """
+        self.system_prompt = self._base_system_prompt
+    
     @abstractmethod
     def _get_system_prompt(self) -> str:
         """
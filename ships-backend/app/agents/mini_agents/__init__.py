@@ -15,6 +15,16 @@ from app.agents.mini_agents.intent_classifier import (
     TargetArea,
 )
 
+from app.agents.mini_agents.intent_cache import (
+    IntentCache,
+    intent_cache,
+)
+
+from app.agents.mini_agents.rule_classifier import (
+    RuleIntentClassifier,
+    rule_classifier,
+)
+
 from app.agents.mini_agents.context_selector import (
     ContextSelector,
     ContextRelevance,
@@ -35,6 +45,14 @@ __all__ = [
     "ActionType",
     "TargetArea",
     
+    # Intent Cache
+    "IntentCache",
+    "intent_cache",
+    
+    # Rule Classifier
+    "RuleIntentClassifier",
+    "rule_classifier",
+    
     # Context Selector
     "ContextSelector",
     "ContextRelevance",
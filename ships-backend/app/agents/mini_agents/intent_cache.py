@@ -0,0 +1,291 @@
+"""
+ShipS* Intent Cache
+
+Memoizes IntentClassifier results so repeated prompts ("fix the build",
+"explain X") against an unchanged project skip the LLM round-trip that
+otherwise runs before any useful work starts.
+
+Key: normalized request text (whitespace collapsed, case folded) +
+project path + fingerprint of the project context (folder_map /
+app_blueprint). The path matters: on the orchestrator's first step there
+is no folder_map yet, and a context-only key would serve one project's
+intent (suggested_files included) to another. Without a folder_map the
+key gets tree_fingerprint() of the project instead (git HEAD + status, or
+file mtimes), so edits made outside the pipeline - editor, git checkout,
+deleted files - miss the cache rather than reuse a stale scope.
+
+- In-memory LRU with TTL, backed by a JSON file so restarts keep hits
+- Explicit invalidation per project when its tree changes
+- Hit-rate counters via get_stats()
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from app.core.logger import get_logger
+
+logger = get_logger("intent_cache")
+
+INTENT_CACHE_PATH = Path(os.getenv(
+    "INTENT_CACHE_PATH",
+    str(Path.home() / ".ships" / "intent_cache.json"),
+))
+INTENT_CACHE_TTL_S = int(os.getenv("INTENT_CACHE_TTL_S", str(6 * 60 * 60)))
+INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "512"))
+
+# Not part of the project's source for fingerprinting purposes
+_TREE_SKIP_DIRS = {"node_modules", "__pycache__", ".git", "dist", "build", ".next", "coverage", ".venv", "venv"}
+_TREE_MAX_DEPTH = 3
+_TREE_MAX_ENTRIES = 5000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_request(text: str) -> str:
+    """Fold case and whitespace so trivially different prompts share a key."""
+    return _WHITESPACE.sub(" ", text or "").strip().casefold()
+
+
+def fingerprint(*parts: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of project context dicts (key order independent)."""
+    blob = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def _git_tree_state(root: str) -> Optional[List[str]]:
+    """HEAD, porcelain status and the mtimes of dirty files; None outside a git repo."""
+    def git(*args: str) -> Optional[str]:
+        try:
+            result = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True,
+                                    encoding="utf-8", errors="replace", timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
+
+    head = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=all") if head is not None else None
+    if status is None:
+        return None
+    state = [head.strip()]
+    for line in status.splitlines():
+        # Status letters stay "M" across further edits: the mtime doesn't
+        path = line[3:].split(" -> ")[-1].strip('"')
+        try:
+            state.append(f"{line}\0{os.stat(os.path.join(root, path)).st_mtime_ns}")
+        except OSError:
+            state.append(line)
+    return state
+
+
+def _mtime_tree_state(root: str) -> List[str]:
+    """(path, mtime, size) of files and directories down to _TREE_MAX_DEPTH."""
+    state: List[str] = []
+    stack = [(root, 0)]
+    while stack and len(state) < _TREE_MAX_ENTRIES:
+        directory, depth = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name in _TREE_SKIP_DIRS:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            state.append(f"{os.path.relpath(entry.path, root)}\0{stat.st_mtime_ns}\0{stat.st_size}")
+            if entry.is_dir(follow_symlinks=False) and depth + 1 < _TREE_MAX_DEPTH:
+                stack.append((entry.path, depth + 1))
+    return state
+
+
+def tree_fingerprint(project_path: Optional[str]) -> Optional[str]:
+    """
+    Cheap hash of a project's working tree, for keys without a folder_map.
+
+    Blocking (git subprocesses / stat calls): run it in a worker thread.
+    """
+    if not project_path or not os.path.isdir(project_path):
+        return None
+    state = _git_tree_state(project_path)
+    if state is None:
+        state = _mtime_tree_state(project_path)
+    return hashlib.sha256("\n".join(state).encode("utf-8")).hexdigest()[:16]
+
+
+class IntentCache:
+    """
+    LRU + on-disk cache of StructuredIntent payloads.
+
+    Singleton: use `IntentCache.get_instance()` or the module-level `intent_cache`.
+    """
+
+    _instance = None
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl_s: int = INTENT_CACHE_TTL_S,
+        max_entries: int = INTENT_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path or INTENT_CACHE_PATH
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+
+        # key -> {"intent": dict, "project": str|None, "stored_at": float}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._invalidations = 0
+
+    @classmethod
+    def get_instance(cls) -> "IntentCache":
+        if cls._instance is None:
+            cls._instance = IntentCache()
+        return cls._instance
+
+    @staticmethod
+    def make_key(
+        user_request: str,
+        folder_map: Optional[Dict[str, Any]] = None,
+        app_blueprint: Optional[Dict[str, Any]] = None,
+        project_path: Optional[str] = None,
+        tree: Optional[str] = None,
+    ) -> str:
+        """
+        Cache key for a request in a given project and project context.
+
+        Args:
+            tree: tree_fingerprint(project_path), when there is no folder_map
+        """
+        project = os.path.normcase(os.path.normpath(project_path)) if project_path else ""
+        context = fingerprint(folder_map, app_blueprint)
+        return hashlib.sha256(
+            f"{normalize_request(user_request)}\0{project}\0{context}\0{tree or ''}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached intent.
+
+        Returns:
+            The StructuredIntent payload (model_dump) or None
+        """
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["stored_at"] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry["intent"])
+
+    def put(self, key: str, intent: Dict[str, Any], project: Optional[str] = None) -> None:
+        """
+        Store a classified intent.
+
+        Args:
+            key: From make_key()
+            intent: StructuredIntent.model_dump(mode="json")
+            project: Project path, for invalidate_project()
+        """
+        self._ensure_loaded()
+        with self._lock:
+            self._entries[key] = {"intent": intent, "project": project, "stored_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stores += 1
+        self._save()
+
+    def invalidate_project(self, project: Optional[str]) -> int:
+        """
+        Drop every cached intent for a project (call when its tree changes).
+
+        Returns:
+            Number of entries removed
+        """
+        if not project:
+            return 0
+        self._ensure_loaded()
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.get("project") == project]
+            for k in stale:
+                del self._entries[k]
+            self._invalidations += len(stale)
+        if stale:
+            logger.info(f"[INTENT_CACHE] 🧹 Invalidated {len(stale)} cached intents for {project}")
+            self._save()
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self._save()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                if self.path.exists():
+                    data = json.loads(self.path.read_text(encoding="utf-8"))
+                    now = time.time()
+                    live = sorted(
+                        ((k, e) for k, e in data.items() if now - e.get("stored_at", 0) <= self.ttl_s),
+                        key=lambda item: item[1]["stored_at"],
+                    )
+                    for k, e in live[-self.max_entries:]:
+                        self._entries[k] = e
+            except Exception as e:
+                logger.warning(f"[INTENT_CACHE] Could not load {self.path}: {e}")
+
+    def _save(self) -> None:
+        """Persist atomically (tmp file + replace)."""
+        try:
+            with self._lock:
+                data = dict(self._entries)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"[INTENT_CACHE] Could not persist {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit-rate counters for diagnostics."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "stores": self._stores,
+                "invalidations": self._invalidations,
+            }
+
+
+# Global instance
+intent_cache = IntentCache.get_instance()
@@ -19,8 +19,10 @@ Key Features:
 from datetime import datetime
 from typing import Optional, Dict, Any, List, AsyncIterator
 from enum import Enum
+import asyncio
 import json
 import re
+import time
 import uuid
 
 from pydantic import BaseModel, Field
@@ -31,6 +33,8 @@ from app.graphs.state import AgentState
 from app.artifacts import ArtifactManager
 from app.security.input_sanitizer import sanitize_input, SanitizationResult
 from app.core.logger import get_logger, dev_log, truncate_for_log
+from app.agents.mini_agents.intent_cache import intent_cache, tree_fingerprint
+from app.agents.mini_agents.rule_classifier import rule_classifier
 
 logger = get_logger("intent")
 from app.prompts.security_prefix import wrap_system_prompt
@@ -405,18 +409,25 @@ You MUST output a valid JSON object matching this schema:
         user_request: str,
         app_blueprint: Optional[Dict[str, Any]] = None,
         folder_map: Optional[Dict[str, Any]] = None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        project_path: Optional[str] = None,
+        use_cache: bool = True
     ) -> StructuredIntent:
         """
         Classify a user request into a structured intent.
         
-        This is the main entry point for classification.
+        This is the main entry point for classification. Results are memoized
+        by normalized request + project context (see intent_cache.py), and
+        clear-cut questions/confirmations are resolved locally without an
+        LLM call (see rule_classifier.py).
         
         Args:
             user_request: The raw user request
             app_blueprint: Optional app blueprint for context
             folder_map: Optional folder structure for context
             config: Optional LangChain config (e.g. to disable callbacks)
+            project_path: Optional project path (scopes cache invalidation)
+            use_cache: Set False to force a fresh LLM classification
             
         Returns:
             StructuredIntent with classification results
@@ -427,6 +438,51 @@ You MUST output a valid JSON object matching this schema:
         # Use sanitized input for classification
         clean_request = sanitization.sanitized_input
         
+        # Step 0.5: Memoized result for the same request against the same project
+        # (without a project path or tree there is nothing to scope the entry to)
+        path_start = time.perf_counter()
+        use_cache = use_cache and bool(project_path or folder_map)
+        # No folder_map yet (orchestrator's first step): key on the tree on disk,
+        # so edits made outside the pipeline aren't answered from a stale entry
+        tree = None
+        if use_cache and project_path and not folder_map:
+            tree = await asyncio.to_thread(tree_fingerprint, project_path)
+        cache_key = intent_cache.make_key(user_request, folder_map, app_blueprint, project_path, tree)
+        cached = intent_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            try:
+                cached["original_request"] = user_request
+                cached.pop("classified_at", None)
+                intent = StructuredIntent.model_validate(cached)
+                rule_classifier.record("cache", time.perf_counter() - path_start)
+                logger.info(
+                    f"[INTENT] ⚡ Cache hit: {intent.task_type}/{intent.action} → {intent.target_area} "
+                    f"(hit rate {intent_cache.get_stats()['hit_rate']:.0%})"
+                )
+                return intent
+            except Exception as e:
+                logger.warning(f"[INTENT] Ignoring unreadable cached intent: {e}")
+        
+        # Step 0.75: Local rules for clear-cut questions/confirmations.
+        # Flagged input always goes to the LLM for a proper look.
+        if not sanitization.is_suspicious:
+            path_start = time.perf_counter()
+            local = rule_classifier.classify(clean_request)
+            if local is not None:
+                intent = StructuredIntent(
+                    **local,
+                    original_request=user_request,
+                    security_risk_score=sanitization.risk_score,
+                    security_warnings=sanitization.detected_patterns
+                )
+                rule_classifier.record("rules", time.perf_counter() - path_start)
+                logger.info(
+                    f"[INTENT] ⚡ Rule match: {intent.task_type}/{intent.action} → {intent.target_area} "
+                    f"(conf: {intent.confidence:.2f})"
+                )
+                return intent
+        path_start = time.perf_counter()
+        
         # Build context-aware prompt
         prompt = self._build_context_prompt(clean_request, app_blueprint, folder_map)
         
@@ -494,6 +550,11 @@ You MUST output a valid JSON object matching this schema:
                     duration_ms=duration_ms
                 )
             
+            # Don't memoize flagged input - it should be re-screened every time
+            if use_cache and not sanitization.is_suspicious:
+                intent_cache.put(cache_key, intent.model_dump(mode="json"), project=project_path)
+            
+            rule_classifier.record("llm", time.perf_counter() - path_start)
             return intent
             
         except Exception as e:
@@ -611,7 +672,8 @@ You MUST output a valid JSON object matching this schema:
         intent = await self.classify(
             user_request=user_request,
             app_blueprint=app_blueprint,
-            folder_map=folder_map
+            folder_map=folder_map,
+            project_path=artifacts.get("project_path")
         )
         
         return {
@@ -0,0 +1,295 @@
+"""
+ShipS* Rule Classifier (local intent fast path)
+
+Resolves the unambiguous conversational cases - questions, confirmations,
+greetings - without a model round-trip, so "what does App.tsx do" reaches
+the Chatter fast path in microseconds. Anything that needs planning
+(features, fixes, refactors, deletions) is left to the LLM classifier.
+
+Two local signals must agree before a result is returned:
+1. Compiled keyword / regex rules (precise, label + base confidence)
+2. A tiny TF-IDF nearest-centroid scorer over seed phrasings (pure Python)
+
+The scorer has to pick the rule's label with at least
+RULE_CLASSIFIER_MIN_SIMILARITY; if it disagrees, or doesn't know the
+words, the request goes to the LLM. Polite requests ("can you center the
+form?") and problem reports phrased as questions ("why does it crash?")
+are never treated as questions.
+
+Per-path latency (rules / cache / llm) is tracked via get_stats() so the
+LLM fallback rate can be watched.
+"""
+
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.core.logger import get_logger
+
+logger = get_logger("rule_classifier")
+
+RULE_CLASSIFIER_ENABLED = os.getenv("RULE_CLASSIFIER_ENABLED", "true").lower() == "true"
+RULE_CLASSIFIER_THRESHOLD = float(os.getenv("RULE_CLASSIFIER_THRESHOLD", "0.85"))
+RULE_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("RULE_CLASSIFIER_MIN_SIMILARITY", "0.2"))
+
+# Label -> (task_type, action)
+LABELS: Dict[str, Tuple[str, str]] = {
+    "question": ("question", "explain"),
+    "confirmation": ("confirmation", "proceed"),
+    "engineering": ("feature", "create"),  # never returned; only used to veto
+}
+
+# Verbs that turn a question into (possibly) an engineering request:
+# "how do I add a navbar?" must go to the LLM.
+_CHANGE_VERBS = re.compile(
+    r"\b(add|create|build|make|implement|fix|change|update|modify|remove|delete|"
+    r"refactor|rename|move|replace|install|scaffold|generate|write|convert|migrate|"
+    r"set ?up|hook up|wire|connect|deploy|upgrade|clean up)\b"
+)
+
+# "can you / could you / would you / will you <verb> ..." asks for a change,
+# unless the verb only asks for information
+_POLITE_REQUEST = re.compile(
+    r"^(please\s+)?(can|could|would|will)\s+(you|u)\s+(please\s+)?"
+    r"(?!(explain|describe|summari[sz]e|tell|show|walk|clarify|help me understand)\b)\w"
+)
+
+# A question about something broken is a bug report: the fixer's job, not chat
+_PROBLEM_WORDS = re.compile(
+    r"\b(crash\w*|errors?|exceptions?|broken|break(s|ing)?|fail\w*|bugs?|buggy|"
+    r"not (working|loading|showing|rendering)|(doesn|don|isn|won|can)'?t (work|load|show|render|compile|start)|"
+    r"blank|undefined|stuck|freez\w*|hang(s|ing)?|wrong|missing|404|500)\b"
+)
+
+_QUESTION_START = re.compile(
+    r"^(what|why|how|where|which|who|when|is|are|does|do|can|could|should|would)\b"
+)
+_EXPLAIN_START = re.compile(
+    r"^(please\s+)?(explain|describe|summari[sz]e|walk me through|tell me about|show me how)\b"
+)
+_CONFIRMATION = re.compile(
+    r"^(yes|yep|yeah|yup|y|ok|okay|sure|sounds good|looks good|lgtm|perfect|great|"
+    r"approved?|proceed|go ahead|go for it|do it|ship it|continue|let'?s go|confirm(ed)?)"
+    r"(\s*(,|and)?\s*(please|thanks|thank you|go ahead|proceed|do it|continue|looks good|"
+    r"sounds good|ship it|let'?s do it))*[\s.!]*$"
+)
+_GREETING = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|thx|good (morning|afternoon|evening))(\s+there)?[\s.!]*$"
+)
+_FILE_REF = re.compile(r"\b[\w./-]+\.(tsx|jsx|ts|js|py|css|scss|html|json|md|sql|toml|ya?ml)\b")
+
+_FRONTEND_EXT = {"tsx", "jsx", "ts", "js", "css", "scss", "html"}
+_BACKEND_EXT = {"py", "sql"}
+_CONFIG_EXT = {"json", "toml", "yml", "yaml"}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Seed phrasings for the centroid scorer (test fixtures + the LLM prompt's
+# classification guide). Small on purpose: it only has to confirm a rule.
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("what does button.tsx do", "question"),
+    ("what does app.tsx do", "question"),
+    ("how does the routing work", "question"),
+    ("what is this project", "question"),
+    ("explain the auth flow", "question"),
+    ("why is the sidebar component so large", "question"),
+    ("where is the api client defined", "question"),
+    ("can you explain how state is managed", "question"),
+    ("describe the folder structure", "question"),
+    ("which files handle login", "question"),
+    ("hi there", "question"),
+    ("thanks", "question"),
+    ("yes looks good", "confirmation"),
+    ("looks good proceed", "confirmation"),
+    ("go ahead", "confirmation"),
+    ("approved", "confirmation"),
+    ("yes do it", "confirmation"),
+    ("ok continue", "confirmation"),
+    ("sounds good ship it", "confirmation"),
+    ("lgtm", "confirmation"),
+    ("add a user profile page", "engineering"),
+    ("fix login bug", "engineering"),
+    ("refactor authentication", "engineering"),
+    ("create a todo app with react", "engineering"),
+    ("remove the footer", "engineering"),
+    ("change the button color to blue", "engineering"),
+    ("update the navbar links", "engineering"),
+    ("the build is broken", "engineering"),
+    ("build a dashboard with charts", "engineering"),
+    ("could you darken the header", "engineering"),
+    ("can you center the login form", "engineering"),
+    ("why does the app crash on login", "engineering"),
+    ("the page is blank after the update", "engineering"),
+]
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.casefold())
+
+
+class _CentroidScorer:
+    """TF-IDF vectors, one L2-normalized centroid per label, cosine scoring."""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        docs = [(Counter(_tokens(text)), label) for text, label in examples]
+        df = Counter(tok for counts, _ in docs for tok in counts)
+        n = len(docs)
+        self.idf = {tok: math.log((1 + n) / (1 + d)) + 1.0 for tok, d in df.items()}
+
+        sums: Dict[str, Dict[str, float]] = {}
+        for counts, label in docs:
+            acc = sums.setdefault(label, {})
+            for tok, w in self._vector(counts).items():
+                acc[tok] = acc.get(tok, 0.0) + w
+        self.centroids = {label: self._normalize(vec) for label, vec in sums.items()}
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vec = {tok: (1 + math.log(c)) * self.idf[tok] for tok, c in counts.items() if tok in self.idf}
+        return self._normalize(vec)
+
+    @staticmethod
+    def _normalize(vec: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        return {tok: w / norm for tok, w in vec.items()} if norm else {}
+
+    def best(self, text: str) -> Tuple[Optional[str], float]:
+        """(label, cosine) of the closest centroid; (None, 0.0) if no known tokens."""
+        vec = self._vector(Counter(_tokens(text)))
+        if not vec:
+            return None, 0.0
+        scores = {
+            label: sum(w * centroid.get(tok, 0.0) for tok, w in vec.items())
+            for label, centroid in self.centroids.items()
+        }
+        label = max(scores, key=scores.get)
+        return label, scores[label]
+
+
+class RuleIntentClassifier:
+    """
+    Local pre-classifier consulted before the LLM IntentClassifier.
+
+    Singleton: use `RuleIntentClassifier.get_instance()` or the module-level
+    `rule_classifier`.
+    """
+
+    _instance = None
+
+    def __init__(self, threshold: float = RULE_CLASSIFIER_THRESHOLD, enabled: bool = RULE_CLASSIFIER_ENABLED,
+                 min_similarity: float = RULE_CLASSIFIER_MIN_SIMILARITY):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+        self._scorer = _CentroidScorer(SEED_EXAMPLES)
+        self._lock = threading.Lock()
+        # path -> {"count", "total_ms", "max_ms"}
+        self._paths: Dict[str, Dict[str, float]] = {}
+        self._rule_rejections = 0
+
+    @classmethod
+    def get_instance(cls) -> "RuleIntentClassifier":
+        if cls._instance is None:
+            cls._instance = RuleIntentClassifier()
+        return cls._instance
+
+    def classify(self, user_request: str) -> Optional[Dict[str, Any]]:
+        """
+        Try to classify locally.
+
+        Returns:
+            StructuredIntent field dict if confidence >= threshold, else None
+        """
+        if not self.enabled:
+            return None
+
+        text = re.sub(r"\s+", " ", user_request or "").strip().casefold()
+        if not text or len(text) > 300:
+            return None
+
+        match = self._match_rules(text)
+        if match is None:
+            return None
+        label, confidence = match
+
+        # The scorer must positively confirm the rule, not merely fail to object
+        scored_label, similarity = self._scorer.best(text)
+        if scored_label != label or similarity < self.min_similarity or confidence < self.threshold:
+            with self._lock:
+                self._rule_rejections += 1
+            return None
+
+        task_type, action = LABELS[label]
+        files = [m.group(0) for m in _FILE_REF.finditer(user_request)]
+        return {
+            "task_type": task_type,
+            "action": action,
+            "target_area": self._target_area(files, label),
+            "scope": "feature",
+            "description": user_request.strip(),
+            "suggested_files": files,
+            "confidence": round(confidence, 3),
+        }
+
+    def _match_rules(self, text: str) -> Optional[Tuple[str, float]]:
+        """Compiled rules -> (label, base confidence) or None."""
+        if _CONFIRMATION.match(text):
+            return "confirmation", 0.95
+        if _GREETING.match(text):
+            return "question", 0.9
+        if _CHANGE_VERBS.search(text) or _POLITE_REQUEST.match(text) or _PROBLEM_WORDS.search(text):
+            return None
+        if _EXPLAIN_START.match(text):
+            return "question", 0.93
+        if _QUESTION_START.match(text) and text.endswith("?"):
+            return "question", 0.95
+        if _QUESTION_START.match(text):
+            return "question", 0.88
+        return None
+
+    @staticmethod
+    def _target_area(files: List[str], label: str) -> str:
+        if label == "confirmation":
+            return "system"
+        exts = {f.rsplit(".", 1)[-1].lower() for f in files}
+        if exts & _FRONTEND_EXT and not exts & _BACKEND_EXT:
+            return "frontend"
+        if exts & _BACKEND_EXT and not exts & _FRONTEND_EXT:
+            return "backend"
+        if exts and exts <= _CONFIG_EXT:
+            return "configuration"
+        return "unknown"
+
+    def record(self, path: str, duration_s: float) -> None:
+        """Record latency for one classification path ('rules', 'cache', 'llm')."""
+        ms = duration_s * 1000
+        with self._lock:
+            stats = self._paths.setdefault(path, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-path counts / latency and the LLM fallback rate."""
+        with self._lock:
+            total = sum(int(s["count"]) for s in self._paths.values())
+            llm = int(self._paths.get("llm", {}).get("count", 0))
+            return {
+                "threshold": self.threshold,
+                "rule_rejections": self._rule_rejections,
+                "llm_fallback_rate": round(llm / total, 3) if total else 0.0,
+                "paths": {
+                    path: {
+                        "count": int(s["count"]),
+                        "avg_ms": round(s["total_ms"] / s["count"], 3) if s["count"] else 0.0,
+                        "max_ms": round(s["max_ms"], 3),
+                    }
+                    for path, s in self._paths.items()
+                },
+            }
+
+
+# Global instance
+rule_classifier = RuleIntentClassifier.get_instance()
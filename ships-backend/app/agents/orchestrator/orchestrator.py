@@ -98,8 +98,8 @@ class ShipSOrchestrator:
         self.error_recovery = ErrorRecoverySystem()
         
         # LLM for reasoning in ambiguous situations
-        from app.core.llm_factory import LLMFactory
-        self._reasoning_llm = LLMFactory.get_model("orchestrator", reasoning_level="high")
+        from app.agents.agent_factory import agent_pool
+        self._reasoning_llm = agent_pool.get_llm("orchestrator", reasoning_level="high")
     
     # =========================================================================
     # ROUTING DECISIONS
@@ -150,6 +150,15 @@ class Coder(BaseAgent):
         # Regenerate prompt with injected context
         self.system_prompt = self._get_system_prompt(command_preference=command_preference)
     
+    def reset_run_state(self) -> None:
+        """Clear injected context between pooled invocations."""
+        self._injected_folder_map = None
+        self._injected_api_contracts = None
+        self._project_type = "generic"
+        self._last_thought_signature = None
+        self._knowledge_prompt = ""
+        super().reset_run_state()
+    
     def _get_system_prompt(self, command_preference: str = "auto") -> str:
         """Get enhanced system prompt with injected context."""
         base_prompt = CODER_SYSTEM_PROMPT
@@ -742,8 +751,7 @@ Return ONLY JSON.
         from langgraph.prebuilt import create_react_agent
         from app.agents.tools.coder import CODER_TOOLS
         from app.prompts import AGENT_PROMPTS
-        from app.core.llm_factory import LLMFactory
-        from app.core.llm_factory import LLMFactory
+        from app.agents.agent_factory import agent_pool  # Shared LLM clients
         from pathlib import Path
         import os
         import os
@@ -825,6 +833,7 @@ Return ONLY JSON.
         # ARTIFACT INTEGRATION: Read structured artifacts
         # ================================================================
         artifact_context = ""
+        plan_file_count = 0
         ships_dir = Path(project_path) / ".ships" if project_path else None
         
         if ships_dir and ships_dir.exists():
@@ -849,6 +858,7 @@ Return ONLY JSON.
                     folder_data = json.loads(folder_map_path.read_text(encoding="utf-8"))
                     entries = folder_data.get("entries", [])
                     files_to_create = [e for e in entries if not e.get("is_directory", False)]
+                    plan_file_count = len(files_to_create)
                     
                     # DEBUG: Log expected files
                     logger.info(f"[CODER] 📋 Expected files from folder_map_plan: {len(files_to_create)}")
@@ -1093,50 +1103,49 @@ COMPLETION CRITERIA:
                 # Only cache if we have substantial content (Gemini requires min 1024 tokens, ~4000 chars)
                 total_cache_chars = len(file_tree_context) + len(artifact_context)
                 if total_cache_chars > 4500:  # ~1125 tokens minimum
-                    cache_name = cache_manager.create_project_context_cache(
+                    # Reuses a live cache for identical content; creation runs off the event loop
+                    cache_name = await cache_manager.get_or_create_project_context_cache(
                         project_id=project_id,
                         artifacts=cache_artifacts,
                         ttl_minutes=30  # Cache for 30 mins (covers typical session)
                     )
                     if cache_name:
-                        logger.info(f"[CODER] 🗄️ Created context cache: {cache_name}")
+                        logger.info(f"[CODER] 🗄️ Using context cache: {cache_name}")
                 else:
                     logger.info(f"[CODER] ⏭️ Skipping cache: content too small ({total_cache_chars} chars, need 4500+)")
             
-            llm = LLMFactory.get_model("coder", cached_content=cache_name)
+            # ================================================================
+            # MODEL POLICY: Thinking budget (and model) sized to the task
+            # ================================================================
+            from app.services.model_policy import model_policy, TaskSignals, MODEL_FLASH
+            
+            choice = model_policy.choose(TaskSignals(
+                agent="coder",
+                task_type=task_type,
+                scope=structured_intent.get("scope"),
+                file_count=len(normalized_outputs) or plan_file_count,
+                failed_attempts=state.get("fix_attempts", 0),  # Fix rounds on this code so far
+            ))
+            if choice is None:
+                llm = agent_pool.get_llm("coder", cached_content=cache_name)
+            else:
+                llm = agent_pool.get_llm(
+                    "coder",
+                    # Caches are bound to the Flash model they were created for
+                    cached_content=cache_name if choice.model == MODEL_FLASH else None,
+                    thinking_level=choice.thinking_level,
+                    model=choice.model,
+                )
             
             # ================================================================
             # MESSAGE TRIMMING: Prevent token bloat in ReAct loop
             # Use pre_model_hook to trim messages before each LLM call
+            # (per-message counts cached, window kept incrementally; the
+            # task message and tool call/result pairs are never split)
             # ================================================================
-            from langchain_core.messages.utils import trim_messages
+            from app.agents.agent_factory import create_message_trimmer, TOKEN_LIMITS
             
-            def pre_model_hook(state):
-                """Trim messages to prevent context overflow in ReAct loop."""
-                messages = state.get("messages", [])
-                
-                # Simple token estimation: ~4 chars per token
-                def estimate_tokens(msgs):
-                    total = 0
-                    for m in msgs:
-                        content = m.content if hasattr(m, 'content') else str(m)
-                        if isinstance(content, list):
-                            content = str(content)
-                        total += len(content) // 4
-                    return total
-                
-                # Trim to keep last ~4000 tokens worth of messages
-                trimmed = trim_messages(
-                    messages,
-                    strategy="last",
-                    token_counter=estimate_tokens,
-                    max_tokens=4000,
-                    start_on="human",  # Always keep the original human message
-                    include_system=True,
-                )
-                
-                # Return trimmed messages via llm_input_messages (doesn't alter state)
-                return {"llm_input_messages": trimmed}
+            pre_model_hook = create_message_trimmer(TOKEN_LIMITS["coder"])
             
             # Get settings and command preference
             settings = artifacts.get("settings", {})
@@ -1215,6 +1224,11 @@ COMPLETION CRITERIA:
             write_calls = sum(1 for t in tool_sequence if 'write' in t.lower())
             read_calls = sum(1 for t in tool_sequence if 'read' in t.lower() or 'get' in t.lower())
             logger.info(f"[CODER] 📈 Action Ratio: {write_calls} writes, {read_calls} reads")
+            history_stats = pre_model_hook.history.get_stats()
+            logger.info(
+                f"[CODER] 🧮 History: ~{history_stats['tokens']} tokens sent last turn "
+                f"({history_stats['kept']} messages kept, {history_stats['trimmed']} trimmed)"
+            )
             
             # IMPROVED: Track files from both AIMessage.tool_calls AND ToolMessage responses
             from langchain_core.messages import AIMessage, ToolMessage
@@ -541,7 +541,7 @@ Output your reasoning, then use tools to implement the fix."""
         from langgraph.prebuilt import create_react_agent
         from app.agents.tools.fixer import FIXER_TOOLS
         from app.prompts import AGENT_PROMPTS
-        from app.core.llm_factory import LLMFactory
+        from app.agents.agent_factory import agent_pool  # Shared LLM clients
         from pathlib import Path
         
         artifacts = state.get("artifacts", {})
@@ -676,11 +676,29 @@ If impossible to fix, respond: {{"escalate": true, "reason": "explain why"}}
             # Use instance method for prompt
             system_prompt = self._get_system_prompt(command_preference=command_pref)
             
-            llm = LLMFactory.get_model("fixer")
+            # Thinking budget (and model) sized to the errors, escalating per attempt
+            from app.services.model_policy import model_policy, TaskSignals
+            
+            structured_intent = artifacts.get("structured_intent") or {}
+            fix_request = artifacts.get("fix_request") or {}
+            choice = model_policy.choose(TaskSignals(
+                agent="fixer",
+                task_type=structured_intent.get("task_type"),
+                scope=structured_intent.get("scope"),
+                file_count=len(file_context),
+                error_count=fix_request.get("total_violations") or len(recent_errors),
+                failed_attempts=fix_attempts - 1,
+            ))
+            if choice is None:
+                llm = agent_pool.get_llm("fixer")
+            else:
+                llm = agent_pool.get_llm("fixer", thinking_level=choice.thinking_level, model=choice.model)
+            from app.agents.agent_factory import create_message_trimmer, TOKEN_LIMITS
             fixer_agent = create_react_agent(
                 model=llm,
                 tools=FIXER_TOOLS,
                 prompt=system_prompt,
+                pre_model_hook=create_message_trimmer(TOKEN_LIMITS["fixer"]),  # Bound history growth
             )
             
             result = await fixer_agent.ainvoke(
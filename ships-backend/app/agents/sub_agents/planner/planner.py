@@ -97,6 +97,7 @@ class Planner(BaseAgent):
             project_type: Project type for prompt template
         """
         self.current_project_type = project_type
+        self._initial_project_type = project_type
         
         super().__init__(
             name="Planner",
@@ -232,6 +233,12 @@ EFFICIENCY: This should be a quick targeted edit, not a full rewrite.
         
         return base_prompt + task_rules + feedback_section
     
+    def reset_run_state(self) -> None:
+        """Restore the initial project type and environment between pooled invocations."""
+        self.current_project_type = self._initial_project_type
+        self.__dict__.pop("environment", None)
+        super().reset_run_state()
+    
     def set_project_type(self, project_type: str) -> None:
         """Update project type and regenerate system prompt."""
         self.current_project_type = project_type
@@ -918,7 +925,7 @@ Create a detailed plan following this EXACT JSON format. Output ONLY valid JSON,
         from langgraph.prebuilt import create_react_agent
         from app.agents.tools.planner import PLANNER_TOOLS
         from app.prompts import AGENT_PROMPTS
-        from app.core.llm_factory import LLMFactory
+        from app.agents.agent_factory import agent_pool  # Shared LLM clients
         from pathlib import Path
         import os
         
@@ -1273,7 +1280,7 @@ Run the command. If it fails, read the error and fix the issue. Don't retry the
 Use run_terminal_command for commands. Use list_directory to check results."""
 
                     # Create ReAct agent with planner tools
-                    llm = LLMFactory.get_model("planner")
+                    llm = agent_pool.get_llm("planner")
                     planner_agent = create_react_agent(
                         model=llm,
                         tools=PLANNER_TOOLS,
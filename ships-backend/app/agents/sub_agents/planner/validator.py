@@ -7,7 +7,6 @@ No hardcoded rules - fully scalable to any project type.
 
 from pydantic import BaseModel, Field
 from typing import Literal
-from app.core.llm_factory import LLMFactory
 import logging
 
 logger = logging.getLogger("ships.planner.validator")
@@ -32,7 +31,8 @@ class PlanValidator:
     def __init__(self):
         """Initialize validator with fast Flash model."""
         # Use minimal thinking for fast validation (planning already used high)
-        self.llm = LLMFactory.get_model("mini", reasoning_level="standard")
+        from app.agents.agent_factory import agent_pool
+        self.llm = agent_pool.get_llm("mini", reasoning_level="standard")
         
     def validate(self, plan_data: dict, user_request: str) -> PlanValidationResult:
         """
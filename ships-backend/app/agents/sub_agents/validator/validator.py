@@ -22,9 +22,11 @@ This agent should be BORING, RUTHLESS, and CHEAP.
 
 from datetime import datetime
 from typing import Optional, Dict, Any, List
+import asyncio
 import uuid
 
 from app.core.logger import get_logger
+from app.utils.run_context import run_project_root
 
 logger = get_logger("validator")
 
@@ -189,7 +191,10 @@ Output ONLY: pass or fail, with specific violations if failing."""
         # Run layers IN ORDER
         for layer in self.layers:
             logger.info(f"[VALIDATOR] 🔍 Running {layer.layer_name.value} layer...")
-            layer_result = layer.validate(context)
+            # Off the event loop: BuildLayer can run npm for minutes, and the loop
+            # must stay free to serve other runs and cancel this one. to_thread
+            # copies the context, so the run's cancel token and run context reach the layer.
+            layer_result = await asyncio.to_thread(layer.validate, context)
             
             # Store result
             report.layer_results[layer.layer_name.value] = layer_result
@@ -394,7 +399,8 @@ Output ONLY: pass or fail, with specific violations if failing."""
         current_task = artifacts.get("current_task") or parameters.get("task")
         app_blueprint = artifacts.get("app_blueprint")
         dependency_plan = artifacts.get("dependency_plan")
-        project_path = artifacts.get("project_path")  # CRITICAL: Required for BuildLayer
+        # CRITICAL: Required for BuildLayer (the run's own project if state lacks it)
+        project_path = artifacts.get("project_path") or run_project_root()
         
         # Validate
         report = await self.validate(
@@ -70,6 +70,7 @@ from .search_tools import (
     get_file_dependencies,
     SEARCH_TOOLS,
 )
+from app.streaming.event_filter import tag_ui_tools
 
 # Combined export of all tools for the Coder agent
 # Edit tools listed FIRST as they are preferred for modifications
@@ -100,6 +101,9 @@ CODER_TOOLS = [
     detect_language,
 ]
 
+# Tag for the UI stream allowlist (see app/streaming/event_filter.py)
+tag_ui_tools(CODER_TOOLS)
+
 __all__ = [
     # Context
     "set_project_root",
@@ -9,6 +9,8 @@ import logging
 from pathlib import Path
 from contextvars import ContextVar
 
+from app.utils.run_context import run_project_root
+
 logger = logging.getLogger("ships.coder")
 
 # ============================================================================
@@ -20,28 +22,25 @@ _project_root_var: ContextVar[str | None] = ContextVar("project_root", default=N
 
 
 def set_project_root(path: str) -> None:
-    """Set the project root path (called by system, not LLM)."""
+    """Set the project root path for this node (called by system, not LLM)."""
     _project_root_var.set(path)
     logger.info(f"[CODER] 📁 Project root set to: {path}")
 
 
 def get_project_root() -> str | None:
-    """Get the current project root path."""
-    # 1. Try context var (set per request/agent)
+    """
+    Get the current project root path.
+    
+    Run-scoped only (see app/utils/run_context.py): never another run's
+    project, and None outside a run.
+    """
+    # 1. Set by the node this code runs in
     root = _project_root_var.get()
     if root:
         return root
-        
-    # 2. Fallback: Preview Manager (global session singleton)
-    # This catches cases where ContextVar is lost across threads
-    try:
-        from app.services.preview_manager import preview_manager
-        if preview_manager.current_project_path:
-            return preview_manager.current_project_path
-    except ImportError:
-        pass
-        
-    return None
+    
+    # 2. The run's context (bound in the run's task, inherited by tool threads)
+    return run_project_root()
 
 
 def validate_project_path() -> tuple[bool, str]:
@@ -21,6 +21,7 @@ from app.terminal import (
     PTYExecutionConfig,
 )
 from app.agents.tools.coder.context import get_project_root
+from app.utils.cancellation import current_cancel_token
 
 logger = logging.getLogger("ships.coder")
 
@@ -57,6 +58,9 @@ def run_terminal_command(command: str, timeout: int = 300) -> Dict[str, Any]:
     - git (init, add, commit, etc.)
     - python, pip (requires approval)
     
+    If the run is cancelled (client disconnected, cancel endpoint), the
+    command's whole process group is killed and the result has cancelled=True.
+    
     Args:
         command: The command to run (e.g., "npm install", "npx create-vite my-app")
         timeout: Maximum execution time in seconds (default: 300 = 5 minutes)
@@ -76,6 +80,15 @@ def run_terminal_command(command: str, timeout: int = 300) -> Dict[str, Any]:
                 "command": command
             }
         
+        token = current_cancel_token()
+        if token is not None and token.cancelled:
+            return {
+                "success": False,
+                "cancelled": True,
+                "error": f"Run cancelled: {token.reason}",
+                "command": command
+            }
+        
         # Validate command first
         is_valid, error, _ = validate_command(command, project_root)
         if not is_valid:
@@ -120,6 +133,7 @@ def run_terminal_command(command: str, timeout: int = 300) -> Dict[str, Any]:
                     "prompts_handled": result.prompts_handled,
                     "error": result.error,
                     "timed_out": result.timed_out,
+                    "cancelled": result.cancelled,
                     "duration_ms": result.duration_ms,
                     "execution_mode": "pty"
                 }
@@ -142,6 +156,7 @@ def run_terminal_command(command: str, timeout: int = 300) -> Dict[str, Any]:
                     "stderr": result.stderr,
                     "error": result.error,
                     "timed_out": result.timed_out,
+                    "cancelled": result.cancelled,
                     "duration_ms": result.duration_ms,
                     "execution_mode": "standard"
                 }
@@ -44,6 +44,7 @@ from app.agents.tools.coder import (
     insert_content,       # For inserting new content
     run_terminal_command,
 )
+from app.streaming.event_filter import tag_ui_tools
 
 # Combined export of all tools for the Fixer agent
 # EMPOWERED: Fixer now has full access to read, write, edit, and run commands
@@ -67,6 +68,9 @@ FIXER_TOOLS = [
     report_fix_outcome,
 ]
 
+# Tag for the UI stream allowlist (see app/streaming/event_filter.py)
+tag_ui_tools(FIXER_TOOLS)
+
 __all__ = [
     # Strategies
     "FixStrategy",
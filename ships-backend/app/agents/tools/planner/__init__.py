@@ -21,6 +21,7 @@ from app.agents.tools.coder import (
     get_artifact,     # Read dependency_graph.json, security_report.json
 )
 from app.agents.tools.coder.terminal_operations import run_terminal_command
+from app.streaming.event_filter import tag_ui_tools
 
 # Combined export of all tools for the Planner agent
 # Tools re-exported from coder for project scaffolding
@@ -34,6 +35,9 @@ PLANNER_TOOLS = [
     write_file_to_disk,      # Write plan artifacts
 ]
 
+# Tag for the UI stream allowlist (see app/streaming/event_filter.py)
+tag_ui_tools(PLANNER_TOOLS)
+
 __all__ = [
     # Tool class
     "PlannerTools",
@@ -29,6 +29,7 @@ from app.agents.tools.validator.validation_tools import (
     create_validation_report,
     verify_visually,
 )
+from app.streaming.event_filter import tag_ui_tools
 
 # Combined export of all tools for the Validator agent
 VALIDATOR_TOOLS = [
@@ -40,6 +41,9 @@ VALIDATOR_TOOLS = [
     verify_visually,
 ]
 
+# Tag for the UI stream allowlist (see app/streaming/event_filter.py)
+tag_ui_tools(VALIDATOR_TOOLS)
+
 __all__ = [
     # Layers
     "ValidationLayer",
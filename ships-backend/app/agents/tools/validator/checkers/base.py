@@ -19,6 +19,8 @@ from typing import List, Optional, Dict, Any
 import subprocess
 import logging
 
+from app.utils.cancellation import run_subprocess, RunCancelled
+
 logger = logging.getLogger("ships.checkers")
 
 
@@ -216,10 +218,9 @@ class BaseChecker(ABC):
             )
         
         try:
-            result = subprocess.run(
+            result = run_subprocess(
                 cmd,
                 cwd=project_path,
-                capture_output=True,
                 text=True,
                 timeout=self.timeout
             )
@@ -260,6 +261,9 @@ class BaseChecker(ABC):
                 skip_reason="Tool not installed"
             )
             
+        except RunCancelled:
+            raise
+            
         except Exception as e:
             logger.error(f"[{self.name}] Checker failed: {e}")
             return CheckerResult(
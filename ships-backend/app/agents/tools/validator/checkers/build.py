@@ -18,6 +18,7 @@ from typing import List
 from app.agents.tools.validator.checkers.base import (
     BaseChecker, CheckerError, CheckerResult, CheckerSeverity
 )
+from app.utils.cancellation import run_subprocess
 
 
 class BuildChecker(BaseChecker):
@@ -75,10 +76,9 @@ class BuildChecker(BaseChecker):
             )
         
         try:
-            result = subprocess.run(
+            result = run_subprocess(
                 cmd,
                 cwd=project_path,
-                capture_output=True,
                 text=True,
                 timeout=120  # Build can take longer
             )
@@ -283,10 +283,9 @@ class TestChecker(BaseChecker):
             )
         
         try:
-            result = subprocess.run(
+            result = run_subprocess(
                 cmd,
                 cwd=project_path,
-                capture_output=True,
                 text=True,
                 timeout=180  # Tests can take longer
             )
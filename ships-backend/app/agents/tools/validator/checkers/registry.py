@@ -15,8 +15,10 @@ Usage:
 from typing import List, Dict, Optional, Type
 from dataclasses import dataclass, field
 from datetime import datetime
+import contextvars
 import logging
 
+from app.utils.cancellation import RunCancelled, raise_if_cancelled
 from app.agents.tools.validator.checkers.base import (
     BaseChecker, CheckerResult, CheckerError
 )
@@ -170,10 +172,11 @@ class CheckerRegistry:
             else:
                 logger.warning(f"Unknown checker: {name}")
         
-        # Run checkers in parallel (max 4 threads to avoid overwhelming system)
+        # Run checkers in parallel (max 4 threads to avoid overwhelming system).
+        # Each runs in a copy of this context so it sees the run's cancel token.
         with ThreadPoolExecutor(max_workers=4) as executor:
             futures = {
-                executor.submit(checker.check, project_path): name 
+                executor.submit(contextvars.copy_context().run, checker.check, project_path): name 
                 for name, checker in checkers_to_run
             }
             
@@ -192,9 +195,13 @@ class CheckerRegistry:
                         registry_result.total_errors += result.error_count
                         if not result.passed:
                             registry_result.passed = False
+                except RunCancelled:
+                    continue
                 except Exception as e:
                     logger.error(f"Checker {name} failed: {e}")
         
+        raise_if_cancelled()
+        
         registry_result.duration_ms = int(
             (datetime.utcnow() - start).total_seconds() * 1000
         )
@@ -21,6 +21,7 @@ from datetime import datetime
 import re
 import os
 
+from app.utils.cancellation import run_subprocess, RunCancelled
 from app.agents.sub_agents.validator.models import (
     ValidationStatus, FailureLayer, RecommendedAction,
     ViolationSeverity, Violation, LayerResult,
@@ -770,11 +771,10 @@ class BuildLayer(ValidationLayer):
             checks_run += 1
             logger.info("[BUILD] 📦 Running npm install...")
             try:
-                install_result = subprocess.run(
+                install_result = run_subprocess(
                     "npm install",
                     cwd=actual_project_root,
                     shell=True,
-                    capture_output=True,
                     text=True,
                     timeout=180  # 3 minute timeout for install
                 )
@@ -817,11 +817,10 @@ class BuildLayer(ValidationLayer):
                     checks_run += 1
                     try:
                         # Run dev server briefly to catch import errors
-                        dev_result = subprocess.run(
+                        dev_result = run_subprocess(
                             "npm run dev",
                             cwd=actual_project_root,
                             shell=True,
-                            capture_output=True,
                             text=True,
                             timeout=15  # 15 second timeout - just to catch initial errors
                         )
@@ -866,11 +865,10 @@ class BuildLayer(ValidationLayer):
                 logger.info("[BUILD] 🏗️ Running npm run build...")
                 try:
                     # Capture output
-                    result = subprocess.run(
+                    result = run_subprocess(
                         "npm run build",
                         cwd=actual_project_root,
                         shell=True,
-                        capture_output=True,
                         text=True,
                         timeout=120  # 2 minute timeout for build
                     )
@@ -901,6 +899,8 @@ class BuildLayer(ValidationLayer):
                         severity=ViolationSeverity.MAJOR,
                         fix_hint="Optimize build or increase timeout"
                     ))
+                except RunCancelled:
+                    raise
                 except Exception as e:
                     violations.append(BuildViolation(
                         rule="build_execution_error",
@@ -919,6 +919,8 @@ class BuildLayer(ValidationLayer):
                 file_path=pkg_path,
                 fix_hint="Fix JSON syntax in package.json"
             ))
+        except RunCancelled:
+            raise
         except Exception as e:
              violations.append(BuildViolation(
                 rule="package_json_read_error",
@@ -16,11 +16,14 @@ import asyncio
 import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, String
+from sqlalchemy import select, desc, String, func
 
 from app.database.connection import get_session
-from app.models.agent_runs import AgentRun as AgentRunModel
+from app.models.agent_runs import AgentRun as AgentRunModel, AgentStep as AgentStepModel, USAGE_COLUMNS
 from app.models import User
+from app.streaming.run_broker import run_broker, DROP_OLDEST
+from app.streaming.run_owner import resolve_run_owner
+from app.utils.cancellation import cancel_registry
 
 logger = logging.getLogger("ships.runs")
 
@@ -97,6 +100,7 @@ class AgentRun(BaseModel):
     commit_count: int = Field(0, alias="commitCount")
     created_at: str = Field(alias="createdAt")
     updated_at: str = Field(alias="updatedAt")
+    usage: Optional[dict] = None  # LLM tokens / latency / cost totals
     
     class Config:
         populate_by_name = True
@@ -267,6 +271,7 @@ def _model_to_response(run: AgentRunModel) -> dict:
         "commitCount": metadata.get("commit_count", 0),
         "createdAt": run.created_at.isoformat() + "Z" if run.created_at else "",
         "updatedAt": run.created_at.isoformat() + "Z" if run.created_at else "",
+        "usage": run.usage_dict(),
     }
 
 
@@ -291,6 +296,54 @@ async def get_run(
     return _model_to_response(run)
 
 
+@router.get("/{run_id}/usage")
+async def get_run_usage(
+    run_id: str,
+    db: AsyncSession = Depends(get_session),
+    user_id: uuid.UUID = Depends(get_current_user_id)
+):
+    """LLM usage of a run: totals, per agent, and per step (tool-loop iterations)."""
+    result = await db.execute(
+        select(AgentRunModel)
+        .where(AgentRunModel.user_id == user_id)
+        .where(AgentRunModel.id.cast(String).like(f"{run_id}%"))
+    )
+    run = result.scalar_one_or_none()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    columns = ("tokens_used", *USAGE_COLUMNS)
+    by_agent = await db.execute(
+        select(AgentStepModel.agent, *(func.sum(getattr(AgentStepModel, name)) for name in columns))
+        .where(AgentStepModel.run_id == run.id)
+        .group_by(AgentStepModel.agent)
+    )
+    steps = await db.execute(
+        select(AgentStepModel)
+        .where(AgentStepModel.run_id == run.id)
+        .where(AgentStepModel.llm_calls > 0)
+        .order_by(AgentStepModel.step_number)
+    )
+    return {
+        "runId": str(run.id),
+        "total": run.usage_dict(),
+        "byAgent": {
+            row[0]: dict(zip(columns, (value or 0 for value in row[1:])))
+            for row in by_agent.all()
+        },
+        "steps": [
+            {
+                "step": step.step_number,
+                "agent": step.agent,
+                "action": step.action,
+                "tokens_used": step.tokens_used,
+                **{name: getattr(step, name) for name in USAGE_COLUMNS},
+            }
+            for step in steps.scalars().all()
+        ],
+    }
+
+
 @router.delete("/{run_id}")
 async def delete_run(
     run_id: str,
@@ -384,6 +437,44 @@ async def resume_run(
     return {"success": True}
 
 
+@router.post("/{run_id}/cancel")
+async def cancel_run(
+    run_id: str,
+    db: AsyncSession = Depends(get_session),
+    user_id: uuid.UUID = Depends(get_current_user_id)
+):
+    """
+    Cancel a running agent: stops the graph (and its in-flight LLM calls) and
+    kills any npm/build process group it started.
+    """
+    result = await db.execute(
+        select(AgentRunModel)
+        .where(AgentRunModel.user_id == user_id)
+        .where(AgentRunModel.id.cast(String).like(f"{run_id}%"))
+    )
+    run = result.scalar_one_or_none()
+    
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    cancelled = cancel_registry.cancel(str(run.id), "cancel requested")
+    logger.info(f"[RUNS] Cancel requested for run {run_id} (live: {cancelled})")
+    
+    run.status = "cancelled"
+    run.run_metadata = {**(run.run_metadata or {}), "current_agent": None, "agent_message": "Cancelled"}
+    await db.commit()
+    
+    await broadcast_event({
+        "type": "run_status",
+        "runId": run_id,
+        "status": "cancelled",
+        "currentAgent": None,
+        "agentMessage": "Cancelled",
+    })
+    
+    return {"success": True, "cancelled": cancelled}
+
+
 @router.post("/{run_id}/feedback")
 async def send_feedback(
     run_id: str, 
@@ -507,9 +598,32 @@ async def delete_run(
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time run updates."""
+    """
+    WebSocket endpoint for real-time run updates.
+    
+    Besides the broadcast run events, a client can attach to a live run's
+    stream through the run broker:
+        {"type": "subscribe", "run_id": "...", "after": 0}
+        {"type": "unsubscribe", "run_id": "..."}
+    Stream lines are forwarded as {"type": "run:line", "run_id", "line"}.
+    The subscription drops its oldest lines if this socket falls behind, so
+    a slow dashboard never holds up the run. Only runs started by the
+    same user (or client address) can be subscribed.
+    """
     await websocket.accept()
     websocket_connections.append(websocket)
+    forwarders: dict = {}
+    owner, _ = await resolve_run_owner(websocket)  # Only the client's own runs can be subscribed
+    
+    async def forward(run_id: str, subscriber):
+        try:
+            async for line in subscriber:
+                await websocket.send_text(json.dumps({"type": "run:line", "run_id": run_id, "line": line.rstrip("\n")}))
+            await websocket.send_text(json.dumps({"type": "run:ended", "run_id": run_id}))
+        except Exception:
+            pass
+        finally:
+            forwarders.pop(run_id, None)
     
     try:
         # TODO: Fetch initial state from DB if needed
@@ -529,6 +643,23 @@ async def websocket_endpoint(websocket: WebSocket):
                 message = json.loads(data)
                 if message.get("type") == "ping":
                     await websocket.send_text(json.dumps({"type": "pong"}))
+                elif message.get("type") == "subscribe" and message.get("run_id"):
+                    run_id = message["run_id"]
+                    if run_id in forwarders:
+                        continue
+                    subscriber = None
+                    if run_broker.get_owned(run_id, owner) is not None:
+                        subscriber = run_broker.subscribe(
+                            run_id, after_seq=int(message.get("after") or 0), policy=DROP_OLDEST, name="runs-ws"
+                        )
+                    if subscriber is None:
+                        await websocket.send_text(json.dumps({"type": "run:unknown", "run_id": run_id}))
+                    else:
+                        forwarders[run_id] = asyncio.create_task(forward(run_id, subscriber))
+                elif message.get("type") == "unsubscribe":
+                    task = forwarders.pop(message.get("run_id"), None)
+                    if task:
+                        task.cancel()
                     
             except asyncio.TimeoutError:
                 # Send keepalive
@@ -539,5 +670,7 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"[WS] WebSocket error: {e}")
     finally:
+        for task in list(forwarders.values()):
+            task.cancel()
         if websocket in websocket_connections:
             websocket_connections.remove(websocket)
@@ -9,8 +9,15 @@ re-sending tokens, reducing latency and cost.
 """
 
 import os
+import json
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger("ships.cache")
@@ -34,14 +41,50 @@ except ImportError:
         logger.warning("No Gemini SDK found. Explicit caching disabled.")
 
 
+# Where the content-hash -> cache name mapping is persisted across restarts
+CACHE_REGISTRY_PATH = Path(os.getenv(
+    "GEMINI_CACHE_REGISTRY_PATH",
+    str(Path.home() / ".ships" / "gemini_cache_registry.json"),
+))
+CACHE_REGISTRY_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_REGISTRY_MAX_ENTRIES", "128"))
+
+# Don't hand out a cache that is about to expire mid ReAct loop
+_EXPIRY_MARGIN_S = 60
+
+
 class GeminiCacheManager:
-    """Manages explicit context caching for Gemini."""
+    """
+    Manages explicit context caching for Gemini.
     
-    def __init__(self, api_key: Optional[str] = None):
+    Caches are registered by a hash of (model, cached content), so identical
+    project context reuses the live remote cache instead of creating a new one
+    on every coder run. The registry is LRU/TTL-bounded and persisted to disk.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, registry_path: Optional[Path] = None):
+        # content key -> {name, model, project_id, created_at, expires_at, ttl_s}
+        self._registry: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._registry_path = registry_path or CACHE_REGISTRY_PATH
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._creations = 0
+        self._creation_failures = 0
+        self._creation_ms_total = 0.0
+        self._creation_ms_max = 0.0
+        self._refreshes = 0
+        self._evictions = 0
+        
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             logger.warning("GEMINI_API_KEY not set. Caching disabled.")
             self.enabled = False
+        elif os.getenv("LLM_BACKEND") == "replay":
+            # Offline replay (app/core/llm_replay.py): no remote caches to create
+            self.enabled = False
         else:
             self.enabled = bool(SDK_VERSION)
             
@@ -50,27 +93,13 @@ class GeminiCacheManager:
             self.client = None # Legacy uses module-level functions
         elif self.enabled and SDK_VERSION == "v1":
              self.client = genai.Client(api_key=self.api_key)
-
-    def create_project_context_cache(
-        self, 
-        project_id: str,
-        artifacts: Dict[str, str],
-        ttl_minutes: int = 60
-    ) -> Optional[str]:
-        """
-        Create a cache for project context.
-        
-        Args:
-            project_id: Unique project ID
-            artifacts: Dict of {name: content_string} (e.g. folder_map, api_contracts)
-            ttl_minutes: Time to live
-            
-        Returns:
-            Cache resource name (e.g. 'cachedContents/123...') or None
-        """
-        if not self.enabled: return None
         
-        # Build cache content
+        if self.enabled:
+            self._load_registry()
+
+    @staticmethod
+    def _build_context_content(artifacts: Dict[str, str]) -> str:
+        """Render project artifacts into the cached context document."""
         content_parts = []
         content_parts.append("# PROJECT CONTEXT\n\n")
         
@@ -89,14 +118,45 @@ class GeminiCacheManager:
             content_parts.append(artifacts["dependencies"])
             content_parts.append("\n\n")
             
-        full_content = "".join(content_parts)
+        return "".join(content_parts)
+
+    @staticmethod
+    def content_key(model: str, content: str) -> str:
+        """Registry key: hash of the model and the exact cached content."""
+        return hashlib.sha256(f"{model}\0{content}".encode("utf-8")).hexdigest()
+
+    def create_project_context_cache(
+        self, 
+        project_id: str,
+        artifacts: Dict[str, str],
+        ttl_minutes: int = 60,
+        model: str = MODEL_FLASH,
+    ) -> Optional[str]:
+        """
+        Create a cache for project context (blocking network call).
+        
+        Prefer `get_or_create_project_context_cache`, which reuses live caches
+        and keeps this call off the event loop.
+        
+        Args:
+            project_id: Unique project ID
+            artifacts: Dict of {name: content_string} (e.g. folder_map, api_contracts)
+            ttl_minutes: Time to live
+            model: Model the cache is bound to (must match the consuming LLM)
+            
+        Returns:
+            Cache resource name (e.g. 'cachedContents/123...') or None
+        """
+        if not self.enabled: return None
+        
+        full_content = self._build_context_content(artifacts)
         
         cache_name = f"ships-project-{project_id}"
         
         try:
             if SDK_VERSION == "legacy":
                 cache = caching.CachedContent.create(
-                    model=MODEL_FLASH, # Use shared constant
+                    model=model,
                     display_name=cache_name,
                     system_instruction="You are an expert AI developer with access to this project context.",
                     contents=[full_content],
@@ -108,7 +168,7 @@ class GeminiCacheManager:
             elif SDK_VERSION == "v1":
                 # Create cache
                 cache = self.client.caches.create(
-                    model=MODEL_FLASH, # Use shared constant
+                    model=model,
                     config=types.CreateCachedContentConfig(
                         display_name=cache_name,
                         system_instruction="You are an expert AI developer.",
@@ -123,13 +183,234 @@ class GeminiCacheManager:
             logger.error(f"[CACHE] Failed to create cache: {e}")
             return None
 
+    async def get_or_create_project_context_cache(
+        self,
+        project_id: str,
+        artifacts: Dict[str, str],
+        ttl_minutes: int = 60,
+        model: str = MODEL_FLASH,
+    ) -> Optional[str]:
+        """
+        Reuse a live cache for this exact content, or create one off the event loop.
+        
+        On a hit whose remaining TTL has dropped below half, the remote TTL is
+        extended. Concurrent callers asking for the same content share one
+        creation.
+        
+        Args:
+            project_id: Project ID (for display name / lookups)
+            artifacts: Dict of {name: content_string}
+            ttl_minutes: Time to live for new or refreshed caches
+            model: Model the cache is bound to
+            
+        Returns:
+            Cache resource name or None (caching disabled / creation failed)
+        """
+        if not self.enabled:
+            return None
+        
+        key = self.content_key(model, self._build_context_content(artifacts))
+        ttl_s = ttl_minutes * 60
+        
+        entry = self._lookup(key)
+        if entry is not None:
+            remaining = entry["expires_at"] - time.time()
+            if remaining < ttl_s / 2:
+                if await asyncio.to_thread(self._refresh_entry, key, entry, ttl_s):
+                    remaining = entry["expires_at"] - time.time()
+                else:
+                    entry = None  # Gone remotely - fall through and recreate
+            if entry is not None:
+                with self._lock:
+                    self._hits += 1
+                logger.info(f"[CACHE] ♻️ Reusing context cache {entry['name']} ({remaining / 60:.0f}m left)")
+                return entry["name"]
+        
+        with self._lock:
+            self._misses += 1
+        
+        # Share an in-flight creation for the same content
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    return None  # Creator was cancelled - run uncached
+                raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            name, elapsed_ms = await asyncio.to_thread(
+                self._create_entry, key, project_id, artifacts, ttl_minutes, model
+            )
+            if name:
+                logger.info(f"[CACHE] 🗄️ Created context cache {name} in {elapsed_ms:.0f}ms")
+            
+            future.set_result(name)
+            return name
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved - waiters are optional
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
     def get_cache_name_for_agent(self, project_id: str) -> Optional[str]:
         """
-        Retrieve existing cache name for project if active.
-        IN PROGRESS: For now, we rely on creating a new one or passed ID.
-        Ideally we store the cache.name in memory/state.
+        Retrieve the most recently used live cache for a project, if any.
+        
+        Args:
+            project_id: Project ID the cache was created for
+            
+        Returns:
+            Cache resource name or None
         """
-        return None 
+        self._evict_expired()
+        with self._lock:
+            for entry in reversed(self._registry.values()):
+                if entry.get("project_id") == project_id:
+                    return entry["name"]
+        return None
+
+    # ------------------------------------------------------------------
+    # Registry (content key -> remote cache)
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._registry.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] - _EXPIRY_MARGIN_S <= time.time():
+                del self._registry[key]
+                self._evictions += 1
+                return None
+            self._registry.move_to_end(key)
+            return entry
+
+    def _register(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._registry[key] = entry
+            self._registry.move_to_end(key)
+            while len(self._registry) > CACHE_REGISTRY_MAX_ENTRIES:
+                self._registry.popitem(last=False)
+                self._evictions += 1
+
+    # Worker-thread helpers: the remote call and the registry write both
+    # block, so each runs in one asyncio.to_thread hop
+
+    def _create_entry(self, key: str, project_id: str, artifacts: Dict[str, str],
+                      ttl_minutes: int, model: str) -> Tuple[Optional[str], float]:
+        """Create a remote cache, register and persist it (blocking). Returns (name, ms)."""
+        start = time.perf_counter()
+        name = self.create_project_context_cache(project_id, artifacts, ttl_minutes, model)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            if name:
+                self._creations += 1
+                self._creation_ms_total += elapsed_ms
+                self._creation_ms_max = max(self._creation_ms_max, elapsed_ms)
+            else:
+                self._creation_failures += 1
+        if name:
+            ttl_s = ttl_minutes * 60
+            self._register(key, {
+                "name": name,
+                "model": model,
+                "project_id": project_id,
+                "created_at": time.time(),
+                "expires_at": time.time() + ttl_s,
+                "ttl_s": ttl_s,
+            })
+            self._save_registry()
+        return name, elapsed_ms
+
+    def _refresh_entry(self, key: str, entry: Dict[str, Any], ttl_s: int) -> bool:
+        """Extend a hit's remote TTL, or drop it if gone, and persist (blocking)."""
+        refreshed = self._refresh_ttl(entry["name"], ttl_s)
+        with self._lock:
+            if refreshed:
+                entry["expires_at"] = time.time() + ttl_s
+                self._refreshes += 1
+            elif self._registry.pop(key, None) is not None:
+                self._evictions += 1
+        self._save_registry()
+        return refreshed
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._registry.items() if e["expires_at"] - _EXPIRY_MARGIN_S <= now]
+            for k in expired:
+                del self._registry[k]
+            self._evictions += len(expired)
+
+    def _refresh_ttl(self, name: str, ttl_s: int) -> bool:
+        """Extend a remote cache's TTL (blocking). Returns False if it no longer exists."""
+        try:
+            if SDK_VERSION == "legacy":
+                caching.CachedContent.get(name).update(ttl=timedelta(seconds=ttl_s))
+            elif SDK_VERSION == "v1":
+                self.client.caches.update(
+                    name=name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{ttl_s}s"),
+                )
+            return True
+        except Exception as e:
+            logger.warning(f"[CACHE] TTL refresh failed for {name}: {e}")
+            return False
+
+    def _load_registry(self) -> None:
+        """Restore live entries from disk so restarts keep cache hits."""
+        try:
+            if not self._registry_path.exists():
+                return
+            data = json.loads(self._registry_path.read_text(encoding="utf-8"))
+            now = time.time()
+            live = [(k, e) for k, e in data.items() if e.get("expires_at", 0) - _EXPIRY_MARGIN_S > now]
+            live.sort(key=lambda item: item[1].get("created_at", 0))
+            with self._lock:
+                for k, e in live[-CACHE_REGISTRY_MAX_ENTRIES:]:
+                    self._registry[k] = e
+            if live:
+                logger.info(f"[CACHE] Restored {len(self._registry)} live context caches from {self._registry_path}")
+        except Exception as e:
+            logger.warning(f"[CACHE] Could not load cache registry: {e}")
+
+    def _save_registry(self) -> None:
+        """Persist the registry atomically (tmp file + replace)."""
+        try:
+            with self._lock:
+                data = dict(self._registry)
+            self._registry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._registry_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self._registry_path)
+        except Exception as e:
+            logger.warning(f"[CACHE] Could not persist cache registry: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Registry counters for diagnostics."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._registry),
+                "hits": self._hits,
+                "misses": self._misses,
+                "creations": self._creations,
+                "creation_failures": self._creation_failures,
+                "creation_ms_avg": round(self._creation_ms_total / self._creations, 1) if self._creations else 0.0,
+                "creation_ms_max": round(self._creation_ms_max, 1),
+                "ttl_refreshes": self._refreshes,
+                "evictions": self._evictions,
+            }
+
 
 # Global instance
 cache_manager = GeminiCacheManager()
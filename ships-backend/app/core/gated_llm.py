@@ -0,0 +1,122 @@
+"""
+Chat model wrapper that sends every call through the LLM gateway.
+
+LLMFactory wraps the clients it builds in a GatedChatModel, so every agent
+call - plain, streamed, with tools, with structured output - waits for
+admission in app/services/llm_gateway.py and has rate-limited attempts
+retried there, in the shared queue (the client library retries at most
+once). Cancelled calls only give their slot back.
+
+The priority comes from the agent type (AGENT_PRIORITY in llm_factory.py)
+and is raised for calls made by the chat node (NODE_PRIORITY).
+
+Sync paths (invoke / stream outside an event loop) call the client
+directly; the gateway counts them as ungated.
+"""
+
+import time
+from typing import Dict, List, Optional, Iterator, AsyncIterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+from app.services.llm_gateway import llm_gateway, INTERACTIVE, STANDARD
+
+# Graph nodes whose calls someone is waiting on directly
+NODE_PRIORITY: Dict[str, int] = {"chat": INTERACTIVE}
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Rough input token count (~4 chars per token) for TPM admission."""
+    chars = 0
+    for message in messages:
+        content = message.content
+        chars += len(content) if isinstance(content, str) else sum(
+            len(part.get("text", "")) if isinstance(part, dict) else len(str(part)) for part in content)
+    return chars // 4 + 1
+
+
+def _result_tokens(result: ChatResult) -> Optional[int]:
+    if not result.generations:
+        return None
+    usage = getattr(result.generations[0].message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class GatedChatModel(BaseChatModel):
+    """A chat model whose calls are admitted (and retried) by the LLM gateway."""
+
+    inner: BaseChatModel
+    gateway_model: str  # Gateway buckets / backoff key
+    priority: int = STANDARD
+    streaming: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        return self.inner._get_ls_params(stop=stop, **kwargs)
+
+    def bind_tools(self, tools, **kwargs):
+        # The client formats the tools; the call still goes through us
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        structured = self.inner.with_structured_output(schema, **kwargs)
+        steps = getattr(structured, "steps", None)
+        if steps and isinstance(steps[0], RunnableBinding) and steps[0].bound is self.inner:
+            return RunnableSequence(self.bind(**steps[0].kwargs), *steps[1:])
+        return super().with_structured_output(schema, **kwargs)
+
+    def _priority(self, run_manager) -> int:
+        node = (getattr(run_manager, "metadata", None) or {}).get("langgraph_node")
+        return min(self.priority, NODE_PRIORITY.get(node, self.priority))
+
+    # ------------------------------------------------------------------
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return await llm_gateway.call(
+            self.gateway_model, self._priority(run_manager), estimate_tokens(messages),
+            lambda: self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens_used=_result_tokens,
+        )
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        priority, tokens = self._priority(run_manager), estimate_tokens(messages)
+        since = time.monotonic()
+        attempt = 0
+        while True:
+            lease = await llm_gateway.acquire(self.gateway_model, priority, tokens, since=since)
+            lease.attempt = attempt
+            started = False
+            used = None
+            try:
+                async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    started = True
+                    usage = getattr(chunk.message, "usage_metadata", None)
+                    if usage:
+                        used = (used or 0) + (usage.get("total_tokens") or 0)
+                    yield chunk
+            except Exception as e:
+                # Only retried before the first chunk: nothing was shown yet
+                if not llm_gateway.fail(lease, e, retryable=not started):
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled, or the consumer stopped reading (GeneratorExit)
+                llm_gateway.cancel(lease)
+                raise
+            llm_gateway.release(lease, used)
+            return
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        llm_gateway.note_ungated(self.gateway_model)
+        return self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        llm_gateway.note_ungated(self.gateway_model)
+        yield from self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
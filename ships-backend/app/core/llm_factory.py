@@ -9,16 +9,42 @@ thinking_level options:
 - 'low': Fast responses (Orchestrator, Mini-agents)
 - 'medium': Balanced (Flash only)
 - 'minimal': Least reasoning (Flash only)
+
+LLM_BACKEND=record / replay records Gemini calls to fixtures or answers
+from them offline (see app/core/llm_replay.py).
+
+The coder and fixer pass a per-invocation model / thinking_level chosen by
+the complexity policy (app/services/model_policy.py); these override the
+agent type defaults below.
+
+Every model is wrapped in a GatedChatModel: calls are admitted, prioritized
+and retried by the process-wide LLM gateway (app/services/llm_gateway.py),
+not by each client (LLM_GATEWAY_ENABLED=false restores client retries).
 """
 
 import os
-from typing import Literal
+from typing import Literal, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from app.core.llm_replay import ReplayChatModel, llm_recorder
+from app.core.gated_llm import GatedChatModel
+from app.services.llm_gateway import MINI, STANDARD, BULK
+
 # Model Constants
 MODEL_FLASH = "gemini-3-flash-preview"
 MODEL_PRO = "gemini-3-pro-preview"
 
+LLM_GATEWAY_ENABLED = os.getenv("LLM_GATEWAY_ENABLED", "true").lower() != "false"
+
+# Gateway priority class per agent type (the chat node is raised further, see gated_llm.py)
+AGENT_PRIORITY = {
+    "mini": MINI,
+    "orchestrator": MINI,
+    "planner": STANDARD,
+    "fixer": STANDARD,
+    "coder": BULK,
+}
+
 
 class LLMFactory:
     """
@@ -32,7 +58,9 @@ class LLMFactory:
     def get_model(
         agent_type: Literal["orchestrator", "planner", "coder", "fixer", "mini"],
         reasoning_level: Literal["standard", "high"] = "standard",
-        cached_content: str = None  # Explicit caching support
+        cached_content: str = None,  # Explicit caching support
+        thinking_level: Optional[str] = None,
+        model: Optional[str] = None,
     ) -> ChatGoogleGenerativeAI:
         """
         Returns a configured ChatGoogleGenerativeAI instance.
@@ -40,14 +68,26 @@ class LLMFactory:
         Args:
             agent_type: Type of agent for model/config selection
             reasoning_level: 'standard' or 'high' for deep thinking
+            thinking_level: Explicit thinking level (overrides the agent default)
+            model: Explicit model name (overrides the agent default)
             
         Returns:
             Configured ChatGoogleGenerativeAI instance with thinking_level
+            (ReplayChatModel when LLM_BACKEND=replay)
         """
+        backend = os.getenv("LLM_BACKEND", "gemini")
+        if backend == "replay":
+            return LLMFactory._gated(
+                ReplayChatModel(agent_type=agent_type, metadata={"ships_agent": agent_type}),
+                MODEL_FLASH, agent_type,
+            )
+
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             print("WARNING: GEMINI_API_KEY not found in environment variables.")
 
+        thinking_override = thinking_level
+
         # Default configuration
         model_name = MODEL_FLASH
         temperature = 0.7
@@ -89,6 +129,12 @@ class LLMFactory:
         # Override if explicit high reasoning requested
         if reasoning_level == "high":
             thinking_level = "high"
+
+        # Per-invocation choice (model_policy.py) wins over the agent defaults
+        if thinking_override:
+            thinking_level = thinking_override
+        if model:
+            model_name = model
             
         # Safety Settings
         safety_settings = {
@@ -107,8 +153,13 @@ class LLMFactory:
             streaming=True,  # Enable token-by-token streaming for LangGraph stream_mode="messages"
             # thinking_level passed via bind() to avoid Pydantic errors in older libs
             cached_content=cached_content, 
-            max_retries=30,
+            # The gateway retries rate-limited calls in its shared queue; client-side
+            # retries would multiply load exactly when the API is saturated
+            max_retries=1 if LLM_GATEWAY_ENABLED else 30,
+            callbacks=[llm_recorder(agent_type)] if backend == "record" else None,
+            metadata={"ships_agent": agent_type},  # Usage attribution (token_accounting.py)
         )
+        llm = LLMFactory._gated(llm, model_name, agent_type)
         
         # Bind the thinking configuration
         # Matches Gemini 3 structure: generation_config={"thinking_config": {"thinking_level": ...}}
@@ -116,6 +167,20 @@ class LLMFactory:
              return llm.bind(generation_config={"thinking_config": {"thinking_level": thinking_level}})
         
         return llm
+    
+    @staticmethod
+    def _gated(llm, model_name: str, agent_type: str):
+        """Route the client's calls through the LLM gateway."""
+        if not LLM_GATEWAY_ENABLED:
+            return llm
+        # Callbacks / metadata move to the wrapper: it is what LangChain runs
+        return GatedChatModel(
+            inner=llm,
+            gateway_model=model_name,
+            priority=AGENT_PRIORITY.get(agent_type, STANDARD),
+            callbacks=llm.callbacks,
+            metadata=llm.metadata,
+        )
 
 
 # Global factory instance
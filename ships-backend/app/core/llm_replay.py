@@ -0,0 +1,373 @@
+"""
+Record / replay LLM backend: run the full pipeline without live Gemini.
+
+Without it, every pipeline run pays real model latency, so graph, tool,
+streaming and DB overhead can't be measured on their own, and nothing runs
+offline.
+
+LLMFactory.get_model() picks the backend from LLM_BACKEND:
+
+- gemini (default): ChatGoogleGenerativeAI
+- record: ChatGoogleGenerativeAI, and an LLMRecorder callback writes every
+  call (input messages, streamed chunks with their timing, final message
+  incl. tool calls) to <fixtures dir>/<agent_type>.jsonl
+- replay: ReplayChatModel answers from those files - no network. Streams
+  the recorded chunks, supports bind_tools / with_structured_output like the
+  real model, and sleeps a configurable synthetic latency
+  (LLM_REPLAY_FIRST_TOKEN_MS + LLM_REPLAY_CHUNK_MS per chunk, or the
+  recorded timing with LLM_REPLAY_LATENCY=recorded)
+
+A call is answered by the recording with the same input messages; if none
+matches (paths / timestamps differ between runs) by the next unused
+recording of that agent, in recorded order. LLM_REPLAY_ON_MISS=empty answers
+an empty message instead of raising when recordings run out.
+
+Usage:
+    LLM_BACKEND=record LLM_FIXTURES_DIR=fixtures/todo python ...   # once, live
+    LLM_BACKEND=replay LLM_FIXTURES_DIR=fixtures/todo python ...   # offline
+    set_fixtures_dir(path)   # switch recordings in-process (benchmarks)
+
+See tests/bench_pipeline.py for the end-to-end benchmark.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import itertools
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Sequence
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage, AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult, LLMResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger("ships.llm_replay")
+
+LLM_FIXTURES_DIR = os.getenv(
+    "LLM_FIXTURES_DIR",
+    str(Path(__file__).resolve().parents[2] / "tests" / "fixtures" / "llm"),
+)
+LLM_REPLAY_FIRST_TOKEN_MS = float(os.getenv("LLM_REPLAY_FIRST_TOKEN_MS", "0"))
+LLM_REPLAY_CHUNK_MS = float(os.getenv("LLM_REPLAY_CHUNK_MS", "0"))
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "synthetic")  # synthetic | recorded
+LLM_REPLAY_ON_MISS = os.getenv("LLM_REPLAY_ON_MISS", "error")  # error | empty
+
+_fixtures_dir = LLM_FIXTURES_DIR
+
+
+class LLMReplayMiss(RuntimeError):
+    """No recording left to answer a replayed call."""
+
+
+def set_fixtures_dir(directory: str) -> None:
+    """Record to / replay from `directory` from now on (all agents)."""
+    global _fixtures_dir
+    _fixtures_dir = str(directory)
+
+
+def get_fixtures_dir() -> str:
+    return _fixtures_dir
+
+
+def request_key(messages: Sequence[BaseMessage]) -> str:
+    """Stable key of a call's input: message types, content and tool calls (no ids)."""
+    parts = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(
+            message.content, sort_keys=True, default=str)
+        calls = [(c.get("name"), json.dumps(c.get("args"), sort_keys=True, default=str))
+                 for c in getattr(message, "tool_calls", None) or []]
+        parts.append((message.type, content, calls))
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+# ============================================================================
+# Recording
+# ============================================================================
+
+class LLMRecorder(BaseCallbackHandler):
+    """Callback on the real model: writes each call to <fixtures dir>/<agent_type>.jsonl."""
+
+    run_inline = True  # Chunk timing and order as they happen, on the loop thread
+
+    def __init__(self, agent_type: str):
+        self.agent_type = agent_type
+        self._seq = itertools.count(1)
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._pending[run_id] = {
+            "seq": next(self._seq),
+            "messages": messages[0],
+            "started": time.perf_counter(),
+            "chunks": [],
+        }
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id=None, **kwargs) -> None:
+        call = self._pending.get(run_id)
+        if call is None or chunk is None:
+            return
+        message = getattr(chunk, "message", None)
+        if isinstance(message, AIMessageChunk):
+            call["chunks"].append({
+                "t_ms": round((time.perf_counter() - call["started"]) * 1000, 1),
+                "message": message_to_dict(message),
+            })
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        call = self._pending.pop(run_id, None)
+        if call is None or not response.generations or not response.generations[0]:
+            return
+        generation = response.generations[0][0]
+        message = getattr(generation, "message", None) or AIMessage(content=generation.text)
+        record = {
+            "seq": call["seq"],
+            "agent_type": self.agent_type,
+            "key": request_key(call["messages"]),
+            "request": [message_to_dict(m) for m in call["messages"]],
+            "response": message_to_dict(message),
+            "chunks": call["chunks"],
+            "total_ms": round((time.perf_counter() - call["started"]) * 1000, 1),
+        }
+        path = Path(_fixtures_dir) / f"{self.agent_type}.jsonl"
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._pending.pop(run_id, None)
+
+
+_recorders: Dict[str, LLMRecorder] = {}
+
+
+def llm_recorder(agent_type: str) -> LLMRecorder:
+    """The recorder for an agent type (one per process, so its call order holds)."""
+    recorder = _recorders.get(agent_type)
+    if recorder is None:
+        recorder = _recorders[agent_type] = LLMRecorder(agent_type)
+    return recorder
+
+
+# ============================================================================
+# Replay
+# ============================================================================
+
+class LLMFixtures:
+    """The recordings of one fixtures dir, and which of them were used."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._used: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.exact = 0
+        self.sequential = 0
+        self.misses = 0
+        self.latency_s = 0.0  # Synthetic model time slept
+
+    def _load(self, agent_type: str) -> List[Dict[str, Any]]:
+        records = self._records.get(agent_type)
+        if records is None:
+            path = self.directory / f"{agent_type}.jsonl"
+            records = []
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+            records.sort(key=lambda r: r.get("seq", 0))
+            self._records[agent_type] = records
+            self._used[agent_type] = set()
+        return records
+
+    def take(self, agent_type: str, key: str) -> Optional[Dict[str, Any]]:
+        """Recording with this key, else the next unused one for the agent."""
+        with self._lock:
+            records = self._load(agent_type)
+            used = self._used[agent_type]
+            fallback = None
+            for i, record in enumerate(records):
+                if i in used:
+                    continue
+                if record.get("key") == key:
+                    used.add(i)
+                    self.exact += 1
+                    return record
+                if fallback is None:
+                    fallback = i
+            if fallback is None:
+                self.misses += 1
+                return None
+            used.add(fallback)
+            self.sequential += 1
+            return records[fallback]
+
+    def rewind(self) -> None:
+        """Make every recording available again (next benchmark round)."""
+        with self._lock:
+            for used in self._used.values():
+                used.clear()
+            self.exact = self.sequential = self.misses = 0
+            self.latency_s = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "recordings": {agent: len(records) for agent, records in self._records.items()},
+            "exact": self.exact,
+            "sequential": self.sequential,
+            "misses": self.misses,
+            "latency_s": round(self.latency_s, 3),
+        }
+
+
+_stores: Dict[str, LLMFixtures] = {}
+
+
+def llm_fixtures(directory: Optional[str] = None) -> LLMFixtures:
+    """Shared recordings of `directory` (default: the current fixtures dir)."""
+    directory = str(directory or _fixtures_dir)
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores[directory] = LLMFixtures(directory)
+    return store
+
+
+def _as_chunk(message: AIMessage) -> AIMessageChunk:
+    """A whole recorded message as one stream chunk (call recorded without streaming)."""
+    return AIMessageChunk(
+        content=message.content,
+        tool_call_chunks=[
+            {"name": c["name"], "args": json.dumps(c["args"]), "id": c.get("id"), "index": i}
+            for i, c in enumerate(message.tool_calls)
+        ],
+        usage_metadata=message.usage_metadata,
+        response_metadata=message.response_metadata,
+    )
+
+
+def _parse_structured(message: AIMessage, schema):
+    """with_structured_output result from a tool call (or JSON text) answer."""
+    if message.tool_calls:
+        data = message.tool_calls[0]["args"]
+    else:
+        text = message.content if isinstance(message.content, str) else "".join(
+            p.get("text", "") if isinstance(p, dict) else str(p) for p in message.content)
+        text = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+        data = json.loads(text)
+    if isinstance(schema, type) and hasattr(schema, "model_validate"):
+        return schema.model_validate(data)
+    return data
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model answering from recorded Gemini calls (see module docstring).
+
+    Deterministic: the same recordings and call order give the same answers.
+    """
+
+    agent_type: str = "mini"
+    fixtures_dir: Optional[str] = None  # None: follow set_fixtures_dir()
+    first_token_ms: float = LLM_REPLAY_FIRST_TOKEN_MS
+    chunk_ms: float = LLM_REPLAY_CHUNK_MS
+    recorded_timing: bool = LLM_REPLAY_LATENCY == "recorded"
+    on_miss: str = LLM_REPLAY_ON_MISS
+
+    @property
+    def _llm_type(self) -> str:
+        return "ships-replay"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, **kwargs):
+        llm = self.bind_tools([schema], tool_choice="any")
+        parser = RunnableLambda(lambda message: _parse_structured(message, schema))
+        if include_raw:
+            return llm | RunnableLambda(lambda message: {
+                "raw": message, "parsed": _parse_structured(message, schema), "parsing_error": None,
+            })
+        return llm | parser
+
+    # ------------------------------------------------------------------
+
+    def _answer(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        store = llm_fixtures(self.fixtures_dir)
+        record = store.take(self.agent_type, request_key(messages))
+        if record is None:
+            if self.on_miss == "empty":
+                logger.warning(f"[LLM_REPLAY] ⚠️ No recording left for {self.agent_type}, answering empty")
+                return {"response": message_to_dict(AIMessage(content="")), "chunks": []}
+            raise LLMReplayMiss(f"No recording left for {self.agent_type} in {store.directory}")
+        return record
+
+    def _chunks(self, record: Dict[str, Any]) -> List[AIMessageChunk]:
+        if record.get("chunks"):
+            return messages_from_dict([c["message"] for c in record["chunks"]])
+        return [_as_chunk(messages_from_dict([record["response"]])[0])]
+
+    def _delays(self, record: Dict[str, Any], count: int) -> List[float]:
+        """Seconds to wait before each chunk."""
+        if self.recorded_timing and record.get("chunks"):
+            marks = [c.get("t_ms", 0.0) for c in record["chunks"]]
+            return [max(0.0, b - a) / 1000 for a, b in zip([0.0] + marks, marks)]
+        return [(self.first_token_ms if i == 0 else self.chunk_ms) / 1000 for i in range(count)]
+
+    def _result(self, record: Dict[str, Any]) -> ChatResult:
+        message = messages_from_dict([record["response"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        record = self._answer(messages)
+        delay = sum(self._delays(record, len(self._chunks(record))))
+        if delay:
+            llm_fixtures(self.fixtures_dir).latency_s += delay
+            time.sleep(delay)
+        return self._result(record)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        record = self._answer(messages)
+        delay = sum(self._delays(record, len(self._chunks(record))))
+        if delay:
+            llm_fixtures(self.fixtures_dir).latency_s += delay
+            await asyncio.sleep(delay)
+        return self._result(record)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        record = self._answer(messages)
+        chunks = self._chunks(record)
+        store = llm_fixtures(self.fixtures_dir)
+        for delay, message in zip(self._delays(record, len(chunks)), chunks):
+            if delay:
+                store.latency_s += delay
+                time.sleep(delay)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        record = self._answer(messages)
+        chunks = self._chunks(record)
+        store = llm_fixtures(self.fixtures_dir)
+        for delay, message in zip(self._delays(record, len(chunks)), chunks):
+            if delay:
+                store.latency_s += delay
+                await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -8,6 +8,14 @@ from app.database.connection import (
     close_database,
     DatabaseConnection,
 )
+from app.database.checkpointer import (
+    init_checkpointer,
+    get_shared_checkpointer,
+    checkpointer_health_check,
+    get_checkpointer_stats,
+    close_checkpointer,
+    CheckpointerPool,
+)
 
 __all__ = [
     "get_session",
@@ -16,4 +24,10 @@ __all__ = [
     "health_check",
     "close_database",
     "DatabaseConnection",
+    "init_checkpointer",
+    "get_shared_checkpointer",
+    "checkpointer_health_check",
+    "get_checkpointer_stats",
+    "close_checkpointer",
+    "CheckpointerPool",
 ]
@@ -0,0 +1,570 @@
+"""
+Compact, deduplicating checkpoint serializer.
+
+LangGraph re-serializes every changed channel after every node. For the agent
+graph that means the whole `artifacts` dict (plan_manifest, folder_map,
+api_contracts, ...) and the append-only `messages` / `stream_events` lists are
+written again on every step, even though most of it hasn't changed.
+
+CompactSerializer wraps the default serializer and:
+- Stores large values content-addressed (sha256) in an ArtifactStore, so an
+  unchanged plan is written once and referenced by digest afterwards
+- Splits long lists into fixed-size blocks, so an append-only list only
+  writes its new tail block(s) - earlier blocks hash to the same digest
+- zlib-compresses the remaining payload
+
+Artifact store I/O happens on the saver's async paths, never inside the
+serializer (which runs on the event loop): CompactPostgresSaver flushes
+new artifacts before each checkpoint write and prefetches missing ones on
+reads. Artifacts no checkpoint references are garbage-collected
+periodically (PostgresArtifactStore.collect_garbage).
+
+Checkpoints written by the plain serializer still load (their type tag is
+delegated to the inner serializer).
+"""
+
+import os
+import json
+import time
+import struct
+import zlib
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator, Set
+
+logger = logging.getLogger("ships.database.checkpoint_serde")
+
+# A persisted digest is reused without writing it again for this long...
+ARTIFACT_KNOWN_TTL_S = float(os.getenv("CHECKPOINT_ARTIFACT_KNOWN_TTL_S", "3600"))
+# ...and unreferenced artifacts are only deleted when untouched for longer
+ARTIFACT_GC_GRACE_S = float(os.getenv("CHECKPOINT_ARTIFACT_GC_GRACE_S", "86400"))
+
+# Type tag written to the checkpoint tables for compact payloads
+COMPACT_TYPE = "ships-cz"
+
+_HEADER_LEN = struct.Struct(">I")
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+# Payloads encoded ahead of a saver write (see CompactSerializer.encoded)
+_ENCODED: ContextVar[Optional[Dict[int, Tuple[Any, Tuple[str, bytes]]]]] = ContextVar(
+    "ships_checkpoint_encoded", default=None
+)
+
+
+def _read_header(payload: bytes) -> Tuple[Dict[str, Any], bytes, int]:
+    raw = zlib.decompress(payload)
+    (header_len,) = _HEADER_LEN.unpack_from(raw, 0)
+    offset = _HEADER_LEN.size
+    header = json.loads(raw[offset:offset + header_len])
+    return header, raw, offset + header_len
+
+
+def _collect_refs(part: Dict[str, Any], refs: List[str]) -> None:
+    if "r" in part:
+        refs.append(part["r"])
+    for key in ("v", "l", "u"):
+        for child in part.get(key, ()):
+            _collect_refs(child, refs)
+
+
+def payload_refs(payload: bytes) -> List[str]:
+    """Artifact digests a compact payload references."""
+    refs: List[str] = []
+    _collect_refs(_read_header(payload)[0]["p"], refs)
+    return refs
+
+
+def _refs_of_payloads(payloads: List[bytes]) -> Set[str]:
+    refs: Set[str] = set()
+    for payload in payloads:
+        try:
+            refs.update(payload_refs(payload))
+        except Exception as e:
+            logger.warning(f"[CHECKPOINT_SERDE] ⚠️ Unreadable payload skipped during GC: {e}")
+    return refs
+
+
+# ============================================================================
+# ARTIFACT STORES
+# ============================================================================
+
+class ArtifactsMissing(ValueError):
+    """Referenced artifacts are not in the store's memory (or not stored at all)."""
+
+    def __init__(self, digests: List[str]):
+        self.digests = digests
+        shown = ", ".join(d[:12] for d in digests[:3])
+        super().__init__(f"Checkpoint artifact(s) {shown} missing from store")
+
+
+class ArtifactStore:
+    """
+    Content-addressed blob storage used by CompactSerializer.
+
+    Blobs are immutable: the same digest always maps to the same bytes, so
+    put() is idempotent and stores are free to cache aggressively.
+
+    get() / put() are called from inside the serializer, i.e. synchronously
+    on the event loop, so they must never do I/O. Stores backed by a
+    database buffer writes and serve reads from memory; the saver calls
+    aflush() / aprefetch() around its own async I/O (see compact_saver.py).
+    """
+
+    def get(self, digest: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put(self, digest: str, data: bytes) -> bool:
+        """
+        Store a blob.
+
+        Returns:
+            True if the blob was new, False if it already existed
+        """
+        raise NotImplementedError
+
+    def missing(self, digests: List[str]) -> List[str]:
+        """Digests get() can't serve right now."""
+        return [d for d in digests if self.get(d) is None]
+
+    async def aprefetch(self, digests: List[str]) -> int:
+        """Load blobs into memory. Returns how many were found."""
+        return 0
+
+    async def aflush(self) -> int:
+        """Persist buffered blobs. Returns how many were written."""
+        return 0
+
+
+class MemoryArtifactStore(ArtifactStore):
+    """In-process store (pairs with MemorySaver - lost on restart)."""
+
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[bytes]:
+        return self._blobs.get(digest)
+
+    def put(self, digest: str, data: bytes) -> bool:
+        with self._lock:
+            if digest in self._blobs:
+                return False
+            self._blobs[digest] = data
+            return True
+
+
+class PostgresArtifactStore(ArtifactStore):
+    """
+    Postgres-backed store (table `checkpoint_artifacts`), sharing the
+    checkpointer's AsyncConnectionPool.
+
+    get() / put() never touch the database:
+    - put() buffers new blobs; aflush() writes them before the checkpoint
+      that references them
+    - get() serves recently written / read blobs; a cold read makes the
+      serializer raise ArtifactsMissing, the saver awaits aprefetch() and
+      retries
+
+    Re-writing an artifact that didn't change is an in-memory digest
+    lookup. A digest is trusted as persisted for ARTIFACT_KNOWN_TTL_S, then
+    written again (which refreshes its touched_at), so collect_garbage()
+    never deletes an artifact a process may still reference without
+    checking the table.
+    """
+
+    CREATE_SQL = """
+        CREATE TABLE IF NOT EXISTS checkpoint_artifacts (
+            digest TEXT PRIMARY KEY,
+            data BYTEA NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            touched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """
+    MIGRATE_SQL = """
+        ALTER TABLE checkpoint_artifacts
+        ADD COLUMN IF NOT EXISTS touched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    """
+    UPSERT_SQL = (
+        "INSERT INTO checkpoint_artifacts (digest, data) VALUES (%s, %s) "
+        "ON CONFLICT (digest) DO UPDATE SET touched_at = NOW()"
+    )
+
+    def __init__(self, pool, cache_size: int = 2048, known_ttl_s: float = ARTIFACT_KNOWN_TTL_S):
+        """
+        Args:
+            pool: The checkpointer's psycopg AsyncConnectionPool (dict rows, autocommit)
+            cache_size: Blobs kept in memory for reads
+            known_ttl_s: How long a persisted digest is reused without writing it again
+        """
+        self._pool = pool
+        self._cache_size = cache_size
+        self._known_ttl_s = known_ttl_s
+        self._known: "OrderedDict[str, float]" = OrderedDict()  # Digest -> when it was last persisted
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()  # Recently read/written blobs
+        self._pending: Dict[str, bytes] = {}  # Written by the serializer, not flushed yet
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.flushed = 0
+        self.prefetched = 0
+        self.collected = 0
+
+    async def setup(self) -> None:
+        """Create / upgrade the table (once per process)."""
+        async with self._pool.connection() as conn:
+            await conn.execute(self.CREATE_SQL)
+            await conn.execute(self.MIGRATE_SQL)
+
+    def _cache_put(self, digest: str, data: bytes) -> None:
+        self._cache[digest] = data
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._pending.get(digest)
+            if data is None:
+                data = self._cache.get(digest)
+                if data is not None:
+                    self._cache.move_to_end(digest)
+            return data
+
+    def put(self, digest: str, data: bytes) -> bool:
+        with self._lock:
+            persisted_at = self._known.get(digest)
+            if persisted_at is not None and time.monotonic() - persisted_at < self._known_ttl_s:
+                self._known.move_to_end(digest)
+                return False
+            if digest in self._pending:
+                return False
+            self._pending[digest] = data
+            return persisted_at is None
+
+    async def aflush(self) -> int:
+        with self._lock:
+            batch = list(self._pending.items())
+        if not batch:
+            return 0
+
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany(self.UPSERT_SQL, batch)
+
+        # Only dropped from pending once written: a concurrent flush
+        # re-writes them (idempotent) instead of skipping them
+        now = time.monotonic()
+        with self._lock:
+            for digest, data in batch:
+                self._pending.pop(digest, None)
+                self._known[digest] = now
+                self._known.move_to_end(digest)
+                self._cache_put(digest, data)
+            while len(self._known) > self._cache_size * 8:
+                self._known.popitem(last=False)
+            self.flushed += len(batch)
+        return len(batch)
+
+    async def aprefetch(self, digests: List[str]) -> int:
+        if not digests:
+            return 0
+        async with self._pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT digest, data FROM checkpoint_artifacts WHERE digest = ANY(%s)",
+                (list(digests),),
+            )
+            rows = await cur.fetchall()
+        with self._lock:
+            for row in rows:
+                self._cache_put(row["digest"], bytes(row["data"]))
+            self.prefetched += len(rows)
+        return len(rows)
+
+    async def collect_garbage(self, grace_s: float = ARTIFACT_GC_GRACE_S, batch_size: int = 500) -> int:
+        """
+        Delete artifacts no checkpoint references any more.
+
+        Mark: reads every compact payload in checkpoint_blobs /
+        checkpoint_writes (header only, decoded off the event loop).
+        Sweep: deletes unreferenced artifacts not written or refreshed
+        within `grace_s` (covers checkpoints being written meanwhile, and
+        must exceed the known-digest TTL).
+
+        Returns:
+            Number of artifacts deleted
+        """
+        live: set = set()
+        async with self._pool.connection() as conn:
+            for table in ("checkpoint_blobs", "checkpoint_writes"):
+                async with conn.transaction():
+                    async with conn.cursor(name="ships_artifact_gc") as cur:
+                        await cur.execute(f"SELECT blob FROM {table} WHERE type = %s", (COMPACT_TYPE,))
+                        while True:
+                            rows = await cur.fetchmany(batch_size)
+                            if not rows:
+                                break
+                            payloads = [bytes(row["blob"]) for row in rows]
+                            live.update(await asyncio.to_thread(_refs_of_payloads, payloads))
+
+            cur = await conn.execute(
+                "DELETE FROM checkpoint_artifacts "
+                "WHERE touched_at < NOW() - make_interval(secs => %s) AND NOT (digest = ANY(%s)) "
+                "RETURNING digest",
+                (float(grace_s), list(live)),
+            )
+            deleted = [row["digest"] for row in await cur.fetchall()]
+
+        with self._lock:
+            for digest in deleted:
+                self._known.pop(digest, None)
+                self._cache.pop(digest, None)
+            self.collected += len(deleted)
+        if deleted:
+            logger.info(f"[CHECKPOINT_SERDE] 🧹 Deleted {len(deleted)} unreferenced artifacts ({len(live)} live)")
+        return len(deleted)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "cached": len(self._cache),
+                "flushed": self.flushed,
+                "prefetched": self.prefetched,
+                "collected": self.collected,
+            }
+
+
+# ============================================================================
+# SERIALIZER
+# ============================================================================
+
+class CompactSerializer:
+    """
+    Checkpoint serde with content-addressed artifacts, list blocks and zlib.
+
+    Implements LangGraph's SerializerProtocol (dumps_typed / loads_typed),
+    delegating leaf values to the default JsonPlusSerializer.
+
+    Payload layout (before compression):
+        [4-byte header length][JSON header][inline piece bytes...]
+
+    The header is a tree of parts:
+        {"j": value}            JSON scalar stored in the header
+        {"t": type, "i": n}     inline piece n, decoded by the inner serde
+        {"r": digest}           blob in the ArtifactStore
+        {"d": keys, "v": parts} plain dict, one part per value
+        {"l": parts}            list, concatenation of list-valued parts
+        {"u": parts}            tuple, one part per item
+    """
+
+    def __init__(
+        self,
+        store: Optional[ArtifactStore] = None,
+        inner=None,
+        block_size: int = 16,
+        min_ref_bytes: int = 1024,
+        max_depth: int = 3,
+        level: int = 6,
+    ):
+        """
+        Args:
+            store: Where content-addressed blobs go (default: in-memory)
+            inner: Serializer for leaf values (default: JsonPlusSerializer)
+            block_size: Items per list block; full blocks are always stored by digest
+            min_ref_bytes: Leaves at least this large are stored by digest
+            max_depth: How deep to descend into nested dicts/lists
+            level: zlib compression level
+        """
+        if inner is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            inner = JsonPlusSerializer()
+
+        self.inner = inner
+        self.store = store or MemoryArtifactStore()
+        self.block_size = block_size
+        self.min_ref_bytes = min_ref_bytes
+        self.max_depth = max_depth
+        self.level = level
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._dumps = 0
+        self._bytes_written = 0
+        self._refs_written = 0
+        self._refs_reused = 0
+        self._ref_bytes_written = 0
+
+    # ------------------------------------------------------------------
+    # SerializerProtocol
+    # ------------------------------------------------------------------
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.inner.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        encoded = _ENCODED.get()
+        if encoded is not None:
+            hit = encoded.get(id(obj))
+            if hit is not None and hit[0] is obj:
+                return hit[1]
+        return self._dumps_typed(obj)
+
+    def _dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        pieces: List[bytes] = []
+        tree = self._encode(obj, pieces, depth=0)
+
+        header = json.dumps(
+            {"p": tree, "n": [len(p) for p in pieces]},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        payload = zlib.compress(
+            _HEADER_LEN.pack(len(header)) + header + b"".join(pieces),
+            self.level,
+        )
+
+        with self._stats_lock:
+            self._dumps += 1
+            self._bytes_written += len(payload)
+        return COMPACT_TYPE, payload
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ != COMPACT_TYPE:
+            # Written before compaction was enabled
+            return self.inner.loads_typed(data)
+
+        header, raw, offset = _read_header(payload)
+
+        # Fail before decoding anything, listing every blob the store must load
+        refs: List[str] = []
+        _collect_refs(header["p"], refs)
+        missing = self.store.missing(refs) if refs else []
+        if missing:
+            raise ArtifactsMissing(missing)
+
+        pieces: List[bytes] = []
+        for n in header["n"]:
+            pieces.append(raw[offset:offset + n])
+            offset += n
+
+        return self._decode(header["p"], pieces)
+
+    @contextmanager
+    def encoded(self, values: Iterable[Any]) -> Iterator[None]:
+        """
+        Encode `values` now; inside the block, dumps_typed() returns these
+        payloads for the same objects instead of encoding them again.
+
+        Lets the saver flush new artifacts to the store before it writes
+        the checkpoint rows that reference them, at the cost of one encode.
+        """
+        token = _ENCODED.set({id(v): (v, self._dumps_typed(v)) for v in values})
+        try:
+            yield
+        finally:
+            _ENCODED.reset(token)
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def _encode(self, obj: Any, pieces: List[bytes], depth: int) -> Dict[str, Any]:
+        if type(obj) in _JSON_SCALARS:
+            if type(obj) is not str or len(obj) < self.min_ref_bytes:
+                return {"j": obj}
+            return self._leaf(obj, pieces)
+
+        if type(obj) is tuple:
+            # Kept as a part at any depth: the inner serde returns tuples as
+            # lists (tuples inside leaf values get the inner serde's behaviour)
+            return {"u": [self._encode(v, pieces, depth + 1) for v in obj]}
+
+        if depth < self.max_depth and type(obj) is dict and all(type(k) is str for k in obj):
+            return {
+                "d": list(obj.keys()),
+                "v": [self._encode(v, pieces, depth + 1) for v in obj.values()],
+            }
+
+        if depth < self.max_depth and type(obj) is list and len(obj) > self.block_size:
+            parts = []
+            full = len(obj) - len(obj) % self.block_size
+            for i in range(0, full, self.block_size):
+                # Full blocks never change in an append-only list -> dedup by digest
+                parts.append(self._leaf(obj[i:i + self.block_size], pieces, force_ref=True))
+            if full < len(obj):
+                parts.append(self._leaf(obj[full:], pieces))
+            return {"l": parts}
+
+        return self._leaf(obj, pieces)
+
+    def _leaf(self, obj: Any, pieces: List[bytes], force_ref: bool = False) -> Dict[str, Any]:
+        type_, data = self.inner.dumps_typed(obj)
+
+        if not force_ref and len(data) < self.min_ref_bytes:
+            pieces.append(data)
+            return {"t": type_, "i": len(pieces) - 1}
+
+        blob = type_.encode("utf-8") + b"\x00" + data
+        digest = hashlib.sha256(blob).hexdigest()
+        created = self.store.put(digest, zlib.compress(blob, self.level))
+
+        with self._stats_lock:
+            if created:
+                self._refs_written += 1
+                self._ref_bytes_written += len(blob)
+            else:
+                self._refs_reused += 1
+        return {"r": digest}
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+
+    def _decode(self, part: Dict[str, Any], pieces: List[bytes]) -> Any:
+        if "j" in part:
+            return part["j"]
+        if "i" in part:
+            return self.inner.loads_typed((part["t"], pieces[part["i"]]))
+        if "r" in part:
+            return self._load_ref(part["r"])
+        if "d" in part:
+            return {k: self._decode(v, pieces) for k, v in zip(part["d"], part["v"])}
+        if "l" in part:
+            items: List[Any] = []
+            for block in part["l"]:
+                items.extend(self._decode(block, pieces))
+            return items
+        if "u" in part:
+            return tuple(self._decode(v, pieces) for v in part["u"])
+        raise ValueError(f"Unknown checkpoint part: {list(part)}")
+
+    def _load_ref(self, digest: str) -> Any:
+        stored = self.store.get(digest)
+        if stored is None:
+            raise ArtifactsMissing([digest])
+        blob = zlib.decompress(stored)
+        type_, _, data = blob.partition(b"\x00")
+        return self.inner.loads_typed((type_.decode("utf-8"), data))
+
+    # ------------------------------------------------------------------
+    # Diagnostics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Write counters for diagnostics."""
+        with self._stats_lock:
+            return {
+                "dumps": self._dumps,
+                "payload_bytes": self._bytes_written,
+                "artifacts_written": self._refs_written,
+                "artifact_bytes_written": self._ref_bytes_written,
+                "artifacts_reused": self._refs_reused,
+            }
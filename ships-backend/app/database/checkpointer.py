@@ -0,0 +1,254 @@
+"""
+LangGraph checkpointer with a shared async connection pool.
+
+Production-grade checkpoint storage for the agent graph:
+- AsyncPostgresSaver (psycopg3) - never blocks the event loop
+- ONE connection pool per process, sized from DATABASE_POOL_SIZE / DATABASE_MAX_OVERFLOW
+- Schema migrations (saver.setup()) run once at boot, not per pipeline
+- Health check and pool usage stats
+
+If Postgres is unreachable at boot, falls back to MemorySaver and reports
+the degraded backend via health()/get_stats() instead of hiding it.
+"""
+
+import os
+import asyncio
+import time
+import logging
+from typing import Optional, Dict, Any
+
+from app.database.connection import (
+    DATABASE_URL,
+    DATABASE_POOL_SIZE,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT,
+)
+
+logger = logging.getLogger("ships.database.checkpointer")
+
+# Content-addressed, compressed checkpoint payloads (see checkpoint_serde.py)
+CHECKPOINT_COMPACT_SERDE = os.getenv("CHECKPOINT_COMPACT_SERDE", "true").lower() == "true"
+# How often unreferenced checkpoint artifacts are deleted (0 disables)
+CHECKPOINT_ARTIFACT_GC_INTERVAL_S = float(os.getenv("CHECKPOINT_ARTIFACT_GC_INTERVAL_S", "21600"))
+
+
+def _psycopg_conninfo(url: str) -> str:
+    """Convert the SQLAlchemy URL (postgresql+asyncpg://) to a libpq URL."""
+    return url.replace("+asyncpg", "").replace("+psycopg", "")
+
+
+class CheckpointerPool:
+    """
+    Owns the process-wide LangGraph checkpointer and its connection pool.
+
+    Implements singleton pattern (class-level state), mirroring
+    DatabaseConnection.
+    """
+
+    _pool = None
+    _saver = None
+    _backend: Optional[str] = None  # "postgres" | "memory"
+    _setup_ms: float = 0.0
+    _init_error: Optional[str] = None
+    _checkouts: int = 0
+    _init_lock: Optional[asyncio.Lock] = None
+    _serde = None
+    _artifact_store = None
+    _gc_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def init(cls):
+        """
+        Create the pool, run checkpoint migrations and build the saver.
+
+        Idempotent - safe to call from startup and lazily from the pipeline.
+        Concurrent callers wait for the first one instead of racing setup().
+
+        Returns:
+            The shared checkpointer instance
+        """
+        if cls._saver is not None:
+            return cls._saver
+
+        if cls._init_lock is None:
+            cls._init_lock = asyncio.Lock()
+
+        async with cls._init_lock:
+            if cls._saver is None:
+                await cls._create()
+        return cls._saver
+
+    @classmethod
+    async def _create(cls) -> None:
+        """Build the pooled saver, or the MemorySaver fallback."""
+        start = time.perf_counter()
+        pool = None
+        try:
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+            pool = AsyncConnectionPool(
+                conninfo=_psycopg_conninfo(DATABASE_URL),
+                min_size=DATABASE_POOL_SIZE,
+                max_size=DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW,
+                timeout=DATABASE_POOL_TIMEOUT,
+                # Required by AsyncPostgresSaver
+                kwargs={
+                    "autocommit": True,
+                    "prepare_threshold": 0,
+                    "row_factory": dict_row,
+                },
+                open=False,
+                name="ships-checkpointer",
+            )
+            await pool.open(wait=True, timeout=DATABASE_POOL_TIMEOUT)
+
+            serde = None
+            store = None
+            if CHECKPOINT_COMPACT_SERDE:
+                from app.database.checkpoint_serde import CompactSerializer, PostgresArtifactStore
+                from app.database.compact_saver import CompactPostgresSaver
+
+                # Shares the saver's pool; all store I/O runs on the saver's async paths
+                store = PostgresArtifactStore(pool)
+                await store.setup()
+                serde = CompactSerializer(store)
+                saver = CompactPostgresSaver(pool, serde=serde, store=store)
+            else:
+                saver = AsyncPostgresSaver(pool, serde=serde)
+            # Create/upgrade checkpoint tables ONCE per process
+            await saver.setup()
+
+            cls._pool = pool
+            cls._saver = saver
+            cls._serde = serde
+            cls._artifact_store = store
+            cls._backend = "postgres"
+            cls._init_error = None
+            cls._setup_ms = (time.perf_counter() - start) * 1000
+            if store is not None and CHECKPOINT_ARTIFACT_GC_INTERVAL_S > 0:
+                cls._gc_task = asyncio.create_task(cls._collect_artifacts_loop())
+
+            logger.info(
+                f"[CHECKPOINTER] ✓ AsyncPostgresSaver ready in {cls._setup_ms:.0f}ms "
+                f"(pool {DATABASE_POOL_SIZE}..{DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW})"
+            )
+
+        except Exception as e:
+            from langgraph.checkpoint.memory import MemorySaver
+
+            # Close a half-opened pool so we don't leak connections
+            if pool is not None:
+                try:
+                    await pool.close()
+                except Exception:
+                    pass
+
+            serde = None
+            if CHECKPOINT_COMPACT_SERDE:
+                from app.database.checkpoint_serde import CompactSerializer
+                serde = CompactSerializer()
+
+            cls._saver = MemorySaver(serde=serde)
+            cls._serde = serde
+            cls._artifact_store = None
+            cls._backend = "memory"
+            cls._init_error = str(e)
+            cls._setup_ms = (time.perf_counter() - start) * 1000
+
+            logger.warning(
+                f"[CHECKPOINTER] ⚠️ Postgres unavailable - using in-memory checkpoints "
+                f"(state is lost on restart): {e}"
+            )
+
+    @classmethod
+    async def _collect_artifacts_loop(cls) -> None:
+        """Periodically delete checkpoint artifacts no checkpoint references."""
+        while True:
+            await asyncio.sleep(CHECKPOINT_ARTIFACT_GC_INTERVAL_S)
+            store = cls._artifact_store
+            if store is None:
+                return
+            try:
+                await store.collect_garbage()
+            except Exception as e:
+                logger.warning(f"[CHECKPOINTER] ⚠️ Artifact garbage collection failed: {e}")
+
+    @classmethod
+    async def get_checkpointer(cls):
+        """
+        Get the shared checkpointer (initializes on first use).
+
+        Returns:
+            AsyncPostgresSaver, or MemorySaver when degraded
+        """
+        saver = cls._saver or await cls.init()
+        cls._checkouts += 1
+        return saver
+
+    @classmethod
+    async def health_check(cls) -> bool:
+        """
+        Check checkpoint storage health.
+
+        Returns:
+            True if Postgres checkpoints are reachable, False otherwise
+        """
+        if cls._backend != "postgres" or cls._pool is None:
+            return False
+        try:
+            async with cls._pool.connection() as conn:
+                await conn.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.error(f"[CHECKPOINTER] ✗ Health check failed: {e}")
+            return False
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Pool usage stats for diagnostics.
+
+        Returns:
+            Dict with backend, setup cost and psycopg pool counters
+        """
+        stats: Dict[str, Any] = {
+            "backend": cls._backend or "uninitialized",
+            "degraded": cls._backend == "memory",
+            "setup_ms": round(cls._setup_ms, 1),
+            "checkouts": cls._checkouts,
+            "error": cls._init_error,
+        }
+        if cls._serde is not None:
+            stats["serde"] = cls._serde.get_stats()
+        if cls._artifact_store is not None:
+            stats["artifacts"] = cls._artifact_store.get_stats()
+        if cls._pool is not None:
+            # pool_size, pool_available, requests_waiting, connections_num, ...
+            stats["pool"] = cls._pool.get_stats()
+        return stats
+
+    @classmethod
+    async def close(cls):
+        """Close the pool and drop the shared saver."""
+        if cls._gc_task is not None:
+            cls._gc_task.cancel()
+            cls._gc_task = None
+        if cls._pool is not None:
+            await cls._pool.close()
+            logger.info("[CHECKPOINTER] Connection pool closed")
+        cls._pool = None
+        cls._saver = None
+        cls._serde = None
+        cls._artifact_store = None
+        cls._backend = None
+        cls._checkouts = 0
+
+
+# Export for convenience
+init_checkpointer = CheckpointerPool.init
+get_shared_checkpointer = CheckpointerPool.get_checkpointer
+checkpointer_health_check = CheckpointerPool.health_check
+get_checkpointer_stats = CheckpointerPool.get_stats
+close_checkpointer = CheckpointerPool.close
@@ -0,0 +1,111 @@
+"""
+AsyncPostgresSaver that does the artifact store's I/O on its async paths.
+
+AsyncPostgresSaver calls the serializer inline on the event loop, so
+CompactSerializer's store can't query Postgres from get() / put() without
+blocking every other request. CompactPostgresSaver moves that I/O around
+the saver's own async methods:
+
+- aput / aput_writes encode the values first, await the store's flush of
+  the new artifacts, then let the saver write the rows (which reuse the
+  encoded payloads) - a checkpoint never references an unwritten artifact
+- aget_tuple / alist retry after awaiting a prefetch when the serializer
+  reports artifacts that aren't in memory (cold reads only), for as long
+  as each round loads artifacts the call hasn't fetched before
+"""
+
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+from app.database.checkpoint_serde import ArtifactsMissing, CompactSerializer, PostgresArtifactStore
+
+logger = logging.getLogger("ships.database.compact_saver")
+
+
+class CompactPostgresSaver(AsyncPostgresSaver):
+    """AsyncPostgresSaver for CompactSerializer + PostgresArtifactStore (see module docstring)."""
+
+    def __init__(self, conn, *, serde: CompactSerializer, store: PostgresArtifactStore):
+        super().__init__(conn, serde=serde)
+        self.artifacts = store
+
+    async def _prefetch(self, error: ArtifactsMissing, fetched: Set[str]) -> None:
+        """
+        Load the missing artifacts of one read, or re-raise.
+
+        `fetched` holds what was prefetched since the read last made
+        progress: asking for only those digests again means they aren't
+        stored (or don't fit in the cache), so retrying can't help.
+        """
+        new = [d for d in error.digests if d not in fetched]
+        if not new or not await self.artifacts.aprefetch(error.digests):
+            raise error  # Not in the table either
+        fetched.update(new)
+        logger.debug(f"[CHECKPOINTER] Prefetched {len(error.digests)} checkpoint artifacts")
+
+    # ------------------------------------------------------------------
+    # Writes: artifacts first, then the rows that reference them
+    # ------------------------------------------------------------------
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        values = checkpoint.get("channel_values", {})
+        with self.serde.encoded(values[k] for k in new_versions if k in values):
+            await self.artifacts.aflush()
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self.serde.encoded(value for _, value in writes):
+            await self.artifacts.aflush()
+            await super().aput_writes(config, writes, task_id, task_path)
+
+    # ------------------------------------------------------------------
+    # Reads: prefetch what the serializer is missing, then retry
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        fetched: Set[str] = set()
+        while True:
+            try:
+                return await super().aget_tuple(config)
+            except ArtifactsMissing as e:
+                await self._prefetch(e, fetched)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # Newest first: after a prefetch, resume below the last checkpoint yielded.
+        # Older checkpoints each end in their own partial block, so a cold
+        # history can take a round per checkpoint - every round makes progress.
+        fetched: Set[str] = set()
+        while True:
+            try:
+                async for item in super().alist(config, filter=filter, before=before, limit=limit):
+                    yield item
+                    fetched.clear()  # Progress: blobs shared with older checkpoints may be evicted later
+                    before = item.config
+                    if limit is not None:
+                        limit -= 1
+                return
+            except ArtifactsMissing as e:
+                await self._prefetch(e, fetched)
@@ -0,0 +1,138 @@
+"""
+Compiled Graph Registry
+
+Builds the agent StateGraph ONCE per process and hands the same compiled
+graph to every run. Compiling rebuilds every node, constructs the Chatter
+subgraph and validates all edges, which is pure overhead when the topology
+never changes between requests.
+
+The checkpointer is NOT baked into the shared graph. Each run gets a cheap
+shallow copy bound to its own checkpointer via `Pregel.copy()`, so runs never
+share checkpoint state by accident.
+
+Usage:
+    from app.graphs.graph_registry import graph_registry
+
+    graph_registry.warm()                       # at startup (optional)
+    graph = graph_registry.get_graph(checkpointer)
+    async for event in graph.astream_events(...):
+        ...
+"""
+
+import threading
+import time
+import logging
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger("ships.graph_registry")
+
+
+class GraphRegistry:
+    """
+    Process-wide holder for the compiled agent graph.
+
+    Singleton: use `GraphRegistry.get_instance()` or the module-level
+    `graph_registry`.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        self._graph = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._compile_ms: float = 0.0
+        self._compiled_at: Optional[float] = None
+        self._warmed: bool = False  # Compiled at startup, not on a request
+        self._runs_served: int = 0
+
+    @classmethod
+    def get_instance(cls) -> "GraphRegistry":
+        if cls._instance is None:
+            cls._instance = GraphRegistry()
+        return cls._instance
+
+    def warm(self) -> float:
+        """
+        Compile the graph eagerly (call from app startup).
+
+        Returns:
+            Compile time in milliseconds (0.0 if already compiled)
+        """
+        if self._graph is not None:
+            return 0.0
+        self._compile()
+        self._warmed = True
+        return self._compile_ms
+
+    def _compile(self) -> None:
+        """Compile the base graph (no checkpointer). Thread-safe, runs once."""
+        with self._lock:
+            if self._graph is not None:
+                return
+
+            from app.graphs.agent_graph import create_agent_graph
+
+            start = time.perf_counter()
+            self._graph = create_agent_graph(checkpointer=None)
+            self._compile_ms = (time.perf_counter() - start) * 1000
+            self._compiled_at = time.time()
+
+            logger.info(f"[GRAPH_REGISTRY] 🏗️ Agent graph compiled in {self._compile_ms:.1f}ms (shared by all runs)")
+
+    def get_graph(self, checkpointer=None):
+        """
+        Get the compiled agent graph, bound to a per-run checkpointer.
+
+        Args:
+            checkpointer: Checkpointer for this run (None = no persistence)
+
+        Returns:
+            Compiled graph ready for ainvoke/astream_events
+        """
+        if self._graph is None:
+            self._compile()
+
+        self._runs_served += 1
+        logger.debug(
+            f"[GRAPH_REGISTRY] ♻️ Reusing compiled graph "
+            f"(run #{self._runs_served}, ~{self.saved_ms:.0f}ms compile time saved so far)"
+        )
+
+        if checkpointer is None:
+            return self._graph
+
+        # Shallow copy - shares nodes/channels, only swaps the checkpointer
+        return self._graph.copy(update={"checkpointer": checkpointer})
+
+    @property
+    def saved_ms(self) -> float:
+        """Compile time kept off the request path by reusing the graph."""
+        # A lazily compiled graph was paid for by the first run
+        paying_runs = 0 if self._warmed else 1
+        return self._compile_ms * max(self._runs_served - paying_runs, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Registry metrics for diagnostics/logging."""
+        return {
+            "compiled": self._graph is not None,
+            "compile_ms": round(self._compile_ms, 1),
+            "compiled_at": self._compiled_at,
+            "warmed_at_startup": self._warmed,
+            "runs_served": self._runs_served,
+            "compile_ms_saved": round(self.saved_ms, 1),
+        }
+
+    def reset(self) -> None:
+        """Drop the compiled graph (tests / hot-reload only)."""
+        with self._lock:
+            self._graph = None
+            self._compile_ms = 0.0
+            self._compiled_at = None
+            self._warmed = False
+            self._runs_served = 0
+
+
+# Global instance
+graph_registry = GraphRegistry.get_instance()
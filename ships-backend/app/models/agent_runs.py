@@ -10,7 +10,7 @@ User isolation: All queries must filter by user_id.
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Integer, DateTime, Text, Index, ForeignKey
+from sqlalchemy import String, Integer, Float, DateTime, Text, Index, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,12 @@ import uuid
 
 from app.database.base import Base
 
+# LLM usage columns shared by AgentStep and AgentRun (besides tokens_used)
+USAGE_COLUMNS = (
+    "input_tokens", "output_tokens", "cached_tokens", "thinking_tokens",
+    "llm_calls", "llm_latency_ms", "cost_usd",
+)
+
 
 class AgentRun(Base):
     """
@@ -36,6 +42,7 @@ class AgentRun(Base):
         status: Current status (pending, running, complete, error, cancelled)
         current_step: Latest step number
         error_message: Error details if status is 'error'
+        tokens_used .. cost_usd: LLM usage summed over the run's steps
     """
     
     __tablename__ = "agent_runs"
@@ -82,6 +89,16 @@ class AgentRun(Base):
     # Error handling
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     
+    # LLM usage, summed from the steps (see app/services/token_accounting.py)
+    tokens_used: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    thinking_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_calls: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_latency_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    
     # Metadata
     run_metadata: Mapped[Optional[dict]] = mapped_column(JSONB, default=dict)
     
@@ -138,6 +155,13 @@ class AgentRun(Base):
         self.current_step += 1
         return self.current_step
     
+    def usage_dict(self) -> dict:
+        """LLM usage totals, as the runs API returns them."""
+        usage = {name: getattr(self, name) or 0 for name in ("tokens_used", *USAGE_COLUMNS)}
+        usage["cost_usd"] = round(usage["cost_usd"], 6)
+        usage["cache_hit_ratio"] = round(usage["cached_tokens"] / usage["input_tokens"], 3) if usage["input_tokens"] else 0.0
+        return usage
+    
     def __repr__(self) -> str:
         return f"<AgentRun(id={self.id}, status={self.status}, steps={self.current_step})>"
 
@@ -159,6 +183,7 @@ class AgentStep(Base):
         action: What action was taken (tool call, decision, etc.)
         content: Detailed content (reasoning, tool results, etc.)
         tokens_used: Token count for this step (for billing)
+        input_tokens .. cost_usd: LLM usage breakdown of the step
     """
     
     __tablename__ = "agent_steps"
@@ -191,6 +216,13 @@ class AgentStep(Base):
     
     # Billing
     tokens_used: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # Incl. cached
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # Incl. thinking
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    thinking_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_calls: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # Tool-loop iterations
+    llm_latency_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
     
     # Timestamp
     created_at: Mapped[datetime] = mapped_column(
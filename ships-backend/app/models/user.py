@@ -23,24 +23,32 @@ TIER_LIMITS = {
         'max_projects': 1,
         'tokens_per_month': 25_000,
         'priority_queue': False,
+        'max_concurrent_runs': 1,  # Pipeline runs at once (run_scheduler)
+        'run_priority': 0,  # Higher is admitted first when runs queue
     },
     'starter': {
         'prompts_per_day': 100,
         'max_projects': 3,
         'tokens_per_month': 5_500_000,  # 10% Bonus
         'priority_queue': False,
+        'max_concurrent_runs': 2,
+        'run_priority': 1,
     },
     'pro': {
         'prompts_per_day': 500,
         'max_projects': 10,
         'tokens_per_month': 25_000_000,  # 25% Bonus
         'priority_queue': True,
+        'max_concurrent_runs': 3,
+        'run_priority': 2,
     },
     'enterprise': {
         'prompts_per_day': -1,  # Unlimited
         'max_projects': -1,
         'tokens_per_month': 150_000_000,  # 50% Bonus for top tier
         'priority_queue': True,
+        'max_concurrent_runs': 5,
+        'run_priority': 3,
     }
 }
 
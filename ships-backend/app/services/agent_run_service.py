@@ -10,11 +10,11 @@ from datetime import datetime
 from typing import Optional, List
 from uuid import UUID, uuid4
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.agent_runs import AgentRun, AgentStep
+from app.models.agent_runs import AgentRun, AgentStep, USAGE_COLUMNS
 
 logger = logging.getLogger("ships.agent_runs")
 
@@ -181,12 +181,16 @@ class AgentRunService:
         phase: Optional[str] = None,
         action: Optional[str] = None,
         content: Optional[dict] = None,
-        tokens_used: int = 0
+        tokens_used: int = 0,
+        usage: Optional[dict] = None
     ) -> Optional[AgentStep]:
         """
         Add a step to a run.
         
-        Automatically increments step number.
+        Automatically increments step number. The step number and the run
+        totals are incremented in one atomic UPDATE, so concurrent steps of
+        the same run (a node's record_step and its leftover llm_usage step)
+        neither share a number nor lose each other's usage.
         
         Args:
             run_id: Parent run
@@ -195,16 +199,35 @@ class AgentRunService:
             action: Action type
             content: Step content/reasoning
             tokens_used: Token count
+            usage: LLM usage columns (input_tokens, ..., cost_usd), also
+                added to the run totals
             
         Returns:
             Created step or None if run not found
         """
-        run = await self.get_run(run_id)
-        if not run:
+        usage = usage or {}
+        totals = {
+            name: func.coalesce(getattr(AgentRun, name), 0) + (usage.get(name) or 0)
+            for name in USAGE_COLUMNS
+        }
+        result = await self.db.execute(
+            update(AgentRun)
+            .where(and_(
+                AgentRun.id == run_id,
+                AgentRun.user_id == self.user_id
+            ))
+            .values(
+                current_step=AgentRun.current_step + 1,
+                tokens_used=func.coalesce(AgentRun.tokens_used, 0) + tokens_used,
+                **totals
+            )
+            .returning(AgentRun.current_step)
+            .execution_options(synchronize_session=False)
+        )
+        step_number = result.scalar_one_or_none()
+        if step_number is None:
             return None
         
-        step_number = run.increment_step()
-        
         step = AgentStep(
             run_id=run_id,
             step_number=step_number,
@@ -212,7 +235,8 @@ class AgentRunService:
             phase=phase,
             action=action,
             content=content or {},
-            tokens_used=tokens_used
+            tokens_used=tokens_used,
+            **usage
         )
         
         self.db.add(step)
@@ -86,6 +86,7 @@ def _scope_for_fixer(state: Dict, artifacts: Dict, base: Dict) -> Dict:
     - Validation report (errors to fix)
     - Recent error log (last 5)
     - Active file being fixed
+    - Intent and fix request (task size for the model policy)
     
     Does NOT need:
     - Full message history
@@ -97,6 +98,8 @@ def _scope_for_fixer(state: Dict, artifacts: Dict, base: Dict) -> Dict:
         "artifacts": {
             "project_path": artifacts.get("project_path"),
             "validation_report": artifacts.get("validation_report", {}),
+            "structured_intent": artifacts.get("structured_intent"),
+            "fix_request": artifacts.get("fix_request") or state.get("fix_request"),
         },
         "error_log": state.get("error_log", [])[-5:],  # Last 5 errors only
         "fix_attempts": state.get("fix_attempts", 0),
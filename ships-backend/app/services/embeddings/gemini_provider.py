@@ -22,6 +22,7 @@ except ImportError:
     NEW_SDK_AVAILABLE = False
 
 from app.services.embeddings.base import EmbeddingProvider
+from app.services.llm_gateway import llm_gateway, BACKGROUND, STANDARD
 
 logger = logging.getLogger("ships.embeddings.gemini")
 
@@ -69,22 +70,24 @@ class GeminiEmbedding(EmbeddingProvider):
         try:
             truncated = self.truncate_text(text)
             
-            if NEW_SDK_AVAILABLE:
-                # New SDK API
-                result = client.models.embed_content(
-                    model=self.MODEL,
-                    contents=truncated,
-                    config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
-                )
-                embedding = result.embeddings[0].values
-            else:
-                # Legacy SDK API
-                result = genai_legacy.embed_content(
-                    model=f"models/{self.MODEL}",
-                    content=truncated,
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-                embedding = result['embedding']
+            # Background work: yields to agent calls, shares 429 backoff (llm_gateway.py)
+            async with llm_gateway.slot(self.MODEL, BACKGROUND, tokens=len(truncated) // 4):
+                if NEW_SDK_AVAILABLE:
+                    # New SDK API
+                    result = client.models.embed_content(
+                        model=self.MODEL,
+                        contents=truncated,
+                        config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
+                    )
+                    embedding = result.embeddings[0].values
+                else:
+                    # Legacy SDK API
+                    result = genai_legacy.embed_content(
+                        model=f"models/{self.MODEL}",
+                        content=truncated,
+                        task_type="RETRIEVAL_DOCUMENT"
+                    )
+                    embedding = result['embedding']
             
             logger.debug(f"Generated embedding: {len(embedding)} dimensions")
             return list(embedding)
@@ -106,25 +109,27 @@ class GeminiEmbedding(EmbeddingProvider):
         try:
             truncated = [self.truncate_text(t) for t in texts]
             
-            if NEW_SDK_AVAILABLE:
-                # New SDK API
-                result = client.models.embed_content(
-                    model=self.MODEL,
-                    contents=truncated,
-                    config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
-                )
-                embeddings = [list(e.values) for e in result.embeddings]
-            else:
-                # Legacy SDK API
-                result = genai_legacy.embed_content(
-                    model=f"models/{self.MODEL}",
-                    content=truncated,
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-                embeddings = result['embedding']
-                # Handle single vs batch response format
-                if truncated and isinstance(embeddings[0], float):
-                    embeddings = [embeddings]
+            # Background work: yields to agent calls, shares 429 backoff (llm_gateway.py)
+            async with llm_gateway.slot(self.MODEL, BACKGROUND, tokens=sum(len(t) for t in truncated) // 4):
+                if NEW_SDK_AVAILABLE:
+                    # New SDK API
+                    result = client.models.embed_content(
+                        model=self.MODEL,
+                        contents=truncated,
+                        config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
+                    )
+                    embeddings = [list(e.values) for e in result.embeddings]
+                else:
+                    # Legacy SDK API
+                    result = genai_legacy.embed_content(
+                        model=f"models/{self.MODEL}",
+                        content=truncated,
+                        task_type="RETRIEVAL_DOCUMENT"
+                    )
+                    embeddings = result['embedding']
+                    # Handle single vs batch response format
+                    if truncated and isinstance(embeddings[0], float):
+                        embeddings = [embeddings]
             
             logger.debug(f"Generated {len(embeddings)} embeddings")
             return embeddings
@@ -142,22 +147,24 @@ class GeminiEmbedding(EmbeddingProvider):
         try:
             truncated = self.truncate_text(query)
             
-            if NEW_SDK_AVAILABLE:
-                # New SDK API
-                result = client.models.embed_content(
-                    model=self.MODEL,
-                    contents=truncated,
-                    config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
-                )
-                return list(result.embeddings[0].values)
-            else:
-                # Legacy SDK API
-                result = genai_legacy.embed_content(
-                    model=f"models/{self.MODEL}",
-                    content=truncated,
-                    task_type="RETRIEVAL_QUERY"
-                )
-                return result['embedding']
+            # A running agent is waiting on retrieval: normal priority
+            async with llm_gateway.slot(self.MODEL, STANDARD, tokens=len(truncated) // 4):
+                if NEW_SDK_AVAILABLE:
+                    # New SDK API
+                    result = client.models.embed_content(
+                        model=self.MODEL,
+                        contents=truncated,
+                        config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
+                    )
+                    return list(result.embeddings[0].values)
+                else:
+                    # Legacy SDK API
+                    result = genai_legacy.embed_content(
+                        model=f"models/{self.MODEL}",
+                        content=truncated,
+                        task_type="RETRIEVAL_QUERY"
+                    )
+                    return result['embedding']
             
         except Exception as e:
             logger.error(f"Gemini query embedding failed: {e}")
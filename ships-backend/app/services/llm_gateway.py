@@ -0,0 +1,399 @@
+"""
+LLM gateway: process-wide admission, priorities and shared 429 backoff.
+
+Every agent used to call Gemini on its own with max_retries=30. Under
+concurrent runs the API answered 429, each client then retried on its own
+schedule, and the retries kept the API saturated - retry storms and very
+long tails, exactly when there was no capacity to spare.
+
+All model calls now go through one gateway (GatedChatModel wraps the
+clients LLMFactory builds; embeddings use slot()):
+
+- admission per model by token buckets: requests per minute (RPM) and
+  tokens per minute (TPM, estimated up front, corrected with the real
+  usage afterwards), plus a cap on calls in flight
+- waiting calls are served by priority class (INTERACTIVE chat first,
+  BACKGROUND knowledge capture last); waiting slowly raises priority
+  (LLM_GATEWAY_AGING_S) so nothing starves
+- a 429 / overloaded answer blocks the whole model for its Retry-After (or
+  an exponential backoff) and halves the admitted rate, which then
+  recovers gradually on successes - every caller backs off together
+- retries re-enter the queue, keeping their place; client libraries retry
+  at most once on their own (max_retries=1 in llm_factory.py)
+- a cancelled call only gives its slot back: it says nothing about the
+  API's capacity, so backoff and rate scale are left alone
+
+Limits default to LLM_GATEWAY_RPM / LLM_GATEWAY_TPM / LLM_GATEWAY_MAX_INFLIGHT,
+overridable per model with LLM_GATEWAY_LIMITS='{"model": {"rpm": .., "tpm": ..}}'.
+
+Usage:
+    result = await llm_gateway.call(model, priority, tokens, lambda: client.call(...))
+
+    async with llm_gateway.slot(model, BACKGROUND, tokens):
+        ...
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+logger = logging.getLogger("ships.llm_gateway")
+
+LLM_GATEWAY_RPM = float(os.getenv("LLM_GATEWAY_RPM", "1000"))
+LLM_GATEWAY_TPM = float(os.getenv("LLM_GATEWAY_TPM", "1000000"))
+LLM_GATEWAY_MAX_INFLIGHT = int(os.getenv("LLM_GATEWAY_MAX_INFLIGHT", "32"))
+LLM_GATEWAY_MAX_RETRIES = int(os.getenv("LLM_GATEWAY_MAX_RETRIES", "6"))
+LLM_GATEWAY_AGING_S = float(os.getenv("LLM_GATEWAY_AGING_S", "20"))
+LLM_GATEWAY_BACKOFF_S = float(os.getenv("LLM_GATEWAY_BACKOFF_S", "2"))
+LLM_GATEWAY_MAX_BACKOFF_S = float(os.getenv("LLM_GATEWAY_MAX_BACKOFF_S", "60"))
+LLM_GATEWAY_LIMITS: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_GATEWAY_LIMITS", "{}"))
+
+# Priority classes (lower is served first)
+INTERACTIVE = 0  # User is waiting on the answer (chat)
+MINI = 1  # Short routing / validation calls that gate a run's progress
+STANDARD = 2  # Planner, fixer
+BULK = 3  # Coder file generation
+BACKGROUND = 4  # Knowledge capture, embeddings
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", MINI: "mini", STANDARD: "standard", BULK: "bulk", BACKGROUND: "background"}
+
+_MIN_RATE_SCALE = 0.1
+_RATE_RECOVERY = 0.05  # Rate scale regained per successful call
+
+_RATE_LIMITED = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|ResourceExhausted|rate.?limit|quota", re.IGNORECASE)
+_OVERLOADED = re.compile(r"\b503\b|UNAVAILABLE|ServiceUnavailable|overloaded", re.IGNORECASE)
+_RETRY_AFTER = re.compile(
+    r"retry[_ -]?(?:after|delay|in)['\"]?\s*[:=]?\s*['\"]?(\d+(?:\.\d+)?)\s*s?", re.IGNORECASE)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """429 / quota exhausted, or the model reporting overload (503)."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in (429, 503):
+        return True
+    text = f"{type(error).__name__} {error}"
+    return bool(_RATE_LIMITED.search(text) or _OVERLOADED.search(text))
+
+
+def retry_after_from(error: BaseException) -> Optional[float]:
+    """Seconds the API asked us to wait (Retry-After header / RetryInfo / message)."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            pass
+    match = _RETRY_AFTER.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `capacity`. May go negative (debt)."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.scale = 1.0  # Learned rate reduction after 429s
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute * self.scale / 60)
+
+    def wait_s(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests over capacity need a full bucket)."""
+        self._refill(now)
+        deficit = min(amount, self.capacity) - self.tokens
+        return max(0.0, deficit * 60 / (self.per_minute * self.scale)) if deficit > 0 else 0.0
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+
+class Lease:
+    """A granted call: holds an in-flight slot until released or failed."""
+
+    def __init__(self, model: str, priority: int, tokens: int, waited_s: float):
+        self.model = model
+        self.priority = priority
+        self.tokens = tokens
+        self.waited_s = waited_s
+        self.attempt = 0
+        self.done = False
+
+
+class _Waiter:
+    def __init__(self, seq: int, priority: int, tokens: int, since: float):
+        self.seq = seq
+        self.priority = priority
+        self.tokens = tokens
+        self.since = since
+        self.future = asyncio.get_running_loop().create_future()
+
+    def effective_priority(self, now: float) -> float:
+        return self.priority - (now - self.since) / LLM_GATEWAY_AGING_S
+
+
+class _ModelState:
+    """Buckets, backoff and queue of one model."""
+
+    def __init__(self, model: str, limits: Dict[str, float]):
+        self.model = model
+        self.rpm = TokenBucket(float(limits.get("rpm", LLM_GATEWAY_RPM)))
+        self.tpm = TokenBucket(float(limits.get("tpm", LLM_GATEWAY_TPM)))
+        self.max_inflight = int(limits.get("max_inflight", LLM_GATEWAY_MAX_INFLIGHT))
+        self.inflight = 0
+        self.waiting: List[_Waiter] = []
+        self.blocked_until = 0.0
+        self.backoff_s = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+        # Metrics
+        self.admitted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.ungated = 0
+        self.waits: Dict[int, deque] = {}  # Priority -> recent queue waits (s)
+
+
+class LLMGateway:
+    """
+    Process-wide admission for model calls (see module docstring).
+
+    Singleton: use `LLMGateway.get_instance()` or the module-level `llm_gateway`.
+    """
+
+    _instance = None
+
+    def __init__(self, max_retries: int = LLM_GATEWAY_MAX_RETRIES,
+                 limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 backoff_s: float = LLM_GATEWAY_BACKOFF_S, max_backoff_s: float = LLM_GATEWAY_MAX_BACKOFF_S):
+        self.max_retries = max_retries
+        self.limits = LLM_GATEWAY_LIMITS if limits is None else limits
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count(1)
+
+    @classmethod
+    def get_instance(cls) -> "LLMGateway":
+        if cls._instance is None:
+            cls._instance = LLMGateway()
+        return cls._instance
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(model, self.limits.get(model, {}))
+        return state
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    async def acquire(self, model: str, priority: int = STANDARD, tokens: int = 0,
+                      since: Optional[float] = None) -> Lease:
+        """
+        Wait for a slot to call `model`.
+
+        Args:
+            model: Model name (buckets and backoff are per model)
+            priority: Priority class (INTERACTIVE .. BACKGROUND)
+            tokens: Estimated tokens of the call (TPM admission)
+            since: When the call first queued (retries keep their place)
+        """
+        state = self._state(model)
+        waiter = _Waiter(next(self._seq), priority, tokens, since or time.monotonic())
+        state.waiting.append(waiter)
+        self._dispatch(state)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in state.waiting:
+                state.waiting.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                state.inflight -= 1  # Granted as we were cancelled: give the slot back
+                self._dispatch(state)
+            raise
+        waited = time.monotonic() - waiter.since
+        state.waits.setdefault(priority, deque(maxlen=500)).append(waited)
+        return Lease(model, priority, tokens, waited)
+
+    def _dispatch(self, state: _ModelState) -> None:
+        """Grant waiting calls in priority order while buckets and backoff allow."""
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        while state.waiting and state.inflight < state.max_inflight:
+            now = time.monotonic()
+            waiter = min(state.waiting, key=lambda w: (w.effective_priority(now), w.seq))
+            if waiter.future.done():  # Cancelled while waiting
+                state.waiting.remove(waiter)
+                continue
+            delay = max(state.blocked_until - now, state.rpm.wait_s(1, now), state.tpm.wait_s(waiter.tokens, now))
+            if delay > 0:
+                # Head of the queue waits; lower priorities don't overtake it
+                state.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, state)
+                return
+            state.waiting.remove(waiter)
+            state.rpm.take(1, now)
+            state.tpm.take(min(waiter.tokens, state.tpm.capacity), now)
+            state.inflight += 1
+            state.admitted += 1
+            waiter.future.set_result(True)
+
+    def release(self, lease: Lease, tokens_used: Optional[int] = None) -> None:
+        """The call succeeded: free the slot, correct the TPM estimate, recover the rate."""
+        if lease.done:
+            return
+        lease.done = True
+        state = self._state(lease.model)
+        state.inflight -= 1
+        if tokens_used is not None and tokens_used != lease.tokens:
+            state.tpm.take(tokens_used - lease.tokens, time.monotonic())
+        state.backoff_s = 0.0
+        for bucket in (state.rpm, state.tpm):
+            bucket.scale = min(1.0, bucket.scale + _RATE_RECOVERY)
+        self._dispatch(state)
+
+    def cancel(self, lease: Lease) -> None:
+        """The call was cancelled: free the slot, leaving backoff and rate scale alone."""
+        if lease.done:
+            return
+        lease.done = True
+        state = self._state(lease.model)
+        state.inflight -= 1
+        state.cancelled += 1
+        self._dispatch(state)
+
+    def fail(self, lease: Lease, error: BaseException, retryable: bool = True) -> bool:
+        """
+        The call failed: free the slot; returns whether to retry it.
+
+        Rate limit / overload answers back off every caller of the model.
+        """
+        if lease.done:
+            return False
+        lease.done = True
+        state = self._state(lease.model)
+        state.inflight -= 1
+        state.failures += 1
+        retry = False
+        if is_rate_limited(error):
+            state.rate_limited += 1
+            now = time.monotonic()
+            state.backoff_s = min(self.max_backoff_s, max(self.backoff_s, state.backoff_s * 2))
+            pause = max(retry_after_from(error) or 0.0, state.backoff_s * random.uniform(0.8, 1.2))
+            if now + pause > state.blocked_until:
+                state.blocked_until = now + pause
+                logger.warning(
+                    f"[LLM_GATEWAY] 🧊 {lease.model} rate limited - all calls paused {pause:.1f}s "
+                    f"({len(state.waiting)} waiting, {state.inflight} in flight)"
+                )
+            for bucket in (state.rpm, state.tpm):
+                bucket.scale = max(_MIN_RATE_SCALE, bucket.scale / 2)
+                bucket.tokens = min(bucket.tokens, 0.0)
+            retry = retryable and lease.attempt < self.max_retries
+            if retry:
+                state.retries += 1
+        self._dispatch(state)
+        return retry
+
+    def note_ungated(self, model: str) -> None:
+        """A call that bypassed the gateway (sync client paths)."""
+        self._state(model).ungated += 1
+
+    # ------------------------------------------------------------------
+    # Call helpers
+    # ------------------------------------------------------------------
+
+    async def call(self, model: str, priority: int, tokens: int, fn: Callable[[], Awaitable[Any]],
+                   tokens_used: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """
+        Run `fn()` under the gateway, retrying rate-limited attempts in the queue.
+
+        Args:
+            tokens_used: Real token count from fn's result (TPM correction)
+        """
+        since = time.monotonic()
+        attempt = 0
+        while True:
+            lease = await self.acquire(model, priority, tokens, since=since)
+            lease.attempt = attempt
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.cancel(lease)
+                raise
+            except Exception as e:
+                if not self.fail(lease, e):
+                    raise
+                attempt += 1
+                continue
+            self.release(lease, tokens_used(result) if tokens_used else None)
+            return result
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int = STANDARD, tokens: int = 0):
+        """One gated attempt (no retry) for calls that aren't a simple coroutine."""
+        lease = await self.acquire(model, priority, tokens)
+        try:
+            yield lease
+        except asyncio.CancelledError:
+            self.cancel(lease)
+            raise
+        except Exception as e:
+            self.fail(lease, e)
+            raise
+        self.release(lease)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        models = {}
+        for model, state in self._models.items():
+            waits = {}
+            for priority, samples in sorted(state.waits.items()):
+                ordered = sorted(samples)
+                waits[PRIORITY_NAMES.get(priority, str(priority))] = {
+                    "count": len(ordered),
+                    "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+                    "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 1),
+                    "max_ms": round(ordered[-1] * 1000, 1),
+                }
+            models[model] = {
+                "inflight": state.inflight,
+                "queued": len(state.waiting),
+                "admitted": state.admitted,
+                "rate_limited": state.rate_limited,
+                "retries": state.retries,
+                "failures": state.failures,
+                "cancelled": state.cancelled,
+                "ungated": state.ungated,
+                "paused_s": round(max(0.0, state.blocked_until - now), 1),
+                "rate_scale": round(state.rpm.scale, 2),
+                "queue_wait": waits,
+            }
+        return {"models": models}
+
+
+# Global instance
+llm_gateway = LLMGateway.get_instance()
@@ -0,0 +1,207 @@
+"""
+Incremental token accounting and trimming for ReAct message histories.
+
+The coder / fixer pre_model_hook used to run trim_messages with a
+len(str(content)) / 4 counter over the whole history before every model
+call: O(history) string conversion per step, blind to tool call arguments
+(where write_file_to_disk puts whole files) and low for code and JSON.
+With start_on="human" it could also drop the task message - the only
+human message in a ReAct history - and send the model nothing.
+
+MessageHistory keeps, per hook:
+
+- a token count per message, computed once and cached by message id
+  (estimate_text_tokens: word pieces, digits, punctuation and indentation
+  runs, closer than chars / 4 for punctuation-dense code and JSON; tool
+  call names and arguments are counted too)
+- the running total of the kept window; new messages are added as they
+  appear, and trimming moves the window start forward, so each step costs
+  O(new + removed) messages
+- a pinned prefix (leading system messages and the task's human message)
+  that is never trimmed
+- turn boundaries: the window starts at an AI / human message, never at
+  a tool result whose tool call was dropped, and the newest turn is
+  always kept
+
+max_tokens is the budget for the history after the pinned prefix.
+
+Usage:
+    history = MessageHistory(max_tokens=10000)
+
+    def pre_model_hook(state):
+        return {"llm_input_messages": history.trim(state["messages"])}
+"""
+
+import re
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("ships.message_history")
+
+_MESSAGE_OVERHEAD = 4  # Role / turn markers per message
+_IMAGE_TOKENS = 258  # Gemini's fixed cost per image part
+
+# Word pieces, single digits, indentation runs, newlines, non-ASCII
+# characters and single punctuation characters. Single spaces are merged
+# into the following word.
+_PIECES = re.compile(r"[A-Za-z]+|[0-9]|[ \t]{2,}|\n|[^\x00-\x7f]|[^\sA-Za-z0-9]")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Approximate tokenizer count for prose, code and JSON."""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if "a" <= first.lower() <= "z":
+            tokens += 1 + (len(piece) - 1) // 6  # Long identifiers split into several pieces
+        elif first in " \t":
+            tokens += 1 + (len(piece) - 1) // 8
+        else:
+            tokens += 1
+    return tokens
+
+
+def count_message_tokens(message: Any) -> int:
+    """Tokens of one message: content parts plus tool call names and arguments."""
+    tokens = _MESSAGE_OVERHEAD
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        tokens += estimate_text_tokens(content)
+    elif isinstance(content, list):
+        for part in content:
+            if isinstance(part, str):
+                tokens += estimate_text_tokens(part)
+            elif isinstance(part, dict) and part.get("type") in ("image", "image_url", "media"):
+                tokens += _IMAGE_TOKENS
+            elif isinstance(part, dict):
+                tokens += estimate_text_tokens(part.get("text") or json.dumps(part, default=str))
+    else:
+        tokens += estimate_text_tokens(str(content))
+
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_text_tokens(call.get("name") or "")
+        tokens += estimate_text_tokens(json.dumps(call.get("args") or {}, ensure_ascii=False, default=str))
+    return tokens
+
+
+def _is_tool_result(message: Any) -> bool:
+    return getattr(message, "type", None) == "tool"
+
+
+class MessageHistory:
+    """
+    Token-budgeted view of one ReAct history (see module docstring).
+
+    Expects the history to grow by appending, as a ReAct loop does; any
+    other change (another thread's history, edited messages) rebuilds
+    the window from the cached counts.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self._counts: Dict[str, int] = {}  # Message id -> tokens
+        self._ids: List[Optional[str]] = []  # Ids of the messages seen, in order
+        self._seen = 0
+        self._pinned_end = 0  # Messages [0, pinned_end) are always sent
+        self._pinned_tokens = 0
+        self._start = 0  # First message of the kept window
+        self._window_tokens = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.counted = 0
+        self.trimmed = 0
+        self.rebuilds = 0
+
+    def _tokens(self, message: Any) -> int:
+        message_id = getattr(message, "id", None)
+        if message_id is None:
+            self.counted += 1
+            return count_message_tokens(message)  # Can't be cached safely
+        tokens = self._counts.get(message_id)
+        if tokens is None:
+            tokens = self._counts[message_id] = count_message_tokens(message)
+            self.counted += 1
+        return tokens
+
+    def _reset(self, messages: List[Any]) -> None:
+        if self._seen:
+            self.rebuilds += 1
+            ids = {getattr(m, "id", None) for m in messages}
+            self._counts = {k: v for k, v in self._counts.items() if k in ids}
+        self._ids = []
+        self._seen = 0
+        self._start = 0
+        self._window_tokens = 0
+
+        # Pin leading system messages and the task (first human message)
+        pinned_end = 0
+        while pinned_end < len(messages) and getattr(messages[pinned_end], "type", None) == "system":
+            pinned_end += 1
+        if pinned_end < len(messages) and getattr(messages[pinned_end], "type", None) == "human":
+            pinned_end += 1
+        self._pinned_end = pinned_end
+        self._pinned_tokens = sum(self._tokens(m) for m in messages[:pinned_end])
+        self._ids = [getattr(m, "id", None) for m in messages[:pinned_end]]
+        self._seen = self._start = pinned_end
+
+    def _is_continuation(self, messages: List[Any]) -> bool:
+        """Whether `messages` extends the history seen so far."""
+        if not self._seen or len(messages) < self._seen:
+            return False
+        last = self._seen - 1
+        return (getattr(messages[last], "id", None) == self._ids[last]
+                and getattr(messages[0], "id", None) == self._ids[0]
+                and self._ids[last] is not None)
+
+    def trim(self, messages: List[Any]) -> List[Any]:
+        """The messages to send: pinned prefix plus the newest turns within budget."""
+        with self._lock:
+            if not self._is_continuation(messages):
+                self._reset(messages)
+
+            for message in messages[self._seen:]:
+                self._ids.append(getattr(message, "id", None))
+                self._window_tokens += self._tokens(message)
+            self._seen = len(messages)
+
+            # The newest turn (its AI / human message and tool results) always stays
+            last_turn = len(messages) - 1
+            while last_turn > self._start and _is_tool_result(messages[last_turn]):
+                last_turn -= 1
+
+            # Drop whole turns from the front: O(removed)
+            dropped = 0
+            while self._window_tokens > self.max_tokens and self._start < last_turn:
+                self._window_tokens -= self._tokens(messages[self._start])
+                self._start += 1
+                dropped += 1
+                while self._start < last_turn and _is_tool_result(messages[self._start]):
+                    self._window_tokens -= self._tokens(messages[self._start])
+                    self._start += 1
+                    dropped += 1
+            if dropped:
+                self.trimmed += dropped
+                logger.debug(
+                    f"[HISTORY] ✂️ Dropped {dropped} messages, keeping {len(messages) - self._start} "
+                    f"(~{self._window_tokens} + {self._pinned_tokens} pinned tokens)"
+                )
+
+            return messages[:self._pinned_end] + messages[self._start:]
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens of the messages the last trim() returned."""
+        return self._pinned_tokens + self._window_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.total_tokens,
+            "pinned_tokens": self._pinned_tokens,
+            "kept": self._pinned_end + self._seen - self._start,
+            "trimmed": self.trimmed,
+            "counted": self.counted,
+            "rebuilds": self.rebuilds,
+        }
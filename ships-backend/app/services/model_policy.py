@@ -0,0 +1,214 @@
+"""
+Model and thinking budget per invocation, from how big the task is.
+
+LLMFactory used to pin one thinking_level per agent type, so a one-line
+color change ran the coder and fixer with the same "high" budget (and
+model) as scaffolding a whole app - most of the latency and cost of small
+requests was reasoning nobody needed.
+
+ModelPolicy.choose() picks the model and thinking_level for one coder /
+fixer invocation from signals the pipeline already has:
+
+- StructuredIntent scope (file < feature < layer < project) and task_type
+- number of files the plan / task touches
+- validation error count (fix_request / validation report)
+- failed attempts so far: each one escalates one thinking level, and after
+  MODEL_POLICY_PRO_AFTER failures with nothing left above "high" the Pro
+  model is used
+
+Decisions are logged ([MODEL_POLICY]) and, with MODEL_POLICY_LOG set,
+appended as JSON lines (with the run id, to join with the run's token
+usage) for offline tuning. MODEL_POLICY_ENABLED=false keeps the agent
+type defaults.
+
+Usage:
+    choice = model_policy.choose(TaskSignals(agent="fixer", error_count=2, failed_attempts=0))
+    llm = agent_pool.get_llm("fixer", model=choice.model, thinking_level=choice.thinking_level)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger("ships.model_policy")
+
+MODEL_POLICY_ENABLED = os.getenv("MODEL_POLICY_ENABLED", "true").lower() != "false"
+MODEL_POLICY_PRO_AFTER = int(os.getenv("MODEL_POLICY_PRO_AFTER", "2"))  # Failed attempts before Pro
+MODEL_POLICY_LOG = os.getenv("MODEL_POLICY_LOG", "")  # JSONL decision log path (off when empty)
+
+# Same names as app/core/llm_factory.py (not imported: that pulls in the Gemini client)
+MODEL_FLASH = "gemini-3-flash-preview"
+MODEL_PRO = "gemini-3-pro-preview"
+
+THINKING_LEVELS = ("minimal", "low", "medium", "high")
+
+# Thinking level per tier for each policy-driven agent
+TIER_THINKING: Dict[str, Dict[str, str]] = {
+    "coder": {"trivial": "low", "small": "medium", "medium": "high", "large": "high"},
+    "fixer": {"trivial": "low", "small": "medium", "medium": "high", "large": "high"},
+}
+
+_SCOPE_POINTS = {"file": 0, "feature": 1, "layer": 2, "project": 3}
+_TASK_TYPE_POINTS = {"fix": 0, "modify": 0, "delete": 0, "question": 0, "refactor": 1, "feature": 1}
+
+
+@dataclass
+class TaskSignals:
+    """What is known about one invocation before its model is picked."""
+
+    agent: str
+    task_type: Optional[str] = None  # StructuredIntent.task_type
+    scope: Optional[str] = None  # StructuredIntent.scope
+    file_count: int = 0  # Files the plan / task touches
+    error_count: int = 0  # Validation errors to fix
+    failed_attempts: int = 0  # Earlier attempts at this work that failed validation
+
+
+@dataclass
+class ModelChoice:
+    """Model and thinking budget chosen for one invocation."""
+
+    model: str
+    thinking_level: str
+    tier: str
+    escalation: int = 0  # Levels added for failed attempts
+    reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _count_points(count: int, small: int, medium: int, large: int) -> int:
+    if count >= large:
+        return 3
+    if count >= medium:
+        return 2
+    if count >= small:
+        return 1
+    return 0
+
+
+class ModelPolicy:
+    """
+    Complexity-adaptive model / thinking selection (see module docstring).
+
+    Singleton: use `ModelPolicy.get_instance()` or the module-level `model_policy`.
+    """
+
+    _instance = None
+
+    def __init__(self, enabled: bool = MODEL_POLICY_ENABLED, pro_after: int = MODEL_POLICY_PRO_AFTER,
+                 log_path: str = MODEL_POLICY_LOG, max_recent: int = 200):
+        self.enabled = enabled
+        self.pro_after = pro_after
+        self.log_path = log_path
+        self._recent = deque(maxlen=max_recent)
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "ModelPolicy":
+        if cls._instance is None:
+            cls._instance = ModelPolicy()
+        return cls._instance
+
+    # ------------------------------------------------------------------
+    # Policy
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def tier(signals: TaskSignals) -> str:
+        """Complexity tier from scope, task type, file count and errors."""
+        scope = _SCOPE_POINTS.get(signals.scope or "", 1)
+        if signals.agent == "fixer":
+            # A fixer's task is the errors, not the original request
+            points = min(scope, 1) + _count_points(signals.error_count, 3, 8, 20) + _count_points(signals.file_count, 2, 4, 8)
+        else:
+            points = scope + _TASK_TYPE_POINTS.get(signals.task_type or "", 1) + _count_points(signals.file_count, 2, 6, 16)
+        if points <= 1:
+            return "trivial"
+        if points <= 2:
+            return "small"
+        if points <= 4:
+            return "medium"
+        return "large"
+
+    def choose(self, signals: TaskSignals) -> Optional[ModelChoice]:
+        """
+        Model and thinking level for one invocation.
+
+        Returns None when the policy is disabled or doesn't cover the agent
+        (the caller keeps LLMFactory's agent type defaults).
+        """
+        levels = TIER_THINKING.get(signals.agent)
+        if not self.enabled or levels is None:
+            return None
+
+        tier = self.tier(signals)
+        base = THINKING_LEVELS.index(levels[tier])
+        escalation = signals.failed_attempts
+        level = min(len(THINKING_LEVELS) - 1, base + escalation)
+
+        model = MODEL_FLASH
+        reason = f"{tier} task"
+        if escalation:
+            reason += f", {escalation} failed attempt(s)"
+        if escalation >= self.pro_after and base + escalation >= len(THINKING_LEVELS):
+            # Flash at "high" already failed: a stronger model, not more of the same
+            model = MODEL_PRO
+            reason += ", escalated to Pro"
+
+        choice = ModelChoice(model=model, thinking_level=THINKING_LEVELS[level], tier=tier,
+                             escalation=escalation, reason=reason)
+        self._record(signals, choice)
+        return choice
+
+    # ------------------------------------------------------------------
+    # Decision log
+    # ------------------------------------------------------------------
+
+    def _record(self, signals: TaskSignals, choice: ModelChoice) -> None:
+        from app.utils.run_context import current_run_context
+
+        ctx = current_run_context()
+        entry = {
+            "ts": time.time(),
+            "run_id": ctx.run_id if ctx else None,
+            "signals": asdict(signals),
+            "choice": choice.to_dict(),
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self._counts[(signals.agent, choice.tier, choice.thinking_level, choice.model)] += 1
+
+        logger.info(
+            f"[MODEL_POLICY] 🎚️ {signals.agent}: {choice.model} / thinking={choice.thinking_level} "
+            f"({choice.reason}; scope={signals.scope}, type={signals.task_type}, "
+            f"files={signals.file_count}, errors={signals.error_count})"
+        )
+        if self.log_path:
+            try:
+                with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logger.warning(f"[MODEL_POLICY] ⚠️ Could not write decision log: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "decisions": [
+                    {"agent": agent, "tier": tier, "thinking_level": level, "model": model, "count": count}
+                    for (agent, tier, level, model), count in sorted(self._counts.items())
+                ],
+                "recent": list(self._recent)[-20:],
+            }
+
+
+# Global instance
+model_policy = ModelPolicy.get_instance()
@@ -6,6 +6,10 @@ within LangGraph nodes. Creates runs at pipeline start and records
 steps for each node invocation.
 
 This is a bridge between the async service layer and the graph nodes.
+
+The run being tracked is the RunContext of the calling code (see
+app/utils/run_context.py), not module state - concurrent runs record their
+steps against their own run.
 """
 
 import logging
@@ -14,15 +18,33 @@ from typing import Optional, Dict, Any
 from uuid import UUID, uuid4
 from contextlib import contextmanager
 
+from app.utils.run_context import current_run_context
+
 logger = logging.getLogger("ships.step_tracking")
 
-# Global tracking state (per-thread safe with asyncio)
-_current_run_id: Optional[UUID] = None
-_current_user_id: Optional[UUID] = None
-_current_project_path: Optional[str] = None
 _tracking_enabled: bool = True
 
 
+def _as_uuid(value) -> Optional[UUID]:
+    if value is None or isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _tracked_run() -> Optional[tuple]:
+    """(run_id, user_id) of the calling run, or None if it isn't tracked."""
+    context = current_run_context()
+    if context is None:
+        return None
+    run_id, user_id = _as_uuid(context.run_id), _as_uuid(context.user_id)
+    if not run_id or not user_id:
+        return None
+    return run_id, user_id
+
+
 def set_tracking_enabled(enabled: bool) -> None:
     """Enable or disable step tracking globally."""
     global _tracking_enabled
@@ -44,7 +66,8 @@ async def start_run(
     """
     Start a new agent run.
     
-    Call this at the beginning of stream_pipeline.
+    Call this at the beginning of stream_pipeline, which puts the returned
+    id on the run's RunContext.
     
     Args:
         user_id: Current user's ID
@@ -56,8 +79,6 @@ async def start_run(
     Returns:
         Run ID if created, None if tracking disabled or failed
     """
-    global _current_run_id, _current_user_id, _current_project_path
-    
     if not _tracking_enabled:
         return None
     
@@ -76,10 +97,6 @@ async def start_run(
             )
             await session.commit()
             
-            _current_run_id = run.id
-            _current_user_id = user_id
-            _current_project_path = project_path
-            
             logger.info(f"[STEP_TRACKING] Started run {run.id}")
             return run.id
             
@@ -93,7 +110,8 @@ async def record_step(
     phase: Optional[str] = None,
     action: Optional[str] = None,
     content: Optional[Dict[str, Any]] = None,
-    tokens_used: int = 0
+    tokens_used: int = 0,
+    usage=None
 ) -> Optional[int]:
     """
     Record a step in the current run.
@@ -105,15 +123,22 @@ async def record_step(
         phase: Current phase
         action: Action type
         content: Step content (will be truncated if too large)
-        tokens_used: Token count
+        tokens_used: Token count (when no LLM usage is attached)
+        usage: LLM usage of the step (token_accounting.Usage). Default:
+            the agent's node usage not yet on a step
         
     Returns:
         Step number if recorded, None otherwise
     """
-    global _current_run_id, _current_user_id
-    
-    if not _tracking_enabled or not _current_run_id or not _current_user_id:
+    tracked = _tracked_run() if _tracking_enabled else None
+    if tracked is None:
         return None
+    run_id, user_id = tracked
+    
+    # Claimed before any await, while the node is still running
+    if usage is None:
+        run_usage = getattr(current_run_context(), "usage", None)
+        usage = run_usage.claim(agent) if run_usage is not None else None
     
     try:
         from app.database.connection import get_session_factory
@@ -124,14 +149,15 @@ async def record_step(
         
         session_factory = get_session_factory()
         async with session_factory() as session:
-            service = AgentRunService(session, _current_user_id)
+            service = AgentRunService(session, user_id)
             step = await service.add_step(
-                run_id=_current_run_id,
+                run_id=run_id,
                 agent=agent,
                 phase=phase,
                 action=action,
                 content=safe_content,
-                tokens_used=tokens_used
+                tokens_used=usage.total_tokens if usage is not None else tokens_used,
+                usage=usage.to_columns() if usage is not None else None
             )
             await session.commit()
             
@@ -158,10 +184,10 @@ async def complete_run(status: str = "complete", error_message: Optional[str] =
     Returns:
         True if updated, False otherwise
     """
-    global _current_run_id, _current_user_id
-    
-    if not _tracking_enabled or not _current_run_id or not _current_user_id:
+    tracked = _tracked_run() if _tracking_enabled else None
+    if tracked is None:
         return False
+    run_id, user_id = tracked
     
     try:
         from app.database.connection import get_session_factory
@@ -169,18 +195,16 @@ async def complete_run(status: str = "complete", error_message: Optional[str] =
         
         session_factory = get_session_factory()
         async with session_factory() as session:
-            service = AgentRunService(session, _current_user_id)
+            service = AgentRunService(session, user_id)
             run = await service.update_run_status(
-                run_id=_current_run_id,
+                run_id=run_id,
                 status=status,
                 error_message=error_message
             )
             await session.commit()
             
             if run:
-                logger.info(f"[STEP_TRACKING] Completed run {_current_run_id}: {status}")
-                # Clear global state
-                _current_run_id = None
+                logger.info(f"[STEP_TRACKING] Completed run {run_id}: {status}")
                 return True
             return False
             
@@ -190,8 +214,9 @@ async def complete_run(status: str = "complete", error_message: Optional[str] =
 
 
 def get_current_run_id() -> Optional[UUID]:
-    """Get the current run ID if tracking is active."""
-    return _current_run_id
+    """Get the calling run's ID if tracking is active."""
+    tracked = _tracked_run()
+    return tracked[0] if tracked else None
 
 
 def _truncate_content(content: Dict[str, Any], max_size: int = 10000) -> Dict[str, Any]:
@@ -0,0 +1,314 @@
+"""
+Token, latency and cost accounting for every LLM call of a run.
+
+AgentStep.tokens_used used to be written as 0 and nothing recorded prompt,
+cached or thinking tokens or model latency, so cache hit ratios and where
+a run's tokens went were invisible.
+
+The pipeline puts a UsageCallbackHandler on the run's LangGraph config; it
+sees every chat model call in the run (nodes, create_react_agent tool
+loops, structured output) and attributes its usage_metadata to:
+
+- node: the top-level graph node (coder, fixer, ...)
+- agent: the LLMFactory agent type of the model (metadata "ships_agent")
+- iteration: the nth model call of that node invocation (tool-loop turn)
+
+into the run's RunUsage (RunContext.usage). Usage reaches the database on
+AgentStep rows: record_step() claims the calling node's usage so far, and
+whatever is left when a node finishes is recorded as an `llm_usage` step
+(in a task the pipeline awaits through drain() before the run ends).
+AgentRunService.add_step adds steps to the AgentRun totals in one atomic
+UPDATE, and the runs API returns both.
+
+Costs are estimates from MODEL_PRICING.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, Set, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("ships.token_accounting")
+
+# USD per 1M tokens: (input, cached input, output incl. thinking)
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gemini-3-flash-preview": (0.50, 0.05, 3.00),
+    "gemini-3-pro-preview": (2.00, 0.20, 12.00),
+}
+_DEFAULT_MODEL = "gemini-3-flash-preview"
+
+UNKNOWN_NODE = "unknown"
+
+# Strong references to llm_usage step writes, so none is garbage-collected
+# mid-flight even if its handler is dropped first
+_STEP_TASKS: Set[asyncio.Task] = set()
+
+
+def usage_cost(model: Optional[str], input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of one call."""
+    price_in, price_cached, price_out = MODEL_PRICING.get(model or _DEFAULT_MODEL, MODEL_PRICING[_DEFAULT_MODEL])
+    uncached = max(0, input_tokens - cached_tokens)
+    return (uncached * price_in + cached_tokens * price_cached + output_tokens * price_out) / 1_000_000
+
+
+@dataclass
+class Usage:
+    """LLM usage of one call, step, node or run (same fields as the AgentStep columns)."""
+
+    llm_calls: int = 0
+    input_tokens: int = 0  # Incl. cached
+    output_tokens: int = 0  # Incl. thinking
+    cached_tokens: int = 0
+    thinking_tokens: int = 0
+    llm_latency_ms: float = 0.0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "Usage") -> None:
+        self.llm_calls += other.llm_calls
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cached_tokens += other.cached_tokens
+        self.thinking_tokens += other.thinking_tokens
+        self.llm_latency_ms += other.llm_latency_ms
+        self.cost_usd += other.cost_usd
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Values for the AgentStep usage columns."""
+        return {**asdict(self), "llm_latency_ms": round(self.llm_latency_ms)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "total_tokens": self.total_tokens,
+            "llm_latency_ms": round(self.llm_latency_ms, 1),
+            "cost_usd": round(self.cost_usd, 6),
+            "cache_hit_ratio": round(self.cached_tokens / self.input_tokens, 3) if self.input_tokens else 0.0,
+        }
+
+    @classmethod
+    def from_metadata(cls, usage_metadata: Optional[Dict[str, Any]], model: Optional[str],
+                      latency_ms: float = 0.0) -> "Usage":
+        """One call's usage from a message's usage_metadata."""
+        usage_metadata = usage_metadata or {}
+        input_tokens = int(usage_metadata.get("input_tokens") or 0)
+        output_tokens = int(usage_metadata.get("output_tokens") or 0)
+        cached = int((usage_metadata.get("input_token_details") or {}).get("cache_read") or 0)
+        thinking = int((usage_metadata.get("output_token_details") or {}).get("reasoning") or 0)
+        return cls(
+            llm_calls=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=cached,
+            thinking_tokens=thinking,
+            llm_latency_ms=latency_ms,
+            cost_usd=usage_cost(model, input_tokens, cached, output_tokens),
+        )
+
+
+def _sum_usage_metadata(total: Optional[Dict[str, Any]], part: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream chunk usage_metadata summed (nested token details too)."""
+    if total is None:
+        return dict(part)
+    merged = dict(total)
+    for key, value in part.items():
+        if isinstance(value, dict):
+            merged[key] = _sum_usage_metadata(merged.get(key) or {}, value)
+        elif isinstance(value, (int, float)):
+            merged[key] = (merged.get(key) or 0) + value
+    return merged
+
+
+class RunUsage:
+    """
+    LLM usage of one run, by node, agent and node invocation.
+
+    Thread-safe: sync model calls from tool threads report here too.
+    """
+
+    def __init__(self, max_calls: int = 500):
+        self.total = Usage()
+        self.by_node: Dict[str, Usage] = {}
+        self.by_agent: Dict[str, Usage] = {}
+        self.calls = deque(maxlen=max_calls)  # Recent calls, newest last
+        # Node invocation -> (node, usage not yet on a step row)
+        self._unclaimed: Dict[str, Tuple[str, Usage]] = {}
+        self._iterations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, node: str, invocation: Optional[str], agent: str, model: Optional[str],
+               usage: Usage, ttft_ms: Optional[float] = None) -> int:
+        """Add one call; returns its iteration within the node invocation."""
+        invocation = invocation or node
+        with self._lock:
+            self.total.add(usage)
+            self.by_node.setdefault(node, Usage()).add(usage)
+            self.by_agent.setdefault(agent, Usage()).add(usage)
+            self._unclaimed.setdefault(invocation, (node, Usage()))[1].add(usage)
+            iteration = self._iterations[invocation] = self._iterations.get(invocation, 0) + 1
+            self.calls.append({
+                "node": node,
+                "agent": agent,
+                "iteration": iteration,
+                "model": model,
+                "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+                **usage.to_dict(),
+            })
+        return iteration
+
+    def claim(self, node: str) -> Optional[Usage]:
+        """Take the usage of `node`'s latest invocation not yet on a step row."""
+        with self._lock:
+            for invocation in reversed(list(self._unclaimed)):
+                owner, usage = self._unclaimed[invocation]
+                if owner == node and usage.llm_calls:
+                    self._unclaimed[invocation] = (owner, Usage())
+                    return usage
+        return None
+
+    def close(self, invocation: str) -> Optional[Tuple[str, Usage, int]]:
+        """Node invocation finished: (node, unclaimed usage, iterations), if any."""
+        with self._lock:
+            node, usage = self._unclaimed.pop(invocation, (None, None))
+            iterations = self._iterations.pop(invocation, 0)
+        if usage is None or not usage.llm_calls:
+            return None
+        return node, usage, iterations
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total": self.total.to_dict(),
+                "by_node": {name: usage.to_dict() for name, usage in self.by_node.items()},
+                "by_agent": {name: usage.to_dict() for name, usage in self.by_agent.items()},
+            }
+
+    def summary(self) -> str:
+        total = self.total
+        return (
+            f"{total.llm_calls} calls, {total.input_tokens} in ({total.cached_tokens} cached) / "
+            f"{total.output_tokens} out ({total.thinking_tokens} thinking), "
+            f"{total.llm_latency_ms / 1000:.1f}s model time, ~${total.cost_usd:.4f}"
+        )
+
+
+def _node_invocation(metadata: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """(top-level node, its invocation id) from LangGraph callback metadata."""
+    namespace = metadata.get("langgraph_checkpoint_ns") or ""
+    if namespace:
+        invocation = namespace.split("|", 1)[0]
+        return invocation.split(":", 1)[0], invocation
+    return metadata.get("langgraph_node") or UNKNOWN_NODE, None
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Collects usage_metadata of every chat model call in a run into its RunUsage."""
+
+    run_inline = True  # Cheap bookkeeping; keeps node-end ordering
+
+    def __init__(self, usage: RunUsage):
+        self.usage = usage
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+        self._nodes: Dict[Any, str] = {}  # Top-level node runs -> invocation
+        self._steps: Set[asyncio.Task] = set()  # llm_usage steps being written
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        node, invocation = _node_invocation(metadata)
+        self._calls[run_id] = {
+            "node": node,
+            "invocation": invocation,
+            "agent": metadata.get("ships_agent") or node,
+            "model": metadata.get("ls_model_name"),
+            "started": time.perf_counter(),
+            "first_token": None,
+            "chunk_usage": None,
+        }
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id=None, **kwargs) -> None:
+        call = self._calls.get(run_id)
+        if call is None:
+            return
+        if call["first_token"] is None:
+            call["first_token"] = time.perf_counter()
+        usage_metadata = getattr(getattr(chunk, "message", None), "usage_metadata", None)
+        if usage_metadata:
+            call["chunk_usage"] = _sum_usage_metadata(call["chunk_usage"], usage_metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        message = None
+        if response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+        usage_metadata = getattr(message, "usage_metadata", None) or call["chunk_usage"]
+        model = call["model"] or (getattr(message, "response_metadata", None) or {}).get("model_name")
+        self._record(call, usage_metadata, model)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            self._record(call, call["chunk_usage"], call["model"])  # Latency was still spent
+
+    def _record(self, call: Dict[str, Any], usage_metadata, model) -> None:
+        now = time.perf_counter()
+        usage = Usage.from_metadata(usage_metadata, model, latency_ms=(now - call["started"]) * 1000)
+        ttft_ms = (call["first_token"] - call["started"]) * 1000 if call["first_token"] else None
+        self.usage.record(call["node"], call["invocation"], call["agent"], model, usage, ttft_ms)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        namespace = metadata.get("langgraph_checkpoint_ns") or ""
+        name = kwargs.get("name")
+        if name and name == metadata.get("langgraph_node") and namespace and "|" not in namespace:
+            self._nodes[run_id] = namespace
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        invocation = self._nodes.pop(run_id, None)
+        if invocation is not None:
+            self._node_finished(invocation)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        invocation = self._nodes.pop(run_id, None)
+        if invocation is not None:
+            self._node_finished(invocation)
+
+    def _node_finished(self, invocation: str) -> None:
+        """Put usage no record_step() claimed on its own step row."""
+        leftover = self.usage.close(invocation)
+        if leftover is None:
+            return
+        node, usage, iterations = leftover
+        from app.services.step_tracking import record_step, get_current_run_id
+        if get_current_run_id() is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(record_step(
+                agent=node,
+                action="llm_usage",
+                content={"iterations": iterations},
+                usage=usage,
+            ))
+        except RuntimeError:
+            logger.debug(f"[TOKENS] No loop to record {node} usage on")
+            return
+        for tasks in (self._steps, _STEP_TASKS):
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Wait for llm_usage steps still being written (before the run ends)."""
+        if not self._steps:
+            return
+        _, pending = await asyncio.wait(set(self._steps), timeout=timeout)
+        if pending:
+            logger.warning(f"[TOKENS] ⚠️ {len(pending)} usage steps still writing after {timeout:.0f}s")
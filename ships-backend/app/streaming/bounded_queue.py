@@ -0,0 +1,236 @@
+"""
+Bounded stream queue: the hand-off between a producer and a stream writer.
+
+Two places hand items from a producer that can outrun its reader to a single
+consumer: the pipeline (graph events + UI events -> the NDJSON renderer) and
+the PTY streamer (process output -> execute_command_streaming's caller). Both
+used an unbounded asyncio.Queue, so a chatty `npm install` or a long model
+stream grew memory for as long as the reader lagged.
+
+StreamQueue is bounded (maxsize items). What happens when it is full is its
+policy:
+
+- block:        put() waits for room - backpressure to the producer (the
+                graph stops being iterated, the PTY pipe stops being read)
+- coalesce:     merge the item into the newest queued one if `coalesce`
+                accepts it (token chunks, output text), otherwise block
+- drop_oldest:  evict the oldest item `droppable` accepts (low-priority
+                events; any item if no predicate is given), otherwise block
+
+Producers that can't wait (event bus callbacks from worker threads, setup
+phase callbacks) use put_nowait(). It applies the same policy but, instead of
+blocking, admits the item over the limit and counts an overflow - critical
+events (completion, errors) are never lost.
+
+Depth metrics (current, high-water, time spent blocked, merges, drops,
+overflows) are on get_stats(); stream_queue_stats() aggregates every live
+queue for /agent/runs/live.
+"""
+
+import os
+import time
+import asyncio
+import weakref
+import logging
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Deque, Generic, TypeVar
+
+logger = logging.getLogger("ships.streaming")
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+# Policies
+BLOCK = "block"
+COALESCE = "coalesce"
+DROP_OLDEST = "drop_oldest"
+
+T = TypeVar("T")
+
+# Live queues, for stream_queue_stats()
+_live_queues: "weakref.WeakSet[StreamQueue]" = weakref.WeakSet()
+
+
+class StreamQueue(Generic[T]):
+    """
+    Bounded single-consumer queue with an overflow policy.
+
+    Loop-bound like asyncio.Queue: call put()/put_nowait()/get() from the
+    event loop (threads go through loop.call_soon_threadsafe, as the event
+    bus already does).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = STREAM_QUEUE_SIZE,
+        policy: str = BLOCK,
+        coalesce: Optional[Callable[[T, T], Optional[T]]] = None,
+        droppable: Optional[Callable[[T], bool]] = None,
+        name: str = "",
+    ):
+        """
+        Args:
+            maxsize: Items held before the policy kicks in (>= 1)
+            policy: BLOCK, COALESCE or DROP_OLDEST
+            coalesce: (newest queued, incoming) -> merged item, or None if
+                they can't be merged (COALESCE)
+            droppable: Which queued items may be evicted (DROP_OLDEST; also
+                tried by COALESCE when merging fails)
+            name: Label for logs and stats
+        """
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.name = name
+        self._coalesce = coalesce
+        self._droppable = droppable
+        self._items: Deque[T] = deque()
+        self._getters: Deque[asyncio.Future] = deque()
+        self._putters: Deque[asyncio.Future] = deque()
+
+        # Metrics
+        self.puts = 0
+        self.gets = 0
+        self.max_depth = 0
+        self.blocked = 0
+        self.blocked_s = 0.0
+        self.coalesced = 0
+        self.dropped = 0
+        self.overflows = 0
+
+        _live_queues.add(self)
+
+    # ------------------------------------------------------------------
+    # asyncio.Queue-compatible surface
+    # ------------------------------------------------------------------
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def full(self) -> bool:
+        return len(self._items) >= self.maxsize
+
+    async def put(self, item: T) -> None:
+        """Queue an item, waiting for room if the policy can't make any."""
+        if self.full() and self._make_room(item):
+            return
+        if self.full():
+            self.blocked += 1
+            began = time.perf_counter()
+            try:
+                while self.full():
+                    putter = asyncio.get_running_loop().create_future()
+                    self._putters.append(putter)
+                    try:
+                        await putter
+                    finally:
+                        if putter in self._putters:
+                            self._putters.remove(putter)
+            finally:
+                self.blocked_s += time.perf_counter() - began
+        self._push(item)
+
+    def put_nowait(self, item: T) -> None:
+        """Queue an item without waiting; over the limit if nothing gives."""
+        if self.full():
+            if self._make_room(item):
+                return
+            if self.full():  # Nothing could be dropped either
+                self.overflows += 1
+        self._push(item)
+
+    async def get(self) -> T:
+        while not self._items:
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            finally:
+                if getter in self._getters:
+                    self._getters.remove(getter)
+        return self._pop()
+
+    def get_nowait(self) -> T:
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._pop()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _make_room(self, item: T) -> bool:
+        """
+        Apply the overflow policy to a full queue.
+
+        Returns:
+            True if `item` was merged into the queue (nothing left to push)
+        """
+        if self.policy == COALESCE and self._coalesce is not None and self._items:
+            merged = self._coalesce(self._items[-1], item)
+            if merged is not None:
+                self._items[-1] = merged
+                self.coalesced += 1
+                self.puts += 1
+                return True
+        if self.policy == DROP_OLDEST or (self.policy == COALESCE and self._droppable is not None):
+            for i, queued in enumerate(self._items):
+                if self._droppable is None or self._droppable(queued):
+                    del self._items[i]
+                    self.dropped += 1
+                    break
+        return False
+
+    def _push(self, item: T) -> None:
+        self._items.append(item)
+        self.puts += 1
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+        self._wake(self._getters)
+
+    def _pop(self) -> T:
+        item = self._items.popleft()
+        self.gets += 1
+        if not self.full():
+            self._wake(self._putters)
+        return item
+
+    @staticmethod
+    def _wake(waiters: Deque[asyncio.Future]) -> None:
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "puts": self.puts,
+            "gets": self.gets,
+            "blocked": self.blocked,
+            "blocked_ms": round(self.blocked_s * 1000, 1),
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+        }
+
+
+def stream_queue_stats() -> Dict[str, Any]:
+    """Depth metrics across every live StreamQueue."""
+    queues = [q.get_stats() for q in list(_live_queues)]
+    return {
+        "live": len(queues),
+        "depth": sum(q["depth"] for q in queues),
+        "max_depth": max((q["max_depth"] for q in queues), default=0),
+        "blocked_ms": round(sum(q["blocked_ms"] for q in queues), 1),
+        "coalesced": sum(q["coalesced"] for q in queues),
+        "dropped": sum(q["dropped"] for q in queues),
+        "overflows": sum(q["overflows"] for q in queues),
+        "queues": queues,
+    }
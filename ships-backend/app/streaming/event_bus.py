@@ -0,0 +1,164 @@
+"""
+UI Event Bus - ephemeral side-channel for agent UI events.
+
+Agents used to return their UI events (thinking, file_written, plan_created, ...)
+under a `stream_events` state key. That persisted every event into the
+checkpointed graph state, and the frontend only saw them when the node finished.
+
+Now `emit_event()` publishes straight to this bus. The streaming pipeline
+subscribes per run, so events reach the client the moment they are emitted
+and never touch graph state or checkpoints.
+
+The active run is tracked in a ContextVar. LangGraph runs nodes in tasks that
+copy the current context, so anything emitted inside the graph lands on the
+run that started it, even when several runs are in flight.
+
+Usage:
+    from app.streaming.event_bus import event_bus
+
+    queue = event_bus.subscribe(run_key)
+
+    async def drive():
+        event_bus.bind(run_key)  # Task-local: scoped to this task's context
+        await graph.ainvoke(...)  # emit_event() in any node publishes to `queue`
+
+    task = asyncio.create_task(drive())
+    ...
+    event_bus.unsubscribe(run_key, queue)
+"""
+
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar, Token
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger("ships.event_bus")
+
+# Run key of the pipeline that owns the current context (None = no subscriber)
+_current_run: ContextVar[Optional[str]] = ContextVar("ships_ui_event_run", default=None)
+
+
+class UIEventBus:
+    """
+    In-process pub/sub for UI events, keyed by run.
+
+    Singleton: use `UIEventBus.get_instance()` or the module-level `event_bus`.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        # run_key -> [(loop, queue), ...]
+        self._subscribers: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._published = 0
+        self._dropped = 0  # Published with no subscriber
+
+    @classmethod
+    def get_instance(cls) -> "UIEventBus":
+        if cls._instance is None:
+            cls._instance = UIEventBus()
+        return cls._instance
+
+    # ------------------------------------------------------------------
+    # Run binding
+    # ------------------------------------------------------------------
+
+    def bind(self, run_key: str) -> Token:
+        """Route events emitted in this context (and tasks it spawns) to run_key."""
+        return _current_run.set(run_key)
+
+    def unbind(self, token: Token) -> None:
+        _current_run.reset(token)
+
+    @staticmethod
+    def current_run() -> Optional[str]:
+        return _current_run.get()
+
+    # ------------------------------------------------------------------
+    # Pub/sub
+    # ------------------------------------------------------------------
+
+    def subscribe(self, run_key: str, queue: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """
+        Subscribe to a run's UI events. Must be called from the event loop.
+
+        Args:
+            run_key: Run to listen to
+            queue: Existing queue to deliver into (anything with put_nowait, e.g. the
+                pipeline's StreamQueue shared with graph events)
+
+        Returns:
+            Queue receiving event dicts in emit order
+        """
+        if queue is None:
+            queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(run_key, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, run_key: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = [s for s in self._subscribers.get(run_key, []) if s[1] is not queue]
+            if subs:
+                self._subscribers[run_key] = subs
+            else:
+                self._subscribers.pop(run_key, None)
+
+    def publish(self, event: Dict[str, Any], run_key: Optional[str] = None) -> bool:
+        """
+        Publish an event to a run's subscribers.
+
+        Safe to call from the event loop or from worker threads
+        (asyncio.to_thread / run_in_executor copy the context too).
+
+        Args:
+            event: UI event dict (see emit_event)
+            run_key: Target run (default: the run bound to this context)
+
+        Returns:
+            True if at least one subscriber received it
+        """
+        run_key = run_key or _current_run.get()
+        if run_key is None:
+            return False
+
+        with self._lock:
+            subs = list(self._subscribers.get(run_key, ()))
+
+        if not subs:
+            self._dropped += 1
+            return False
+
+        for loop, queue in subs:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+
+            if running is loop:
+                queue.put_nowait(event)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        self._published += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Bus metrics for diagnostics."""
+        with self._lock:
+            active = {k: len(v) for k, v in self._subscribers.items()}
+        return {
+            "active_runs": len(active),
+            "subscribers": sum(active.values()),
+            "published": self._published,
+            "dropped": self._dropped,
+        }
+
+
+# Global instance
+event_bus = UIEventBus.get_instance()
@@ -0,0 +1,74 @@
+"""
+Source-side filter for graph.astream_events().
+
+The pipeline only renders a few kinds of events: chat model tokens, the
+top-level agent nodes starting/ending, and tools that change something.
+Asking LangGraph for just those (v2 schema + include_*/exclude_* filters)
+means internal chains, routers, prompts, parsers and read-only tool calls
+are never materialized in the first place.
+
+UI allowlist:
+- chat models:  by run type
+- agent nodes:  by name (UI_NODE_NAMES) - node tags would be inherited by
+                every child run and defeat the filter
+- tools:        by the UI_STREAM_TAG tag, applied with tag_ui_tools() where
+                each agent's tool list is defined (tool tags are local to
+                the tool run, not inherited)
+"""
+
+from typing import Dict, Any, Iterable, List
+
+UI_STREAM_TAG = "ships:ui"
+
+# Top-level graph nodes whose chain start/end the pipeline renders or tracks
+UI_NODE_NAMES = ("orchestrator", "planner", "coder", "validator", "fixer")
+
+# Tools that never produce UI output (no block, no sidebar entry)
+READ_ONLY_TOOLS = frozenset([
+    "list_directory", "read_file", "read_file_from_disk", "get_file_tree",
+    "scan_project_tree", "grep_search", "file_search", "semantic_search",
+])
+
+UI_EVENT_FILTERS: Dict[str, Any] = {
+    "include_types": ["chat_model"],
+    "include_names": list(UI_NODE_NAMES),
+    "include_tags": [UI_STREAM_TAG],
+    "exclude_names": sorted(READ_ONLY_TOOLS),
+}
+
+
+def tag_ui_tools(tools: Iterable[Any]) -> List[Any]:
+    """
+    Tag tools for the UI stream allowlist (read-only tools are skipped).
+
+    Tools are module-level singletons, so this is idempotent and safe to call
+    from every tool package that re-exports them.
+    """
+    tools = list(tools)
+    for t in tools:
+        if getattr(t, "name", None) in READ_ONLY_TOOLS:
+            continue
+        tags = list(getattr(t, "tags", None) or [])
+        if UI_STREAM_TAG not in tags:
+            t.tags = tags + [UI_STREAM_TAG]
+    return tools
+
+
+def is_ui_event(event: Dict[str, Any], run_type: str = "") -> bool:
+    """
+    Python mirror of UI_EVENT_FILTERS (same include-any / exclude semantics
+    as astream_events), for tests and recorded-run benchmarks.
+
+    Args:
+        event: astream_events event dict (event, name, tags)
+        run_type: Run type ("chat_model", "tool", "chain", ...); derived from
+            the event name ("on_<type>_<stage>") when omitted
+    """
+    run_type = run_type or event.get("event", "").split("_", 1)[-1].rsplit("_", 1)[0]
+    name = event.get("name")
+    include = (
+        run_type in UI_EVENT_FILTERS["include_types"]
+        or name in UI_NODE_NAMES
+        or UI_STREAM_TAG in (event.get("tags") or [])
+    )
+    return include and name not in READ_ONLY_TOOLS
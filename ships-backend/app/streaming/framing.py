@@ -0,0 +1,300 @@
+"""
+Negotiated framing for run streams: compression, compact keys, msgpack.
+
+The canonical stream (what the replay ring stores and every subscriber
+reads) is NDJSON with long keys. How it goes over the wire is decided per
+response, from the request headers:
+
+- Accept-Encoding: zstd (if `zstandard` is installed) or gzip. Every event
+  is sync-flushed through the compressor, so nothing sits in a compression
+  buffer while the agent is thinking.
+- X-Stream-Options (comma separated):
+    compact             short keys (SHORT_KEYS), no whitespace
+    msgpack             msgpack frames with short keys (if `msgpack` is
+                        installed, else compact NDJSON). Also selected by
+                        Accept: application/x-msgpack
+    omit-final-content  block_end carries final_len instead of final_content
+                        when this client saw the block's start and every
+                        line since (no seq gap), i.e. it could rebuild the
+                        content from the deltas itself
+
+Compact and msgpack streams start with a stream:framing frame (long keys)
+carrying the key map. Plain NDJSON without compression is passed through
+untouched.
+
+Loopback clients (the Electron app) are not compressed unless
+STREAM_COMPRESS_LOCAL=1 - there is no egress to save there.
+"""
+
+import os
+import json
+import zlib
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, AsyncIterator, Mapping, Union
+
+logger = logging.getLogger("ships.streaming")
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STREAM_COMPRESSION = os.getenv("STREAM_COMPRESSION", "1") != "0"
+STREAM_COMPRESS_LOCAL = os.getenv("STREAM_COMPRESS_LOCAL", "0") == "1"
+STREAM_GZIP_LEVEL = int(os.getenv("STREAM_GZIP_LEVEL", "6"))
+STREAM_ZSTD_LEVEL = int(os.getenv("STREAM_ZSTD_LEVEL", "3"))
+
+# Formats
+NDJSON = "ndjson"
+COMPACT = "compact"
+MSGPACK = "msgpack"
+
+# Content encodings
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    COMPACT: "application/x-ndjson",
+    MSGPACK: "application/x-msgpack",
+}
+
+# Top-level keys shortened in compact / msgpack frames (values are untouched)
+SHORT_KEYS = {
+    "type": "t",
+    "id": "i",
+    "seq": "s",
+    "block_type": "bt",
+    "timestamp": "ts",
+    "content": "c",
+    "final_content": "fc",
+    "final_len": "fl",
+    "duration_ms": "d",
+    "title": "ti",
+    "metadata": "m",
+    "agent": "a",
+    "tool": "tl",
+    "file": "f",
+    "success": "ok",
+}
+
+_LOOPBACK = {"127.0.0.1", "::1", "localhost"}
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding -> {coding: q} (lower-cased, q defaults to 1)."""
+    codings: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+@dataclass
+class StreamFraming:
+    """Wire format chosen for one response."""
+
+    format: str = NDJSON
+    encoding: str = IDENTITY
+    omit_final_content: bool = False
+
+    @property
+    def is_plain(self) -> bool:
+        return self.format == NDJSON and self.encoding == IDENTITY and not self.omit_final_content
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    def response_headers(self) -> Dict[str, str]:
+        headers = {"Vary": "Accept-Encoding, Accept, X-Stream-Options"}
+        if self.encoding != IDENTITY:
+            headers["Content-Encoding"] = self.encoding
+        options = [o for o, on in ((self.format, self.format != NDJSON),
+                                   ("omit-final-content", self.omit_final_content)) if on]
+        if options:
+            headers["X-Stream-Options"] = ", ".join(options)
+        return headers
+
+    def stream(self, lines: AsyncIterator[str]) -> AsyncIterator[Union[str, bytes]]:
+        """Wrap a subscriber's NDJSON lines in this framing."""
+        if self.is_plain:
+            return lines
+        return _encode_stream(lines, StreamEncoder(self))
+
+
+def negotiate(headers: Mapping[str, str], client_host: Optional[str] = None) -> StreamFraming:
+    """
+    Pick the framing for a response from its request headers.
+
+    Args:
+        headers: Request headers (case-insensitive mapping, e.g. request.headers)
+        client_host: Peer address; loopback peers aren't compressed by default
+    """
+    options = {o.strip().lower() for o in (headers.get("x-stream-options") or "").split(",") if o.strip()}
+    wants_msgpack = MSGPACK in options or "application/x-msgpack" in (headers.get("accept") or "")
+
+    framing = StreamFraming(omit_final_content="omit-final-content" in options)
+    if wants_msgpack:
+        framing.format = MSGPACK if msgpack is not None else COMPACT
+    elif COMPACT in options:
+        framing.format = COMPACT
+
+    if STREAM_COMPRESSION and (STREAM_COMPRESS_LOCAL or client_host not in _LOOPBACK):
+        accepted = parse_accept_encoding(headers.get("accept-encoding"))
+        wildcard = accepted.get("*", 0.0)
+        if zstandard is not None and accepted.get(ZSTD, 0.0) > 0:
+            framing.encoding = ZSTD
+        elif accepted.get(GZIP, wildcard) > 0:
+            framing.encoding = GZIP
+    return framing
+
+
+class StreamEncoder:
+    """
+    Turns canonical NDJSON lines into wire frames for one response.
+
+    Stateful: tracks which blocks this client can rebuild (omit-final-content)
+    and owns the response's compressor.
+    """
+
+    def __init__(self, framing: StreamFraming):
+        self.framing = framing
+        self._reshape = framing.format != NDJSON or framing.omit_final_content
+        self._compressor = None
+        if framing.encoding == GZIP:
+            self._compressor = zlib.compressobj(STREAM_GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif framing.encoding == ZSTD:
+            self._compressor = zstandard.ZstdCompressor(level=STREAM_ZSTD_LEVEL).compressobj()
+
+        # Blocks whose start and every later line this client received
+        self._rebuildable = set()
+        self._last_seq: Optional[int] = None
+
+        # Metrics
+        self.lines = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.final_content_omitted = 0
+
+    def header(self) -> bytes:
+        """stream:framing frame (compact / msgpack only)."""
+        if self.framing.format == NDJSON:
+            return b""
+        return self._frame({"type": "stream:framing", "format": self.framing.format, "keys": SHORT_KEYS},
+                           shorten=False)
+
+    def encode(self, line: str) -> bytes:
+        """Encode one newline-terminated NDJSON line (may return b"" while buffering)."""
+        data = line.encode("utf-8")
+        self.lines += 1
+        self.bytes_in += len(data)
+        if not self._reshape:
+            return self._compress(data)
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return self._compress(data)
+        if self.framing.omit_final_content:
+            self._track(event)
+        return self._frame(event)
+
+    def close(self) -> bytes:
+        """Finish the compressed stream (gzip trailer / zstd end frame)."""
+        if self._compressor is None:
+            return b""
+        out = self._compressor.flush()
+        self._compressor = None
+        self.bytes_out += len(out)
+        return out
+
+    def _track(self, event: Dict[str, Any]) -> None:
+        seq = event.get("seq")
+        kind = event.get("type")
+        if (isinstance(seq, int) and self._last_seq is not None and seq != self._last_seq + 1) \
+                or kind in ("stream:gap", "stream:lagged"):
+            # Missed lines: deltas can't be trusted for any open block
+            self._rebuildable.clear()
+        if isinstance(seq, int):
+            self._last_seq = seq
+
+        if kind == "block_start":
+            self._rebuildable.add(event.get("id"))
+        elif kind == "block_end" and event.get("id") in self._rebuildable:
+            self._rebuildable.discard(event.get("id"))
+            final = event.pop("final_content", None)
+            if final is not None:
+                event["final_len"] = len(final)
+                self.final_content_omitted += 1
+
+    def _frame(self, event: Dict[str, Any], shorten: bool = True) -> bytes:
+        fmt = self.framing.format
+        if shorten and fmt != NDJSON:
+            event = {SHORT_KEYS.get(k, k): v for k, v in event.items()}
+        if fmt == MSGPACK:
+            data = msgpack.packb(event, use_bin_type=True)
+        else:
+            data = (json.dumps(event, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        return self._compress(data)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            self.bytes_out += len(data)
+            return data
+        if self.framing.encoding == GZIP:
+            out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            out = self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        self.bytes_out += len(out)
+        return out
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "format": self.framing.format,
+            "encoding": self.framing.encoding,
+            "lines": self.lines,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "final_content_omitted": self.final_content_omitted,
+        }
+
+
+async def _encode_stream(lines: AsyncIterator[str], encoder: StreamEncoder) -> AsyncIterator[bytes]:
+    try:
+        header = encoder.header()
+        if header:
+            yield header
+        async for line in lines:
+            frame = encoder.encode(line)
+            if frame:
+                yield frame
+        tail = encoder.close()
+        if tail:
+            yield tail
+        if encoder.bytes_in:
+            logger.info(
+                f"[FRAMING] 📦 {encoder.framing.format}/{encoder.framing.encoding}: "
+                f"{encoder.bytes_in} -> {encoder.bytes_out} bytes over {encoder.lines} lines "
+                f"({encoder.final_content_omitted} final_content omitted)"
+            )
+    finally:
+        # Closing the response must still detach the subscriber
+        aclose = getattr(lines, "aclose", None)
+        if aclose is not None:
+            await aclose()
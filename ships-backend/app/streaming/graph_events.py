@@ -0,0 +1,549 @@
+"""
+Graph event rendering: astream_events (v2) + UI bus events -> NDJSON lines.
+
+stream_pipeline used to do this inline, in one long `async for` loop that
+rebuilt its tool lists, action map and command list on every event,
+re-imported json in hot branches, parsed each tool output twice and built
+the planner narrative with repeated string +=.
+
+GraphEventRenderer keeps one run's rendering state (block manager, active
+agent, JSON detection) and dispatches through tables built once per process:
+
+- graph events:  _GRAPH_HANDLERS, event type -> handler
+- UI bus events: _UI_HANDLERS, emit_event type -> handler
+
+Every handler returns the lines to write (a shared empty tuple when there
+are none, which is what most token events produce).
+"""
+
+import json
+import time
+import logging
+from typing import Optional, Dict, Any, List, Sequence
+
+from app.streaming.stream_events import StreamBlockManager, BlockType
+from app.streaming.event_filter import READ_ONLY_TOOLS
+from app.streaming.json_stream import JsonStreamScanner, OBJECT as JSON_OBJECT, ERROR as JSON_ERROR
+from app.utils.run_context import RunContext
+
+logger = logging.getLogger("ships.streaming")
+
+_NO_LINES: Sequence[str] = ()
+
+# Tools that change something: shown as a command block when they start...
+ACTION_TOOLS = frozenset([
+    "write_files_batch", "write_file_to_disk", "apply_source_edits",
+    "delete_file_from_disk", "install_dependencies",
+    "create_directory", "scaffold_project",
+])
+# ...and whose result is shown when they end (terminal results always are)
+RESULT_TOOLS = ACTION_TOOLS | {"run_terminal_command"}
+
+# Terminal commands the user cares about (not builds/tests run while debugging)
+USER_FACING_COMMANDS = ("npm install", "npm run dev", "npm start", "pip install", "yarn install")
+
+# Conversational action descriptions for command blocks
+TOOL_ACTIONS = {
+    "write_files_batch": "Writing files",
+    "write_file_to_disk": "Creating file",
+    "apply_source_edits": "Editing code",
+    "delete_file_from_disk": "Deleting file",
+    "run_terminal_command": "Running command",
+    "install_dependencies": "Installing packages",
+    "create_directory": "Creating directory",
+    "scaffold_project": "Setting up project structure",
+}
+
+# Agent nodes that open a status block when they start
+NODE_BLOCKS = {
+    "planner": (BlockType.THINKING, "Planning your project..."),
+    "coder": (BlockType.CODE, "Implementing code..."),
+    "validator": (BlockType.TEXT, "Reviewing changes..."),
+    "fixer": (BlockType.TEXT, "Fixing issues..."),
+}
+
+# Internal routing nodes: their output is never shown
+INTERNAL_NODES = frozenset(["orchestrator", "IntentClassifier", "intent_classifier", "Orchestrator"])
+
+# Block types tokens stream into (anything else gets a fresh thinking block)
+STREAMING_BLOCK_TYPES = frozenset([BlockType.THINKING, BlockType.TEXT, BlockType.CODE, BlockType.PLAN])
+
+# emit_event file operations -> the tool the ToolProgress sidebar shows
+FILE_ACTION_TOOLS = {
+    "write": "write_file_to_disk",
+    "batch_write": "write_files_batch",
+    "edit": "apply_source_edits",
+    "patch": "write_file_to_disk",
+    "delete": "delete_file_from_disk",
+}
+
+_UNPARSED = object()
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _is_user_facing_terminal(tool_name: str, tool_input: Any) -> bool:
+    if tool_name != "run_terminal_command" or not isinstance(tool_input, dict):
+        return False
+    command = tool_input.get("command", "")
+    return any(cmd in command for cmd in USER_FACING_COMMANDS)
+
+
+def _tool_file(tool_input: Any) -> Optional[str]:
+    if isinstance(tool_input, dict):
+        return tool_input.get("file_path") or tool_input.get("filename")
+    return None
+
+
+def _chunk_text(content: Any) -> str:
+    """Text of a chat model chunk ([{"type": "text", "text": ...}] lists included)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        extracted = []
+        for part in content:
+            if isinstance(part, dict):
+                if part.get("type") == "text":
+                    extracted.append(part.get("text", ""))
+            elif isinstance(part, str):
+                extracted.append(part)
+        return "".join(extracted)
+    return str(content)
+
+
+def planner_narrative(output: Dict[str, Any]) -> str:
+    """Conversational presentation of the planner's structured output."""
+    reasoning = output.get("reasoning", "")
+    summary = output.get("summary", "")
+    tasks = output.get("tasks", [])
+    decision_notes = output.get("decision_notes", [])
+    folders = output.get("folders", [])
+    dependencies = output.get("dependencies", {})
+    risks = output.get("risks", [])
+
+    parts: List[str] = []
+
+    # 1. Summary (what we're building)
+    if summary:
+        parts.append(f"{summary}\n\n")
+
+    # 2. Reasoning (why/how) - but only if substantial
+    if reasoning and len(reasoning) > 200:
+        parts.append(f"**Design Approach:**\n{reasoning}\n\n")
+
+    # 3. Implementation plan (tasks)
+    if tasks:
+        parts.append(f"**Implementation Plan ({len(tasks)} tasks):**\n\n")
+        for i, task in enumerate(tasks[:5], 1):  # Show top 5
+            parts.append(f"{i}. **{task.get('title', 'Untitled')}** (_{task.get('complexity', 'medium')}_)\n")
+        if len(tasks) > 5:
+            parts.append(f"\n... and {len(tasks) - 5} more tasks\n")
+        parts.append("\n")
+
+    # 4. File structure (concise) - key files only (components, pages, main files)
+    if folders:
+        file_count = len(folders)
+        parts.append(f"**File Structure:** Creating {file_count} files\n\n")
+        key_files = [f for f in folders if any(x in f.get("path", "").lower()
+                     for x in ["component", "page", "app", "main", "index"])]
+        for folder in key_files[:5]:
+            path = folder.get("path", "")
+            if path:
+                parts.append(f"• `{path}`\n")
+        if file_count > 5:
+            parts.append(f"• ... and {file_count - 5} more files\n")
+        parts.append("\n")
+
+    # 5. Tech stack (dependencies) - very concise
+    runtime = dependencies.get("runtime", [])
+    if runtime:
+        main_deps = [pkg.get("name", pkg) if isinstance(pkg, dict) else pkg for pkg in runtime[:3]]
+        parts.append(f"**Tech Stack:** {', '.join(main_deps)}")
+        if len(runtime) > 3:
+            parts.append(f" +{len(runtime) - 3} more")
+        parts.append("\n\n")
+
+    # 6. Important decisions (top 3)
+    if decision_notes:
+        parts.append("**Key Decisions:**\n")
+        parts.extend(f"• {note}\n" for note in decision_notes[:3])
+        parts.append("\n")
+
+    # 7. Risks/warnings (top 2)
+    if risks:
+        parts.append("**⚠️ Considerations:**\n")
+        for risk in risks[:2]:
+            desc = risk.get("description", str(risk)) if isinstance(risk, dict) else risk
+            parts.append(f"• {desc}\n")
+        parts.append("\n")
+
+    return "".join(parts).strip()
+
+
+class GraphEventRenderer:
+    """
+    Renders one run's graph and UI events as NDJSON lines.
+
+    Usage:
+        renderer = GraphEventRenderer(block_mgr)
+        for line in renderer.render(event):        # astream_events v2 event
+            yield line
+        for line in renderer.render_ui_event(ui):  # emit_event dict
+            yield line
+    """
+
+    def __init__(self, block_mgr: Optional[StreamBlockManager] = None, run_context: Optional[RunContext] = None):
+        self.block_mgr = block_mgr or StreamBlockManager()
+        self.run_context = run_context
+        self.current_agent: Optional[str] = None  # Which agent is active
+        self.json_scanner = JsonStreamScanner()  # Incremental JSON detector (O(chunk) per token)
+        self.in_json_stream = False  # Are we currently streaming JSON?
+        self.json_source_agent: Optional[str] = None  # Which agent is producing the JSON
+
+        # Bound once per run; the tables themselves are built once per process
+        self._graph_dispatch = {kind: getattr(self, name) for kind, name in _GRAPH_HANDLERS.items()}
+        self._ui_dispatch = {kind: getattr(self, name) for kind, name in _UI_HANDLERS.items()}
+
+        # Metrics
+        self.events = 0
+        self.unhandled = 0
+
+    def render(self, event: Dict[str, Any]) -> Sequence[str]:
+        """Lines for one astream_events v2 event."""
+        self.events += 1
+        handler = self._graph_dispatch.get(event["event"])
+        if handler is None:
+            self.unhandled += 1
+            return _NO_LINES
+        return handler(event.get("name", "unknown"), event.get("data", {}))
+
+    def render_ui_event(self, custom_event: Dict[str, Any]) -> Sequence[str]:
+        """Lines for one agent UI event (from emit_event / the event bus)."""
+        event_type = custom_event.get("type", "")
+        handler = self._ui_dispatch.get(event_type)
+        if handler is None:
+            # Unknown events → log but don't spam UI
+            logger.debug(f"[PIPELINE] Unknown event type: {event_type} from {custom_event.get('agent', '')}")
+            return _NO_LINES
+        return handler(
+            event_type,
+            custom_event.get("agent", ""),
+            custom_event.get("content", ""),
+            custom_event.get("metadata", {}),
+        )
+
+    # ------------------------------------------------------------------
+    # Graph events
+    # ------------------------------------------------------------------
+
+    def _on_chat_model_stream(self, name: str, data: Dict[str, Any]) -> Sequence[str]:
+        """Token streaming."""
+        chunk = data.get("chunk")
+        content = getattr(chunk, "content", None) if chunk else None
+        if not content:
+            return _NO_LINES
+        if not isinstance(content, str):
+            content = _chunk_text(content)
+
+        # JSON streaming (structured output) - buffered, never streamed raw
+        if not self.in_json_stream and "{" in content:
+            self.in_json_stream = True
+            self.json_scanner.reset()
+            self.json_source_agent = self.current_agent
+            logger.info(f"[PIPELINE] Started JSON buffering for {self.current_agent}")
+        if self.in_json_stream:
+            return self._feed_json(content)
+
+        # Internal markers (IntentClassifier - shouldn't happen with disabled callbacks)
+        if "__INTENT_RESULT__:" in content:
+            return _NO_LINES
+
+        active = self.block_mgr.active_block
+        if active and active.type in STREAMING_BLOCK_TYPES:
+            # Hot path: most tokens are buffered by delta coalescing (no line)
+            delta = self.block_mgr.append_delta(content)
+            return (delta + "\n",) if delta else _NO_LINES
+
+        lines = [self.block_mgr.start_block(BlockType.THINKING, "Thinking...") + "\n"]
+        delta = self.block_mgr.append_delta(content)
+        if delta:
+            lines.append(delta + "\n")
+        return lines
+
+    def _feed_json(self, content: str) -> Sequence[str]:
+        lines = []
+        for json_event in self.json_scanner.feed(content):
+            if json_event.kind not in (JSON_OBJECT, JSON_ERROR):
+                continue
+
+            if json_event.kind == JSON_ERROR:
+                logger.error(f"[PIPELINE] Failed to parse JSON\nBuffer: {json_event.value[:200]}")
+            else:
+                logger.info(f"[PIPELINE] JSON complete for {self.json_source_agent}, parsing...")
+                parsed = json_event.value
+
+                # IntentClassifier output - show description
+                if self.json_source_agent == "orchestrator" and isinstance(parsed, dict):
+                    description = parsed.get("description", "")
+                    if description:
+                        lines.append(self.block_mgr.create_block(BlockType.TEXT, "Understanding", description) + "\n")
+                    logger.info("[PIPELINE] Displayed IntentClassifier description")
+
+            self.in_json_stream = False
+            self.json_source_agent = None
+            break
+        return lines
+
+    def _on_tool_start(self, name: str, data: Dict[str, Any]) -> Sequence[str]:
+        """Tool execution - only actions that change something get a block."""
+        lines = []
+        # Close any active thinking/text block before showing tool
+        end_block = self.block_mgr.end_current_block()
+        if end_block:
+            lines.append(end_block + "\n")
+
+        tool_input = data.get("input", {})
+        if name in ACTION_TOOLS or _is_user_facing_terminal(name, tool_input):
+            lines.append(self.block_mgr.start_block(BlockType.COMMAND, TOOL_ACTIONS.get(name, name)) + "\n")
+
+        # ToolProgress sidebar (read-only tools are already excluded at the
+        # source; kept as a guard for untagged callers)
+        if name not in READ_ONLY_TOOLS:
+            lines.append(json.dumps({
+                "type": "tool_start",
+                "tool": name,
+                "file": _tool_file(tool_input),
+                "timestamp": _now_ms(),
+            }) + "\n")
+        return lines
+
+    def _on_tool_end(self, name: str, data: Dict[str, Any]) -> Sequence[str]:
+        lines = []
+        output = data.get("output", "")
+        # Actual content of ToolMessage/AIMessage outputs
+        output_content = output.content if hasattr(output, "content") else output
+        tool_input = data.get("input", {})
+
+        # Parsed once, shared by the result block and the sidebar entry
+        parsed = _UNPARSED
+        if isinstance(output_content, str):
+            try:
+                parsed = json.loads(output_content)
+            except Exception:
+                pass
+
+        if name in RESULT_TOOLS or _is_user_facing_terminal(name, tool_input):
+            formatted_output = None
+            if parsed is _UNPARSED:
+                if isinstance(output_content, str):
+                    formatted_output = "✓ Complete"
+            elif isinstance(parsed, dict):
+                if parsed.get("success"):
+                    # Concise success messages
+                    if "message" in parsed:
+                        formatted_output = f"✓ {parsed['message']}"
+                    elif name == "write_files_batch":
+                        formatted_output = f"✓ Created {parsed.get('files_written', parsed.get('count', 0))} files"
+                    else:
+                        formatted_output = "✓ Done"
+                else:
+                    formatted_output = f"✗ {parsed.get('error', 'Failed')}"
+
+            end_block = self.block_mgr.end_current_block()
+            if end_block:
+                lines.append(end_block + "\n")
+            if formatted_output:
+                lines.append(self.block_mgr.create_block(BlockType.CMD_OUTPUT, "", formatted_output) + "\n")
+
+        if name not in READ_ONLY_TOOLS:
+            success = True
+            if isinstance(parsed, dict):
+                success = parsed.get("success", True)
+            elif not isinstance(output_content, str) and isinstance(output, dict):
+                success = output.get("success", True)
+            lines.append(json.dumps({
+                "type": "tool_result",
+                "tool": name,
+                "file": _tool_file(tool_input),
+                "success": success,
+                "timestamp": _now_ms(),
+            }) + "\n")
+        return lines
+
+    def _on_chain_start(self, name: str, data: Dict[str, Any]) -> Sequence[str]:
+        """Node transitions - conversational status for the main agents."""
+        self.current_agent = name
+        block = NODE_BLOCKS.get(name)
+        if block is None:
+            return _NO_LINES  # Orchestrator and IntentClassifier are silent (internal routing)
+        return (self.block_mgr.start_block(*block) + "\n",)
+
+    def _on_chain_end(self, name: str, data: Dict[str, Any]) -> Sequence[str]:
+        # Reset current_agent when a chain finishes (so next agent can stream)
+        if name == self.current_agent:
+            self.current_agent = None
+
+        # Routing metadata, not user-facing
+        if name in INTERNAL_NODES:
+            logger.debug(f"[PIPELINE] Filtered internal event: {name}")
+            return _NO_LINES
+
+        output = data.get("output", {})
+        if not isinstance(output, dict):
+            return _NO_LINES
+
+        # Coder/validator/fixer complete silently (their work shows through tool
+        # calls and UI events); the planner's structured output is presented
+        lines = _NO_LINES
+        if name == "planner":
+            lines = (self.block_mgr.create_block(BlockType.TEXT, "Plan", planner_narrative(output)) + "\n",)
+
+        new_path = output.get("artifacts", {}).get("project_path")
+        if new_path:
+            self._sync_project_path(new_path)
+        return lines
+
+    def _sync_project_path(self, new_path: str) -> None:
+        """
+        A node moved the project (e.g. scaffolding): update this run's context.
+        
+        The preview (Frontend Deep Linking) follows only if it was showing this
+        run's project - never another run's.
+        """
+        old_path = self.run_context.project_root if self.run_context else None
+        if old_path == new_path:
+            return
+        if self.run_context is not None:
+            self.run_context.project_root = new_path
+            logger.info(f"[PIPELINE] 🔄 Run project root moved to: {new_path}")
+
+        from app.services.preview_manager import preview_manager
+        if preview_manager.current_project_path in (None, old_path):
+            preview_manager.current_project_path = new_path
+            logger.info(f"[PIPELINE] 🔄 Synced preview_manager path to: {new_path}")
+
+    # ------------------------------------------------------------------
+    # UI bus events (emit_event)
+    # ------------------------------------------------------------------
+
+    def _on_file_event(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        """File operations → ToolProgress component."""
+        tool_name = FILE_ACTION_TOOLS.get(metadata.get("action", "write"), "write_file_to_disk")
+        return (json.dumps({
+            "type": "tool_result",
+            "tool": tool_name,
+            "file": content_text,  # file path
+            "success": True,
+        }) + "\n",)
+
+    def _on_thinking(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        """Thinking/reasoning → rich thinking block with task context."""
+        title = f"{agent.capitalize()}: {content_text[:50]}..." if len(content_text) > 50 else f"{agent.capitalize()}: Analyzing"
+
+        thinking_content = [content_text]
+
+        if metadata.get("task_title"):
+            thinking_content.insert(0, f"**Task:** {metadata['task_title']}\n")
+
+        if metadata.get("task_description"):
+            desc = metadata["task_description"][:150]
+            if len(metadata.get("task_description", "")) > 150:
+                desc += "..."
+            thinking_content.insert(1, f"**Description:** {desc}\n")
+
+        if metadata.get("expected_files"):
+            files = metadata["expected_files"][:3]
+            thinking_content.append(f"\n\n**Expected Files:** {', '.join(files)}")
+            if metadata.get("files_expected", 0) > 3:
+                thinking_content.append(f" (+{metadata['files_expected'] - 3} more)")
+
+        if metadata.get("acceptance_criteria"):
+            thinking_content.append("\n\n**Success Criteria:**")
+            for criterion in metadata["acceptance_criteria"][:3]:
+                thinking_content.append(f"\n- {criterion}")
+
+        full_content = "\n".join(str(c) for c in thinking_content)
+        return (self.block_mgr.create_block(BlockType.THINKING, title, full_content) + "\n",)
+
+    def _on_agent_status(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        """Status updates → activity indicator."""
+        return (json.dumps({
+            "type": "activity",
+            "agent": agent,
+            "message": content_text,
+            "metadata": metadata,
+        }) + "\n",)
+
+    def _on_plan_created(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        task_count = metadata.get("task_count", 0)
+        task_titles = metadata.get("task_titles", [])
+        files_to_create = metadata.get("files_to_create", [])
+        total_files = metadata.get("total_files", len(files_to_create))
+
+        summary_parts = [f"Created implementation plan with {task_count} task{'s' if task_count != 1 else ''}"]
+
+        if task_titles:
+            summary_parts.append("\n\n**Tasks:**")
+            for i, title in enumerate(task_titles, 1):
+                summary_parts.append(f"\n{i}. {title}")
+            if task_count > len(task_titles):
+                summary_parts.append(f"\n... and {task_count - len(task_titles)} more")
+
+        if files_to_create:
+            summary_parts.append("\n\n**Files to Create:**")
+            for f in files_to_create[:5]:  # Show first 5
+                summary_parts.append(f"\n- {f}")
+            if total_files > 5:
+                summary_parts.append(f"\n- ... and {total_files - 5} more files")
+
+        return (self.block_mgr.create_block(BlockType.PLAN, "✓ Plan Ready", "".join(summary_parts)) + "\n",)
+
+    def _on_validation_complete(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        if metadata.get("passed", False):
+            return (self.block_mgr.create_block(BlockType.PREFLIGHT, "✓ Validation Passed", content_text) + "\n",)
+
+        error_parts = [
+            content_text,
+            f"\n\n**Failed at:** {metadata.get('layer', 'unknown').upper()} layer",
+            f"\n**Violations:** {metadata.get('violation_count', 0)}",
+        ]
+        if metadata.get("violations"):
+            error_parts.append("\n\n**Issues Found:**")
+            for v in metadata["violations"][:5]:  # First 5 violations
+                if isinstance(v, dict):
+                    error_parts.append(f"\n- {v.get('message', v.get('type', 'Violation'))}")
+                else:
+                    error_parts.append(f"\n- {v}")
+
+        return (self.block_mgr.create_block(BlockType.ERROR, "✗ Validation Failed", "".join(error_parts)) + "\n",)
+
+    def _on_error(self, event_type: str, agent: str, content_text: str, metadata: Dict[str, Any]) -> Sequence[str]:
+        return (self.block_mgr.create_block(BlockType.ERROR, f"{agent.capitalize()}: Error", content_text) + "\n",)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"events": self.events, "unhandled": self.unhandled}
+
+
+# Dispatch tables (event type -> GraphEventRenderer method), built once
+_GRAPH_HANDLERS = {
+    "on_chat_model_stream": "_on_chat_model_stream",
+    "on_tool_start": "_on_tool_start",
+    "on_tool_end": "_on_tool_end",
+    "on_chain_start": "_on_chain_start",
+    "on_chain_end": "_on_chain_end",
+}
+
+_UI_HANDLERS = {
+    "file_written": "_on_file_event",
+    "file_deleted": "_on_file_event",
+    "fix_applied": "_on_file_event",
+    "thinking": "_on_thinking",
+    "reasoning": "_on_thinking",
+    "agent_start": "_on_agent_status",
+    "agent_complete": "_on_agent_status",
+    "plan_created": "_on_plan_created",
+    "validation_complete": "_on_validation_complete",
+    "error": "_on_error",
+}
@@ -0,0 +1,209 @@
+"""
+Incremental JSON scanner for streamed LLM output.
+
+Structured agent outputs (intent JSON, 50-100 KB planner plans) arrive as
+thousands of small chunks. Re-counting braces or re-running regexes over a
+growing buffer on every token is quadratic; this scanner keeps its state
+(nesting, string / escape, current key) between chunks so each chunk costs
+O(len(chunk)).
+
+feed() returns events as they happen:
+- "start":       a top-level object opened
+- "value_delta": decoded text of a captured key's string value, as it streams
+- "value":       a captured key's string value closed (full decoded value)
+- "object":      a top-level object closed (parsed value)
+- "error":       a top-level object closed but did not parse (raw text)
+
+Text outside top-level objects (prose, ``` fences) is ignored.
+"""
+
+import re
+import json
+from typing import Optional, List, NamedTuple, Any, Iterable
+
+START = "start"
+VALUE_DELTA = "value_delta"
+VALUE = "value"
+OBJECT = "object"
+ERROR = "error"
+
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_STOP = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStreamEvent(NamedTuple):
+    kind: str
+    key: Optional[str] = None
+    value: Any = None
+
+
+class JsonStreamScanner:
+    """
+    Stateful, chunk-at-a-time JSON scanner.
+
+    Args:
+        capture_keys: Object keys whose string values are streamed as
+            value_delta / value events (at any nesting depth)
+        collect_objects: Keep top-level object text and emit parsed
+            "object" events (set False when only values are needed)
+    """
+
+    def __init__(self, capture_keys: Optional[Iterable[str]] = None, collect_objects: bool = True):
+        self.capture_keys = frozenset(capture_keys or ())
+        self.collect_objects = collect_objects
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget any partial object (e.g. when the source agent changes)."""
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._capturing = False
+        self._key_parts: List[str] = []
+        self._value_parts: List[str] = []
+        self._escape: Optional[str] = None  # None | "" (after \) | "u...." (collecting hex)
+        self._high_surrogate: Optional[str] = None
+        self._object_parts: List[str] = []
+
+    @property
+    def depth(self) -> int:
+        return len(self._stack)
+
+    @property
+    def in_object(self) -> bool:
+        return bool(self._stack)
+
+    def feed(self, chunk: str) -> List[JsonStreamEvent]:
+        """Scan one chunk and return the events it completes."""
+        events: List[JsonStreamEvent] = []
+        pos = 0
+        end = len(chunk)
+        segment_start = 0 if self._stack else None
+
+        while pos < end:
+            if self._in_string:
+                pos = self._scan_string(chunk, pos, events)
+                continue
+
+            if not self._stack:
+                brace = chunk.find("{", pos)
+                if brace < 0:
+                    break
+                self._stack.append("{")
+                self._expect_key = True
+                self._last_key = None
+                self._object_parts = []
+                segment_start = brace
+                events.append(JsonStreamEvent(START))
+                pos = brace + 1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                break
+            ch = match.group(0)
+            pos = match.end()
+
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = self._expect_key and self._stack[-1] == "{"
+                self._capturing = (
+                    not self._string_is_key
+                    and self._stack[-1] == "{"
+                    and self._last_key in self.capture_keys
+                )
+                self._key_parts = []
+                self._value_parts = []
+            elif ch == "{" or ch == "[":
+                self._stack.append(ch)
+                self._expect_key = ch == "{"
+            elif ch == "}" or ch == "]":
+                self._stack.pop()
+                self._expect_key = False
+                if not self._stack:
+                    if self.collect_objects:
+                        self._object_parts.append(chunk[segment_start:pos])
+                        events.append(self._finish_object())
+                    segment_start = None
+            elif ch == ",":
+                self._expect_key = self._stack[-1] == "{"
+            else:  # ":"
+                self._expect_key = False
+
+        if self._stack and self.collect_objects and segment_start is not None:
+            self._object_parts.append(chunk[segment_start:])
+        return events
+
+    def _scan_string(self, chunk: str, pos: int, events: List[JsonStreamEvent]) -> int:
+        """Consume string content from pos; returns the new position."""
+        if self._escape is not None:
+            return self._scan_escape(chunk, pos, events)
+
+        match = _STRING_STOP.search(chunk, pos)
+        stop = match.start() if match else len(chunk)
+        if stop > pos:
+            self._string_text(chunk[pos:stop], events)
+        if match is None:
+            return stop
+
+        if match.group(0) == "\\":
+            self._escape = ""
+            return stop + 1
+
+        # Closing quote
+        self._in_string = False
+        if self._string_is_key:
+            self._last_key = "".join(self._key_parts)
+            self._expect_key = False
+        elif self._capturing:
+            events.append(JsonStreamEvent(VALUE, self._last_key, "".join(self._value_parts)))
+            self._capturing = False
+        return stop + 1
+
+    def _scan_escape(self, chunk: str, pos: int, events: List[JsonStreamEvent]) -> int:
+        if self._escape == "":
+            ch = chunk[pos]
+            if ch == "u":
+                self._escape = "u"
+            else:
+                self._escape = None
+                self._string_text(_ESCAPES.get(ch, ch), events)
+            return pos + 1
+
+        # Collecting \uXXXX hex digits
+        need = 5 - len(self._escape)
+        self._escape += chunk[pos:pos + need]
+        pos += min(need, len(chunk) - pos)
+        if len(self._escape) < 5:
+            return pos
+
+        code = int(self._escape[1:], 16) if all(c in "0123456789abcdefABCDEF" for c in self._escape[1:]) else 0xFFFD
+        self._escape = None
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = chr(code)
+            return pos
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate:
+            text = (self._high_surrogate + chr(code)).encode("utf-16", "surrogatepass").decode("utf-16")
+        else:
+            text = chr(code)
+        self._high_surrogate = None
+        self._string_text(text, events)
+        return pos
+
+    def _string_text(self, text: str, events: List[JsonStreamEvent]) -> None:
+        if self._string_is_key:
+            self._key_parts.append(text)
+        elif self._capturing:
+            self._value_parts.append(text)
+            events.append(JsonStreamEvent(VALUE_DELTA, self._last_key, text))
+
+    def _finish_object(self) -> JsonStreamEvent:
+        raw = "".join(self._object_parts)
+        self._object_parts = []
+        try:
+            return JsonStreamEvent(OBJECT, None, json.loads(raw))
+        except ValueError:
+            return JsonStreamEvent(ERROR, None, raw)
@@ -1,18 +1,142 @@
-from typing import Optional, Dict, Any, AsyncGenerator
+from typing import Optional, AsyncGenerator
+import asyncio
+import json
+import time
 import logging
-from uuid import UUID
+from uuid import UUID, uuid4
 from langchain_core.messages import HumanMessage
 
-from app.graphs.agent_graph import create_agent_graph, get_checkpointer
+from app.graphs.agent_graph import get_checkpointer
+from app.graphs.graph_registry import graph_registry
 from app.streaming.stream_events import StreamBlockManager, BlockType
+from app.streaming.event_bus import event_bus
+from app.streaming.event_filter import UI_EVENT_FILTERS
+from app.streaming.graph_events import GraphEventRenderer
 from app.database import get_session_factory
 from sqlalchemy import select
 from app.models import User
 from app.utils.debounced_logger import DebouncedLogger
+from app.streaming.run_setup import RunSetup, bind_run_setup, TRACKING, GRAPH, WORKSPACE
+from app.streaming.bounded_queue import StreamQueue, COALESCE
+from app.utils.cancellation import CancelToken, bind_cancel_token, current_cancel_token, cancel_registry
+from app.utils.run_context import RunContext, bind_run_context, RUN_CONTEXT_KEY
+from app.services.token_accounting import RunUsage, UsageCallbackHandler
 
 logger = logging.getLogger("ships.streaming")
 debounced_log = DebouncedLogger(logger, debounce_seconds=2.0)
 
+# Markers for graph items on the merged stream queue (UI events are plain dicts)
+_GRAPH_EVENT = "graph"
+_GRAPH_DONE = "done"
+_GRAPH_ERROR = "error"
+_SETUP = "setup"  # run:setup phase finished in the background
+
+# UI events the merged queue may shed when the renderer falls behind
+# (activity indicator only - everything else is rendered as a block)
+_LOW_PRIORITY_UI_EVENTS = {"agent_start", "agent_complete"}
+
+
+def _coalesce_tokens(queued, item):
+    """
+    Merge a token chunk into the newest queued one (same model call only).
+    
+    Used by the merged queue when it is full, so a long model stream under a
+    slow renderer turns into fewer, larger chunks instead of unbounded memory.
+    """
+    if isinstance(queued, dict) or isinstance(item, dict):
+        return None
+    if queued[0] != _GRAPH_EVENT or item[0] != _GRAPH_EVENT:
+        return None
+    first, second = queued[1], item[1]
+    if first["event"] != "on_chat_model_stream" or second["event"] != "on_chat_model_stream" \
+            or first.get("run_id") != second.get("run_id"):
+        return None
+    a, b = first.get("data", {}).get("chunk"), second.get("data", {}).get("chunk")
+    if not isinstance(getattr(a, "content", None), str) or not isinstance(getattr(b, "content", None), str):
+        return None
+    try:
+        merged_chunk = a + b
+    except Exception:
+        return None
+    return (_GRAPH_EVENT, {**first, "data": {**first["data"], "chunk": merged_chunk}})
+
+
+def _is_low_priority(item) -> bool:
+    return isinstance(item, dict) and item.get("type") in _LOW_PRIORITY_UI_EVENTS
+
+
+async def _pump_graph_events(graph, initial_state, config, bus_key: str, merged: StreamQueue,
+                             cancel_token: CancelToken, setup: RunSetup, run_context: RunContext) -> None:
+    """
+    Drive the graph and push its events onto the merged stream queue.
+    
+    Runs in its own task, so binding the event bus, cancel token, run setup
+    and run context here scopes emit_event() calls, cancellation checks,
+    await_workspace() and get_project_root() from every node (and the tasks
+    and tool threads LangGraph spawns) to this run only.
+    
+    put() waits while the merged queue is full, so a renderer that falls
+    behind holds the graph back instead of buffering its events.
+    """
+    event_bus.bind(bus_key)
+    bind_cancel_token(cancel_token)
+    bind_run_setup(setup)
+    bind_run_context(run_context)
+    try:
+        # Only the event kinds the UI renders are materialized (see event_filter.py)
+        async for event in graph.astream_events(initial_state, config=config, version="v2", **UI_EVENT_FILTERS):
+            await merged.put((_GRAPH_EVENT, event))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        merged.put_nowait((_GRAPH_ERROR, e))
+        return
+    merged.put_nowait((_GRAPH_DONE, None))
+
+async def _start_tracking(user_id, project_path: str, user_request: str) -> Optional[UUID]:
+    """Setup phase: create the AgentRun row for step tracking (None if unavailable)."""
+    try:
+        from app.services.step_tracking import start_run
+        run_id = await start_run(
+            user_id=UUID(user_id) if isinstance(user_id, str) else user_id,
+            project_path=project_path,
+            user_request=user_request[:500]
+        )
+        if run_id:
+            logger.info(f"[PIPELINE] 📊 Step tracking started: run_id={run_id}")
+        return run_id
+    except Exception as e:
+        logger.debug(f"[PIPELINE] Step tracking unavailable: {e}")
+        return None
+
+
+async def _load_graph():
+    """Setup phase: graph compiled once per process, checkpointer bound per run."""
+    checkpointer = await get_checkpointer()
+    return graph_registry.get_graph(checkpointer)
+
+
+def _isolate_git_branch(project_path: str, run_id: Optional[UUID]) -> bool:
+    """Setup phase (worker thread): run on its own git branch (Production Hardening)."""
+    try:
+        from app.services.git_checkpointer import get_checkpointer as get_git_service
+        
+        # Use run_id for branch name (or timestamp if missing)
+        branch_id = str(run_id) if run_id else f"dev-{int(time.time())}"
+        # Shorten UUID for readability
+        short_id = branch_id[:8] if "-" in branch_id else branch_id
+        branch_name = f"ships/run/{short_id}"
+        
+        git_service = get_git_service(project_path, str(run_id))
+        if git_service.create_and_checkout_branch(branch_name):
+            logger.info(f"[PIPELINE] 🌿 Isolated run in git branch: {branch_name}")
+            return True
+        logger.warning(f"[PIPELINE] ⚠️ Failed to isolate branch {branch_name} - using current branch")
+    except Exception as git_err:
+        logger.error(f"[PIPELINE] ❌ Git branch error: {git_err}")
+    return False
+
+
 async def stream_pipeline(
     user_request: str,
     thread_id: str = "default",
@@ -24,7 +148,10 @@ async def stream_pipeline(
     """
     Stream the full agent pipeline with token-by-token streaming.
     
-    Refactored from agent_graph.py to use astream_events (v1).
+    Refactored from agent_graph.py to use astream_events (v2, filtered at
+    the source to the events the UI renders - see event_filter.py). Events
+    are rendered by a GraphEventRenderer (see graph_events.py); this loop
+    only merges, orders and flushes.
     """
     
     logger.info("=" * 60)
@@ -32,49 +159,25 @@ async def stream_pipeline(
     logger.info(f"[PIPELINE] Project path: {project_path or 'Not set'}")
     logger.info("=" * 60)
     
-    # 1. Step Tracking (Optional)
-    run_id = None
-    if user_id and project_path:
-        try:
-            from app.services.step_tracking import start_run
-            run_id = await start_run(
-                user_id=UUID(user_id) if isinstance(user_id, str) else user_id,
-                project_path=project_path,
-                user_request=user_request[:500]
-            )
-            if run_id:
-                logger.info(f"[PIPELINE] 📊 Step tracking started: run_id={run_id}")
-        except Exception as e:
+    # Streaming-first startup: acknowledge now, set up concurrently (see run_setup.py)
+    setup = RunSetup()
+    yield json.dumps({"type": "run:accepted", "timestamp": int(time.time() * 1000)}) + "\n"
     
-            if run_id:
-                logger.info(f"[PIPELINE] 📊 Step tracking started: run_id={run_id}")
-        except Exception as e:
-            logger.debug(f"[PIPELINE] Step tracking unavailable: {e}")
-
-    # 1.5. GIT BRANCH ISOLATION (Production Hardening)
-    if project_path:
-        try:
-            from app.services.git_checkpointer import get_checkpointer as get_git_service
-            
-            # Use run_id for branch name (or timestamp if missing)
-            import time
-            branch_id = str(run_id) if run_id else f"dev-{int(time.time())}"
-            # Shorten UUID for readability
-            short_id = branch_id[:8] if "-" in branch_id else branch_id
-            branch_name = f"ships/run/{short_id}"
-            
-            git_service = get_git_service(project_path, str(run_id))
-            if git_service.create_and_checkout_branch(branch_name):
-                logger.info(f"[PIPELINE] 🌿 Isolated run in git branch: {branch_name}")
-            else:
-                logger.warning(f"[PIPELINE] ⚠️ Failed to isolate branch {branch_name} - using current branch")
-                
-        except Exception as git_err:
-            logger.error(f"[PIPELINE] ❌ Git branch error: {git_err}")
-
-    # 2. Setup Graph
-    checkpointer = get_checkpointer()
-    graph = create_agent_graph(checkpointer)
+    # 1. Step tracking (optional) + graph (compiled once per process, checkpointer
+    #    bound per run), concurrently - both are needed to start the graph
+    pending = {setup.start(GRAPH, _load_graph())}
+    if user_id and project_path:
+        pending.add(setup.start(TRACKING, _start_tracking(user_id, project_path, user_request)))
+    try:
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for phase in setup.drain():
+                yield json.dumps(phase) + "\n"
+        graph = await setup.wait(GRAPH)
+        run_id = await setup.wait(TRACKING)
+    except BaseException:
+        setup.cancel()
+        raise
     
     human_msg = HumanMessage(content=user_request)
     
@@ -105,11 +208,24 @@ async def stream_pipeline(
         "agent_status": {},
         "current_step": 0,
         "fix_request": None,
-        "stream_events": []
     }
     
+    # Project, run and user of this run - what tools resolve paths against
+    # (see app/utils/run_context.py; there is no process-global fallback)
+    run_context = RunContext(
+        run_id=str(run_id) if run_id else None,
+        user_id=user_id,
+        project_root=project_path,
+        thread_id=thread_id,
+        settings=settings or {},
+        usage=RunUsage(),
+    )
+    
+    # Tokens / latency / cost of every model call, per node (token_accounting.py)
+    usage_handler = UsageCallbackHandler(run_context.usage)
     config = {
-        "configurable": {"thread_id": thread_id},
+        "configurable": {"thread_id": thread_id, RUN_CONTEXT_KEY: run_context},
+        "callbacks": [usage_handler],
         "run_name": f"ShipS* Pipeline: {user_request[:50]}...",
         "metadata": {
             "project_path": project_path,
@@ -118,522 +234,121 @@ async def stream_pipeline(
         "recursion_limit": 100,
     }
     
+    # Live UI event side-channel for this run (see app/streaming/event_bus.py)
+    bus_key = str(run_id) if run_id else f"{thread_id}:{uuid4().hex[:8]}"
+    # Bounded: full -> merge token chunks, shed activity events, then hold the graph
+    merged = StreamQueue(policy=COALESCE, coalesce=_coalesce_tokens, droppable=_is_low_priority,
+                         name=f"pipeline:{bus_key}")
+    event_bus.subscribe(bus_key, queue=merged)
+    # The broker's token when run under it, so its cancel reaches our tools
+    cancel_token = current_cancel_token() or CancelToken(bus_key)
+    if run_id:
+        cancel_registry.register(str(run_id), cancel_token)  # POST /api/runs/{id}/cancel
+    
+    # 2. Git branch isolation, off the critical path: nodes that write to the
+    #    project await_workspace() first; completion is reported in-stream
+    setup.on_phase = lambda phase: merged.put_nowait((_SETUP, phase))
+    if project_path:
+        setup.start(WORKSPACE, asyncio.to_thread(_isolate_git_branch, project_path, run_id))
+    pump = None
+    getter = None
+    
     block_mgr = StreamBlockManager()
-    current_agent = None  # Track which agent is active
-    json_buffer = ""  # Buffer for accumulating JSON tokens
-    in_json_stream = False  # Are we currently streaming JSON?
-    json_source_agent = None  # Which agent is producing the JSON
+    renderer = GraphEventRenderer(block_mgr, run_context=run_context)
     
     try:
         logger.info(f"[STREAM] 🚀 Starting graph.astream_events() with thread_id={thread_id}")
         
-        # Use astream_events v1 for token streaming
-        async for event in graph.astream_events(initial_state, config=config, version="v1"):
-            event_type = event["event"]
-            event_name = event.get("name", "unknown")
-            event_data = event.get("data", {})
-            
-            # 1. TOKEN STREAMING
-            if event_type == "on_chat_model_stream":
-                chunk = event_data.get("chunk")
-                if chunk and hasattr(chunk, "content"):
-                    content = chunk.content
-                    if content:
-                        # Parsing Logic for Complex Chunks (Lists/Dicts)
-                        if isinstance(content, list):
-                            # Handle [{"type": "text", "text": "..."}] format
-                            extracted = []
-                            for item in content:
-                                if isinstance(item, dict):
-                                    if item.get("type") == "text":
-                                        extracted.append(item.get("text", ""))
-                                elif isinstance(item, str):
-                                    extracted.append(item)
-                            content = "".join(extracted)
-                        elif not isinstance(content, str):
-                            content = str(content)
-                        
-                        # DETECT JSON STREAMING - look for opening brace anywhere in content
-                        if not in_json_stream:
-                            # Check if this chunk contains JSON start
-                            stripped = content.strip()
-                            if stripped and (stripped.startswith('{') or '{' in content):
-                                in_json_stream = True
-                                json_buffer = content
-                                json_source_agent = current_agent
-                                logger.info(f"[PIPELINE] Started JSON buffering for {current_agent}")
-                                continue
-                        
-                        if in_json_stream:
-                            json_buffer += content
-                            
-                            # Check if JSON is complete (balanced braces)
-                            open_count = json_buffer.count('{')
-                            close_count = json_buffer.count('}')
-                            
-                            if open_count > 0 and open_count == close_count:
-                                logger.info(f"[PIPELINE] JSON complete for {json_source_agent}, parsing...")
-                                # Parse and display meaningful parts
-                                try:
-                                    import json as json_mod
-                                    parsed = json_mod.loads(json_buffer.strip())
-                                    
-                                    # IntentClassifier output - show description
-                                    if json_source_agent == "orchestrator" and isinstance(parsed, dict):
-                                        description = parsed.get("description", "")
-                                        if description:
-                                            yield block_mgr.create_block(BlockType.TEXT, "Understanding", description) + "\n"
-                                        logger.info(f"[PIPELINE] Displayed IntentClassifier description")
-                                    
-                                except Exception as e:
-                                    logger.error(f"[PIPELINE] Failed to parse JSON: {e}\nBuffer: {json_buffer[:200]}")
-                                
-                                in_json_stream = False
-                                json_buffer = ""
-                                json_source_agent = None
-                            
-                            continue  # Don't stream raw JSON tokens
-                        
-                        # Filter out internal markers (IntentClassifier - shouldn't happen with disabled callbacks)
-                        if "__INTENT_RESULT__:" in content:
-                            continue
-                        
-                        # Regular token streaming
-                        if not block_mgr.active_block or block_mgr.active_block.type not in [
-                            BlockType.THINKING, BlockType.TEXT, BlockType.CODE, BlockType.PLAN
-                        ]:
-                             yield block_mgr.start_block(BlockType.THINKING, "Thinking...") + "\n"
-                        
-                        delta = block_mgr.append_delta(content)
-                        if delta: yield delta + "\n"
-
-            # 2. TOOL EXECUTION - Only show important actions, not every read
-            elif event_type == "on_tool_start":
-                # Close any active thinking/text block before showing tool
-                end_block = block_mgr.end_current_block()
-                if end_block:
-                    yield end_block + "\n"
-                
-                # Filter: Only show write/modify operations, not reads or debugging
-                important_tools = [
-                    "write_files_batch", "write_file_to_disk", "apply_source_edits",
-                    "delete_file_from_disk", "install_dependencies",
-                    "create_directory", "scaffold_project"
-                ]
-                
-                # Special case: Terminal commands - only show user-facing ones
-                tool_metadata = event_data.get("input", {})
-                is_important_terminal = False
-                if event_name == "run_terminal_command" and isinstance(tool_metadata, dict):
-                    command = tool_metadata.get("command", "")
-                    # Only show: npm install, npm run dev, package installs (not builds/tests during debugging)
-                    user_facing_commands = ["npm install", "npm run dev", "npm start", "pip install", "yarn install"]
-                    is_important_terminal = any(cmd in command for cmd in user_facing_commands)
-                
-                # Show block only for important operations
-                if event_name in important_tools or is_important_terminal:
-                    # Conversational action description
-                    action_map = {
-                        "write_files_batch": "Writing files",
-                        "write_file_to_disk": "Creating file",
-                        "apply_source_edits": "Editing code",
-                        "delete_file_from_disk": "Deleting file",
-                        "run_terminal_command": "Running command",
-                        "install_dependencies": "Installing packages",
-                        "create_directory": "Creating directory",
-                        "scaffold_project": "Setting up project structure"
-                    }
-                    action_text = action_map.get(event_name, event_name)
-                    yield block_mgr.start_block(BlockType.COMMAND, action_text) + "\n"
-                
-                # Emit tool_start for ToolProgress sidebar - but filter out read-only operations
-                # Don't show: list_directory, read_file, get_file_tree, etc
-                read_only_tools = [
-                    "list_directory", "read_file", "read_file_from_disk", "get_file_tree",
-                    "scan_project_tree", "grep_search", "file_search", "semantic_search"
-                ]
-                
-                if event_name not in read_only_tools:
-                    import json
-                    file_path = None
-                    if isinstance(tool_metadata, dict):
-                        file_path = tool_metadata.get("file_path") or tool_metadata.get("filename")
-                    
-                    tool_start_json = json.dumps({
-                        "type": "tool_start",
-                        "tool": event_name,
-                        "file": file_path,
-                        "timestamp": int(time.time() * 1000)
-                    })
-                    yield tool_start_json + "\n"
-                
-            elif event_type == "on_tool_end":
-                import json
-                output = event_data.get("output", "")
-                
-                # EXTRACT actual content from ToolMessage/AIMessage objects
-                output_content = output
-                if hasattr(output, 'content'):
-                    output_content = output.content
-                
-                # Only show results for important tools (same filter as on_tool_start)
-                important_tools = [
-                    "write_files_batch", "write_file_to_disk", "apply_source_edits",
-                    "delete_file_from_disk", "run_terminal_command", "install_dependencies",
-                    "create_directory", "scaffinstall_dependencies",
-                    "create_directory", "scaffold_project"
-                ]
-                
-                # Check terminal command filter
-                tool_metadata = event_data.get("input", {})
-                is_important_terminal = False
-                if event_name == "run_terminal_command" and isinstance(tool_metadata, dict):
-                    command = tool_metadata.get("command", "")
-                    user_facing_commands = ["npm install", "npm run dev", "npm start", "pip install", "yarn install"]
-                    is_important_terminal = any(cmd in command for cmd in user_facing_commands)
-                
-                # Parse and format output for important tools only
-                if event_name in important_tools or is_important_terminal:
-                    formatted_output = None
-                    if isinstance(output_content, str):
-                        try:
-                            parsed = json.loads(output_content)
-                            if isinstance(parsed, dict):
-                                if parsed.get("success"):
-                                    # Concise success messages
-                                    if "message" in parsed:
-                                        formatted_output = f"✓ {parsed['message']}"
-                                    elif event_name == "write_files_batch":
-                                        file_count = parsed.get("files_written", parsed.get("count", 0))
-                                        formatted_output = f"✓ Created {file_count} files"
-                                    else:
-                                        formatted_output = "✓ Done"
-                                else:
-                                    formatted_output = f"✗ {parsed.get('error', 'Failed')}"
-                        except:
-                            formatted_output = "✓ Complete"
-                    
-                    end_block = block_mgr.end_current_block()
-                    if end_block:
-                        yield end_block + "\n"
-                    
-                    # Show concise result
-                    if formatted_output:
-                        block_json = block_mgr.create_block(BlockType.CMD_OUTPUT, "", formatted_output)
-                        yield block_json + "\n"
-                
-                # Emit tool_result for ToolProgress sidebar - but filter out read-only operations
-                read_only_tools = [
-                    "list_directory", "read_file", "read_file_from_disk", "get_file_tree",
-                    "scan_project_tree", "grep_search", "file_search", "semantic_search"
-                ]
-                
-                if event_name not in read_only_tools:
-                    file_path = None
-                    if isinstance(tool_metadata, dict):
-                        file_path = tool_metadata.get("file_path") or tool_metadata.get("filename")
-                    
-                    # Determine success from output
-                    success = True
-                    if isinstance(output_content, str):
-                        try:
-                            parsed = json.loads(output_content)
-                            if isinstance(parsed, dict):
-                                success = parsed.get("success", True)
-                        except:
-                            pass
-                    elif isinstance(output, dict):
-                        success = output.get("success", True)
-                    
-                    tool_result_json = json.dumps({
-                        "type": "tool_result",
-                        "tool": event_name,
-                        "file": file_path,
-                        "success": success,
-                        "timestamp": int(time.time() * 1000)
-                    })
-                    yield tool_result_json + "\n"
-
-            # 3. NODE TRANSITIONS - Conversational agent status
-            elif event_type == "on_chain_start":
-                current_agent = event_name  # Track which agent started
-                
-                # Show conversational status for main agents only
-                if event_name == "planner":
-                    yield block_mgr.start_block(BlockType.THINKING, "Planning your project...") + "\n"
-                elif event_name == "coder":
-                    yield block_mgr.start_block(BlockType.CODE, "Implementing code...") + "\n"
-                elif event_name == "validator":
-                    yield block_mgr.start_block(BlockType.TEXT, "Reviewing changes...") + "\n"
-                elif event_name == "fixer":
-                    yield block_mgr.start_block(BlockType.TEXT, "Fixing issues...") + "\n"
-                # Orchestrator and IntentClassifier are silent (internal routing)
+        # Graph events (astream_events v2, for token streaming) and live UI events
+        # from the event bus are merged into one queue, in the order they happen.
+        pump = asyncio.create_task(
+            _pump_graph_events(graph, initial_state, config, bus_key, merged, cancel_token, setup, run_context)
+        )
+        
+        while True:
+            # Wait for the next item, but wake up when coalesced delta text is due
+            if getter is None:
+                getter = asyncio.ensure_future(merged.get())
+            done, _ = await asyncio.wait({getter}, timeout=block_mgr.pending_delta_deadline())
+            if not done:
+                flushed = block_mgr.flush_delta()
+                if flushed: yield flushed + "\n"
+                continue
+            item = getter.result()
+            getter = None
 
-            elif event_type == "on_chain_end":
-                # Reset current_agent when a chain finishes (so next agent can stream)
-                if event_name == current_agent:
-                    current_agent = None
-                
-                # SKIP DISPLAY FOR INTERNAL OUTPUTS (routing metadata, not user-facing)
-                if event_name in ["orchestrator", "IntentClassifier", "intent_classifier", "Orchestrator"]:
-                    # Internal orchestration - user doesn't need to see routing decisions
-                    logger.debug(f"[PIPELINE] Filtered internal event: {event_name}")
-                    continue
-                
-                # PARSE STRUCTURED OUTPUTS from planner/coder
-                import json
-                output = event_data.get("output", {})
-                
-                # PLANNER STRUCTURED OUTPUT - Conversational presentation
-                if event_name == "planner" and isinstance(output, dict):
-                    reasoning = output.get("reasoning", "")
-                    summary = output.get("summary", "")
-                    tasks = output.get("tasks", [])
-                    decision_notes = output.get("decision_notes", [])
-                    folders = output.get("folders", [])
-                    dependencies = output.get("dependencies", {})
-                    risks = output.get("risks", [])
-                    clarifying_questions = output.get("clarifying_questions", [])
-                    
-                    # BUILD CONVERSATIONAL NARRATIVE
-                    narrative = ""
-                    
-                    # 1. Summary (what we're building)
-                    if summary:
-                        narrative += f"{summary}\n\n"
-                    
-                    # 2. Reasoning (why/how) - but only if substantial
-                    if reasoning and len(reasoning) > 200:
-                        narrative += f"**Design Approach:**\n{reasoning}\n\n"
-                    
-                    # 3. Implementation plan (tasks)
-                    if tasks:
-                        narrative += f"**Implementation Plan ({len(tasks)} tasks):**\n\n"
-                        for i, task in enumerate(tasks[:5], 1):  # Show top 5
-                            title = task.get("title", "Untitled")
-                            complexity = task.get("complexity", "medium")
-                            narrative += f"{i}. **{title}** (_{complexity}_)\n"
-                        
-                        if len(tasks) > 5:
-                            narrative += f"\n... and {len(tasks) - 5} more tasks\n"
-                        narrative += "\n"
-                    
-                    # 4. File structure (concise)
-                    if folders:
-                        file_count = len(folders)
-                        narrative += f"**File Structure:** Creating {file_count} files\n\n"
-                        # Show key files only (components, pages, main files)
-                        key_files = [f for f in folders if any(x in f.get("path", "").lower() 
-                                    for x in ["component", "page", "app", "main", "index"])]
-                        for folder in key_files[:5]:
-                            path = folder.get("path", "")
-                            if path:
-                                narrative += f"• `{path}`\n"
-                        if file_count > 5:
-                            narrative += f"• ... and {file_count - 5} more files\n"
-                        narrative += "\n"
-                    
-                    # 5. Tech stack (dependencies) - very concise
-                    runtime = dependencies.get("runtime", [])
-                    if runtime and len(runtime) > 0:
-                        main_deps = [pkg.get("name", pkg) if isinstance(pkg, dict) else pkg for pkg in runtime[:3]]
-                        narrative += f"**Tech Stack:** {', '.join(main_deps)}"
-                        if len(runtime) > 3:
-                            narrative += f" +{len(runtime) - 3} more"
-                        narrative += "\n\n"
-                    
-                    # 6. Important decisions (only if present)
-                    if decision_notes and len(decision_notes) > 0:
-                        narrative += f"**Key Decisions:**\n"
-                        for note in decision_notes[:3]:  # Top 3
-                            narrative += f"• {note}\n"
-                        narrative += "\n"
-                    
-                    # 7. Risks/warnings (only if critical)
-                    if risks and len(risks) > 0:
-                        narrative += f"**⚠️ Considerations:**\n"
-                        for risk in risks[:2]:  # Top 2 only
-                            desc = risk.get("description", str(risk)) if isinstance(risk, dict) else risk
-                            narrative += f"• {desc}\n"
-                        narrative += "\n"
-                    
-                    # Output as single conversational block
-                    yield block_mgr.create_block(BlockType.TEXT, "Plan", narrative.strip()) + "\n"
-                    
-                    # Questions ONLY if actually stopping for user input (not just rhetorical)
-                    # For now, skip questions since we don't pause for answers
-                    # if clarifying_questions:
-                    #     q_text = "\n".join(f"{i}. {q}" for i, q in enumerate(clarifying_questions, 1))
-                    #     yield block_mgr.create_block(BlockType.TEXT, "Questions", q_text) + "\n"
-                
-                # CODER/VALIDATOR/FIXER - Silent completion (actions already shown via tool events)
-                elif event_name in ["coder", "validator", "fixer"]:
-                    # These agents show their work through tool calls and custom events
-                    # No need to dump their final output dict
-                    pass
-                
-                # CAPTURE CUSTOM NODE EVENTS (e.g. file_written, run:complete)
-                # These are returned in the "stream_events" key of the node output
-                if isinstance(output, dict):
-                    # 1. SYNC PREVIEW MANAGER (Frontend Deep Linking)
-                    # This controller layer logic ensures the API knows about path changes (e.g. scaffolding)
-                    # without coupling the Graph logic to the Service layer.
-                    new_path = output.get("artifacts", {}).get("project_path")
-                    if new_path:
-                        from app.services.preview_manager import preview_manager
-                        if preview_manager.current_project_path != new_path:
-                            preview_manager.current_project_path = new_path
-                            logger.info(f"[PIPELINE] 🔄 Synced preview_manager path to: {new_path}")
+            # Anything other than another token flushes buffered delta text,
+            # so lines keep their original order on the wire
+            if isinstance(item, dict) or item[0] != _GRAPH_EVENT or item[1]["event"] != "on_chat_model_stream":
+                flushed = block_mgr.flush_delta()
+                if flushed: yield flushed + "\n"
 
-                    # 2. CAPTURE CUSTOM EVENTS (from agents)
-                    if "stream_events" in output:
-                        import json
-                        for custom_event in output["stream_events"]:
-                            event_type = custom_event.get("type", "")
-                            agent = custom_event.get("agent", "")
-                            content_text = custom_event.get("content", "")
-                            metadata = custom_event.get("metadata", {})
-                            
-                            # ROUTE 1: File operations → ToolProgress component
-                            if event_type in ["file_written", "file_deleted", "fix_applied"]:
-                                action = metadata.get("action", "write")
-                                tool_name = {
-                                    "write": "write_file_to_disk",
-                                    "batch_write": "write_files_batch",
-                                    "edit": "apply_source_edits",
-                                    "patch": "write_file_to_disk",
-                                    "delete": "delete_file_from_disk"
-                                }.get(action, "write_file_to_disk")
-                                
-                                yield json.dumps({
-                                    "type": "tool_result",
-                                    "tool": tool_name,
-                                    "file": content_text,  # file path
-                                    "success": True
-                                }) + "\n"
-                            
-                            # ROUTE 2: Thinking/reasoning → StreamBlocks in chat
-                            elif event_type in ["thinking", "reasoning"]:
-                                # Build rich thinking block with task context
-                                title = f"{agent.capitalize()}: {content_text[:50]}..." if len(content_text) > 50 else f"{agent.capitalize()}: Analyzing"
-                                
-                                # Add task details if available
-                                thinking_content = [content_text]
-                                
-                                if metadata.get("task_title"):
-                                    thinking_content.insert(0, f"**Task:** {metadata['task_title']}\n")
-                                
-                                if metadata.get("task_description"):
-                                    desc = metadata['task_description'][:150]
-                                    if len(metadata.get('task_description', '')) > 150:
-                                        desc += "..."
-                                    thinking_content.insert(1, f"**Description:** {desc}\n")
-                                
-                                if metadata.get("expected_files"):
-                                    files = metadata['expected_files'][:3]
-                                    thinking_content.append(f"\n\n**Expected Files:** {', '.join(files)}")
-                                    if metadata.get('files_expected', 0) > 3:
-                                        thinking_content.append(f" (+{metadata['files_expected'] - 3} more)")
-                                
-                                if metadata.get("acceptance_criteria"):
-                                    thinking_content.append("\n\n**Success Criteria:**")
-                                    for criterion in metadata['acceptance_criteria'][:3]:
-                                        thinking_content.append(f"\n- {criterion}")
-                                
-                                full_content = "\n".join(str(c) for c in thinking_content)
-                                yield block_mgr.create_block(BlockType.THINKING, title, full_content) + "\n"
-                            
-                            # ROUTE 3: Status updates → Activity indicator
-                            elif event_type in ["agent_start", "agent_complete"]:
-                                # Simple status message for activity indicator
-                                yield json.dumps({
-                                    "type": "activity",
-                                    "agent": agent,
-                                    "message": content_text,
-                                    "metadata": metadata
-                                }) + "\n"
-                            
-                            # ROUTE 4: Important events → StreamBlocks with nice formatting
-                            elif event_type == "plan_created":
-                                task_count = metadata.get("task_count", 0)
-                                task_titles = metadata.get("task_titles", [])
-                                files_to_create = metadata.get("files_to_create", [])
-                                total_files = metadata.get("total_files", len(files_to_create))
-                                
-                                # Build rich summary
-                                summary_parts = [f"Created implementation plan with {task_count} task{'s' if task_count != 1 else ''}"]
-                                
-                                if task_titles:
-                                    summary_parts.append("\n\n**Tasks:**")
-                                    for i, title in enumerate(task_titles, 1):
-                                        summary_parts.append(f"\n{i}. {title}")
-                                    if task_count > len(task_titles):
-                                        summary_parts.append(f"\n... and {task_count - len(task_titles)} more")
-                                
-                                if files_to_create:
-                                    summary_parts.append("\n\n**Files to Create:**")
-                                    for f in files_to_create[:5]:  # Show first 5
-                                        summary_parts.append(f"\n- {f}")
-                                    if total_files > 5:
-                                        summary_parts.append(f"\n- ... and {total_files - 5} more files")
-                                
-                                summary = "".join(summary_parts)
-                                yield block_mgr.create_block(BlockType.PLAN, "✓ Plan Ready", summary) + "\n"
-                            
-                            elif event_type == "validation_complete":
-                                passed = metadata.get("passed", False)
-                                if passed:
-                                    yield block_mgr.create_block(BlockType.PREFLIGHT, "✓ Validation Passed", content_text) + "\n"
-                                else:
-                                    violation_count = metadata.get("violation_count", 0)
-                                    layer = metadata.get("layer", "unknown")
-                                    
-                                    # Build detailed error report
-                                    error_parts = [content_text]
-                                    error_parts.append(f"\n\n**Failed at:** {layer.upper()} layer")
-                                    error_parts.append(f"\n**Violations:** {violation_count}")
-                                    
-                                    # Show violations if available
-                                    if metadata.get("violations"):
-                                        error_parts.append("\n\n**Issues Found:**")
-                                        for v in metadata["violations"][:5]:  # First 5 violations
-                                            if isinstance(v, dict):
-                                                error_parts.append(f"\n- {v.get('message', v.get('type', 'Violation'))}")
-                                            else:
-                                                error_parts.append(f"\n- {v}")
-                                    
-                                    detail = "".join(error_parts)
-                                    yield block_mgr.create_block(BlockType.ERROR, "✗ Validation Failed", detail) + "\n"
-                            
-                            # ROUTE 5: Errors
-                            elif event_type == "error":
-                                yield block_mgr.create_block(BlockType.ERROR, f"{agent.capitalize()}: Error", content_text) + "\n"
-                            
-                            # ROUTE 6: Unknown events → log but don't spam UI
-                            else:
-                                logger.debug(f"[PIPELINE] Unknown event type: {event_type} from {agent}")
+            # Setup phases finishing in the background (git branch)
+            if not isinstance(item, dict) and item[0] == _SETUP:
+                yield json.dumps(item[1]) + "\n"
+                continue
+            setup.mark_first_event()
 
+            # Live UI events (emit_event → event bus, never stored in state)
+            if isinstance(item, dict):
+                for line in renderer.render_ui_event(item):
+                    yield line
+                continue
+            
+            source, event = item
+            if source == _GRAPH_DONE:
+                break
+            if source == _GRAPH_ERROR:
+                raise event
             
-            # Log debug info (commented out to reduce noise)
-            # if event_type not in ["on_chat_model_stream", "on_chat_model_start"]:
-            #      logger.debug(f"[STREAM] Event: {event_type} - {event_name}")
+            # Graph events: tokens, tool calls, node transitions (see graph_events.py)
+            for line in renderer.render(event):
+                yield line
 
         final = block_mgr.end_current_block()
         if final: yield final + "\n"
+        if block_mgr.deltas_in:
+            logger.info(
+                f"[STREAM] 📦 Coalesced {block_mgr.deltas_in} deltas into "
+                f"{block_mgr.delta_events_out} block_delta lines"
+            )
+        # Leftover node usage must be on its step rows before the run counts as done
+        await usage_handler.drain()
+        if run_context.usage.total.llm_calls:
+            logger.info(f"[PIPELINE] 💰 LLM usage: {run_context.usage.summary()}")
+        if merged.blocked or merged.coalesced or merged.dropped:
+            logger.info(
+                f"[STREAM] 🚦 Backpressure: queue peaked at {merged.max_depth}/{merged.maxsize}, "
+                f"graph held {merged.blocked}x ({merged.blocked_s * 1000:.0f}ms), "
+                f"{merged.coalesced} chunks merged, {merged.dropped} activity events shed"
+            )
         
         # Signal stream completion
-        import json
         yield json.dumps({"type": "stream:complete", "timestamp": int(time.time() * 1000)}) + "\n"
 
     except Exception as e:
         logger.error(f"[STREAM] Error: {e}", exc_info=True)
+        await usage_handler.drain()
         err = block_mgr.start_block(BlockType.ERROR, "Stream Error")
         if err: yield err + "\n"
-        yield block_mgr.append_delta(str(e)) + "\n"
+        delta = block_mgr.append_delta(str(e))
+        if delta: yield delta + "\n"
         yield block_mgr.end_current_block() + "\n"
         raise e # Re-raise for upper handlers
 
     finally:
+        # Run cancelled or the graph failed - don't leave the graph running, and
+        # kill whatever its tool threads started (npm install, builds, ...)
+        if pump is not None and not pump.done():
+            pump.cancel()
+            cancel_token.cancel("stream closed")
+        if getter is not None and not getter.done():
+            getter.cancel()
+        setup.cancel()
+        event_bus.unsubscribe(bus_key, merged)
+        if run_id:
+            cancel_registry.unregister(str(run_id))
+        
         # Step Tracking Finalization
         # (Simplified for now - can be expanded)
-        pass
+
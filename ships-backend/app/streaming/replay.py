@@ -0,0 +1,273 @@
+"""
+Resumable run streams.
+
+Every NDJSON line a run produces gets a monotonically increasing "seq" and
+is kept in a bounded per-run ring buffer (optionally spilled to
+~/.ships/streams/<stream_id>.ndjson). The pipeline runs in a background task
+that writes into the RunStream, and HTTP responses only tail it. A dropped
+connection therefore loses nothing: the client reconnects with the last seq
+it saw and replays from there.
+
+Usage:
+    stream = run_streams.create()
+    stream.task = asyncio.create_task(produce(stream))   # stream.append(line) ... stream.close()
+    async for line in stream.iter_from(after_seq):        # any number of readers
+        yield line
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque, OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator, Deque, Tuple, List, Callable
+from uuid import uuid4
+
+logger = logging.getLogger("ships.replay")
+
+STREAM_REPLAY_CAPACITY = int(os.getenv("STREAM_REPLAY_CAPACITY", "5000"))
+STREAM_REPLAY_TTL_S = int(os.getenv("STREAM_REPLAY_TTL_S", str(15 * 60)))
+STREAM_REPLAY_MAX_STREAMS = int(os.getenv("STREAM_REPLAY_MAX_STREAMS", "64"))
+STREAM_REPLAY_SPILL = os.getenv("STREAM_REPLAY_SPILL", "false").lower() == "true"
+STREAM_REPLAY_DIR = Path(os.getenv(
+    "STREAM_REPLAY_DIR",
+    str(Path.home() / ".ships" / "streams"),
+))
+
+
+def with_seq(line: str, seq: int) -> str:
+    """Prefix a JSON object line with its sequence number (no re-parse)."""
+    if line.startswith("{"):
+        rest = line[1:].lstrip()
+        return f'{{"seq": {seq}' + (", " + rest if rest != "}" else "}")
+    return json.dumps({"seq": seq, "type": "raw", "content": line})
+
+
+class RunStream:
+    """
+    One run's sequenced NDJSON output: ring buffer + live tail.
+    """
+
+    def __init__(self, stream_id: str, capacity: int = STREAM_REPLAY_CAPACITY, spill_dir: Optional[Path] = None):
+        self.stream_id = stream_id
+        self.capacity = capacity
+        self.created_at = time.time()
+        self.closed_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None  # Producer (keeps a strong ref)
+        self.owner: Optional[str] = None  # Who may read / cancel it ("user:<id>" / "ip:<addr>")
+
+        self._buffer: Deque[Tuple[int, str]] = deque(maxlen=capacity)
+        self._last_seq = 0
+        self._changed = asyncio.Event()
+        # Push consumers (run broker subscribers): called as (seq, line), then (None, None) on close
+        self._listeners: List[Callable[[Optional[int], Optional[str]], None]] = []
+
+        self._spill_path = spill_dir / f"{stream_id}.ndjson" if spill_dir else None
+        self._spill_file = None
+        if self._spill_path:
+            try:
+                self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+                self._spill_file = open(self._spill_path, "a", encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"[REPLAY] Could not open spill file {self._spill_path}: {e}")
+                self._spill_path = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    @property
+    def closed(self) -> bool:
+        return self.closed_at is not None
+
+    def append(self, chunk: str) -> int:
+        """
+        Sequence and store NDJSON output (may hold several lines).
+
+        Returns:
+            The last sequence number assigned
+        """
+        if self.closed:
+            return self._last_seq
+        for line in chunk.split("\n"):
+            if not line.strip():
+                continue
+            self._last_seq += 1
+            stamped = with_seq(line, self._last_seq)
+            self._buffer.append((self._last_seq, stamped))
+            if self._spill_file:
+                self._spill_file.write(stamped + "\n")
+            for listener in list(self._listeners):
+                listener(self._last_seq, stamped)
+        if self._spill_file:
+            self._spill_file.flush()
+        self._notify()
+        return self._last_seq
+
+    def close(self) -> None:
+        """Mark the run finished; readers drain and stop."""
+        if self.closed:
+            return
+        self.closed_at = time.time()
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+        for listener in list(self._listeners):
+            listener(None, None)
+        self._notify()
+
+    def add_listener(self, listener: Callable[[Optional[int], Optional[str]], None]) -> None:
+        """Register a synchronous push consumer (must never block)."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Optional[int], Optional[str]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def lines_after(self, cursor: int) -> List[Tuple[int, str]]:
+        """
+        Snapshot of (seq, line) with seq > cursor: spilled lines first, then a
+        stream:gap marker for anything unrecoverable, then the ring buffer.
+        """
+        lines: List[Tuple[int, str]] = []
+        if self._buffer and cursor < self._buffer[0][0] - 1:
+            lines.extend(self._replay_evicted(cursor))
+            if lines:
+                cursor = lines[-1][0]
+            missed_to = self._buffer[0][0] - 1
+            if cursor < missed_to:
+                gap = {"type": "stream:gap", "missed_from": cursor + 1, "missed_to": missed_to}
+                lines.append((missed_to, json.dumps(gap)))
+                cursor = missed_to
+        lines.extend((seq, line) for seq, line in self._buffer if seq > cursor)
+        return lines
+
+    async def iter_from(self, after_seq: int = 0) -> AsyncIterator[str]:
+        """
+        Yield newline-terminated lines with seq > after_seq, then follow live
+        output until the stream closes.
+        """
+        cursor = max(0, after_seq)
+        while True:
+            changed = self._changed
+            pending = self.lines_after(cursor)
+            for _, line in pending:
+                yield line + "\n"
+            if pending:
+                cursor = pending[-1][0]
+                continue
+
+            if self.closed:
+                return
+            await changed.wait()
+
+    def _replay_evicted(self, cursor: int) -> List[Tuple[int, str]]:
+        """Lines already dropped from the ring, read back from the spill file."""
+        if not self._spill_path or not self._spill_path.exists():
+            return []
+        first_buffered = self._buffer[0][0]
+        lines: List[Tuple[int, str]] = []
+        seq = 0
+        with open(self._spill_path, encoding="utf-8") as f:
+            for line in f:
+                seq += 1
+                if seq <= cursor:
+                    continue
+                if seq >= first_buffered:
+                    break
+                lines.append((seq, line.rstrip("\n")))
+        return lines
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "stream_id": self.stream_id,
+            "last_seq": self._last_seq,
+            "buffered": len(self._buffer),
+            "oldest_seq": self._buffer[0][0] if self._buffer else None,
+            "closed": self.closed,
+            "spilled": bool(self._spill_path),
+        }
+
+
+class RunStreamRegistry:
+    """
+    Live and recently finished RunStreams, by stream_id.
+
+    Singleton: use `RunStreamRegistry.get_instance()` or the module-level `run_streams`.
+    Finished streams are kept for STREAM_REPLAY_TTL_S so late reconnects can
+    still replay the tail.
+    """
+
+    _instance = None
+
+    def __init__(
+        self,
+        capacity: int = STREAM_REPLAY_CAPACITY,
+        ttl_s: int = STREAM_REPLAY_TTL_S,
+        max_streams: int = STREAM_REPLAY_MAX_STREAMS,
+        spill_dir: Optional[Path] = STREAM_REPLAY_DIR if STREAM_REPLAY_SPILL else None,
+    ):
+        self.capacity = capacity
+        self.ttl_s = ttl_s
+        self.max_streams = max_streams
+        self.spill_dir = spill_dir
+        self._streams: "OrderedDict[str, RunStream]" = OrderedDict()
+        self._resumes = 0
+
+    @classmethod
+    def get_instance(cls) -> "RunStreamRegistry":
+        if cls._instance is None:
+            cls._instance = RunStreamRegistry()
+        return cls._instance
+
+    def create(self, stream_id: Optional[str] = None) -> RunStream:
+        self._evict()
+        stream_id = stream_id or uuid4().hex
+        stream = RunStream(stream_id, capacity=self.capacity, spill_dir=self.spill_dir)
+        self._streams[stream_id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> Optional[RunStream]:
+        self._evict()
+        return self._streams.get(stream_id)
+
+    def record_resume(self) -> None:
+        self._resumes += 1
+
+    def _evict(self) -> None:
+        now = time.time()
+        for stream_id, stream in list(self._streams.items()):
+            if stream.closed and now - stream.closed_at > self.ttl_s:
+                self._drop(stream_id)
+        # Over the cap: drop oldest finished streams first, never live ones
+        for stream_id, stream in list(self._streams.items()):
+            if len(self._streams) <= self.max_streams:
+                break
+            if stream.closed:
+                self._drop(stream_id)
+
+    def _drop(self, stream_id: str) -> None:
+        stream = self._streams.pop(stream_id, None)
+        if stream and stream._spill_path:
+            try:
+                stream._spill_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        live = sum(1 for s in self._streams.values() if not s.closed)
+        return {
+            "streams": len(self._streams),
+            "live": live,
+            "resumes": self._resumes,
+        }
+
+
+# Global instance
+run_streams = RunStreamRegistry.get_instance()
@@ -0,0 +1,365 @@
+"""
+Run broker: pipeline runs as background tasks, many readers per run.
+
+A run is owned by the broker, not by the HTTP request that started it. Its
+output goes into a RunStream (sequenced + replayable, see replay.py) and is
+fanned out to any number of subscribers - the /agent/run chat stream, the
+/api/runs/ws dashboard, a `curl -N` tail of /agent/run/{id}/stream.
+
+Each subscriber has its own bounded queue, filled with put_nowait() from the
+producer. A slow or stalled reader can therefore never block the run; when
+its queue overflows, its policy decides what happens:
+
+- catch_up:    drop the queue and re-read from the replay buffer (lossless
+               while the ring still holds the lines) - chat stream default
+- drop_oldest: discard the oldest queued line - dashboards
+- disconnect:  end the subscription with a stream:lagged marker carrying the
+               seq to resume from
+
+Cancellation: every run has a CancelToken (app/utils/cancellation.py), bound
+in the run's task and registered under its run id. Cancelling the token (the
+cancel endpoints, or cancel()) cancels the task and kills the run's
+subprocess groups. A run whose last subscriber leaves - the chat tab closed,
+the client dropped - is cancelled after RUN_ORPHAN_GRACE_S unless someone
+resumes it first (negative = never, runs always finish in the background).
+
+Ownership: start(owner=...) records who started the run (see
+run_owner.py). Endpoints resume, cancel and list runs only through
+get_owned() / list_runs(owner), so a stream id alone grants nothing.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Any, AsyncIterator, Set, List, Callable
+
+from app.streaming.replay import RunStream, RunStreamRegistry, run_streams
+from app.utils.cancellation import CancelToken, CancelRegistry, bind_cancel_token, cancel_registry
+
+logger = logging.getLogger("ships.broker")
+
+RUN_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("RUN_SUBSCRIBER_QUEUE_SIZE", "1000"))
+RUN_ORPHAN_GRACE_S = float(os.getenv("RUN_ORPHAN_GRACE_S", "30"))
+
+CATCH_UP = "catch_up"
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+_CLOSED = object()
+
+
+class RunSubscriber:
+    """
+    One reader attached to a run. Iterate with `async for line in sub`
+    (or pass `sub.lines()` where the consumer may be closed early).
+    """
+
+    def __init__(self, run: "BrokeredRun", after_seq: int = 0,
+                 maxsize: int = RUN_SUBSCRIBER_QUEUE_SIZE, policy: str = CATCH_UP, name: str = ""):
+        self.run = run
+        self.policy = policy
+        self.name = name
+        self.cursor = max(0, after_seq)
+        self.dropped = 0
+        self.overflows = 0
+        self.lagged = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Replay from the ring before reading the queue
+        self._behind = run.stream.last_seq > self.cursor
+        self._attached = False
+
+    def _attach(self) -> None:
+        if self.run.stream.closed:
+            self._queue.put_nowait(_CLOSED)
+            return
+        self.run.stream.add_listener(self._offer)
+        self._attached = True
+
+    def detach(self) -> None:
+        if self._attached:
+            self.run.stream.remove_listener(self._offer)
+            self._attached = False
+        if self in self.run.subscribers:
+            self.run.subscribers.discard(self)
+            if not self.run.subscribers and self.run.on_orphaned is not None:
+                self.run.on_orphaned(self.run)
+
+    def _offer(self, seq: Optional[int], line: Optional[str]) -> None:
+        """Called by the producer for every line - never blocks."""
+        item = _CLOSED if seq is None else (seq, line)
+        try:
+            self._queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self.overflows += 1
+        if self.policy == DROP_OLDEST and item is not _CLOSED:
+            self._queue.get_nowait()
+            self.dropped += 1
+            self._queue.put_nowait(item)
+            return
+
+        if self.policy == DISCONNECT:
+            self.lagged = True
+            self.detach()
+        else:  # CATCH_UP (and a close arriving on a full DROP_OLDEST queue)
+            self._behind = True
+        self._drain()
+        self._queue.put_nowait(_CLOSED if self.lagged else item)
+
+    def _drain(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self.lines()
+
+    async def lines(self) -> AsyncIterator[str]:
+        """Newline-terminated NDJSON lines until the run ends (detaches on exit)."""
+        try:
+            while True:
+                if self._behind:
+                    self._behind = False
+                    for seq, line in self.run.stream.lines_after(self.cursor):
+                        self.cursor = seq
+                        yield line + "\n"
+                    continue
+
+                item = await self._queue.get()
+                if item is _CLOSED:
+                    if self.lagged:
+                        yield json.dumps({"type": "stream:lagged", "resume_after": self.cursor}) + "\n"
+                        return
+                    # Whatever the queue skipped is still in the ring
+                    for seq, line in self.run.stream.lines_after(self.cursor):
+                        self.cursor = seq
+                        yield line + "\n"
+                    return
+                if self._behind:
+                    continue
+                seq, line = item
+                if seq <= self.cursor:
+                    continue
+                self.cursor = seq
+                yield line + "\n"
+        finally:
+            self.detach()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "cursor": self.cursor,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+            "lagged": self.lagged,
+        }
+
+
+class BrokeredRun:
+    """A background run: its stream, producer task and current subscribers."""
+
+    def __init__(self, run_id: str, stream: RunStream, token: Optional[CancelToken] = None):
+        self.run_id = run_id
+        self.stream = stream
+        self.token = token or CancelToken(run_id)
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: Set[RunSubscriber] = set()
+        self.started_at = time.time()
+        # Called when the last subscriber detaches (set by the broker)
+        self.on_orphaned: Optional[Callable[["BrokeredRun"], None]] = None
+        self.orphan_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def done(self) -> bool:
+        return self.stream.closed
+
+    @property
+    def owner(self) -> Optional[str]:
+        return self.stream.owner
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "done": self.done,
+            "cancelled": self.token.cancelled,
+            "last_seq": self.stream.last_seq,
+            "age_s": round(time.time() - self.started_at, 1),
+            "subscribers": [s.get_stats() for s in self.subscribers],
+        }
+
+
+class RunBroker:
+    """
+    Owns background pipeline runs and their subscribers.
+
+    Singleton: use `RunBroker.get_instance()` or the module-level `run_broker`.
+    """
+
+    _instance = None
+
+    def __init__(self, streams: Optional[RunStreamRegistry] = None,
+                 orphan_grace_s: Optional[float] = None,
+                 cancels: Optional[CancelRegistry] = None):
+        self.streams = streams or run_streams
+        self.orphan_grace_s = RUN_ORPHAN_GRACE_S if orphan_grace_s is None else orphan_grace_s
+        self.cancels = cancels or cancel_registry
+        self._runs: Dict[str, BrokeredRun] = {}
+
+        # Metrics
+        self._started = 0
+        self._subscriptions = 0
+        self._orphan_cancels = 0
+
+    @classmethod
+    def get_instance(cls) -> "RunBroker":
+        if cls._instance is None:
+            cls._instance = RunBroker()
+        return cls._instance
+
+    def start(self, producer: AsyncIterator[str], run_id: Optional[str] = None,
+              owner: Optional[str] = None) -> BrokeredRun:
+        """
+        Start draining `producer` (NDJSON chunks) in a background task.
+
+        The task only starts at the caller's next await, so lines appended to
+        run.stream right after start() still come first.
+
+        Args:
+            producer: Async iterator of NDJSON chunks (e.g. stream_pipeline(...))
+            run_id: Optional id (defaults to a fresh stream id)
+            owner: Owner key; only this owner may resume, cancel or list the run
+        """
+        self._prune()
+        stream = self.streams.create(run_id)
+        stream.owner = owner
+        run = BrokeredRun(stream.stream_id, stream)
+        run.on_orphaned = self._orphaned
+        self._runs[run.run_id] = run
+        run.task = stream.task = asyncio.create_task(self._drive(run, producer))
+        self.cancels.register(run.run_id, run.token)
+        # Token may be cancelled from any thread; the task is cancelled on the loop
+        loop = asyncio.get_running_loop()
+        run.token.on_cancel(lambda: loop.call_soon_threadsafe(self._cancel_task, run))
+        self._started += 1
+        return run
+
+    async def _drive(self, run: BrokeredRun, producer: AsyncIterator[str]) -> None:
+        # Tools, validator layers and subprocesses started by this run find its token here
+        bind_cancel_token(run.token)
+        try:
+            async for chunk in producer:
+                run.stream.append(chunk)
+        except asyncio.CancelledError:
+            # Also kills the run's subprocesses if the task was cancelled directly
+            run.token.cancel("run task cancelled")
+            run.stream.append(json.dumps({"type": "stream:cancelled", "reason": run.token.reason}))
+            raise
+        except Exception as e:
+            logger.error(f"[BROKER] Run {run.run_id} failed: {e}", exc_info=True)
+            run.stream.append(json.dumps({"type": "error", "content": str(e)}))
+        finally:
+            self.cancels.unregister(run.run_id)
+            if run.orphan_timer is not None:
+                run.orphan_timer.cancel()
+                run.orphan_timer = None
+            run.stream.close()
+            logger.info(
+                f"[BROKER] 🏁 Run {run.run_id} finished: {run.stream.last_seq} lines, "
+                f"{len(run.subscribers)} subscribers attached"
+            )
+
+    def cancel(self, run_id: str, reason: str = "cancel requested") -> bool:
+        """Cancel a live run (False if unknown, finished or already cancelled)."""
+        run = self._runs.get(run_id)
+        if run is None or run.done:
+            return False
+        return run.token.cancel(reason)
+
+    @staticmethod
+    def _cancel_task(run: BrokeredRun) -> None:
+        if run.task is not None and not run.task.done():
+            run.task.cancel()
+
+    def _orphaned(self, run: BrokeredRun) -> None:
+        """Last subscriber left: cancel the run unless someone resumes within the grace period."""
+        if run.done or self.orphan_grace_s < 0:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Generator finalized outside the loop (shutdown)
+        logger.info(f"[BROKER] 👻 Run {run.run_id} has no subscribers, cancelling in {self.orphan_grace_s:g}s")
+        if run.orphan_timer is not None:
+            run.orphan_timer.cancel()
+        run.orphan_timer = loop.call_later(self.orphan_grace_s, self._cancel_orphan, run)
+
+    def _cancel_orphan(self, run: BrokeredRun) -> None:
+        run.orphan_timer = None
+        if run.subscribers or run.done:
+            return
+        if run.token.cancel("client disconnected"):
+            self._orphan_cancels += 1
+
+    def get(self, run_id: str) -> Optional[BrokeredRun]:
+        run = self._runs.get(run_id)
+        if run is None:
+            # Finished and pruned from the broker, but still replayable
+            stream = self.streams.get(run_id)
+            if stream is not None:
+                run = BrokeredRun(run_id, stream)
+        return run
+
+    def get_owned(self, run_id: str, owner: Optional[str]) -> Optional[BrokeredRun]:
+        """The run if `owner` started it (None otherwise, so ids of others' runs don't leak)."""
+        run = self.get(run_id)
+        if run is None or owner is None or run.owner != owner:
+            return None
+        return run
+
+    def subscribe(self, run_id: str, after_seq: int = 0, policy: str = CATCH_UP,
+                  maxsize: int = RUN_SUBSCRIBER_QUEUE_SIZE, name: str = "") -> Optional[RunSubscriber]:
+        """Attach a reader to a run (None if the run is unknown or expired)."""
+        run = self.get(run_id)
+        if run is None:
+            return None
+        if run.orphan_timer is not None:
+            # Resumed within the grace period
+            run.orphan_timer.cancel()
+            run.orphan_timer = None
+        sub = RunSubscriber(run, after_seq=after_seq, maxsize=maxsize, policy=policy, name=name)
+        sub._attach()
+        run.subscribers.add(sub)
+        self._subscriptions += 1
+        return sub
+
+    def list_runs(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Live runs of `owner` (all runs when None: internal use only)."""
+        self._prune()
+        return [run.get_stats() for run in self._runs.values() if owner is None or run.owner == owner]
+
+    def _prune(self) -> None:
+        """Forget finished runs nobody is reading (replay stays in run_streams)."""
+        for run_id, run in list(self._runs.items()):
+            if run.done and not run.subscribers:
+                del self._runs[run_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        live = [r for r in self._runs.values() if not r.done]
+        return {
+            "live_runs": len(live),
+            "runs_started": self._started,
+            "subscriptions": self._subscriptions,
+            "subscribers": sum(len(r.subscribers) for r in self._runs.values()),
+            "orphan_cancels": self._orphan_cancels,
+            "cancels": self.cancels.get_stats(),
+            "streams": self.streams.get_stats(),
+        }
+
+
+# Global instance
+run_broker = RunBroker.get_instance()
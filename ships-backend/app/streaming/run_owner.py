@@ -0,0 +1,36 @@
+"""
+Who a run belongs to.
+
+The owner key is the logged-in user ("user:<id>") or, for anonymous
+clients, the client address ("ip:<addr>"). It is used for admission
+(run_scheduler.py, with the user's tier) and recorded on the brokered run,
+so only the same owner can resume, cancel or list it (run_broker.py).
+
+Works for HTTP requests and WebSockets alike (both carry the session).
+"""
+
+import logging
+from typing import Tuple
+
+from starlette.requests import HTTPConnection
+
+logger = logging.getLogger("ships.run_owner")
+
+
+async def resolve_run_owner(conn: HTTPConnection) -> Tuple[str, str]:
+    """(owner key, tier) of the client behind `conn`."""
+    session_user = conn.session.get("user") if "session" in conn.scope else None
+    if session_user and session_user.get("email"):
+        try:
+            from sqlalchemy import select
+            from app.models import User
+            from app.database import get_session
+            async for db in get_session():
+                result = await db.execute(select(User).where(User.email == session_user["email"]))
+                user = result.scalar_one_or_none()
+                if user:
+                    return f"user:{user.id}", user.tier
+        except Exception as e:
+            logger.warning(f"[RUN_OWNER] User lookup failed, using client address: {e}")
+    client_ip = conn.client.host if conn.client else "unknown"
+    return f"ip:{client_ip}", "free"
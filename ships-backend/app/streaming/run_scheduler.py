@@ -0,0 +1,320 @@
+"""
+Run scheduler: admission control and tier-fair queueing for pipeline runs.
+
+Every /agent/run used to start a pipeline straight away. Each run can spawn
+npm install / builds / tsc / a dev server and several model streams, so a
+burst of users overloaded the box and every run slowed down together until
+they all timed out.
+
+The scheduler sits in front of stream_pipeline:
+
+- RUN_MAX_CONCURRENT runs execute at once (global cap)
+- a user runs at most their tier's `max_concurrent_runs` at once
+  (TIER_LIMITS in app/models/user.py; anonymous users are keyed by IP, tier
+  free)
+- the excess waits in a queue ordered by tier `run_priority`, then arrival.
+  Waiting raises a run's priority by one level per RUN_PRIORITY_AGING_S, so
+  lower tiers are delayed, never starved
+- a full queue (RUN_MAX_QUEUED overall, RUN_MAX_QUEUED_PER_USER per user)
+  rejects new runs up front with a retry hint (HTTP 429), and a run that has
+  waited RUN_QUEUE_TIMEOUT_S gives up - load beyond capacity is shed at the
+  door instead of stretching every admitted run
+
+While queued, the run's stream carries `run:queued` lines (position, ahead,
+eta_s) whenever its position changes, then `run:admitted` with the wait.
+
+Usage:
+    ticket = run_scheduler.submit(owner_key, tier)       # may raise RunRejected
+    run = run_broker.start(run_scheduler.run(ticket, produce()))
+    run.task.add_done_callback(lambda _: run_scheduler.release(ticket))  # never leak a slot
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Optional, Dict, Any, AsyncIterator, List, Mapping
+
+logger = logging.getLogger("ships.scheduler")
+
+RUN_MAX_CONCURRENT = int(os.getenv("RUN_MAX_CONCURRENT", "4"))
+RUN_MAX_QUEUED = int(os.getenv("RUN_MAX_QUEUED", "32"))
+RUN_MAX_QUEUED_PER_USER = int(os.getenv("RUN_MAX_QUEUED_PER_USER", "2"))
+RUN_QUEUE_TIMEOUT_S = float(os.getenv("RUN_QUEUE_TIMEOUT_S", "300"))
+RUN_PRIORITY_AGING_S = float(os.getenv("RUN_PRIORITY_AGING_S", "30"))
+
+DEFAULT_TIER = "free"
+_DEFAULT_RUN_SECONDS = 60.0  # ETA until real run durations are known
+
+
+class RunRejected(Exception):
+    """The scheduler can't take this run now (queue full)."""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class RunTicket:
+    """One run's place in the scheduler, from submit() to release."""
+
+    def __init__(self, seq: int, owner: str, tier: str, priority: int, max_concurrent: int):
+        self.seq = seq
+        self.owner = owner
+        self.tier = tier
+        self.priority = priority
+        self.max_concurrent = max_concurrent
+        self.submitted_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.released = False
+        self.admitted = asyncio.get_running_loop().create_future()
+        self.changed = asyncio.Event()  # Queue moved: position may have changed
+
+    def effective_priority(self, now: float) -> float:
+        return self.priority + (now - self.submitted_at) / RUN_PRIORITY_AGING_S
+
+    @property
+    def waited_s(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.submitted_at
+
+
+class RunScheduler:
+    """
+    Admission control for pipeline runs.
+
+    Singleton: use `RunScheduler.get_instance()` or the module-level `run_scheduler`.
+    """
+
+    _instance = None
+
+    def __init__(self, max_concurrent: int = RUN_MAX_CONCURRENT, max_queued: int = RUN_MAX_QUEUED,
+                 max_queued_per_user: int = RUN_MAX_QUEUED_PER_USER,
+                 queue_timeout_s: float = RUN_QUEUE_TIMEOUT_S,
+                 tier_limits: Optional[Mapping[str, Mapping[str, Any]]] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout_s = queue_timeout_s
+        self._tier_limits = tier_limits
+        self._seq = itertools.count(1)
+        self._waiting: List[RunTicket] = []
+        self._active: Dict[int, RunTicket] = {}
+
+        # Metrics
+        self._admitted = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._abandoned = 0  # Cancelled while queued (client left)
+        self._waits = deque(maxlen=500)  # Recent queue waits (s), admitted runs
+        self._durations = deque(maxlen=100)  # Recent run durations (s), for ETAs
+
+    @classmethod
+    def get_instance(cls) -> "RunScheduler":
+        if cls._instance is None:
+            cls._instance = RunScheduler()
+        return cls._instance
+
+    @property
+    def tier_limits(self) -> Mapping[str, Mapping[str, Any]]:
+        if self._tier_limits is None:
+            # Lazy: importing the models at startup would pull in the ORM
+            from app.models.user import TIER_LIMITS
+            self._tier_limits = TIER_LIMITS
+        return self._tier_limits
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def submit(self, owner: str, tier: Optional[str] = None) -> RunTicket:
+        """
+        Take a place for a run. Admitted immediately if there is capacity.
+
+        Args:
+            owner: Who the run counts against ("user:<id>" / "ip:<addr>")
+            tier: Subscription tier (unknown tiers count as free)
+
+        Raises:
+            RunRejected: Queue full; retry_after_s is a hint for Retry-After
+        """
+        limits = self.tier_limits.get(tier or DEFAULT_TIER) or self.tier_limits.get(DEFAULT_TIER, {})
+        ticket = RunTicket(
+            next(self._seq), owner, tier or DEFAULT_TIER,
+            priority=int(limits.get("run_priority", 0)),
+            max_concurrent=int(limits.get("max_concurrent_runs", 1)),
+        )
+
+        # Goes through the queue so it can't overtake higher-priority waiters
+        self._waiting.append(ticket)
+        self._dispatch()
+        if not ticket.admitted.done():
+            ahead = [t for t in self._waiting if t is not ticket]
+            queued_by_owner = sum(1 for t in ahead if t.owner == owner)
+            if len(ahead) >= self.max_queued or queued_by_owner >= self.max_queued_per_user:
+                self._waiting.remove(ticket)
+                ticket.released = True
+                ticket.admitted.cancel()
+                self._rejected += 1
+                reason = "server busy" if len(ahead) >= self.max_queued else "too many queued runs"
+                logger.warning(f"[SCHEDULER] 🚫 Rejected run for {owner} ({ticket.tier}): {reason}")
+                raise RunRejected(reason, retry_after_s=round(self._eta_s(len(ahead) + 1), 1))
+            logger.info(
+                f"[SCHEDULER] ⏳ Run for {owner} ({ticket.tier}) queued at position "
+                f"{self.position(ticket)}/{len(self._waiting)} ({len(self._active)} active)"
+            )
+        return ticket
+
+    def _can_admit(self, ticket: RunTicket) -> bool:
+        if len(self._active) >= self.max_concurrent:
+            return False
+        running = sum(1 for t in self._active.values() if t.owner == ticket.owner)
+        return running < ticket.max_concurrent
+
+    def _admit(self, ticket: RunTicket) -> None:
+        ticket.admitted_at = time.monotonic()
+        self._active[ticket.seq] = ticket
+        self._admitted += 1
+        self._waits.append(ticket.waited_s)
+        if not ticket.admitted.done():
+            ticket.admitted.set_result(True)
+
+    def _ordered(self) -> List[RunTicket]:
+        now = time.monotonic()
+        return sorted(self._waiting, key=lambda t: (-t.effective_priority(now), t.seq))
+
+    def _dispatch(self) -> None:
+        """Admit waiting runs in priority order while there is capacity."""
+        admitted = False
+        for ticket in self._ordered():
+            if len(self._active) >= self.max_concurrent:
+                break
+            if self._can_admit(ticket):  # Owners at their tier cap are skipped, not blocking
+                self._waiting.remove(ticket)
+                self._admit(ticket)
+                admitted = True
+        if admitted:
+            for ticket in self._waiting:
+                ticket.changed.set()
+
+    def position(self, ticket: RunTicket) -> int:
+        """1-based queue position (0 once admitted)."""
+        if ticket.admitted.done():
+            return 0
+        for i, waiting in enumerate(self._ordered(), 1):
+            if waiting is ticket:
+                return i
+        return 0
+
+    def release(self, ticket: RunTicket) -> None:
+        """Run finished or abandoned: free its slot / queue place."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.seq in self._active:
+            del self._active[ticket.seq]
+            self._durations.append(time.monotonic() - ticket.admitted_at)
+        elif ticket in self._waiting:
+            self._waiting.remove(ticket)
+            for waiting in self._waiting:
+                waiting.changed.set()
+        if not ticket.admitted.done():
+            ticket.admitted.cancel()
+        self._dispatch()
+
+    def _eta_s(self, position: int) -> float:
+        """Rough wait for a queue position, from recent run durations."""
+        avg = sum(self._durations) / len(self._durations) if self._durations else _DEFAULT_RUN_SECONDS
+        return avg * position / self.max_concurrent
+
+    # ------------------------------------------------------------------
+    # Streaming wrapper
+    # ------------------------------------------------------------------
+
+    async def run(self, ticket: RunTicket, producer: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Stream `producer` once `ticket` is admitted, with queue events before it.
+
+        The producer is only iterated (so the pipeline only starts) after
+        admission. Cancelling the run while it is queued gives up its place.
+        """
+        try:
+            if not ticket.admitted.done():
+                last_position = None
+                deadline = ticket.submitted_at + self.queue_timeout_s
+                while not ticket.admitted.done():
+                    position = self.position(ticket)
+                    if position != last_position:
+                        last_position = position
+                        yield json.dumps({
+                            "type": "run:queued",
+                            "position": position,
+                            "ahead": position - 1,
+                            "active": len(self._active),
+                            "eta_s": round(self._eta_s(position), 1),
+                        }) + "\n"
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        logger.warning(f"[SCHEDULER] ⌛ Run for {ticket.owner} gave up after {ticket.waited_s:.0f}s in queue")
+                        yield json.dumps({
+                            "type": "run:rejected",
+                            "reason": "queue timeout",
+                            "waited_ms": round(ticket.waited_s * 1000),
+                        }) + "\n"
+                        return
+
+                    # Wake on admission, on the queue moving, or periodically
+                    # (aging can reorder the queue without either happening)
+                    ticket.changed.clear()
+                    changed = asyncio.ensure_future(ticket.changed.wait())
+                    try:
+                        await asyncio.wait({ticket.admitted, changed}, timeout=min(remaining, 5.0))
+                    finally:
+                        changed.cancel()
+
+                logger.info(f"[SCHEDULER] ▶️ Run for {ticket.owner} ({ticket.tier}) admitted after {ticket.waited_s:.1f}s")
+                yield json.dumps({"type": "run:admitted", "waited_ms": round(ticket.waited_s * 1000)}) + "\n"
+
+            async for chunk in producer:
+                yield chunk
+        except asyncio.CancelledError:
+            if not ticket.admitted.done():
+                self._abandoned += 1
+            raise
+        finally:
+            started = ticket.admitted_at is not None
+            self.release(ticket)
+            aclose = getattr(producer, "aclose", None)
+            if not started and aclose is not None:
+                await aclose()  # Never started: don't leave the generator pending
+
+    def get_stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        by_tier: Dict[str, Dict[str, int]] = {}
+        for ticket in self._active.values():
+            by_tier.setdefault(ticket.tier, {"active": 0, "queued": 0})["active"] += 1
+        for ticket in self._waiting:
+            by_tier.setdefault(ticket.tier, {"active": 0, "queued": 0})["queued"] += 1
+        return {
+            "active": len(self._active),
+            "queued": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+            "by_tier": by_tier,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "queue_timeouts": self._timeouts,
+            "abandoned_in_queue": self._abandoned,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0] * 1000, 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
+
+
+# Global instance
+run_scheduler = RunScheduler.get_instance()
@@ -0,0 +1,152 @@
+"""
+Deferred run setup: stream first, set up concurrently.
+
+Before a run can start it needs an AgentRun row (step tracking), a compiled
+graph with its checkpointer, and an isolated git branch. Done one after the
+other, in front of the first yield, that kept users looking at an empty chat
+for 1-3 s on every prompt.
+
+The pipeline now sends `run:accepted` straight away and runs each setup step
+as a phase:
+
+- tracking + graph:  concurrently, awaited before the graph starts (the run
+                     id and graph are needed to start it)
+- git branch:        in a worker thread, in the background. Only nodes that
+                     touch the project tree wait for it (await_workspace()),
+                     so the orchestrator's first LLM call overlaps with it.
+
+Each phase is reported to the client as a `run:setup` line when it finishes,
+and the pipeline logs time-to-first-event ([TTFB]) for every run.
+"""
+
+import time
+import asyncio
+import logging
+from contextvars import ContextVar, Token
+from typing import Optional, Dict, Any, Awaitable, Callable, List
+
+logger = logging.getLogger("ships.streaming")
+
+# Phase names
+TRACKING = "tracking"
+GRAPH = "graph"
+WORKSPACE = "workspace"  # git branch isolation
+
+_current_setup: ContextVar[Optional["RunSetup"]] = ContextVar("ships_run_setup", default=None)
+
+
+class RunSetup:
+    """
+    Setup phases of one run, timed from the moment the run was accepted.
+
+    Phase results are awaited with wait(); completion events (for the stream)
+    go to on_phase if set, otherwise they queue up until drain().
+    """
+
+    def __init__(self, on_phase: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.started_at = time.perf_counter()
+        self.on_phase = on_phase
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.first_event_ms: Optional[float] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending: List[Dict[str, Any]] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def start(self, name: str, work: Awaitable[Any]) -> asyncio.Task:
+        """Run `work` as phase `name` in its own task."""
+        task = asyncio.ensure_future(self._run_phase(name, work))
+        self._tasks[name] = task
+        return task
+
+    async def _run_phase(self, name: str, work: Awaitable[Any]) -> Any:
+        began = time.perf_counter()
+        status, error = "ok", None
+        try:
+            return await work
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status, error = "failed", str(e)
+            raise
+        finally:
+            phase = {
+                "phase": name,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - began) * 1000, 1),
+                "at_ms": round(self.elapsed_ms(), 1),
+            }
+            if error:
+                phase["error"] = error
+            self.phases[name] = phase
+            event = {"type": "run:setup", **phase}
+            if self.on_phase is not None:
+                self.on_phase(event)
+            else:
+                self._pending.append(event)
+
+    async def wait(self, name: str) -> Any:
+        """Result of phase `name` (None if it was never started)."""
+        task = self._tasks.get(name)
+        if task is None:
+            return None
+        return await asyncio.shield(task)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Phase events not yet delivered through on_phase."""
+        events, self._pending = self._pending, []
+        return events
+
+    def mark_first_event(self) -> None:
+        """Record and log time-to-first-event (once per run)."""
+        if self.first_event_ms is not None:
+            return
+        self.first_event_ms = self.elapsed_ms()
+        phases = ", ".join(
+            f"{p['phase']} {p['duration_ms']:.0f}ms" + ("" if p["status"] == "ok" else f" ({p['status']})")
+            for p in self.phases.values()
+        )
+        logger.info(f"[TTFB] ⏱️ First event after {self.first_event_ms:.0f}ms (setup: {phases or 'none'})")
+
+    def cancel(self) -> None:
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "first_event_ms": self.first_event_ms,
+            "phases": list(self.phases.values()),
+        }
+
+
+# ----------------------------------------------------------------------
+# Run binding (same scoping as the event bus / cancel token)
+# ----------------------------------------------------------------------
+
+def bind_run_setup(setup: RunSetup) -> Token:
+    return _current_setup.set(setup)
+
+
+def current_run_setup() -> Optional[RunSetup]:
+    return _current_setup.get()
+
+
+async def await_workspace() -> None:
+    """
+    Wait until the run's project workspace (git branch) is ready.
+
+    Call before anything writes to the project tree. Never raises on setup
+    failure - the run then works on the current branch, as it always has.
+    """
+    setup = _current_setup.get()
+    if setup is None:
+        return
+    try:
+        await setup.wait(WORKSPACE)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        pass
@@ -1,9 +1,18 @@
 from enum import Enum
 from typing import Optional, Dict, Any, List
+import os
 import uuid
 import json
 import time
 
+from app.streaming.event_bus import event_bus
+
+# Delta coalescing: consecutive block_delta chunks for the same block are
+# merged into one NDJSON line, flushed after this window / byte cap or on any
+# block boundary. STREAM_COALESCE_MS=0 restores one line per chunk.
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "40"))
+STREAM_COALESCE_MAX_BYTES = int(os.getenv("STREAM_COALESCE_MAX_BYTES", "4096"))
+
 class BlockType(str, Enum):
     TEXT = "text"           # Standard text response
     CODE = "code"           # Code block (file content)
@@ -23,11 +32,15 @@ def emit_event(
     metadata: Dict[str, Any] = None
 ) -> Dict[str, Any]:
     """
-    Create a UI-safe streaming event.
+    Create a UI-safe streaming event and publish it to the frontend.
     
     This is the ONLY way agents should emit events to the frontend.
     All values are JSON-serializable primitives.
     
+    The event is published immediately on the run's ephemeral event bus
+    (never stored in graph state). The dict is still returned so callers
+    can log or inspect what they emitted.
+    
     Args:
         event_type: "agent_start", "thinking", "file_written", "error", etc.
         agent: "planner", "coder", "validator", "fixer"
@@ -37,13 +50,16 @@ def emit_event(
     Returns:
         Dict ready to be JSON serialized and streamed
     """
-    return {
+    event = {
         "type": event_type,
         "agent": agent,
         "content": content,
         "metadata": metadata or {},
         "timestamp": int(time.time() * 1000)
     }
+    
+    event_bus.publish(event)
+    return event
 
 class StreamBlock:
     """
@@ -86,11 +102,27 @@ class StreamBlockManager:
     """
     Manages the lifecycle of streaming blocks.
     Ensures valid state transitions (Start -> Delta -> End).
+    
+    Deltas are coalesced: append_delta() buffers text and only returns a
+    block_delta line once the coalescing window or byte cap is reached.
+    Block boundaries always flush first, so ordering is preserved. Callers
+    that can idle (the pipeline loop) should flush when
+    pending_delta_deadline() elapses.
     """
-    def __init__(self):
+    def __init__(self, coalesce_ms: Optional[float] = None, coalesce_max_bytes: Optional[int] = None):
         self.active_block: Optional[StreamBlock] = None
         self.blocks: List[StreamBlock] = []
         
+        self.coalesce_s = (STREAM_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        self.coalesce_max_bytes = STREAM_COALESCE_MAX_BYTES if coalesce_max_bytes is None else coalesce_max_bytes
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+        
+        # Metrics (see tests/bench_stream_coalescing.py)
+        self.deltas_in = 0
+        self.delta_events_out = 0
+        
     def start_block(self, block_type: BlockType, title: Optional[str] = None, **metadata) -> str:
         """
         Start a new block. accessible via .active_block
@@ -112,26 +144,64 @@ class StreamBlockManager:
         return "\n".join(filter(None, events))
 
     def append_delta(self, text: str) -> Optional[str]:
-        """Append content to active block."""
+        """
+        Append content to active block.
+        
+        Returns:
+            NDJSON line(s) to send now, or None while the delta is buffered
+        """
         if not self.active_block or self.active_block.is_complete:
             # Fallback: Create default text block if none active
-             # (Or should we simplify and ignore? Better to catch it)
-             return self.start_block(BlockType.TEXT, title=None) + "\n" + self.append_delta(text)
+            start = self.start_block(BlockType.TEXT, title=None)
+            return "\n".join(filter(None, [start, self.append_delta(text)]))
         
         # DEFENSIVE: Ensure text is actually a string
         if not isinstance(text, str):
             text = str(text) if text is not None else ""
              
         self.active_block.content += text
+        self.deltas_in += 1
+        
+        if self.coalesce_s <= 0:
+            self.delta_events_out += 1
+            return self.active_block.to_event("block_delta", delta=text)
+        
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.append(text)
+        self._pending_bytes += len(text)
+        
+        if (self._pending_bytes >= self.coalesce_max_bytes
+                or time.monotonic() - self._pending_since >= self.coalesce_s):
+            return self.flush_delta()
+        return None
+
+    def flush_delta(self) -> Optional[str]:
+        """Emit buffered delta text for the active block as one block_delta line."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        if not self.active_block:
+            return None
+        self.delta_events_out += 1
         return self.active_block.to_event("block_delta", delta=text)
 
+    def pending_delta_deadline(self) -> Optional[float]:
+        """Seconds until buffered delta text is due, or None if nothing is buffered."""
+        if not self._pending:
+            return None
+        return max(0.0, self.coalesce_s - (time.monotonic() - self._pending_since))
+
     def end_current_block(self) -> Optional[str]:
-        """Close the active block."""
+        """Close the active block (flushing any buffered delta first)."""
         if not self.active_block or self.active_block.is_complete:
             return None
             
+        pending = self.flush_delta()
         self.active_block.is_complete = True
-        return self.active_block.to_event("block_end")
+        return "\n".join(filter(None, [pending, self.active_block.to_event("block_end")]))
 
     def ensure_block_type(self, block_type: BlockType, title: Optional[str] = None) -> Optional[str]:
         """Ensure the active block is of specific type. If not, start new one."""
@@ -147,6 +217,3 @@ class StreamBlockManager:
             events.append(self.append_delta(content))
         events.append(self.end_current_block())
         return "\n".join(filter(None, events))
-        if self.active_block and self.active_block.type == block_type:
-            return None
-        return self.start_block(block_type, title)
@@ -2,7 +2,8 @@
 Terminal Executor Module
 
 Executes validated commands using subprocess.
-Handles timeouts and output streaming.
+Handles timeouts and output streaming. Commands run in their own process
+group, killed as a whole on timeout or when the run is cancelled.
 """
 
 import subprocess
@@ -14,6 +15,7 @@ from pathlib import Path
 
 from .models import CommandRequest, CommandResult
 from .security import validate_command, get_allowed_command_config
+from app.utils.cancellation import run_subprocess, RunCancelled
 
 logger = logging.getLogger("ships.terminal")
 
@@ -53,10 +55,9 @@ async def execute_command(request: CommandRequest) -> CommandResult:
         logger.info(f"[EXECUTOR] 🚀 Running: {sanitized}")
         
         # Run the command
-        result = subprocess.run(
+        result = run_subprocess(
             [shell] + shell_args + [sanitized],
             cwd=request.cwd,
-            capture_output=True,
             timeout=timeout,
             text=True,
             env={
@@ -97,6 +98,16 @@ async def execute_command(request: CommandRequest) -> CommandResult:
             duration_ms=duration
         )
         
+    except RunCancelled as e:
+        duration = int((time.time() - start_time) * 1000)
+        logger.info(f"[EXECUTOR] 🛑 {e}: {sanitized}")
+        return CommandResult(
+            success=False,
+            error=str(e),
+            cancelled=True,
+            duration_ms=duration
+        )
+        
     except Exception as e:
         duration = int((time.time() - start_time) * 1000)
         logger.error(f"[EXECUTOR] ❌ Execution error: {e}")
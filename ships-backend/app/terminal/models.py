@@ -33,6 +33,7 @@ class CommandResult(BaseModel):
     stderr: str = ""
     error: Optional[str] = None
     timed_out: bool = False
+    cancelled: bool = False
     duration_ms: int = 0
 
 
@@ -5,10 +5,13 @@ Async PTY-based command execution with real-time output streaming.
 Enables the agent to interact with interactive terminal commands.
 
 Features:
-- Real-time output streaming via asyncio
+- Real-time output streaming via asyncio (bounded: a slow reader of
+  execute_command_streaming() gets merged chunks, then stops the pipe
+  being read, instead of an ever-growing queue)
 - Prompt detection and auto-response
 - Configurable timeout handling
-- Proper resource cleanup
+- Proper resource cleanup (the command runs in its own process group,
+  killed as a whole on timeout or when the run is cancelled)
 
 Usage:
     result = await execute_with_pty(
@@ -18,20 +21,29 @@ Usage:
     )
 """
 
+import os
 import asyncio
+import inspect
 import platform
 import time
 import logging
-from typing import Optional, Callable, AsyncGenerator, Tuple
+from typing import Optional, Callable, AsyncGenerator, Awaitable, Tuple, Union
 from dataclasses import dataclass, field
 from pathlib import Path
 
 from .models import CommandRequest, CommandResult
 from .security import validate_command, get_allowed_command_config
 from .prompt_patterns import detect_prompt, get_auto_response, is_waiting_for_input
+from app.utils.cancellation import current_cancel_token, kill_process_tree, new_process_group_kwargs
+from app.streaming.bounded_queue import StreamQueue, COALESCE
 
 logger = logging.getLogger("ships.terminal")
 
+# execute_command_streaming(): chunks queued for the reader, and the largest
+# chunk queued chunks are merged into while the reader is behind
+PTY_STREAM_QUEUE_SIZE = int(os.getenv("PTY_STREAM_QUEUE_SIZE", "64"))
+PTY_STREAM_MAX_CHUNK = int(os.getenv("PTY_STREAM_MAX_CHUNK", "65536"))
+
 
 @dataclass
 class PTYExecutionConfig:
@@ -61,6 +73,7 @@ class PTYResult:
         output: Combined stdout/stderr output.
         prompts_handled: Number of prompts automatically handled.
         timed_out: Whether execution timed out.
+        cancelled: Whether the run was cancelled (process group killed).
         error: Error message if execution failed.
         duration_ms: Execution duration in milliseconds.
     """
@@ -69,6 +82,7 @@ class PTYResult:
     output: str = ""
     prompts_handled: int = 0
     timed_out: bool = False
+    cancelled: bool = False
     error: Optional[str] = None
     duration_ms: int = 0
 
@@ -112,7 +126,7 @@ async def execute_with_pty(
     command: str,
     cwd: str,
     config: Optional[PTYExecutionConfig] = None,
-    on_output: Optional[Callable[[str], None]] = None,
+    on_output: Optional[Callable[[str], Union[None, Awaitable[None]]]] = None,
 ) -> PTYResult:
     """
     Execute a command using async subprocess with PTY-like behavior.
@@ -124,7 +138,8 @@ async def execute_with_pty(
         command: The command to execute.
         cwd: Working directory for the command.
         config: Execution configuration.
-        on_output: Optional callback for real-time output chunks.
+        on_output: Optional callback for real-time output chunks. If it
+            returns an awaitable, reading waits for it (backpressure).
         
     Returns:
         PTYResult with execution details.
@@ -154,6 +169,13 @@ async def execute_with_pty(
     
     output_buffer = []
     prompts_handled = 0
+    process = None
+    untrack = None
+    
+    # Cancellation of the run this command belongs to (see app/utils/cancellation.py)
+    token = current_cancel_token()
+    if token is not None and token.cancelled:
+        return PTYResult(success=False, cancelled=True, error=f"Run cancelled: {token.reason}")
     
     try:
         logger.info(f"[PTY] 🚀 Starting: {sanitized}")
@@ -166,7 +188,11 @@ async def execute_with_pty(
             stdin=asyncio.subprocess.PIPE,
             cwd=cwd,
             env=env,
+            **new_process_group_kwargs(),
         )
+        if token is not None:
+            # Runs in the cancelling thread: killing the group ends read_output() with EOF
+            untrack = token.on_cancel(lambda: kill_process_tree(process))
         
         async def read_output():
             """Read output from process."""
@@ -190,7 +216,9 @@ async def execute_with_pty(
                     
                     # Callback for real-time streaming
                     if on_output:
-                        on_output(text)
+                        pending = on_output(text)
+                        if inspect.isawaitable(pending):
+                            await pending
                     
                     # Limit buffer size
                     full_output = ''.join(output_buffer)
@@ -234,7 +262,8 @@ async def execute_with_pty(
             await asyncio.wait_for(read_output(), timeout=timeout)
         except asyncio.TimeoutError:
             logger.warning(f"[PTY] ⏰ Command timed out after {timeout}s")
-            process.kill()
+            kill_process_tree(process)
+            await process.wait()
             return PTYResult(
                 success=False,
                 output=''.join(output_buffer),
@@ -249,6 +278,19 @@ async def execute_with_pty(
         duration = int((time.time() - start_time) * 1000)
         
         output = ''.join(output_buffer)
+        
+        if token is not None and token.cancelled:
+            logger.info(f"[PTY] 🛑 Cancelled after {duration}ms: {sanitized}")
+            return PTYResult(
+                success=False,
+                exit_code=exit_code,
+                output=output[:config.max_output_size],
+                prompts_handled=prompts_handled,
+                cancelled=True,
+                error=f"Run cancelled: {token.reason}",
+                duration_ms=duration
+            )
+        
         success = exit_code == 0
         
         logger.info(f"[PTY] {'✅' if success else '❌'} Exit code: {exit_code} in {duration}ms (handled {prompts_handled} prompts)")
@@ -261,6 +303,12 @@ async def execute_with_pty(
             duration_ms=duration
         )
         
+    except asyncio.CancelledError:
+        # Awaiting task was cancelled - don't leave the command running
+        if process is not None:
+            kill_process_tree(process)
+        raise
+        
     except Exception as e:
         duration = int((time.time() - start_time) * 1000)
         logger.error(f"[PTY] ❌ Execution error: {e}")
@@ -270,6 +318,10 @@ async def execute_with_pty(
             error=str(e),
             duration_ms=duration
         )
+    
+    finally:
+        if untrack is not None:
+            untrack()
 
 
 async def execute_command_streaming(
@@ -287,30 +339,48 @@ async def execute_command_streaming(
     Yields:
         Output chunks as they arrive.
     """
-    output_queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
-    
-    async def on_output(chunk: str):
-        await output_queue.put(chunk)
+    output_queue: StreamQueue[Optional[str]] = StreamQueue(
+        maxsize=PTY_STREAM_QUEUE_SIZE, policy=COALESCE, coalesce=_join_output,
+        name=f"pty:{request.command[:40]}",
+    )
     
     # Start execution in background
     async def run():
-        result = await execute_with_pty(
-            command=request.command,
-            cwd=request.cwd,
-            config=PTYExecutionConfig(timeout=request.timeout or 300),
-            on_output=lambda chunk: asyncio.create_task(output_queue.put(chunk))
-        )
-        await output_queue.put(None)  # Signal completion
-        return result
+        try:
+            return await execute_with_pty(
+                command=request.command,
+                cwd=request.cwd,
+                config=PTYExecutionConfig(timeout=request.timeout or 300),
+                on_output=output_queue.put,  # waits while the reader is behind
+            )
+        finally:
+            output_queue.put_nowait(None)  # Signal completion
     
     execution_task = asyncio.create_task(run())
     
-    # Yield chunks as they arrive
-    while True:
-        chunk = await output_queue.get()
-        if chunk is None:
-            break
-        yield chunk
-    
-    # Ensure task is complete
-    await execution_task
+    try:
+        # Yield chunks as they arrive
+        while True:
+            chunk = await output_queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        
+        # Ensure task is complete
+        await execution_task
+    finally:
+        # Reader went away: the command would block on a full queue forever
+        if not execution_task.done():
+            execution_task.cancel()
+        if output_queue.blocked:
+            logger.info(
+                f"[PTY] 🚦 Slow reader: output held {output_queue.blocked}x "
+                f"({output_queue.blocked_s * 1000:.0f}ms), {output_queue.coalesced} chunks merged"
+            )
+
+
+def _join_output(queued: Optional[str], chunk: Optional[str]) -> Optional[str]:
+    """Merge output text into the newest queued chunk (up to PTY_STREAM_MAX_CHUNK)."""
+    if queued is None or chunk is None or len(queued) + len(chunk) > PTY_STREAM_MAX_CHUNK:
+        return None
+    return queued + chunk
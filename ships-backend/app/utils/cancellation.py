@@ -0,0 +1,275 @@
+"""
+Cooperative cancellation for pipeline runs.
+
+Cancelling the pipeline task stops the graph, and with it any in-flight async
+LLM call. It does not stop work that already left the event loop: sync tools
+run in executor threads, and `npm install` / `npm run build` run in child
+processes that outlive the Python code that started them.
+
+Each run gets a CancelToken, bound in a ContextVar. asyncio tasks and
+run_in_executor / asyncio.to_thread copy the context, so tools and validator
+layers deep inside the graph find the token of the run that called them.
+Code that starts a subprocess puts it in its own process group and tracks it
+on the token; cancelling the token kills the whole group (npm and everything
+it spawned) from whichever thread cancels.
+
+Tokens of live runs are registered in `cancel_registry` under the run's
+keys (broker run id, AgentRun id), which is how the cancel endpoints and the
+run broker's disconnect policy reach them.
+
+Usage:
+    token = CancelToken(run_id)
+    bind_cancel_token(token)          # in the task that drives the graph
+    ...
+    result = run_subprocess("npm run build", shell=True, cwd=path, timeout=120)
+    ...
+    cancel_registry.cancel(run_id, "cancel requested")   # from any thread
+"""
+
+import os
+import signal
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Optional, Callable, List, Any, Iterator, Dict
+
+logger = logging.getLogger("ships.cancel")
+
+_current_token: ContextVar[Optional["CancelToken"]] = ContextVar("ships_cancel_token", default=None)
+
+
+class RunCancelled(Exception):
+    """Raised by cancellation-aware code when its run has been cancelled."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Run cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag for one run, plus the cleanup to do on cancel.
+
+    Callbacks registered with on_cancel() run once, in the cancelling thread,
+    and must not block (killing a process group is fine).
+    """
+
+    def __init__(self, run_id: str = ""):
+        self.run_id = run_id
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the run. Returns False if it was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        logger.info(f"[CANCEL] 🛑 Run {self.run_id or '?'} cancelled ({reason}), {len(callbacks)} cleanups")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[CANCEL] Cleanup failed: {e}")
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RunCancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run `callback` when the token is cancelled (right away if it already is).
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @contextmanager
+    def track_process(self, process: Any) -> Iterator[None]:
+        """Kill `process`'s group if the run is cancelled while inside the block."""
+        remove = self.on_cancel(lambda: kill_process_tree(process))
+        try:
+            yield
+        finally:
+            remove()
+
+
+# ----------------------------------------------------------------------
+# Run binding
+# ----------------------------------------------------------------------
+
+def bind_cancel_token(token: CancelToken) -> Token:
+    """Make `token` the current run's token in this context (and tasks/threads it spawns)."""
+    return _current_token.set(token)
+
+
+def unbind_cancel_token(reset: Token) -> None:
+    _current_token.reset(reset)
+
+
+def current_cancel_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def raise_if_cancelled() -> None:
+    """Raise RunCancelled if the current run has been cancelled (no-op outside a run)."""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+class CancelRegistry:
+    """
+    Live runs' cancel tokens by key. A token may be registered under several
+    keys (e.g. the broker's stream id and the AgentRun id).
+
+    Singleton: use `CancelRegistry.get_instance()` or the module-level `cancel_registry`.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        self._tokens: Dict[str, CancelToken] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._cancelled = 0
+
+    @classmethod
+    def get_instance(cls) -> "CancelRegistry":
+        if cls._instance is None:
+            cls._instance = CancelRegistry()
+        return cls._instance
+
+    def register(self, key: str, token: CancelToken) -> None:
+        with self._lock:
+            self._tokens[key] = token
+
+    def unregister(self, key: str) -> None:
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def get(self, key: str) -> Optional[CancelToken]:
+        with self._lock:
+            return self._tokens.get(key)
+
+    def cancel(self, key: str, reason: str = "cancel requested") -> bool:
+        """Cancel the run registered under `key`. False if unknown or already cancelled."""
+        token = self.get(key)
+        if token is None or not token.cancel(reason):
+            return False
+        self._cancelled += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            live = len({id(t) for t in self._tokens.values()})
+        return {"live_runs": live, "cancelled": self._cancelled}
+
+
+# ----------------------------------------------------------------------
+# Process groups
+# ----------------------------------------------------------------------
+
+def new_process_group_kwargs() -> dict:
+    """
+    Popen / create_subprocess_* kwargs that start the child in its own
+    process group, so kill_process_tree() also reaches its children.
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process: Any) -> None:
+    """
+    Kill a process started with new_process_group_kwargs() and everything it spawned.
+
+    Accepts a subprocess.Popen or an asyncio subprocess; safe to call from
+    any thread and on processes that already exited.
+    """
+    if getattr(process, "returncode", None) is not None:
+        return
+    pid = process.pid
+    try:
+        if os.name == "nt":
+            subprocess.run(f"taskkill /F /T /PID {pid}", shell=True, capture_output=True)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError as e:
+        logger.debug(f"[CANCEL] killpg({pid}) failed: {e}")
+
+
+def run_subprocess(args, *, timeout: Optional[float] = None,
+                   cancel_token: Optional[CancelToken] = None, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(capture_output=True) that kills the whole process group on
+    timeout or when the run is cancelled.
+
+    Args:
+        args: Command (list, or string with shell=True)
+        timeout: Seconds before the group is killed and TimeoutExpired is raised
+        cancel_token: Token to honour (default: the current run's token)
+        **kwargs: Passed to Popen (cwd, shell, text, env, ...)
+
+    Raises:
+        subprocess.TimeoutExpired: Timed out (the process group is already dead)
+        RunCancelled: The run was cancelled before or while the command ran
+    """
+    token = cancel_token or current_cancel_token()
+    if token is not None:
+        token.raise_if_cancelled()
+
+    kwargs.setdefault("stdout", subprocess.PIPE)
+    kwargs.setdefault("stderr", subprocess.PIPE)
+    process = subprocess.Popen(args, **new_process_group_kwargs(), **kwargs)
+    remove = token.on_cancel(lambda: kill_process_tree(process)) if token is not None else None
+    try:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(process)
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(process.args, timeout, output=stdout, stderr=stderr)
+        except BaseException:
+            kill_process_tree(process)
+            process.wait()
+            raise
+    finally:
+        if remove is not None:
+            remove()
+
+    if token is not None and token.cancelled:
+        raise RunCancelled(token.reason or "cancelled")
+    return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+
+# Global instance
+cancel_registry = CancelRegistry.get_instance()
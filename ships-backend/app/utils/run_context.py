@@ -0,0 +1,90 @@
+"""
+Run-scoped context: which project, run and user the current code works for.
+
+Tools used to find the project through get_project_root(), which fell back to
+the process-global `preview_manager.current_project_path` - and the pipeline
+rewrote that global whenever a node reported a new path. Two runs on
+different projects in one process could read and write each other's files.
+
+Each run now gets a RunContext, created once by the pipeline and propagated
+the way the event bus and cancel token are:
+
+- ContextVar: bound in the run's graph task, so every node, the tasks
+  LangGraph spawns and tool threads (asyncio.to_thread / run_in_executor /
+  copy_context().run) see it
+- LangGraph config: configurable[RUN_CONTEXT_KEY], for code handed a
+  RunnableConfig outside the run's context (current_run_context(config))
+
+There is no global fallback: outside a run there is no project root.
+
+Usage:
+    ctx = RunContext(run_id=..., user_id=..., project_root=project_path)
+    bind_run_context(ctx)                 # in the run's task
+    config["configurable"][RUN_CONTEXT_KEY] = ctx
+
+    current_run_context()                 # anywhere inside the run
+    run_project_root()                    # shorthand for the project root
+"""
+
+from dataclasses import dataclass, field
+from contextvars import ContextVar, Token
+from typing import Optional, Dict, Any, Mapping
+
+RUN_CONTEXT_KEY = "ships_run_context"
+
+_current_context: ContextVar[Optional["RunContext"]] = ContextVar("ships_run_context", default=None)
+
+
+@dataclass
+class RunContext:
+    """
+    Identity and workspace of one run.
+
+    project_root can move during the run (e.g. scaffolding into a new
+    folder); it is updated here, for this run only. usage is the run's LLM
+    usage ledger (RunUsage, app/services/token_accounting.py).
+    """
+
+    run_id: Optional[str] = None
+    user_id: Optional[str] = None
+    project_root: Optional[str] = None
+    thread_id: Optional[str] = None
+    settings: Dict[str, Any] = field(default_factory=dict)
+    usage: Optional[Any] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "user_id": self.user_id,
+            "project_root": self.project_root,
+            "thread_id": self.thread_id,
+        }
+
+
+def bind_run_context(context: RunContext) -> Token:
+    """Scope `context` to this task (and the tasks / threads it spawns)."""
+    return _current_context.set(context)
+
+
+def unbind_run_context(token: Token) -> None:
+    _current_context.reset(token)
+
+
+def current_run_context(config: Optional[Mapping[str, Any]] = None) -> Optional[RunContext]:
+    """
+    The RunContext of the run executing this code.
+
+    Args:
+        config: LangGraph / RunnableConfig to fall back to when called
+            outside the run's context
+    """
+    context = _current_context.get()
+    if context is None and config:
+        context = (config.get("configurable") or {}).get(RUN_CONTEXT_KEY)
+    return context
+
+
+def run_project_root(config: Optional[Mapping[str, Any]] = None) -> Optional[str]:
+    """Project root of the current run (None outside a run)."""
+    context = current_run_context(config)
+    return context.project_root if context is not None else None
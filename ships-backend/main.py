@@ -8,11 +8,20 @@ from app.auth import router as auth_router, get_current_user
 from app.api.auth_routes import router as google_auth_router
 from app.services.preview_manager import preview_manager
 from app.services.usage_tracker import usage_tracker
-from app.database import health_check, close_database
+from app.database import (
+    health_check,
+    close_database,
+    init_checkpointer,
+    close_checkpointer,
+    checkpointer_health_check,
+    get_checkpointer_stats,
+)
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 import os
+import math
+import asyncio
 import logging
 
 # Initialize centralized logging FIRST
@@ -47,6 +56,17 @@ async def startup_event():
     if not db_healthy:
         logger.warning("⚠ Database not available - some features may be limited")
     
+    # Open the checkpointer pool and run checkpoint migrations ONCE
+    await init_checkpointer()
+    
+    # Compile the agent graph once so the first prompt doesn't pay for it
+    try:
+        from app.graphs.graph_registry import graph_registry
+        compile_ms = graph_registry.warm()
+        logger.info(f"[STARTUP] 🏗️ Agent graph pre-compiled in {compile_ms:.1f}ms (saved on every run)")
+    except Exception as e:
+        logger.warning(f"[STARTUP] ⚠️ Graph pre-compile failed, will compile on first request: {e}")
+    
     logger.info("✓ Startup complete")
 
 # Shutdown event
@@ -54,6 +74,34 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down...")
+    try:
+        from app.graphs.graph_registry import graph_registry
+        stats = graph_registry.get_stats()
+        logger.info(
+            f"[SHUTDOWN] 📊 Graph registry: {stats['runs_served']} runs served, "
+            f"{stats['compile_ms_saved']:.0f}ms compile time saved"
+        )
+    except Exception:
+        pass
+    try:
+        from app.core.cache import cache_manager
+        cache_stats = cache_manager.get_stats()
+        logger.info(
+            f"[SHUTDOWN] 🗄️ Context caches: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+            f"{cache_stats['creations']} created (avg {cache_stats['creation_ms_avg']:.0f}ms)"
+        )
+    except Exception:
+        pass
+    try:
+        from app.agents.mini_agents.rule_classifier import rule_classifier
+        intent_stats = rule_classifier.get_stats()
+        logger.info(
+            f"[SHUTDOWN] 🧭 Intent paths: {intent_stats['paths']}, "
+            f"LLM fallback rate {intent_stats['llm_fallback_rate']:.0%}"
+        )
+    except Exception:
+        pass
+    await close_checkpointer()
     await close_database()
     logger.info("✓ Shutdown complete")
 
@@ -310,10 +358,19 @@ class PromptRequest(BaseModel):
 from fastapi.responses import StreamingResponse
 import json
 from app.streaming.pipeline import stream_pipeline
-
-import re
+from app.streaming.replay import run_streams
+from app.streaming.run_broker import run_broker
+from app.streaming.framing import negotiate as negotiate_framing
+from app.streaming.bounded_queue import stream_queue_stats
+from app.streaming.run_scheduler import run_scheduler, RunRejected
+from app.streaming.run_owner import resolve_run_owner
+from app.services.llm_gateway import llm_gateway
+from app.services.model_policy import model_policy
+from app.streaming.json_stream import JsonStreamScanner, VALUE as JSON_VALUE, VALUE_DELTA as JSON_VALUE_DELTA
 
 class JsonValueFilter:
+    """Streams the string values of selected keys out of chunked JSON (see app/streaming/json_stream.py)."""
+
     def __init__(self, target_keys=None):
         # Comprehensive list based on planner/models.py
         self.target_keys = target_keys or [
@@ -321,39 +378,17 @@ class JsonValueFilter:
             "path", "command", "assertion", "mitigation", 
             "detailed_description", "mvs_verification", "notes"
         ]
-        self.buffer = ""
-        self.is_capturing = False
-        self.key_pattern = re.compile(r'"(' + '|'.join(self.target_keys) + r')"\s*:\s*"')
+        self.scanner = JsonStreamScanner(capture_keys=self.target_keys, collect_objects=False)
 
     def process_chunk(self, chunk: str) -> str:
-        self.buffer += chunk
-        output = ""
-        
-        while True:
-            if self.is_capturing:
-                # Look for unescaped quote to end the value
-                match = re.search(r'(?<!\\)"', self.buffer)
-                if match:
-                    end_idx = match.start()
-                    val = self.buffer[:end_idx]
-                    # Use space separator, not newline. Frontend handles line breaks.
-                    output += val + " "
-                    self.is_capturing = False
-                    self.buffer = self.buffer[match.end():]
-                else:
-                    output += self.buffer
-                    self.buffer = "" # Consumed all
-                    break
-            else:
-                match = self.key_pattern.search(self.buffer)
-                if match:
-                    self.is_capturing = True
-                    self.buffer = self.buffer[match.end():] # Start of value
-                else:
-                    # Keep tail
-                    if len(self.buffer) > 40: self.buffer = self.buffer[-40:]
-                    break
-        return output
+        output = []
+        for event in self.scanner.feed(chunk):
+            if event.kind == JSON_VALUE_DELTA:
+                output.append(event.value)
+            elif event.kind == JSON_VALUE:
+                # Use space separator, not newline. Frontend handles line breaks.
+                output.append(" ")
+        return "".join(output)
 
 @agent_router.post("/run")
 async def run_agent(request: Request, body: PromptRequest):
@@ -361,7 +396,9 @@ async def run_agent(request: Request, body: PromptRequest):
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     logger = logging.getLogger("ships.agent")
     
-    # Determine project path: use provided, fall back to preview_manager's current project
+    # Determine project path: use provided, fall back to preview_manager's current project.
+    # Resolved once, here: the run works against its own RunContext from now on
+    # (app/utils/run_context.py), never the global preview path.
     effective_project_path = body.project_path or preview_manager.current_project_path
     
     # Log the FULL raw input
@@ -395,39 +432,109 @@ async def run_agent(request: Request, body: PromptRequest):
             detail="No project folder selected. Please use the Electron app to select a project folder first."
         )
     
+    # Admission control: past capacity the run queues (by tier) or is shed
+    # here, before it costs anything (see run_scheduler.py)
+    owner, tier = await resolve_run_owner(request)
+    try:
+        ticket = run_scheduler.submit(owner, tier)
+    except RunRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many runs in progress ({e.reason}). Please retry shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after_s)))},
+        )
+
     usage_tracker.record_usage(client_ip, user_id)
     logger.info(f"[API] Usage recorded for IP: {client_ip}")
 
-    async def response_generator():
-        try:
-            logger.info("[STREAM] 🚀 Starting agent pipeline stream...")
-            logger.info(f"[STREAM] Passing to stream_pipeline: '{body.prompt[:100]}...'")
-            
-            # CRITICAL FIX: Pass user_id so run_id can be generated for step tracking
-            async for chunk in stream_pipeline(
-                body.prompt, 
-                project_path=effective_project_path, 
-                settings=body.settings, 
-                artifact_context=body.artifact_context,
-                user_id=user_id  # Pass user_id for run tracking
-            ):
-                yield chunk
-
-            
-            logger.info("[STREAM] Pipeline completed successfully")
-            
-            # Emit completion event (if not already handled by stream_pipeline)
-            yield json.dumps({
-                "type": "block_end",
-                "final_content": "Pipeline completed.",
-                "duration_ms": 0
-            }) + "\n"
-            
-        except Exception as e:
-            logger.error(f"[STREAM] Pipeline error: {e}", exc_info=True)
-            yield json.dumps({"type": "error", "content": str(e)}) + "\n"
-
-    return StreamingResponse(response_generator(), media_type="application/x-ndjson")
+    # The run is owned by the broker (background task + replay buffer); this
+    # response is just one subscriber. If it drops and nobody resumes within
+    # RUN_ORPHAN_GRACE_S, the broker cancels the run (see run_broker.py).
+    async def produce():
+        logger.info("[STREAM] 🚀 Starting agent pipeline stream...")
+        logger.info(f"[STREAM] Passing to stream_pipeline: '{body.prompt[:100]}...'")
+        
+        # CRITICAL FIX: Pass user_id so run_id can be generated for step tracking
+        async for chunk in stream_pipeline(
+            body.prompt, 
+            project_path=effective_project_path, 
+            settings=body.settings, 
+            artifact_context=body.artifact_context,
+            user_id=user_id  # Pass user_id for run tracking
+        ):
+            yield chunk
+        
+        logger.info("[STREAM] Pipeline completed successfully")
+        
+        # Emit completion event (if not already handled by stream_pipeline)
+        yield json.dumps({
+            "type": "block_end",
+            "final_content": "Pipeline completed.",
+            "duration_ms": 0
+        })
+
+    # The pipeline only starts once the scheduler admits the run; until then
+    # the stream carries run:queued position updates
+    run = run_broker.start(run_scheduler.run(ticket, produce()), owner=owner)
+    run.task.add_done_callback(lambda _: run_scheduler.release(ticket))  # Even if never started
+    # First line tells the client how to resume (GET /agent/run/{stream_id}/stream)
+    run.stream.append(json.dumps({"type": "stream:resumable", "stream_id": run.run_id}))
+    subscriber = run_broker.subscribe(run.run_id, name="chat")
+
+    # Compression / compact framing per Accept-Encoding and X-Stream-Options
+    framing = negotiate_framing(request.headers, client_ip)
+    return StreamingResponse(
+        framing.stream(subscriber.lines()),
+        media_type=framing.media_type,
+        headers={"X-Stream-Id": run.run_id, **framing.response_headers()},
+    )
+
+@agent_router.get("/run/{stream_id}/stream")
+async def resume_agent_stream(stream_id: str, request: Request, after: Optional[int] = None):
+    """
+    Attach to a run's NDJSON stream (reconnects, a second window, `curl -N` tails).
+    
+    Replays every line with seq > `after` (or the Last-Event-ID header),
+    then follows live output until the run finishes.
+    """
+    if after is None:
+        last_event_id = request.headers.get("Last-Event-ID")
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    # Only the client that started the run may read it
+    owner, _ = await resolve_run_owner(request)
+    if run_broker.get_owned(stream_id, owner) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired stream")
+    subscriber = run_broker.subscribe(stream_id, after_seq=after, name="resume")
+    if subscriber is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired stream")
+    
+    run_streams.record_resume()
+    logger.info(f"[STREAM] 🔁 Resuming stream {stream_id} after seq {after} (last seq {subscriber.run.stream.last_seq})")
+    framing = negotiate_framing(request.headers, request.client.host if request.client else None)
+    return StreamingResponse(
+        framing.stream(subscriber.lines()),
+        media_type=framing.media_type,
+        headers={"X-Stream-Id": stream_id, **framing.response_headers()},
+    )
+
+@agent_router.post("/run/{stream_id}/cancel")
+async def cancel_agent_run(stream_id: str, request: Request):
+    """Cancel a live run: stops the graph and kills its subprocess groups."""
+    owner, _ = await resolve_run_owner(request)
+    if run_broker.get_owned(stream_id, owner) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired stream")
+    cancelled = run_broker.cancel(stream_id)
+    logger.info(f"[STREAM] 🛑 Cancel requested for stream {stream_id} (live: {cancelled})")
+    return {"stream_id": stream_id, "cancelled": cancelled}
+
+@agent_router.get("/runs/live")
+async def list_live_runs(request: Request):
+    """The caller's live runs, plus broker, stream queue, scheduler and gateway stats."""
+    owner, _ = await resolve_run_owner(request)
+    return {"runs": run_broker.list_runs(owner=owner), "stats": run_broker.get_stats(), "queues": stream_queue_stats(),
+            "scheduler": run_scheduler.get_stats(), "llm_gateway": llm_gateway.get_stats(),
+            "model_policy": model_policy.get_stats()}
 
 # Include Routers
 app.include_router(auth_router, tags=["Authentication"])
@@ -454,3 +561,11 @@ app.include_router(runs_router)
 @app.get("/")
 def read_root():
     return {"message": "ShipS* Backend is Running"}
+
+@app.get("/health/checkpointer")
+async def checkpointer_health():
+    """Checkpoint storage health and connection pool usage."""
+    return {
+        "healthy": await checkpointer_health_check(),
+        **get_checkpointer_stats(),
+    }
@@ -0,0 +1,39 @@
+"""add_llm_usage_columns
+
+Revision ID: 7d2e4b1a9c30
+Revises: 5ca99d237685
+Create Date: 2026-01-20 12:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4b1a9c30'
+down_revision: Union[str, None] = '5ca99d237685'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USAGE_COLUMNS = (
+    'input_tokens', 'output_tokens', 'cached_tokens', 'thinking_tokens',
+    'llm_calls', 'llm_latency_ms',
+)
+
+
+def upgrade() -> None:
+    for table in ('agent_steps', 'agent_runs'):
+        for name in USAGE_COLUMNS:
+            op.add_column(table, sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('cost_usd', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('agent_runs', sa.Column('tokens_used', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('agent_runs', 'tokens_used')
+    for table in ('agent_runs', 'agent_steps'):
+        op.drop_column(table, 'cost_usd')
+        for name in reversed(USAGE_COLUMNS):
+            op.drop_column(table, name)
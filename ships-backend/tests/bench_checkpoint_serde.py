@@ -0,0 +1,157 @@
+"""
+Checkpoint size / write latency benchmark.
+
+Replays a 30-step agent run channel-by-channel (the way LangGraph writes
+checkpoint blobs: only channels that changed on a step are serialized) through
+the default JsonPlusSerializer and the CompactSerializer, and reports bytes
+written and serialization time per step.
+
+Usage:
+    python tests/bench_checkpoint_serde.py                 # synthetic 30-step run
+    python tests/bench_checkpoint_serde.py run.jsonl       # recorded run
+
+A recorded run is JSONL, one state update (channel -> new value) per line.
+Messages are given as {"role": "human"|"ai"|"tool", "content": "..."}.
+"""
+
+import sys
+import os
+import json
+import time
+import random
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.database.checkpoint_serde import CompactSerializer, MemoryArtifactStore
+
+
+STEPS = 30
+NODE_CYCLE = ["orchestrator", "planner", "orchestrator", "coder", "orchestrator", "validator", "fixer"]
+
+
+def _to_message(m):
+    if isinstance(m, dict) and "role" in m:
+        if m["role"] == "human":
+            return HumanMessage(content=m["content"])
+        if m["role"] == "tool":
+            return ToolMessage(content=m["content"], tool_call_id=m.get("tool_call_id", "call"))
+        return AIMessage(content=m["content"])
+    return m
+
+
+def synthetic_run(steps: int = STEPS):
+    """Yield per-step channel updates shaped like AgentGraphState."""
+    rng = random.Random(42)
+    words = "component state hook props render route fetch api schema test build lint".split()
+
+    def text(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    plan = {
+        "summary": text(80),
+        "tasks": [
+            {"id": i, "title": text(6), "description": text(60), "files": [f"src/components/C{i}.tsx"]}
+            for i in range(40)
+        ],
+        "dependencies": {f"pkg-{i}": f"^{i}.0.0" for i in range(30)},
+    }
+    folder_map = {"entries": [{"path": f"src/components/C{i}.tsx", "role": text(8)} for i in range(120)]}
+    contracts = {"endpoints": [{"path": f"/api/r{i}", "method": "GET", "schema": text(30)} for i in range(25)]}
+
+    messages = [HumanMessage(content="Build me a kanban board with drag and drop")]
+    events = []
+    artifacts = {"project_path": "/projects/kanban"}
+
+    for step in range(steps):
+        node = NODE_CYCLE[step % len(NODE_CYCLE)]
+        update = {"phase": node, "current_step": step}
+
+        if node == "planner" and "plan_manifest" not in artifacts:
+            artifacts = {**artifacts, "plan_manifest": plan, "folder_map": folder_map, "api_contracts": contracts}
+        elif node == "validator":
+            artifacts = {**artifacts, "validation_report": {"status": rng.choice(["pass", "fail"]), "errors": [text(20)]}}
+        elif node == "fixer":
+            artifacts = {**artifacts, "fix_request": {"attempt": step, "errors": [text(25)]}}
+        # Nodes hand back the whole artifacts dict every step
+        update["artifacts"] = artifacts
+
+        messages = messages + [AIMessage(content=text(rng.randint(150, 400)))]
+        if node in ("coder", "fixer"):
+            messages = messages + [ToolMessage(content=text(200), tool_call_id=f"call_{step}")]
+        update["messages"] = messages
+
+        events = events + [{"type": "thinking", "node": node, "content": text(40)} for _ in range(6)]
+        update["stream_events"] = events
+
+        yield update
+
+
+def recorded_run(path: str):
+    """Yield per-step channel updates from a JSONL recording (accumulated like the graph reducers)."""
+    state = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            update = json.loads(line)
+            if "messages" in update:
+                update["messages"] = state.get("messages", []) + [_to_message(m) for m in update["messages"]]
+            if "stream_events" in update:
+                update["stream_events"] = state.get("stream_events", []) + update["stream_events"]
+            state.update(update)
+            yield update
+
+
+def bench(serde, updates, store=None):
+    rows = []
+    for update in updates:
+        store_before = _store_bytes(store)
+        start = time.perf_counter()
+        size = 0
+        for value in update.values():
+            _, data = serde.dumps_typed(value)
+            size += len(data)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        size += _store_bytes(store) - store_before
+        rows.append((size, elapsed_ms))
+    return rows
+
+
+def _store_bytes(store) -> int:
+    if store is None:
+        return 0
+    return sum(len(b) for b in store._blobs.values())
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    updates = list(recorded_run(source) if source else synthetic_run())
+
+    default_rows = bench(JsonPlusSerializer(), updates)
+    store = MemoryArtifactStore()
+    compact = CompactSerializer(store)
+    compact_rows = bench(compact, updates, store)
+
+    print(f"Checkpoint writes over {len(updates)} steps ({'recorded: ' + source if source else 'synthetic run'})")
+    print(f"{'step':>4} | {'default KB':>10} {'ms':>7} | {'compact KB':>10} {'ms':>7}")
+    print("-" * 50)
+    for i, ((d_size, d_ms), (c_size, c_ms)) in enumerate(zip(default_rows, compact_rows)):
+        print(f"{i:>4} | {d_size / 1024:>10.1f} {d_ms:>7.2f} | {c_size / 1024:>10.1f} {c_ms:>7.2f}")
+
+    d_total = sum(r[0] for r in default_rows)
+    c_total = sum(r[0] for r in compact_rows)
+    d_ms = sum(r[1] for r in default_rows)
+    c_ms = sum(r[1] for r in compact_rows)
+    print("-" * 50)
+    print(f"{'sum':>4} | {d_total / 1024:>10.1f} {d_ms:>7.1f} | {c_total / 1024:>10.1f} {c_ms:>7.1f}")
+    print(f"\nBytes written: {c_total / d_total:.1%} of default ({d_total / max(c_total, 1):.1f}x smaller)")
+    print(f"Write latency: {c_ms / len(updates):.2f}ms/step vs {d_ms / len(updates):.2f}ms/step")
+    print(f"Serde stats:   {compact.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Graph event rendering benchmark: per-event CPU of GraphEventRenderer.
+
+Replays an event trace (what _pump_graph_events pulls off astream_events v2,
+plus event bus UI events) through a fresh renderer, the way stream_pipeline
+does, and reports events/sec and microseconds per event by event type.
+With --profile, the hottest functions from cProfile are printed too.
+
+Usage:
+    python tests/bench_graph_events.py                      # synthetic run
+    python tests/bench_graph_events.py trace.jsonl          # recorded run
+    python tests/bench_graph_events.py --record trace.jsonl # write the synthetic trace
+    python tests/bench_graph_events.py --profile
+
+A trace is JSONL, one event per line:
+    {"event": "on_chat_model_stream", "name": "...", "data": {"chunk": {"content": "..."}}}
+    {"event": "on_tool_end", "name": "...", "data": {"input": {...}, "output": {"content": "..."}}}
+    {"ui": {"type": "thinking", "agent": "coder", "content": "...", "metadata": {}}}
+Chunks and tool outputs given as {"content": ...} are replayed as message
+objects (they are AIMessageChunk / ToolMessage in a live run).
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import cProfile
+import pstats
+from collections import defaultdict
+from types import SimpleNamespace
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.streaming.stream_events import StreamBlockManager
+from app.streaming.graph_events import GraphEventRenderer
+
+ROUNDS = 20
+
+
+def synthetic_trace(tasks: int = 8, seed: int = 7):
+    rng = random.Random(seed)
+    words = "the component state should render props then we fetch data and update the route".split()
+    trace = []
+
+    def tokens(agent_text_len):
+        for _ in range(agent_text_len):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) + " "
+            trace.append({"event": "on_chat_model_stream", "name": "ChatGoogleGenerativeAI",
+                          "data": {"chunk": {"content": text}}})
+
+    def tool(name, tool_input, output):
+        trace.append({"event": "on_tool_start", "name": name, "data": {"input": tool_input}})
+        trace.append({"event": "on_tool_end", "name": name,
+                      "data": {"input": tool_input, "output": {"content": json.dumps(output)}}})
+
+    trace.append({"event": "on_chain_start", "name": "orchestrator", "data": {}})
+    trace.append({"event": "on_chat_model_stream", "name": "ChatGoogleGenerativeAI",
+                  "data": {"chunk": {"content": '{"description": "Build a todo app with filters", "scope": "feature"}'}}})
+    trace.append({"event": "on_chain_end", "name": "orchestrator", "data": {"output": {"phase": "planning"}}})
+
+    trace.append({"event": "on_chain_start", "name": "planner", "data": {}})
+    tokens(300)
+    trace.append({"event": "on_chain_end", "name": "planner", "data": {"output": {
+        "summary": "A todo app with filters and local persistence.",
+        "reasoning": "Component-per-concern layout. " * 20,
+        "tasks": [{"title": f"Task {i}", "complexity": "medium"} for i in range(tasks)],
+        "folders": [{"path": f"src/components/Item{i}.tsx"} for i in range(tasks * 2)],
+        "dependencies": {"runtime": ["react", "react-dom", "zustand", "clsx"]},
+        "decision_notes": ["Zustand over context", "CSS modules"],
+        "risks": [{"description": "localStorage quota"}],
+    }}})
+
+    for i in range(tasks):
+        trace.append({"event": "on_chain_start", "name": "coder", "data": {}})
+        trace.append({"ui": {"type": "thinking", "agent": "coder", "content": f"Implementing task {i}",
+                             "metadata": {"task_title": f"Task {i}", "expected_files": ["a.tsx", "b.tsx"]}}})
+        tokens(120)
+        for f in range(2):
+            path = f"src/components/Item{i}_{f}.tsx"
+            tool("write_file_to_disk", {"file_path": path, "content": "x" * 2000},
+                 {"success": True, "message": f"Wrote {path}"})
+            trace.append({"ui": {"type": "file_written", "agent": "coder", "content": path,
+                                 "metadata": {"action": "write"}}})
+        tool("run_terminal_command", {"command": "npx tsc --noEmit"}, {"success": True, "output": "ok"})
+        trace.append({"event": "on_chain_end", "name": "coder", "data": {"output": {"implementation_complete": False}}})
+
+    tool("install_dependencies", {"packages": ["zustand"]}, {"success": True, "message": "Installed 1 package"})
+    trace.append({"ui": {"type": "validation_complete", "agent": "validator", "content": "All layers passed",
+                         "metadata": {"passed": True}}})
+    return trace
+
+
+def materialize(trace):
+    """Trace records -> what the pipeline loop sees (message objects, not dicts)."""
+    items = []
+    for record in trace:
+        if "ui" in record:
+            items.append(record["ui"])
+            continue
+        data = dict(record.get("data", {}))
+        if isinstance(data.get("chunk"), dict):
+            data["chunk"] = SimpleNamespace(**data["chunk"])
+        if isinstance(data.get("output"), dict) and set(data["output"]) == {"content"}:
+            data["output"] = SimpleNamespace(**data["output"])
+        items.append({**record, "data": data})
+    return items
+
+
+def replay(items, per_type=None):
+    renderer = GraphEventRenderer(StreamBlockManager())
+    out = 0
+    for item in items:
+        start = time.perf_counter()
+        if "event" in item:
+            lines = renderer.render(item)
+            kind = item["event"]
+        else:
+            lines = renderer.render_ui_event(item)
+            kind = f"ui:{item.get('type')}"
+        for line in lines:
+            out += len(line)
+        if per_type is not None:
+            per_type[kind][0] += 1
+            per_type[kind][1] += time.perf_counter() - start
+    return out
+
+
+def main():
+    args = sys.argv[1:]
+    profile = "--profile" in args
+    if "--record" in args:
+        path = args[args.index("--record") + 1]
+        with open(path, "w", encoding="utf-8") as f:
+            for record in synthetic_trace():
+                f.write(json.dumps(record) + "\n")
+        print(f"Wrote synthetic trace to {path}")
+        return
+
+    paths = [a for a in args if not a.startswith("--")]
+    if paths:
+        with open(paths[0], encoding="utf-8") as f:
+            trace = [json.loads(line) for line in f if line.strip()]
+    else:
+        trace = synthetic_trace()
+    items = materialize(trace)
+
+    replay(items)  # warm up
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        replay(items)
+    elapsed = time.perf_counter() - start
+    total = len(items) * ROUNDS
+    print(f"{len(items)} events x {ROUNDS} rounds: {elapsed * 1000:.1f}ms, "
+          f"{total / elapsed:,.0f} events/s, {elapsed / total * 1e6:.2f}us/event\n")
+
+    per_type = defaultdict(lambda: [0, 0.0])
+    for _ in range(ROUNDS):
+        replay(items, per_type)
+    print(f"{'event':<28}{'count':>8}{'us/event':>11}")
+    for kind, (count, seconds) in sorted(per_type.items(), key=lambda kv: -kv[1][1]):
+        print(f"{kind:<28}{count // ROUNDS:>8}{seconds / count * 1e6:>11.2f}")
+
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for _ in range(ROUNDS):
+            replay(items)
+        profiler.disable()
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
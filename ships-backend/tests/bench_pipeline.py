@@ -0,0 +1,195 @@
+"""
+End-to-end pipeline benchmark: our overhead, without model latency.
+
+Drives stream_pipeline (planner -> coder -> validator -> fixer) on the
+bundled project templates with the replay LLM backend (app/core/llm_replay.py),
+so runs are deterministic and fully offline. Reports per template:
+
+- wall time, and how much of it was (synthetic) model latency
+- CPU time per graph node (process CPU while the node ran; inclusive, and
+  overlapping nodes are each charged)
+- NDJSON events streamed, events/sec
+
+Recordings live in <fixtures>/<template>/<agent_type>.jsonl and are made once
+with a live key (--record). Tools really run against a fresh temp project
+per round (npm runs with npm_config_offline unless --online).
+
+Usage:
+    GEMINI_API_KEY=... python tests/bench_pipeline.py --record         # once
+    python tests/bench_pipeline.py                                      # replay
+    python tests/bench_pipeline.py --templates react-vite --rounds 3
+    python tests/bench_pipeline.py --first-token-ms 400 --chunk-ms 15  # synthetic latency
+    python tests/bench_pipeline.py --recorded-timing                   # recorded latency
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import shutil
+from collections import defaultdict
+from contextvars import ContextVar
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "pipeline")
+
+SCENARIOS = {
+    "react-vite": "Build a todo app with filters (all / active / done) and local persistence.",
+    "fastapi": "Build a REST API for notes with create, list, update and delete endpoints.",
+    "python-cli": "Build a CLI that counts words, lines and characters in the given files.",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--record", action="store_true", help="Run live and record fixtures")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--templates", default=",".join(SCENARIOS))
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=0.0)
+    parser.add_argument("--chunk-ms", type=float, default=0.0)
+    parser.add_argument("--recorded-timing", action="store_true")
+    parser.add_argument("--online", action="store_true", help="Let npm reach the network")
+    return parser.parse_args()
+
+
+def configure_env(args):
+    """Backend selection is read at import / model creation - set it first."""
+    os.environ["LLM_BACKEND"] = "record" if args.record else "replay"
+    os.environ["LLM_REPLAY_FIRST_TOKEN_MS"] = str(args.first_token_ms)
+    os.environ["LLM_REPLAY_CHUNK_MS"] = str(args.chunk_ms)
+    os.environ["LLM_REPLAY_LATENCY"] = "recorded" if args.recorded_timing else "synthetic"
+    if not args.online and not args.record:
+        os.environ.setdefault("npm_config_offline", "true")
+
+
+def node_cpu_tracker():
+    """Callback (installed for every run) charging process CPU to graph nodes."""
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.tracers.context import register_configure_hook
+
+    class NodeCPU(BaseCallbackHandler):
+        run_inline = True
+
+        def __init__(self):
+            self.open = {}
+            self.cpu = defaultdict(float)
+            self.wall = defaultdict(float)
+            self.calls = defaultdict(int)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            name = kwargs.get("name")
+            if name and (metadata or {}).get("langgraph_node") == name:
+                self.open[run_id] = (name, time.process_time(), time.perf_counter())
+
+        def _close(self, run_id):
+            opened = self.open.pop(run_id, None)
+            if opened:
+                name, cpu, wall = opened
+                self.cpu[name] += time.process_time() - cpu
+                self.wall[name] += time.perf_counter() - wall
+                self.calls[name] += 1
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._close(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._close(run_id)
+
+    handler_var = ContextVar("bench_node_cpu", default=None)
+    register_configure_hook(handler_var, True)
+    handler = NodeCPU()
+    handler_var.set(handler)
+    return handler
+
+
+async def run_once(template, prompt, round_no):
+    from app.streaming.pipeline import stream_pipeline
+
+    project = tempfile.mkdtemp(prefix=f"ships-bench-{template}-")
+    events = 0
+    kinds = defaultdict(int)
+    error = None
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        async for chunk in stream_pipeline(prompt, thread_id=f"bench-{template}-{round_no}-{time.time_ns()}",
+                                           project_path=project):
+            for line in chunk.splitlines():
+                if not line.strip():
+                    continue
+                events += 1
+                try:
+                    kinds[json.loads(line).get("type")] += 1
+                except ValueError:
+                    pass
+    except Exception as e:
+        error = e
+    finally:
+        shutil.rmtree(project, ignore_errors=True)
+    return {
+        "wall_s": time.perf_counter() - start_wall,
+        "cpu_s": time.process_time() - start_cpu,
+        "events": events,
+        "kinds": kinds,
+        "error": error,
+    }
+
+
+async def main():
+    args = parse_args()
+    configure_env(args)
+
+    from app.prompts.project_templates import PROJECT_TEMPLATES
+    from app.core.llm_replay import set_fixtures_dir, llm_fixtures
+
+    tracker = node_cpu_tracker()
+    templates = [t for t in args.templates.split(",") if t]
+    rounds = 1 if args.record else args.rounds
+
+    for template in templates:
+        if template not in PROJECT_TEMPLATES:
+            print(f"Unknown template {template!r}, skipping")
+            continue
+        prompt = SCENARIOS.get(template, "Build a small starter project.") + \
+            f" Use {PROJECT_TEMPLATES[template]['stack']}."
+        fixtures = os.path.join(args.fixtures, template)
+        if not args.record and not os.path.isdir(fixtures):
+            print(f"{template}: no recordings in {fixtures} (run with --record once)")
+            continue
+        set_fixtures_dir(fixtures)
+
+        tracker.cpu.clear(); tracker.wall.clear(); tracker.calls.clear()
+        results = []
+        for round_no in range(rounds):
+            llm_fixtures().rewind()
+            results.append(await run_once(template, prompt, round_no))
+            results[-1]["model_s"] = llm_fixtures().latency_s
+
+        wall = sum(r["wall_s"] for r in results) / len(results)
+        cpu = sum(r["cpu_s"] for r in results) / len(results)
+        model = sum(r["model_s"] for r in results) / len(results)
+        events = sum(r["events"] for r in results) / len(results)
+        print(f"\n{template} ({'record' if args.record else 'replay'}, {len(results)} round(s))")
+        print(f"  wall {wall * 1000:.0f}ms (model {model * 1000:.0f}ms, overhead {(wall - model) * 1000:.0f}ms), "
+              f"cpu {cpu * 1000:.0f}ms")
+        print(f"  {events:.0f} events, {events / wall:,.0f} events/s")
+        if not args.record:
+            stats = llm_fixtures().get_stats()
+            print(f"  replay: {stats['exact']} exact, {stats['sequential']} in order, {stats['misses']} missed")
+        for r in results:
+            if r["error"] is not None:
+                print(f"  ! round failed: {r['error']!r}")
+
+        print(f"  {'node':<24}{'calls':>7}{'cpu ms':>10}{'wall ms':>10}")
+        for name, seconds in sorted(tracker.cpu.items(), key=lambda kv: -kv[1]):
+            print(f"  {name:<24}{tracker.calls[name] // rounds:>7}"
+                  f"{seconds / rounds * 1000:>10.1f}{tracker.wall[name] / rounds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+NDJSON delta coalescing benchmark.
+
+Feeds a synthetic high-thinking token stream (thousands of tiny chunks with
+a few ms between them, split across a handful of blocks) through
+StreamBlockManager with coalescing off and on, and reports lines and bytes on
+the wire plus encode throughput.
+
+Time is simulated, so results are deterministic and the run is instant.
+
+Usage:
+    python tests/bench_stream_coalescing.py                    # defaults
+    python tests/bench_stream_coalescing.py 20000 2 40         # chunks, ms between chunks, window ms
+"""
+
+import sys
+import os
+import time
+import random
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import app.streaming.stream_events as stream_events
+from app.streaming.stream_events import StreamBlockManager, BlockType
+
+
+class SimClock:
+    """Stands in for the `time` module inside stream_events."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def synthetic_chunks(count: int, seed: int = 7):
+    """Gemini-like thinking chunks: 1-6 words, occasional block switch."""
+    rng = random.Random(seed)
+    words = "the component state should render props then we fetch data and update the route".split()
+    for i in range(count):
+        new_block = i % 2000 == 0
+        yield new_block, " ".join(rng.choice(words) for _ in range(rng.randint(1, 6))) + " "
+
+
+def run(chunks, gap_ms: float, window_ms: float, max_bytes: int = 4096):
+    clock = SimClock()
+    real_time = stream_events.time
+    stream_events.time = clock
+    try:
+        mgr = StreamBlockManager(coalesce_ms=window_ms, coalesce_max_bytes=max_bytes)
+        lines = []
+        cpu_start = time.perf_counter()
+        sim_start = clock.now
+        for new_block, text in chunks:
+            clock.now += gap_ms / 1000
+            if new_block:
+                lines.append(mgr.start_block(BlockType.THINKING, "Thinking..."))
+            # What the pipeline loop does when the window elapses between chunks
+            deadline = mgr.pending_delta_deadline()
+            if deadline is not None and deadline <= 0:
+                lines.append(mgr.flush_delta())
+            lines.append(mgr.append_delta(text))
+        lines.append(mgr.end_current_block())
+        cpu_s = time.perf_counter() - cpu_start
+        sim_s = clock.now - sim_start
+    finally:
+        stream_events.time = real_time
+
+    wire = "".join(line + "\n" for part in lines if part for line in part.split("\n"))
+    return {
+        "lines": wire.count("\n"),
+        "bytes": len(wire.encode("utf-8")),
+        "lines_per_s": wire.count("\n") / sim_s if sim_s else 0.0,
+        "cpu_ms": cpu_s * 1000,
+        "deltas_in": mgr.deltas_in,
+        "delta_lines": mgr.delta_events_out,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    gap_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    window_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 40.0
+
+    chunks = list(synthetic_chunks(count))
+    before = run(chunks, gap_ms, window_ms=0)
+    after = run(chunks, gap_ms, window_ms=window_ms)
+
+    print(f"{count} chunks, {gap_ms:g} ms apart, window {window_ms:g} ms\n")
+    print(f"{'':<14}{'lines':>10}{'bytes':>12}{'lines/s':>12}{'cpu ms':>10}")
+    for label, r in (("per-chunk", before), ("coalesced", after)):
+        print(f"{label:<14}{r['lines']:>10}{r['bytes']:>12}{r['lines_per_s']:>12.0f}{r['cpu_ms']:>10.1f}")
+    print(
+        f"\nlines: -{1 - after['lines'] / before['lines']:.0%}   "
+        f"bytes: -{1 - after['bytes'] / before['bytes']:.0%}   "
+        f"({after['deltas_in']} deltas -> {after['delta_lines']} block_delta lines)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+astream_events throughput benchmark: unfiltered v1 vs filtered v2.
+
+Builds a small graph shaped like the agent pipeline (orchestrator -> planner
+-> coder -> validator), where every node makes read-only tool calls with
+large outputs, one UI-visible tool call, and streams an LLM response from a
+fake chat model replaying recorded text. The run is consumed both ways:
+
+- before: version="v1", no filters (what stream_pipeline used to do)
+- after:  version="v2", **UI_EVENT_FILTERS
+
+and reports events delivered, wall time and events/sec.
+
+Usage:
+    python tests/bench_stream_events.py                  # built-in responses
+    python tests/bench_stream_events.py responses.jsonl  # recorded run
+
+A recorded run is JSONL with one LLM response per line: {"content": "..."}.
+Responses are used in node order and cycled if there are fewer than nodes.
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+from typing import TypedDict, List
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from langgraph.graph import StateGraph, START, END
+
+from app.streaming.event_filter import UI_EVENT_FILTERS, tag_ui_tools
+
+
+NODES = ["orchestrator", "planner", "coder", "validator"]
+READS_PER_NODE = 6
+FILE_BODY = "export const value = 1;\n" * 800  # ~20 KB per read
+
+
+@tool
+def read_file_from_disk(file_path: str) -> str:
+    """Read a file."""
+    return FILE_BODY
+
+
+@tool
+def write_file_to_disk(file_path: str, content: str) -> str:
+    """Write a file."""
+    return json.dumps({"success": True, "message": f"Wrote {file_path}"})
+
+
+tag_ui_tools([read_file_from_disk, write_file_to_disk])
+
+
+class BenchState(TypedDict):
+    messages: List
+    notes: List[str]
+
+
+def load_responses(path=None) -> List[str]:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line)["content"] for line in f if line.strip()]
+    words = "Let me look at the component tree and update the routing so the page renders".split()
+    return [" ".join(words[i % len(words)] for i in range(400)) for _ in NODES]
+
+
+def build_graph(responses: List[str]):
+    graph = StateGraph(BenchState)
+
+    def make_node(index: int, name: str):
+        async def node(state: BenchState, config: RunnableConfig):
+            for i in range(READS_PER_NODE):
+                await read_file_from_disk.ainvoke({"file_path": f"src/f{i}.ts"}, config=config)
+            await write_file_to_disk.ainvoke({"file_path": f"src/{name}.ts", "content": "x"}, config=config)
+            model = GenericFakeChatModel(messages=iter([AIMessage(content=responses[index % len(responses)])]))
+            reply = await model.ainvoke([HumanMessage(content=name)], config=config)
+            return {"messages": state["messages"] + [reply], "notes": state["notes"] + [FILE_BODY[:2000]]}
+        return node
+
+    for i, name in enumerate(NODES):
+        graph.add_node(name, make_node(i, name))
+    graph.add_edge(START, NODES[0])
+    for a, b in zip(NODES, NODES[1:]):
+        graph.add_edge(a, b)
+    graph.add_edge(NODES[-1], END)
+    return graph.compile()
+
+
+async def consume(graph, **kwargs):
+    state = {"messages": [HumanMessage(content="build a todo app")], "notes": []}
+    count = 0
+    start = time.perf_counter()
+    async for event in graph.astream_events(state, **kwargs):
+        count += 1
+        # What the pipeline touches on every event before deciding to skip it
+        _ = event["event"], event.get("name"), event.get("data", {})
+    return count, time.perf_counter() - start
+
+
+async def main():
+    responses = load_responses(sys.argv[1] if len(sys.argv) > 1 else None)
+    graph = build_graph(responses)
+
+    before = await consume(graph, version="v1")
+    after = await consume(graph, version="v2", **UI_EVENT_FILTERS)
+
+    print(f"{len(NODES)} nodes, {READS_PER_NODE} read-only tool calls each\n")
+    print(f"{'':<22}{'events':>8}{'wall ms':>10}{'events/s':>10}")
+    for label, (count, secs) in (("v1, unfiltered", before), ("v2, UI_EVENT_FILTERS", after)):
+        print(f"{label:<22}{count:>8}{secs * 1000:>10.1f}{count / secs:>10.0f}")
+    print(f"\nevents: -{1 - after[0] / before[0]:.0%}   wall: -{1 - after[1] / before[1]:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Run stream framing benchmark: bytes on the wire per negotiated framing.
+
+Builds a synthetic run the way the pipeline does (StreamBlockManager with the
+default delta coalescing, seq-stamped by a RunStream) - thinking blocks,
+code blocks and tool results - then encodes it with each framing and
+reports wire bytes, ratio against plain NDJSON, and encode time.
+
+Usage:
+    python tests/bench_stream_framing.py            # 40 blocks
+    python tests/bench_stream_framing.py 200        # blocks
+"""
+
+import sys
+import os
+import time
+import random
+
+# Add app to path (assuming script is in ships-backend/tests/)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.streaming.stream_events import StreamBlockManager, BlockType
+from app.streaming.replay import RunStream
+from app.streaming.framing import StreamFraming, StreamEncoder, COMPACT, MSGPACK, GZIP, ZSTD
+from app.streaming import framing as framing_mod
+
+
+def synthetic_run(blocks: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = "the component state should render props then we fetch data and update the route".split()
+    code = "export function TodoItem({ todo }: Props) {\n  return <li>{todo.title}</li>;\n}\n"
+    mgr = StreamBlockManager(coalesce_ms=0)  # one line per chunk, worst case
+    stream = RunStream("bench", capacity=1_000_000)
+
+    for b in range(blocks):
+        kind = BlockType.CODE if b % 3 == 2 else BlockType.THINKING
+        stream.append(mgr.start_block(kind, f"Block {b}"))
+        for _ in range(rng.randint(20, 80)):
+            text = code if kind == BlockType.CODE else " ".join(rng.choice(words) for _ in range(rng.randint(1, 6))) + " "
+            delta = mgr.append_delta(text)
+            if delta:
+                stream.append(delta)
+        stream.append(mgr.end_current_block())
+        stream.append('{"type": "tool_result", "tool": "write_file_to_disk", "file": "src/TodoItem.tsx", "success": true}')
+    stream.close()
+    return [line + "\n" for _, line in stream.lines_after(0)]
+
+
+def encode(lines, framing):
+    enc = StreamEncoder(framing)
+    start = time.perf_counter()
+    out = len(enc.header())
+    for line in lines:
+        out += len(enc.encode(line))
+    out += len(enc.close())
+    return out, (time.perf_counter() - start) * 1000
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    lines = synthetic_run(blocks)
+    plain = sum(len(l.encode("utf-8")) for l in lines)
+
+    variants = [
+        ("ndjson", StreamFraming()),
+        ("ndjson + omit-final", StreamFraming(omit_final_content=True)),
+        ("compact + omit-final", StreamFraming(format=COMPACT, omit_final_content=True)),
+        ("ndjson / gzip", StreamFraming(encoding=GZIP)),
+        ("compact + omit / gzip", StreamFraming(format=COMPACT, encoding=GZIP, omit_final_content=True)),
+    ]
+    if framing_mod.msgpack is not None:
+        variants.append(("msgpack + omit / gzip", StreamFraming(format=MSGPACK, encoding=GZIP, omit_final_content=True)))
+    if framing_mod.zstandard is not None:
+        variants.append(("compact + omit / zstd", StreamFraming(format=COMPACT, encoding=ZSTD, omit_final_content=True)))
+
+    print(f"{len(lines)} lines, {plain / 1024:.1f} KB plain NDJSON ({blocks} blocks)\n")
+    print(f"{'framing':<26}{'KB':>10}{'ratio':>8}{'encode ms':>11}")
+    for label, framing in variants:
+        size, ms = encode(lines, framing)
+        print(f"{label:<26}{size / 1024:>10.1f}{size / plain:>8.0%}{ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
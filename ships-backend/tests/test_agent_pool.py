@@ -0,0 +1,120 @@
+"""
+Tests for AgentPool (agent instance + LLM client reuse).
+
+Covers:
+- One LLM client per (agent_type, reasoning_level, cached_content)
+- Leased agents are reused and reset between calls
+- Concurrent leases never share an instance
+"""
+
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.agent_factory import AgentPool
+import app.agents.agent_factory as agent_factory_module
+
+
+class DummyAgent:
+    """Stands in for a BaseAgent subclass with per-run state."""
+
+    def __init__(self, cached_content=None):
+        self.cached_content = cached_content
+        self.injected = None
+        self.resets = 0
+
+    def reset_run_state(self):
+        self.injected = None
+        self.resets += 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    built = []
+
+    def fake_get_model(agent_type, reasoning_level="standard", cached_content=None,
+                       thinking_level=None, model=None):
+        built.append((agent_type, reasoning_level, cached_content, thinking_level, model))
+        return object()
+
+    monkeypatch.setattr(agent_factory_module.LLMFactory, "get_model", staticmethod(fake_get_model))
+    pool = AgentPool()
+    pool.built = built
+    return pool
+
+
+class TestLLMClients:
+    """LLM clients are built once per key."""
+
+    def test_same_key_reuses_client(self, pool):
+        a = pool.get_llm("coder", "high")
+        b = pool.get_llm("coder", "high")
+
+        assert a is b
+        assert len(pool.built) == 1
+        assert pool.get_stats()["llm_hits"] == 1
+
+    def test_different_keys_get_different_clients(self, pool):
+        pool.get_llm("coder", "high")
+        pool.get_llm("coder", "high", cached_content="cachedContents/abc")
+        pool.get_llm("fixer", "high")
+
+        assert len(pool.built) == 3
+
+    def test_policy_choice_is_part_of_key(self, pool):
+        pool.get_llm("coder", thinking_level="low")
+        pool.get_llm("coder", thinking_level="low")
+        pool.get_llm("coder", thinking_level="high", model="gemini-3-pro-preview")
+
+        assert [b[3:] for b in pool.built] == [("low", None), ("high", "gemini-3-pro-preview")]
+
+    def test_client_cache_is_bounded(self, pool):
+        pool.max_llm_clients = 2
+        for i in range(5):
+            pool.get_llm("coder", cached_content=f"cache-{i}")
+
+        assert pool.get_stats()["llm_clients"] == 2
+
+
+class TestAgentLeases:
+    """Agents are leased exclusively and reset on return."""
+
+    def test_released_agent_is_reused_and_reset(self, pool):
+        with pool.lease(DummyAgent) as first:
+            first.injected = {"folder_map": "run-1"}
+
+        with pool.lease(DummyAgent) as second:
+            assert second is first
+            assert second.injected is None
+            assert second.resets == 1
+
+        assert pool.get_stats()["agents_created"] == 1
+        assert pool.get_stats()["agents_reused"] == 1
+
+    def test_concurrent_leases_get_distinct_instances(self, pool):
+        with pool.lease(DummyAgent) as a, pool.lease(DummyAgent) as b:
+            assert a is not b
+
+    def test_kwargs_are_part_of_the_key(self, pool):
+        with pool.lease(DummyAgent, cached_content="x") as a:
+            pass
+        with pool.lease(DummyAgent) as b:
+            assert b is not a
+
+    def test_unhashable_kwargs_are_not_pooled(self, pool):
+        with pool.lease(DummyAgent, cached_content={"not": "hashable"}) as a:
+            pass
+        with pool.lease(DummyAgent, cached_content={"not": "hashable"}) as b:
+            assert b is not a
+
+    def test_idle_list_is_bounded(self, pool):
+        pool.max_idle_per_key = 1
+        a = pool.acquire(DummyAgent)
+        b = pool.acquire(DummyAgent)
+        pool.release(a, DummyAgent)
+        pool.release(b, DummyAgent)
+
+        assert pool.get_stats()["agents_idle"] == 1
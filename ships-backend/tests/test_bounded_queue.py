@@ -0,0 +1,117 @@
+"""
+Tests for the bounded stream queue (pipeline + PTY streamer hand-off).
+
+Covers:
+- block: put() waits for the reader and records the wait
+- coalesce: full queue merges into the newest item, falls back to blocking
+- drop_oldest: only droppable items are evicted
+- put_nowait() never loses an item, and depth metrics
+"""
+
+import asyncio
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.bounded_queue import StreamQueue, stream_queue_stats, BLOCK, COALESCE, DROP_OLDEST
+
+
+def join(queued, item):
+    return queued + item if len(queued) + len(item) <= 4 else None
+
+
+class TestBlock:
+    """A full queue holds the producer back."""
+
+    @pytest.mark.asyncio
+    async def test_put_waits_for_reader(self):
+        q = StreamQueue(maxsize=2, policy=BLOCK)
+        await q.put(1)
+        await q.put(2)
+
+        producer = asyncio.ensure_future(q.put(3))
+        await asyncio.sleep(0.02)
+        assert not producer.done()
+
+        assert await q.get() == 1
+        await asyncio.wait_for(producer, 1)
+        assert [await q.get(), await q.get()] == [2, 3]
+        assert q.blocked == 1 and q.blocked_s >= 0.01
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_producer(self):
+        q = StreamQueue(maxsize=2)
+        reader = asyncio.ensure_future(q.get())
+        await asyncio.sleep(0)
+        q.put_nowait("x")
+        assert await asyncio.wait_for(reader, 1) == "x"
+
+
+class TestCoalesce:
+    """Full queue merges into the newest item when it can."""
+
+    @pytest.mark.asyncio
+    async def test_merges_into_tail(self):
+        q = StreamQueue(maxsize=2, policy=COALESCE, coalesce=join)
+        for chunk in ("a", "b", "c", "d"):
+            await q.put(chunk)
+
+        assert [q.get_nowait(), q.get_nowait()] == ["a", "bcd"]
+        assert q.coalesced == 2 and q.blocked == 0
+
+    @pytest.mark.asyncio
+    async def test_blocks_when_merge_refused(self):
+        q = StreamQueue(maxsize=1, policy=COALESCE, coalesce=join)
+        await q.put("abcd")
+
+        producer = asyncio.ensure_future(q.put("e"))
+        await asyncio.sleep(0.01)
+        assert not producer.done()
+
+        assert await q.get() == "abcd"
+        await asyncio.wait_for(producer, 1)
+        assert q.get_nowait() == "e"
+
+
+class TestDropOldest:
+    """Only low-priority items are shed."""
+
+    def test_evicts_oldest_droppable(self):
+        q = StreamQueue(maxsize=3, policy=DROP_OLDEST, droppable=lambda i: i.startswith("low"))
+        for item in ("keep1", "low1", "low2", "keep2"):
+            q.put_nowait(item)
+
+        assert [q.get_nowait() for _ in range(q.qsize())] == ["keep1", "low2", "keep2"]
+        assert q.dropped == 1
+
+    def test_put_nowait_overflows_instead_of_losing(self):
+        q = StreamQueue(maxsize=1, policy=DROP_OLDEST, droppable=lambda i: False)
+        q.put_nowait("done")
+        q.put_nowait("error")
+
+        assert q.qsize() == 2 and q.overflows == 1
+
+    def test_dropping_is_not_an_overflow(self):
+        q = StreamQueue(maxsize=2, policy=DROP_OLDEST)
+        for i in range(5):
+            q.put_nowait(i)
+
+        assert (q.qsize(), q.dropped, q.overflows) == (2, 3, 0)
+
+
+class TestMetrics:
+    """Depth metrics per queue and across live queues."""
+
+    def test_stats(self):
+        q = StreamQueue(maxsize=4, name="metrics-test")
+        for i in range(3):
+            q.put_nowait(i)
+        q.get_nowait()
+
+        stats = q.get_stats()
+        assert stats["depth"] == 2 and stats["max_depth"] == 3
+        assert stats["puts"] == 3 and stats["gets"] == 1
+        assert any(s["name"] == "metrics-test" for s in stream_queue_stats()["queues"])
@@ -0,0 +1,171 @@
+"""
+Tests for cooperative run cancellation.
+
+Covers:
+- CancelToken callbacks and the ContextVar binding across threads
+- run_subprocess() kills the whole process group on cancel and on timeout
+- CancelRegistry lookups
+"""
+
+import os
+import sys
+import time
+import threading
+import subprocess
+import contextvars
+import pytest
+
+# Add parent to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.cancellation import (
+    CancelToken,
+    CancelRegistry,
+    RunCancelled,
+    bind_cancel_token,
+    current_cancel_token,
+    raise_if_cancelled,
+    run_subprocess,
+)
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="process groups via killpg")
+
+# Parent shell that leaves a grandchild behind, printing the grandchild's pid
+SPAWNS_CHILD = "sleep 30 & echo $!; wait"
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Zombies still answer kill(0) until reaped by init
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except OSError:
+        return True
+
+
+def wait_dead(pid: int, timeout: float = 2.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not alive(pid):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestCancelToken:
+    """Flag, callbacks and context binding."""
+
+    def test_callbacks_run_once(self):
+        token = CancelToken("r1")
+        calls = []
+        token.on_cancel(lambda: calls.append(1))
+
+        assert token.cancel("user")
+        assert not token.cancel("again")
+
+        assert calls == [1]
+        assert token.reason == "user"
+        with pytest.raises(RunCancelled):
+            token.raise_if_cancelled()
+
+    def test_late_callback_runs_immediately(self):
+        token = CancelToken()
+        token.cancel()
+        calls = []
+        token.on_cancel(lambda: calls.append(1))
+        assert calls == [1]
+
+    def test_removed_callback_is_not_called(self):
+        token = CancelToken()
+        calls = []
+        remove = token.on_cancel(lambda: calls.append(1))
+        remove()
+        token.cancel()
+        assert calls == []
+
+    def test_token_reaches_worker_threads(self):
+        token = CancelToken()
+        seen = []
+
+        def worker():
+            seen.append(current_cancel_token())
+
+        def run():
+            bind_cancel_token(token)
+            # What run_in_executor / asyncio.to_thread do
+            t = threading.Thread(target=contextvars.copy_context().run, args=(worker,))
+            t.start()
+            t.join()
+
+        contextvars.copy_context().run(run)
+
+        assert seen == [token]
+        assert current_cancel_token() is None
+        raise_if_cancelled()  # no-op outside a run
+
+
+@posix_only
+class TestRunSubprocess:
+    """The process group dies with the run."""
+
+    @pytest.fixture(autouse=True)
+    def _tmp(self, tmp_path):
+        self.tmp = str(tmp_path)
+
+    def test_completes_normally(self):
+        result = run_subprocess("echo hi", shell=True, text=True, timeout=5, cancel_token=CancelToken())
+        assert result.returncode == 0
+        assert result.stdout.strip() == "hi"
+
+    def test_cancel_kills_grandchildren(self):
+        token = CancelToken()
+        threading.Timer(0.3, token.cancel, args=("client disconnected",)).start()
+
+        start = time.time()
+        with pytest.raises(RunCancelled):
+            run_subprocess(
+                ["/bin/sh", "-c", "sleep 30 & echo $! > pid.txt; wait"],
+                cwd=self.tmp, text=True, timeout=30, cancel_token=token,
+            )
+
+        assert time.time() - start < 5
+        with open(os.path.join(self.tmp, "pid.txt")) as f:
+            assert wait_dead(int(f.read()))
+
+    def test_timeout_kills_grandchildren(self):
+        with pytest.raises(subprocess.TimeoutExpired) as info:
+            run_subprocess(["/bin/sh", "-c", SPAWNS_CHILD], text=True, timeout=0.5)
+
+        assert wait_dead(int(info.value.output.split()[0]))
+
+    def test_already_cancelled_does_not_start(self):
+        token = CancelToken()
+        token.cancel()
+        with pytest.raises(RunCancelled):
+            run_subprocess(["/bin/sh", "-c", "touch started"], cwd=self.tmp, cancel_token=token)
+        assert not os.path.exists(os.path.join(self.tmp, "started"))
+
+
+class TestCancelRegistry:
+    """Tokens by run key."""
+
+    def test_cancel_by_any_key(self):
+        registry = CancelRegistry()
+        token = CancelToken("stream-1")
+        registry.register("stream-1", token)
+        registry.register("agent-run-uuid", token)
+
+        assert registry.cancel("agent-run-uuid", "cancel requested")
+        assert token.cancelled
+        assert not registry.cancel("stream-1")  # already cancelled
+        assert registry.get_stats() == {"live_runs": 1, "cancelled": 1}
+
+    def test_unknown_key(self):
+        registry = CancelRegistry()
+        registry.register("a", CancelToken())
+        registry.unregister("a")
+        assert not registry.cancel("a")
@@ -0,0 +1,178 @@
+"""
+Tests for the compact checkpoint serializer.
+
+Covers:
+- Round-tripping agent state (dicts, lists, LangChain messages)
+- Content-addressed reuse of unchanged artifacts
+- Block reuse for append-only lists
+- Loading checkpoints written by the default serializer
+- Store I/O kept out of the serializer (buffered writes, missing digests listed)
+"""
+
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.database.checkpoint_serde import (
+    ArtifactsMissing,
+    CompactSerializer,
+    MemoryArtifactStore,
+    PostgresArtifactStore,
+    COMPACT_TYPE,
+    payload_refs,
+)
+
+
+def _plan(n_tasks: int = 40) -> dict:
+    return {
+        "summary": "Build a todo app",
+        "tasks": [{"id": i, "title": f"Task {i}", "files": [f"src/file_{i}.tsx"]} for i in range(n_tasks)],
+    }
+
+
+class TestRoundTrip:
+    """Serialized state must load back unchanged."""
+
+    def test_state_round_trip(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        state = {
+            "phase": "coding",
+            "fix_attempts": 2,
+            "artifacts": {"plan_manifest": _plan(), "project_path": "/tmp/app"},
+            "messages": [HumanMessage(content=f"msg {i}") for i in range(40)],
+            "stream_events": [{"type": "thinking", "content": "x" * i} for i in range(35)],
+        }
+
+        restored = serde.loads_typed(serde.dumps_typed(state))
+
+        assert restored["phase"] == "coding"
+        assert restored["fix_attempts"] == 2
+        assert restored["artifacts"] == state["artifacts"]
+        assert [m.content for m in restored["messages"]] == [m.content for m in state["messages"]]
+        assert isinstance(restored["messages"][0], HumanMessage)
+        assert restored["stream_events"] == state["stream_events"]
+
+    def test_scalars_and_tuples(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        for value in [None, 0, 1.5, "text", True, ("a", 1), [1, 2, 3]]:
+            assert serde.loads_typed(serde.dumps_typed(value)) == value
+
+    def test_tuples_keep_their_type(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        state = {"pair": ("a", 1), "top": ("a", {"b": (1, 2)})}
+
+        restored = serde.loads_typed(serde.dumps_typed(state))
+
+        assert restored == state
+        assert type(restored["pair"]) is tuple
+        assert type(restored["top"][1]["b"]) is tuple
+
+    def test_payload_is_tagged(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        type_, _ = serde.dumps_typed({"a": 1})
+        assert type_ == COMPACT_TYPE
+
+
+class TestDeduplication:
+    """Unchanged content is stored once and referenced afterwards."""
+
+    def test_unchanged_artifact_is_reused(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        plan = _plan()
+
+        serde.dumps_typed({"plan_manifest": plan, "current_step": 1})
+        written = serde.get_stats()["artifacts_written"]
+        serde.dumps_typed({"plan_manifest": plan, "current_step": 2})
+
+        stats = serde.get_stats()
+        assert stats["artifacts_written"] == written
+        assert stats["artifacts_reused"] >= 1
+
+    def test_append_only_list_writes_only_new_blocks(self):
+        serde = CompactSerializer(MemoryArtifactStore(), block_size=8)
+        events = [{"type": "tool_result", "n": i} for i in range(32)]
+
+        serde.dumps_typed(events)
+        assert serde.get_stats()["artifacts_written"] == 4
+
+        serde.dumps_typed(events + [{"type": "tool_result", "n": i} for i in range(32, 40)])
+        assert serde.get_stats()["artifacts_written"] == 5
+
+    def test_compact_payload_is_smaller(self):
+        plain = JsonPlusSerializer()
+        serde = CompactSerializer(MemoryArtifactStore())
+        state = {"plan_manifest": _plan(), "messages": [AIMessage(content="done " * 50)] * 20}
+
+        serde.dumps_typed(state)  # First write stores the artifacts
+        _, compact = serde.dumps_typed(state)
+        _, default = plain.dumps_typed(state)
+
+        assert len(compact) < len(default) / 4
+
+
+class TestCompatibility:
+    """Checkpoints written before compaction still load."""
+
+    def test_loads_default_serializer_payload(self):
+        plain = JsonPlusSerializer()
+        serde = CompactSerializer(MemoryArtifactStore())
+        state = {"phase": "planning", "artifacts": {"plan_manifest": _plan(3)}}
+
+        assert serde.loads_typed(plain.dumps_typed(state)) == state
+
+    def test_missing_artifact_raises(self):
+        writer = CompactSerializer(MemoryArtifactStore())
+        reader = CompactSerializer(MemoryArtifactStore())
+        data = writer.dumps_typed({"plan_manifest": _plan()})
+
+        with pytest.raises(ValueError, match="missing from store"):
+            reader.loads_typed(data)
+
+
+class TestStoreIO:
+    """The serializer never waits on the store; the saver flushes / prefetches."""
+
+    def test_payload_refs_lists_artifacts(self):
+        store = MemoryArtifactStore()
+        serde = CompactSerializer(store, block_size=8)
+        _, payload = serde.dumps_typed({"plan_manifest": _plan(), "events": list(range(20))})
+
+        refs = payload_refs(payload)
+
+        assert refs and set(refs) <= set(store._blobs)
+
+    def test_missing_artifacts_listed_together(self):
+        writer = CompactSerializer(MemoryArtifactStore(), block_size=8)
+        reader = CompactSerializer(MemoryArtifactStore(), block_size=8)
+        data = writer.dumps_typed([{"n": i} for i in range(24)])
+
+        with pytest.raises(ArtifactsMissing) as error:
+            reader.loads_typed(data)
+
+        assert error.value.digests == payload_refs(data[1])
+        assert len(error.value.digests) == 3
+
+    def test_encoded_payload_reused(self):
+        serde = CompactSerializer(MemoryArtifactStore())
+        state = {"plan_manifest": _plan()}
+
+        with serde.encoded([state]):
+            first = serde.dumps_typed(state)
+            assert serde.get_stats()["dumps"] == 1
+        assert serde.dumps_typed(state) == first
+        assert serde.get_stats()["dumps"] == 2
+
+    def test_postgres_store_buffers_writes(self):
+        store = PostgresArtifactStore(pool=None)  # Never touched by get/put
+        serde = CompactSerializer(store)
+        data = serde.dumps_typed({"plan_manifest": _plan()})
+
+        assert store.get_stats()["pending"] >= 1
+        assert serde.loads_typed(data) == {"plan_manifest": _plan()}
+        assert store.missing(["0" * 64]) == ["0" * 64]
@@ -0,0 +1,90 @@
+"""
+Tests for the ephemeral UI event bus.
+
+Covers:
+- emit_event() publishing to the run bound in the current task
+- Isolation between concurrent runs
+- Publishing from worker threads
+"""
+
+import asyncio
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.event_bus import UIEventBus
+from app.streaming.stream_events import emit_event
+import app.streaming.event_bus as event_bus_module
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    """Fresh bus so counters don't leak between tests."""
+    fresh = UIEventBus()
+    monkeypatch.setattr(event_bus_module, "event_bus", fresh)
+    import app.streaming.stream_events as stream_events_module
+    monkeypatch.setattr(stream_events_module, "event_bus", fresh)
+    return fresh
+
+
+class TestEventBus:
+    """UI events reach the subscribed run immediately."""
+
+    @pytest.mark.asyncio
+    async def test_emit_event_publishes_to_bound_run(self, bus):
+        queue = bus.subscribe("run-1")
+
+        async def node():
+            bus.bind("run-1")
+            emit_event("thinking", "coder", "Writing App.tsx")
+
+        await asyncio.create_task(node())
+
+        event = queue.get_nowait()
+        assert event["type"] == "thinking"
+        assert event["content"] == "Writing App.tsx"
+
+    @pytest.mark.asyncio
+    async def test_runs_are_isolated(self, bus):
+        q1 = bus.subscribe("run-1")
+        q2 = bus.subscribe("run-2")
+
+        async def node(run_key, text):
+            bus.bind(run_key)
+            await asyncio.sleep(0)
+            emit_event("thinking", "coder", text)
+
+        await asyncio.gather(node("run-1", "a"), node("run-2", "b"))
+
+        assert q1.get_nowait()["content"] == "a"
+        assert q2.get_nowait()["content"] == "b"
+        assert q1.empty() and q2.empty()
+
+    @pytest.mark.asyncio
+    async def test_publish_from_worker_thread(self, bus):
+        queue = bus.subscribe("run-1")
+
+        async def node():
+            bus.bind("run-1")
+            await asyncio.to_thread(emit_event, "file_written", "coder", "src/App.tsx")
+
+        await asyncio.create_task(node())
+
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        assert event["content"] == "src/App.tsx"
+
+    def test_no_subscriber_is_a_noop(self, bus):
+        event = emit_event("thinking", "planner", "no run bound")
+        assert event["type"] == "thinking"
+        assert bus.get_stats()["published"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_stops_delivery(self, bus):
+        queue = bus.subscribe("run-1")
+        bus.unsubscribe("run-1", queue)
+
+        assert bus.publish({"type": "thinking"}, run_key="run-1") is False
+        assert queue.empty()
@@ -0,0 +1,64 @@
+"""
+Tests for the astream_events source filter (UI allowlist).
+
+Covers:
+- Tokens, agent nodes and tagged tools pass; internal chains don't
+- Read-only tools are excluded even if tagged
+- tag_ui_tools() is idempotent and skips read-only tools
+"""
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.event_filter import (
+    UI_STREAM_TAG,
+    UI_EVENT_FILTERS,
+    is_ui_event,
+    tag_ui_tools,
+)
+
+
+class FakeTool:
+    def __init__(self, name, tags=None):
+        self.name = name
+        self.tags = tags
+
+
+class TestAllowlist:
+    """Only events the pipeline renders pass the filter."""
+
+    def test_chat_model_tokens_pass(self):
+        assert is_ui_event({"event": "on_chat_model_stream", "name": "ChatGoogleGenerativeAI"})
+
+    def test_agent_nodes_pass(self):
+        assert is_ui_event({"event": "on_chain_start", "name": "planner"})
+        assert is_ui_event({"event": "on_chain_end", "name": "orchestrator"})
+
+    def test_internal_chains_are_dropped(self):
+        for name in ["RunnableSequence", "agent", "tools", "LangGraph", "route_orchestrator"]:
+            assert not is_ui_event({"event": "on_chain_start", "name": name, "tags": ["graph:step:3"]})
+
+    def test_tagged_tools_pass(self):
+        assert is_ui_event({"event": "on_tool_start", "name": "write_files_batch", "tags": [UI_STREAM_TAG]})
+        assert not is_ui_event({"event": "on_tool_start", "name": "write_files_batch", "tags": []})
+
+    def test_read_only_tools_excluded(self):
+        assert not is_ui_event({"event": "on_tool_end", "name": "read_file_from_disk", "tags": [UI_STREAM_TAG]})
+
+    def test_filters_use_v2_keywords(self):
+        assert set(UI_EVENT_FILTERS) == {"include_types", "include_names", "include_tags", "exclude_names"}
+
+
+class TestTagging:
+    """Tools are tagged once, read-only tools never."""
+
+    def test_tags_non_read_only_tools(self):
+        write, read = FakeTool("write_file_to_disk", ["existing"]), FakeTool("list_directory")
+
+        tag_ui_tools([write, read])
+        tag_ui_tools([write, read])
+
+        assert write.tags == ["existing", UI_STREAM_TAG]
+        assert read.tags is None
@@ -0,0 +1,121 @@
+"""
+Tests for negotiated run stream framing.
+
+Covers:
+- Accept-Encoding / X-Stream-Options negotiation
+- gzip frames decode per event (sync flush, nothing held back)
+- Compact keys and the stream:framing header
+- final_content is only omitted for blocks the client can rebuild
+"""
+
+import json
+import zlib
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming import framing as framing_mod
+from app.streaming.framing import (
+    StreamFraming, StreamEncoder, negotiate, parse_accept_encoding,
+    COMPACT, GZIP, IDENTITY, SHORT_KEYS,
+)
+
+
+def line(seq, **event):
+    return json.dumps({**event, "seq": seq}) + "\n"
+
+
+BLOCK = [
+    line(1, type="block_start", id="b1", block_type="text"),
+    line(2, type="block_delta", id="b1", content="Hello "),
+    line(3, type="block_delta", id="b1", content="world"),
+    line(4, type="block_end", id="b1", final_content="Hello world", duration_ms=5),
+]
+
+
+def decode_ndjson(frames):
+    return [json.loads(l) for l in b"".join(frames).decode().splitlines()]
+
+
+class TestNegotiation:
+    """Headers pick the wire format."""
+
+    def test_parse_accept_encoding(self):
+        assert parse_accept_encoding("gzip, br;q=0.5, zstd;q=0") == {"gzip": 1.0, "br": 0.5, "zstd": 0.0}
+
+    def test_gzip_for_remote_clients(self):
+        f = negotiate({"accept-encoding": "gzip, deflate"}, "203.0.113.7")
+        assert f.encoding == GZIP
+        assert f.response_headers()["Content-Encoding"] == "gzip"
+
+    def test_loopback_is_not_compressed(self):
+        assert negotiate({"accept-encoding": "gzip"}, "127.0.0.1").encoding == IDENTITY
+
+    def test_refused_gzip(self):
+        assert negotiate({"accept-encoding": "gzip;q=0"}, "203.0.113.7").encoding == IDENTITY
+
+    def test_options(self):
+        f = negotiate({"x-stream-options": "compact, omit-final-content"})
+        assert f.format == COMPACT and f.omit_final_content
+        assert f.response_headers()["X-Stream-Options"] == "compact, omit-final-content"
+
+    def test_msgpack_falls_back_without_library(self, monkeypatch):
+        monkeypatch.setattr(framing_mod, "msgpack", None)
+        assert negotiate({"accept": "application/x-msgpack"}).format == COMPACT
+
+    def test_default_is_plain_passthrough(self):
+        f = negotiate({})
+        lines = object()
+        assert f.is_plain and f.stream(lines) is lines
+
+
+class TestEncoding:
+    """Frames on the wire."""
+
+    def test_gzip_frames_decode_per_event(self):
+        enc = StreamEncoder(StreamFraming(encoding=GZIP))
+        d = zlib.decompressobj(31)
+
+        for raw in BLOCK:
+            assert d.decompress(enc.encode(raw)).decode() == raw
+        d.decompress(enc.close())
+        assert d.eof
+
+    def test_compact_keys(self):
+        enc = StreamEncoder(StreamFraming(format=COMPACT))
+
+        header, first = decode_ndjson([enc.header(), enc.encode(BLOCK[0])])
+
+        assert header["type"] == "stream:framing" and header["keys"] == SHORT_KEYS
+        assert first == {"t": "block_start", "i": "b1", "bt": "text", "s": 1}
+
+
+class TestOmitFinalContent:
+    """block_end drops final_content only when the deltas add up."""
+
+    def encode(self, lines):
+        enc = StreamEncoder(StreamFraming(omit_final_content=True))
+        return decode_ndjson([enc.encode(l) for l in lines]), enc
+
+    def test_omitted_for_complete_block(self):
+        events, enc = self.encode(BLOCK)
+
+        assert "final_content" not in events[-1]
+        assert events[-1]["final_len"] == len("Hello world")
+        assert enc.final_content_omitted == 1
+
+    def test_kept_after_seq_gap(self):
+        events, _ = self.encode([BLOCK[0], BLOCK[1], BLOCK[3]])
+        assert events[-1]["final_content"] == "Hello world"
+
+    def test_kept_when_block_start_not_seen(self):
+        events, _ = self.encode(BLOCK[2:])  # resumed mid-block
+        assert events[-1]["final_content"] == "Hello world"
+
+    def test_kept_after_replay_gap_marker(self):
+        gap = line(3, type="stream:gap")
+        events, _ = self.encode(BLOCK[:2] + [gap, BLOCK[3]])
+        assert events[-1]["final_content"] == "Hello world"
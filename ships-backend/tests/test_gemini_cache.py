@@ -0,0 +1,150 @@
+"""
+Tests for the Gemini context-cache registry.
+
+Covers:
+- Reuse of a live cache for identical content (no second creation)
+- New cache for changed content or a different model
+- Concurrent requests sharing one creation
+- TTL refresh, expiry and persistence across restarts
+"""
+
+import asyncio
+import json
+import time
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.cache import GeminiCacheManager
+
+
+ARTIFACTS = {"folder_map": "src/\n  App.tsx\n" * 400, "dependencies": "react, vite"}
+
+
+def make_manager(tmp_path, monkeypatch, created=None, delay=0.0):
+    """Enabled manager whose remote calls are faked."""
+    manager = GeminiCacheManager(api_key=None, registry_path=tmp_path / "registry.json")
+    manager.enabled = True
+    created = created if created is not None else []
+
+    def fake_create(project_id, artifacts, ttl_minutes=60, model="m"):
+        time.sleep(delay)
+        created.append((project_id, model))
+        return f"cachedContents/{len(created)}"
+
+    monkeypatch.setattr(manager, "create_project_context_cache", fake_create)
+    monkeypatch.setattr(manager, "_refresh_ttl", lambda name, ttl_s: True)
+    manager.created = created
+    return manager
+
+
+class TestCacheReuse:
+    """Identical content reuses the live cache."""
+
+    @pytest.mark.asyncio
+    async def test_hit_reuses_cache(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+
+        first = await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+        second = await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+
+        assert first == second
+        assert len(manager.created) == 1
+        stats = manager.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["creations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_content_or_model_creates_new_cache(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+
+        a = await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+        b = await manager.get_or_create_project_context_cache("app", {**ARTIFACTS, "dependencies": "vue"})
+        c = await manager.get_or_create_project_context_cache("app", ARTIFACTS, model="other-model")
+
+        assert len({a, b, c}) == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_creation(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch, delay=0.05)
+
+        names = await asyncio.gather(*[
+            manager.get_or_create_project_context_cache("app", ARTIFACTS) for _ in range(5)
+        ])
+
+        assert len(set(names)) == 1
+        assert len(manager.created) == 1
+
+
+class TestCacheLifetime:
+    """TTL refresh, expiry and persistence."""
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_recreated(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+        for entry in manager._registry.values():
+            entry["expires_at"] = time.time() - 1
+
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+
+        assert len(manager.created) == 2
+
+    @pytest.mark.asyncio
+    async def test_hit_refreshes_ttl_when_half_spent(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+        for entry in manager._registry.values():
+            entry["expires_at"] = time.time() + 5 * 60
+
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+
+        assert manager.get_stats()["ttl_refreshes"] == 1
+        entry = next(iter(manager._registry.values()))
+        assert entry["expires_at"] > time.time() + 25 * 60
+
+    @pytest.mark.asyncio
+    async def test_refresh_logs_new_ttl_and_persists(self, tmp_path, monkeypatch, caplog):
+        manager = make_manager(tmp_path, monkeypatch)
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+        for entry in manager._registry.values():
+            entry["expires_at"] = time.time() + 5 * 60
+
+        with caplog.at_level("INFO", logger="ships.cache"):
+            await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+
+        assert "(30m left)" in caplog.text
+        saved = json.loads((tmp_path / "registry.json").read_text())
+        assert next(iter(saved.values()))["expires_at"] > time.time() + 25 * 60
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_recreates(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+        for entry in manager._registry.values():
+            entry["expires_at"] = time.time() + 5 * 60
+        monkeypatch.setattr(manager, "_refresh_ttl", lambda name, ttl_s: False)
+
+        await manager.get_or_create_project_context_cache("app", ARTIFACTS, ttl_minutes=30)
+
+        assert len(manager.created) == 2
+
+    @pytest.mark.asyncio
+    async def test_registry_survives_restart(self, tmp_path, monkeypatch):
+        manager = make_manager(tmp_path, monkeypatch)
+        name = await manager.get_or_create_project_context_cache("app", ARTIFACTS)
+
+        restarted = make_manager(tmp_path, monkeypatch)
+        restarted._load_registry()
+
+        assert await restarted.get_or_create_project_context_cache("app", ARTIFACTS) == name
+        assert restarted.created == []
+        assert restarted.get_cache_name_for_agent("app") == name
+
+    def test_disabled_manager_returns_none(self, tmp_path):
+        manager = GeminiCacheManager(api_key=None, registry_path=tmp_path / "registry.json")
+        manager.enabled = False
+
+        assert asyncio.run(manager.get_or_create_project_context_cache("app", ARTIFACTS)) is None
@@ -0,0 +1,140 @@
+"""
+Tests for the table-driven graph event renderer.
+
+Covers:
+- Token streaming into a thinking block, JSON output buffered (not streamed)
+- Tool start/end: command block, result line and sidebar entry
+- Planner narrative block, internal routing nodes silent
+- UI bus events routed by type, unknown events ignored
+"""
+
+import json
+from types import SimpleNamespace
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.stream_events import StreamBlockManager
+from app.streaming.graph_events import GraphEventRenderer, planner_narrative
+
+
+def renderer():
+    return GraphEventRenderer(StreamBlockManager(coalesce_ms=0))
+
+
+def token(text):
+    return {"event": "on_chat_model_stream", "name": "model", "data": {"chunk": SimpleNamespace(content=text)}}
+
+
+def parse(lines):
+    """Rendered lines (create_block emits several per string) -> event dicts."""
+    return [json.loads(line) for chunk in lines for line in chunk.splitlines() if line]
+
+
+class TestTokens:
+    """Chat model chunks."""
+
+    def test_tokens_open_thinking_block(self):
+        r = renderer()
+        first = parse(r.render(token("Hello")))
+        second = parse(r.render(token(" world")))
+
+        assert first[0]["type"] == "block_start" and first[0]["block_type"] == "thinking"
+        assert first[1]["content"] == "Hello"
+        assert [e["type"] for e in second] == ["block_delta"]
+
+    def test_list_content(self):
+        r = renderer()
+        events = parse(r.render(token([{"type": "text", "text": "Hi"}, {"type": "image"}])))
+        assert events[-1]["content"] == "Hi"
+
+    def test_json_output_is_buffered(self):
+        r = renderer()
+        r.render({"event": "on_chain_start", "name": "orchestrator", "data": {}})
+
+        assert list(r.render(token('{"description": "Build a '))) == []
+        events = parse(r.render(token('todo app"}')))
+
+        assert events[0]["type"] == "block_start" and events[0]["title"] == "Understanding"
+        assert not r.in_json_stream
+
+
+class TestTools:
+    """Tool start/end rendering."""
+
+    def test_write_tool(self):
+        r = renderer()
+        start = parse(r.render({"event": "on_tool_start", "name": "write_file_to_disk",
+                                "data": {"input": {"file_path": "src/App.tsx"}}}))
+        end = parse(r.render({"event": "on_tool_end", "name": "write_file_to_disk",
+                              "data": {"input": {"file_path": "src/App.tsx"},
+                                       "output": SimpleNamespace(content='{"success": true, "message": "Wrote src/App.tsx"}')}}))
+
+        assert start[0]["title"] == "Creating file"
+        assert start[1] == {**start[1], "type": "tool_start", "file": "src/App.tsx"}
+        assert any(e.get("final_content") == "✓ Wrote src/App.tsx" for e in end)
+        assert end[-1]["type"] == "tool_result" and end[-1]["success"] is True
+
+    def test_failed_tool_result(self):
+        r = renderer()
+        end = parse(r.render({"event": "on_tool_end", "name": "apply_source_edits",
+                              "data": {"output": '{"success": false, "error": "no match"}'}}))
+
+        assert any(e.get("final_content") == "✗ no match" for e in end)
+        assert end[-1]["success"] is False
+
+    def test_internal_terminal_command_has_no_block(self):
+        r = renderer()
+        start = parse(r.render({"event": "on_tool_start", "name": "run_terminal_command",
+                                "data": {"input": {"command": "npx tsc --noEmit"}}}))
+        assert [e["type"] for e in start] == ["tool_start"]
+
+
+class TestNodes:
+    """Agent node transitions."""
+
+    def test_planner_narrative(self):
+        r = renderer()
+        r.render({"event": "on_chain_start", "name": "planner", "data": {}})
+        events = parse(r.render({"event": "on_chain_end", "name": "planner", "data": {"output": {
+            "summary": "A todo app.",
+            "tasks": [{"title": "Scaffold"}],
+            "dependencies": {"runtime": ["react"]},
+        }}}))
+
+        plan = next(e for e in events if e["type"] == "block_end" and e.get("final_content"))
+        assert plan["final_content"] == planner_narrative({
+            "summary": "A todo app.", "tasks": [{"title": "Scaffold"}], "dependencies": {"runtime": ["react"]},
+        })
+        assert "**Implementation Plan (1 tasks):**" in plan["final_content"]
+        assert r.current_agent is None
+
+    def test_internal_nodes_are_silent(self):
+        r = renderer()
+        assert list(r.render({"event": "on_chain_start", "name": "orchestrator", "data": {}})) == []
+        assert list(r.render({"event": "on_chain_end", "name": "orchestrator", "data": {"output": {}}})) == []
+
+    def test_unhandled_event_type(self):
+        r = renderer()
+        assert list(r.render({"event": "on_retriever_end", "name": "x", "data": {}})) == []
+        assert r.get_stats() == {"events": 1, "unhandled": 1}
+
+
+class TestUIEvents:
+    """emit_event types routed through the UI table."""
+
+    def test_file_written(self):
+        r = renderer()
+        [event] = parse(r.render_ui_event({"type": "file_written", "agent": "coder",
+                                           "content": "src/a.ts", "metadata": {"action": "edit"}}))
+        assert event == {"type": "tool_result", "tool": "apply_source_edits", "file": "src/a.ts", "success": True}
+
+    def test_activity(self):
+        r = renderer()
+        [event] = parse(r.render_ui_event({"type": "agent_start", "agent": "coder", "content": "Coding"}))
+        assert event["type"] == "activity" and event["message"] == "Coding"
+
+    def test_unknown_type_is_ignored(self):
+        assert list(renderer().render_ui_event({"type": "mystery"})) == []
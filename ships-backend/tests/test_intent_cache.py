@@ -0,0 +1,135 @@
+"""
+Tests for the intent classification cache.
+
+Covers:
+- Key normalization (case / whitespace) and project fingerprinting
+- Tree fingerprint (git state or mtimes) for keys without a folder_map
+- TTL expiry and LRU bounds
+- Project invalidation and persistence across restarts
+"""
+
+import time
+import subprocess
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.mini_agents.intent_cache import IntentCache, normalize_request, tree_fingerprint
+
+
+INTENT = {"task_type": "fix", "action": "modify", "target_area": "frontend", "confidence": 0.9}
+FOLDER_MAP = {"entries": [{"path": "src/App.tsx"}]}
+
+
+class TestKeys:
+    """Near-identical prompts share a key; different projects don't."""
+
+    def test_normalize_folds_case_and_whitespace(self):
+        assert normalize_request("  Fix   the\nBUILD ") == "fix the build"
+
+    def test_same_request_different_spacing_shares_key(self):
+        assert IntentCache.make_key("Fix the build", FOLDER_MAP) == IntentCache.make_key("fix  the build ", FOLDER_MAP)
+
+    def test_changed_folder_map_changes_key(self):
+        other = {"entries": [{"path": "src/Other.tsx"}]}
+        assert IntentCache.make_key("fix the build", FOLDER_MAP) != IntentCache.make_key("fix the build", other)
+
+    def test_folder_map_key_order_is_irrelevant(self):
+        a = {"x": 1, "y": 2}
+        b = {"y": 2, "x": 1}
+        assert IntentCache.make_key("explain x", a) == IntentCache.make_key("explain x", b)
+
+    def test_project_path_changes_key(self):
+        # First orchestrator step: no folder_map yet, only the project path
+        assert IntentCache.make_key("fix the build", project_path="/p1") != IntentCache.make_key(
+            "fix the build", project_path="/p2"
+        )
+        assert IntentCache.make_key("fix the build", project_path="/p1/") == IntentCache.make_key(
+            "fix the build", project_path="/p1"
+        )
+
+
+class TestTreeFingerprint:
+    """Edits made outside the pipeline change the key."""
+
+    def test_changes_with_files(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        app = tmp_path / "src" / "App.tsx"
+        app.write_text("export default 1")
+        before = tree_fingerprint(str(tmp_path))
+
+        assert tree_fingerprint(str(tmp_path)) == before
+        app.write_text("export default 22")
+        os.utime(app, ns=(1, 1))
+        edited = tree_fingerprint(str(tmp_path))
+        app.unlink()
+
+        assert len({before, edited, tree_fingerprint(str(tmp_path))}) == 3
+
+    def test_changes_with_git_worktree(self, tmp_path):
+        run = lambda *args: subprocess.run(["git", *args], cwd=tmp_path, capture_output=True)
+        if run("init").returncode != 0:
+            pytest.skip("git unavailable")
+        (tmp_path / "a.ts").write_text("1")
+        run("add", ".")
+        run("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-m", "init")
+        clean = tree_fingerprint(str(tmp_path))
+
+        (tmp_path / "a.ts").write_text("2")
+
+        assert tree_fingerprint(str(tmp_path)) != clean
+
+    def test_missing_project(self, tmp_path):
+        assert tree_fingerprint(str(tmp_path / "gone")) is None
+        assert tree_fingerprint(None) is None
+
+
+class TestIntentCache:
+    """Lookup, expiry, invalidation, persistence."""
+
+    def test_hit_and_miss_counters(self, tmp_path):
+        cache = IntentCache(path=tmp_path / "intents.json")
+        key = cache.make_key("fix the build", FOLDER_MAP)
+
+        assert cache.get(key) is None
+        cache.put(key, INTENT, project="/p")
+        assert cache.get(key) == INTENT
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_entries_expire(self, tmp_path):
+        cache = IntentCache(path=tmp_path / "intents.json", ttl_s=60)
+        key = cache.make_key("fix the build", FOLDER_MAP)
+        cache.put(key, INTENT)
+        cache._entries[key]["stored_at"] = time.time() - 120
+
+        assert cache.get(key) is None
+
+    def test_lru_bound(self, tmp_path):
+        cache = IntentCache(path=tmp_path / "intents.json", max_entries=2)
+        for i in range(3):
+            cache.put(f"k{i}", INTENT)
+
+        assert cache.get("k0") is None
+        assert cache.get("k2") == INTENT
+
+    def test_invalidate_project(self, tmp_path):
+        cache = IntentCache(path=tmp_path / "intents.json")
+        cache.put("a", INTENT, project="/p1")
+        cache.put("b", INTENT, project="/p2")
+
+        assert cache.invalidate_project("/p1") == 1
+        assert cache.get("a") is None
+        assert cache.get("b") == INTENT
+
+    def test_persists_across_restart(self, tmp_path):
+        path = tmp_path / "intents.json"
+        key = IntentCache.make_key("explain routing", FOLDER_MAP)
+        IntentCache(path=path).put(key, INTENT, project="/p")
+
+        assert IntentCache(path=path).get(key) == INTENT
@@ -0,0 +1,108 @@
+"""
+Tests for the incremental JSON scanner used by the streaming pipeline.
+
+Covers:
+- Objects completed across arbitrary chunk boundaries
+- Braces / quotes inside strings and escapes split across chunks
+- Streaming capture of selected key values
+- Linear scaling on large planner-sized outputs
+"""
+
+import json
+import time
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.json_stream import JsonStreamScanner, OBJECT, ERROR, VALUE, VALUE_DELTA, START
+
+
+def feed_in_chunks(scanner, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(scanner.feed(text[i:i + size]))
+    return events
+
+
+PLAN = {
+    "summary": "Build a {todo} app with \"quotes\" and a \\ backslash",
+    "tasks": [{"title": f"Task {i}", "description": "close } brace ] inside", "files": ["a.tsx"]} for i in range(3)],
+    "notes": "emoji \U0001F680 and é",
+}
+
+
+class TestObjects:
+    """Top-level objects are detected however the text is chunked."""
+
+    def test_object_split_into_single_characters(self):
+        text = "Here is the plan:\n```json\n" + json.dumps(PLAN) + "\n```"
+        events = feed_in_chunks(JsonStreamScanner(), text, 1)
+
+        objects = [e.value for e in events if e.kind == OBJECT]
+        assert objects == [PLAN]
+        assert events[0].kind == START
+
+    def test_braces_inside_strings_do_not_close_object(self):
+        scanner = JsonStreamScanner()
+        events = scanner.feed('{"description": "use { and } freely"')
+
+        assert not [e for e in events if e.kind == OBJECT]
+        assert scanner.in_object
+        assert scanner.feed("}")[-1].value == {"description": "use { and } freely"}
+
+    def test_multiple_objects(self):
+        events = JsonStreamScanner().feed('{"a": 1} noise {"b": [1, {"c": 2}]}')
+
+        assert [e.value for e in events if e.kind == OBJECT] == [{"a": 1}, {"b": [1, {"c": 2}]}]
+
+    def test_invalid_object_reports_error(self):
+        events = JsonStreamScanner().feed("{'single': 'quotes'}")
+
+        assert events[-1].kind == ERROR
+
+    def test_reset_drops_partial_object(self):
+        scanner = JsonStreamScanner()
+        scanner.feed('{"partial": ')
+        scanner.reset()
+
+        assert [e.value for e in scanner.feed('{"x": 1}') if e.kind == OBJECT] == [{"x": 1}]
+
+
+class TestValueCapture:
+    """Selected key values stream out decoded."""
+
+    def test_values_stream_and_decode(self):
+        scanner = JsonStreamScanner(capture_keys={"summary", "title", "notes"}, collect_objects=False)
+        events = feed_in_chunks(scanner, json.dumps(PLAN), 3)
+
+        values = [(e.key, e.value) for e in events if e.kind == VALUE]
+        assert values[0] == ("summary", PLAN["summary"])
+        assert [v for k, v in values if k == "title"] == ["Task 0", "Task 1", "Task 2"]
+        assert values[-1] == ("notes", PLAN["notes"])
+
+        streamed = "".join(e.value for e in events if e.kind == VALUE_DELTA)
+        assert streamed == PLAN["summary"] + "Task 0Task 1Task 2" + PLAN["notes"]
+
+    def test_uncaptured_keys_and_array_strings_are_ignored(self):
+        scanner = JsonStreamScanner(capture_keys={"title"})
+        events = scanner.feed('{"description": "x", "title": "y", "files": ["title"]}')
+
+        assert [e.value for e in events if e.kind == VALUE] == ["y"]
+
+
+class TestScaling:
+    """Work per chunk does not grow with the buffer."""
+
+    def test_large_plan_token_by_token(self):
+        big = {"tasks": [{"title": f"T{i}", "description": "x" * 400} for i in range(250)]}
+        text = json.dumps(big)  # ~110 KB
+        scanner = JsonStreamScanner(capture_keys={"title"})
+
+        start = time.perf_counter()
+        events = feed_in_chunks(scanner, text, 4)
+        elapsed = time.perf_counter() - start
+
+        assert [e.value for e in events if e.kind == OBJECT] == [big]
+        assert elapsed < 2.0
@@ -0,0 +1,200 @@
+"""
+Tests for the LLM gateway.
+
+Covers:
+- Waiting calls served by priority class
+- TPM admission and correction with the real token count
+- A 429 pausing every caller of the model, then retrying in the queue
+- Retry-After parsing and rate-limit classification
+- Cancelled waiters leaving the queue
+- Cancelled calls freeing their slot without resetting the backoff
+"""
+
+import time
+import asyncio
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_gateway import (
+    LLMGateway, TokenBucket, is_rate_limited, retry_after_from,
+    INTERACTIVE, STANDARD, BULK, BACKGROUND,
+)
+
+MODEL = "test-model"
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+def gateway(**limits) -> LLMGateway:
+    return LLMGateway(max_retries=3, limits={MODEL: limits}, backoff_s=0.05, max_backoff_s=0.5)
+
+
+class TestErrors:
+    """Rate limit detection and Retry-After."""
+
+    def test_is_rate_limited(self):
+        assert is_rate_limited(RateLimited())
+        assert is_rate_limited(Exception("429 RESOURCE_EXHAUSTED: quota exceeded"))
+        assert is_rate_limited(Exception("503 UNAVAILABLE: the model is overloaded"))
+        assert not is_rate_limited(ValueError("invalid argument"))
+
+    def test_retry_after_from_message(self):
+        assert retry_after_from(Exception("429 Please retry in 12.5s")) == 12.5
+        assert retry_after_from(Exception("{'retryDelay': '7s'}")) == 7.0
+        assert retry_after_from(Exception("429")) is None
+
+    def test_retry_after_from_header(self):
+        class Response:
+            headers = {"Retry-After": "3"}
+
+        error = RateLimited()
+        error.response = Response()
+        assert retry_after_from(error) == 3.0
+
+    def test_token_bucket_wait(self):
+        bucket = TokenBucket(60)  # 1 per second
+        now = time.monotonic()
+        bucket.take(60, now)
+        assert bucket.wait_s(2, now) == pytest.approx(2.0)
+
+
+class TestAdmission:
+    """Priorities, in-flight cap and TPM."""
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        gw = gateway(max_inflight=1)
+        first = await gw.acquire(MODEL, STANDARD)
+        order = []
+
+        async def queued(priority):
+            lease = await gw.acquire(MODEL, priority)
+            order.append(priority)
+            gw.release(lease)
+
+        tasks = [asyncio.create_task(queued(p)) for p in (BACKGROUND, BULK, INTERACTIVE)]
+        await asyncio.sleep(0.01)
+        assert gw.get_stats()["models"][MODEL]["queued"] == 3
+
+        gw.release(first)
+        await asyncio.gather(*tasks)
+
+        assert order == [INTERACTIVE, BULK, BACKGROUND]
+        assert set(gw.get_stats()["models"][MODEL]["queue_wait"]) == {"interactive", "standard", "bulk", "background"}
+
+    @pytest.mark.asyncio
+    async def test_tpm_waits_for_tokens(self):
+        gw = gateway(tpm=6000)  # 100 tokens per second
+        gw.release(await gw.acquire(MODEL, STANDARD, tokens=6000))
+
+        lease = await gw.acquire(MODEL, STANDARD, tokens=20)
+
+        assert lease.waited_s >= 0.15
+
+    @pytest.mark.asyncio
+    async def test_release_corrects_estimate(self):
+        gw = gateway(tpm=6000)
+        lease = await gw.acquire(MODEL, STANDARD, tokens=100)
+        gw.release(lease, tokens_used=9000)
+
+        assert gw._state(MODEL).tpm.tokens < 0  # In debt until it refills
+        gw.release(lease, tokens_used=9000)  # Second release is a no-op
+        assert gw._state(MODEL).inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        gw = gateway(max_inflight=1)
+        held = await gw.acquire(MODEL)
+        task = asyncio.create_task(gw.acquire(MODEL))
+        await asyncio.sleep(0.01)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert gw._state(MODEL).waiting == []
+        gw.release(held)
+        assert gw._state(MODEL).inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_keeps_backoff(self):
+        gw = gateway()
+        assert gw.fail(await gw.acquire(MODEL), Exception("429 retry in 0.05s"))
+        state = gw._state(MODEL)
+        backoff, scale = state.backoff_s, state.rpm.scale
+
+        task = asyncio.create_task(gw.call(MODEL, STANDARD, 10, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.15)
+        assert state.inflight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert (state.inflight, state.backoff_s, state.rpm.scale) == (0, backoff, scale)
+        assert gw.get_stats()["models"][MODEL]["cancelled"] == 1
+
+
+class TestBackoff:
+    """429s back off every caller and retry in the queue."""
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_pauses_model_and_retries(self):
+        gw = gateway()
+        attempts = []
+
+        async def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise Exception("429 RESOURCE_EXHAUSTED, retry in 0.2s")
+            return "ok"
+
+        assert await gw.call(MODEL, STANDARD, 10, flaky) == "ok"
+
+        assert attempts[1] - attempts[0] >= 0.18
+        stats = gw.get_stats()["models"][MODEL]
+        assert (stats["rate_limited"], stats["retries"], stats["inflight"]) == (1, 1, 0)
+        assert stats["rate_scale"] < 1.0
+
+    @pytest.mark.asyncio
+    async def test_other_callers_wait_out_the_pause(self):
+        gw = gateway()
+        lease = await gw.acquire(MODEL)
+        assert gw.fail(lease, Exception("429 retry in 0.2s"))
+
+        started = time.monotonic()
+        gw.release(await gw.acquire(MODEL, INTERACTIVE))
+
+        assert time.monotonic() - started >= 0.18
+
+    @pytest.mark.asyncio
+    async def test_other_errors_are_not_retried(self):
+        gw = gateway()
+        calls = []
+
+        async def broken():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            await gw.call(MODEL, STANDARD, 10, broken)
+
+        assert len(calls) == 1
+        assert gw._state(MODEL).inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self):
+        gw = gateway()
+
+        async def always_limited():
+            raise RateLimited("429")
+
+        with pytest.raises(RateLimited):
+            await gw.call(MODEL, STANDARD, 10, always_limited)
+
+        assert gw.get_stats()["models"][MODEL]["retries"] == 3
@@ -0,0 +1,109 @@
+"""
+Tests for incremental ReAct message history trimming.
+
+Covers:
+- Token estimates for prose vs code / JSON, tool call arguments included
+- Counts computed once per message id across steps
+- Task message pinned; tool calls never separated from their results
+- Newest turn kept even over budget
+- Rebuild when a different history is passed
+"""
+
+import uuid
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.message_history import MessageHistory, count_message_tokens, estimate_text_tokens
+
+
+class Msg:
+    """Duck-typed stand-in for a LangChain message."""
+
+    def __init__(self, type, content="", tool_calls=None):
+        self.type = type
+        self.content = content
+        self.tool_calls = tool_calls or []
+        self.id = uuid.uuid4().hex
+
+
+def turn(size=200):
+    """One ReAct turn: an AI tool call and its result."""
+    call = Msg("ai", tool_calls=[{"name": "write_file_to_disk", "args": {"content": "x = 1\n" * size}}])
+    return [call, Msg("tool", "ok " * size)]
+
+
+class TestEstimates:
+    """Token estimates."""
+
+    def test_code_counts_more_than_chars_over_4(self):
+        code = 'if (a[i] === "x") { fn({k: 1}); }\n' * 20
+
+        assert estimate_text_tokens(code) > len(code) // 4
+
+    def test_prose_close_to_words(self):
+        text = "the quick brown fox jumps over the lazy dog " * 10
+
+        assert estimate_text_tokens(text) == 90
+
+    def test_tool_call_arguments_counted(self):
+        empty = Msg("ai")
+        call = Msg("ai", tool_calls=[{"name": "write_file_to_disk", "args": {"content": "print(1)\n" * 50}}])
+
+        assert count_message_tokens(call) > count_message_tokens(empty) + 100
+
+
+class TestTrim:
+    """Budgeted window."""
+
+    def test_under_budget_keeps_everything(self):
+        messages = [Msg("human", "build it")] + turn(5)
+
+        assert MessageHistory(10_000).trim(messages) == messages
+
+    def test_task_pinned_and_pairs_kept(self):
+        history = MessageHistory(1500)
+        messages = [Msg("human", "task " * 500)]
+        for _ in range(6):
+            messages += turn()
+
+        kept = history.trim(messages)
+
+        assert kept[0] is messages[0]
+        assert kept[1].type == "ai"  # Never starts on an orphaned tool result
+        assert len(kept) < len(messages)
+        assert history.total_tokens - history.get_stats()["pinned_tokens"] <= 1500
+        assert history.total_tokens == sum(count_message_tokens(m) for m in kept)
+
+    def test_newest_turn_kept_over_budget(self):
+        history = MessageHistory(10)
+        messages = [Msg("human", "task")] + turn() + turn()
+
+        kept = history.trim(messages)
+
+        assert kept == [messages[0]] + messages[-2:]
+
+    def test_incremental_counting(self):
+        history = MessageHistory(1500)
+        messages = [Msg("human", "task")]
+        for _ in range(10):
+            messages += turn()
+            history.trim(list(messages))  # State hands the hook a new list each step
+
+        stats = history.get_stats()
+        assert stats["counted"] == len(messages)  # Each message counted once
+        assert stats["rebuilds"] == 0
+        assert stats["trimmed"] > 0
+
+    def test_other_history_rebuilds(self):
+        history = MessageHistory(10_000)
+        first = [Msg("human", "a")] + turn(5)
+        second = [Msg("human", "b")] + turn(5)
+
+        history.trim(first)
+        assert history.trim(second) == second
+        assert history.get_stats()["rebuilds"] == 1
+        assert history.total_tokens == sum(count_message_tokens(m) for m in second)
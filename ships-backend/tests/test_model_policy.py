@@ -0,0 +1,116 @@
+"""
+Tests for the complexity-adaptive model policy.
+
+Covers:
+- Small edits get a low thinking budget, scaffolds keep "high"
+- Fixer sizing from error and file counts
+- Escalation per failed attempt, then to the Pro model
+- Disabled policy / uncovered agents fall back to the defaults
+- Decision log (stats and JSON lines)
+"""
+
+import json
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_policy import ModelPolicy, TaskSignals, MODEL_FLASH, MODEL_PRO
+
+
+@pytest.fixture
+def policy():
+    return ModelPolicy(enabled=True, pro_after=2, log_path="")
+
+
+class TestSizing:
+    """Tier and thinking level from the task signals."""
+
+    def test_one_line_edit_is_trivial(self, policy):
+        choice = policy.choose(TaskSignals(agent="coder", task_type="modify", scope="feature", file_count=1))
+
+        assert (choice.tier, choice.thinking_level, choice.model) == ("trivial", "low", MODEL_FLASH)
+
+    def test_new_project_keeps_high(self, policy):
+        choice = policy.choose(TaskSignals(agent="coder", task_type="feature", scope="project", file_count=20))
+
+        assert (choice.tier, choice.thinking_level) == ("large", "high")
+
+    def test_multi_file_feature_is_bigger_than_single_file(self, policy):
+        small = policy.choose(TaskSignals(agent="coder", task_type="feature", scope="file", file_count=1))
+        bigger = policy.choose(TaskSignals(agent="coder", task_type="feature", scope="feature", file_count=8))
+
+        assert small.tier == "trivial"
+        assert bigger.tier == "medium"
+
+    def test_fixer_sized_by_errors(self, policy):
+        few = policy.choose(TaskSignals(agent="fixer", scope="feature", error_count=1, file_count=1))
+        many = policy.choose(TaskSignals(agent="fixer", scope="feature", error_count=25, file_count=6))
+
+        assert few.thinking_level == "low"
+        assert many.thinking_level == "high"
+
+
+class TestEscalation:
+    """Failed attempts raise the budget, then switch model."""
+
+    def test_each_failure_adds_a_level(self, policy):
+        levels = [
+            policy.choose(TaskSignals(agent="fixer", error_count=1, failed_attempts=n)).thinking_level
+            for n in range(3)
+        ]
+
+        assert levels == ["low", "medium", "high"]
+
+    def test_pro_after_failures_at_high(self, policy):
+        signals = TaskSignals(agent="fixer", error_count=25, file_count=6)
+
+        assert policy.choose(signals).model == MODEL_FLASH
+        signals.failed_attempts = 1
+        assert policy.choose(signals).model == MODEL_FLASH
+        signals.failed_attempts = 2
+        choice = policy.choose(signals)
+        assert (choice.model, choice.thinking_level) == (MODEL_PRO, "high")
+
+    def test_small_task_escalates_thinking_before_model(self, policy):
+        choice = policy.choose(TaskSignals(agent="coder", task_type="modify", scope="file", failed_attempts=2))
+
+        assert (choice.model, choice.thinking_level) == (MODEL_FLASH, "high")
+
+
+class TestFallback:
+    """No choice means LLMFactory's agent defaults."""
+
+    def test_disabled(self):
+        assert ModelPolicy(enabled=False).choose(TaskSignals(agent="coder")) is None
+
+    def test_uncovered_agent(self, policy):
+        assert policy.choose(TaskSignals(agent="planner")) is None
+
+
+class TestDecisionLog:
+    """Decisions are counted and written for offline tuning."""
+
+    def test_stats(self, policy):
+        policy.choose(TaskSignals(agent="coder", task_type="modify", scope="file"))
+        policy.choose(TaskSignals(agent="coder", task_type="modify", scope="file"))
+
+        stats = policy.get_stats()
+
+        assert stats["decisions"] == [
+            {"agent": "coder", "tier": "trivial", "thinking_level": "low", "model": MODEL_FLASH, "count": 2}
+        ]
+        assert len(stats["recent"]) == 2
+
+    def test_jsonl_log(self, tmp_path):
+        path = tmp_path / "decisions.jsonl"
+        policy = ModelPolicy(enabled=True, log_path=str(path))
+
+        policy.choose(TaskSignals(agent="fixer", error_count=4, failed_attempts=1))
+
+        entry = json.loads(path.read_text().splitlines()[0])
+        assert entry["signals"]["error_count"] == 4
+        assert entry["choice"]["escalation"] == 1
+        assert "run_id" in entry
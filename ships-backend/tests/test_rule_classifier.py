@@ -0,0 +1,115 @@
+"""
+Tests for the local rule-based intent fast path.
+
+Covers:
+- Questions and confirmations resolved without the LLM
+- Engineering requests (and question/change hybrids) left to the LLM
+- Polite edit requests and bug reports phrased as questions left to the LLM
+- Per-path latency stats and fallback rate
+"""
+
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.mini_agents.rule_classifier import RuleIntentClassifier
+
+
+@pytest.fixture
+def classifier():
+    return RuleIntentClassifier(threshold=0.85, enabled=True)
+
+
+class TestFastPath:
+    """Clear-cut conversational requests are classified locally."""
+
+    @pytest.mark.parametrize("request_text", [
+        "What does Button.tsx do?",
+        "what does App.tsx do",
+        "How does the routing work?",
+        "Explain the auth flow",
+    ])
+    def test_questions(self, classifier, request_text):
+        result = classifier.classify(request_text)
+
+        assert result is not None
+        assert result["task_type"] == "question"
+        assert result["action"] == "explain"
+
+    @pytest.mark.parametrize("request_text", ["yes, looks good", "Go ahead!", "LGTM", "ok proceed"])
+    def test_confirmations(self, classifier, request_text):
+        result = classifier.classify(request_text)
+
+        assert result is not None
+        assert result["task_type"] == "confirmation"
+        assert result["action"] == "proceed"
+
+    def test_file_reference_sets_target_area(self, classifier):
+        result = classifier.classify("What does Button.tsx do?")
+
+        assert result["suggested_files"] == ["Button.tsx"]
+        assert result["target_area"] == "frontend"
+
+
+class TestFallback:
+    """Anything that may change code goes to the LLM."""
+
+    @pytest.mark.parametrize("request_text", [
+        "Add a user profile page",
+        "Fix login bug",
+        "Refactor authentication",
+        "How do I add a navbar?",
+        "yes, but change the color to blue",
+        "",
+    ])
+    def test_returns_none(self, classifier, request_text):
+        assert classifier.classify(request_text) is None
+
+    @pytest.mark.parametrize("request_text", [
+        "could you darken the header?",
+        "can you center the login form?",
+        "can you put the navbar on top?",
+        "Would you please tidy up the CSS?",
+        "why does the app crash on login?",
+        "why is the page blank?",
+    ])
+    def test_polite_requests_and_bug_reports(self, classifier, request_text):
+        assert classifier.classify(request_text) is None
+
+    def test_polite_information_request_is_a_question(self, classifier):
+        result = classifier.classify("could you explain the auth flow?")
+
+        assert result is not None
+        assert result["task_type"] == "question"
+
+    def test_scorer_must_confirm(self):
+        unsure = RuleIntentClassifier(threshold=0.85, enabled=True, min_similarity=0.99)
+
+        assert unsure.classify("what does App.tsx do") is None
+
+    def test_disabled(self):
+        assert RuleIntentClassifier(enabled=False).classify("what does App.tsx do") is None
+
+    def test_high_threshold_rejects(self):
+        strict = RuleIntentClassifier(threshold=0.99, enabled=True)
+
+        assert strict.classify("what does App.tsx do") is None
+        assert strict.get_stats()["rule_rejections"] == 1
+
+
+class TestStats:
+    """Per-path latency and LLM fallback rate."""
+
+    def test_fallback_rate(self, classifier):
+        classifier.record("rules", 0.00002)
+        classifier.record("rules", 0.00004)
+        classifier.record("cache", 0.0001)
+        classifier.record("llm", 1.2)
+
+        stats = classifier.get_stats()
+        assert stats["llm_fallback_rate"] == 0.25
+        assert stats["paths"]["rules"]["count"] == 2
+        assert stats["paths"]["llm"]["avg_ms"] == 1200.0
@@ -0,0 +1,220 @@
+"""
+Tests for the run broker (background runs, multi-subscriber fan-out).
+
+Covers:
+- The run completes even with no reader attached
+- Several subscribers, late attach with replay
+- Slow-consumer policies never block the producer
+- Cancel by id, and cancel after the last subscriber leaves
+- Runs reachable only by their owner
+"""
+
+import asyncio
+import json
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.replay import RunStreamRegistry
+from app.streaming.run_broker import RunBroker, CATCH_UP, DROP_OLDEST, DISCONNECT
+from app.utils.cancellation import CancelRegistry, current_cancel_token
+
+
+@pytest.fixture
+def broker():
+    return RunBroker(streams=RunStreamRegistry(spill_dir=None), orphan_grace_s=0.05, cancels=CancelRegistry())
+
+
+async def produce(count, delay=0.0):
+    for i in range(count):
+        if delay:
+            await asyncio.sleep(delay)
+        yield json.dumps({"type": "block_delta", "i": i})
+
+
+async def read_all(subscriber):
+    return [json.loads(line) async for line in subscriber]
+
+
+class TestBackgroundRuns:
+    """Runs don't depend on any reader."""
+
+    @pytest.mark.asyncio
+    async def test_run_finishes_without_subscribers(self, broker):
+        run = broker.start(produce(5))
+        await run.task
+
+        assert run.done
+        assert run.stream.last_seq == 5
+
+    @pytest.mark.asyncio
+    async def test_failure_is_reported_in_stream(self, broker):
+        async def failing():
+            yield json.dumps({"type": "block_start"})
+            raise RuntimeError("boom")
+
+        run = broker.start(failing())
+        await run.task
+
+        events = await read_all(broker.subscribe(run.run_id))
+        assert events[-1]["type"] == "error" and events[-1]["content"] == "boom"
+
+
+class TestSubscribers:
+    """Fan-out to many readers."""
+
+    @pytest.mark.asyncio
+    async def test_multiple_subscribers_see_everything(self, broker):
+        run = broker.start(produce(20, delay=0.001))
+        a = broker.subscribe(run.run_id, name="chat")
+        b = broker.subscribe(run.run_id, name="dashboard")
+
+        ra, rb = await asyncio.gather(read_all(a), read_all(b))
+
+        assert [e["seq"] for e in ra] == list(range(1, 21))
+        assert ra == rb
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber_replays_then_follows(self, broker):
+        run = broker.start(produce(10, delay=0.002))
+        await asyncio.sleep(0.01)
+
+        events = await read_all(broker.subscribe(run.run_id, after_seq=2))
+
+        assert [e["seq"] for e in events] == list(range(3, 11))
+
+    def test_unknown_run(self, broker):
+        assert broker.subscribe("nope") is None
+
+
+class TestSlowConsumers:
+    """A full subscriber queue never blocks the run."""
+
+    @pytest.mark.asyncio
+    async def test_catch_up_is_lossless(self, broker):
+        run = broker.start(produce(50))
+        sub = broker.subscribe(run.run_id, maxsize=3, policy=CATCH_UP)
+        await run.task  # producer ran to completion without the reader
+
+        events = await read_all(sub)
+
+        assert [e["seq"] for e in events] == list(range(1, 51))
+        assert sub.overflows > 0
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_keeps_newest(self, broker):
+        run = broker.start(produce(50))
+        sub = broker.subscribe(run.run_id, maxsize=3, policy=DROP_OLDEST)
+        await run.task
+
+        events = await read_all(sub)
+
+        assert events[-1]["seq"] == 50
+        assert sub.dropped > 0
+
+    @pytest.mark.asyncio
+    async def test_disconnect_reports_resume_point(self, broker):
+        run = broker.start(produce(50))
+        sub = broker.subscribe(run.run_id, maxsize=3, policy=DISCONNECT)
+        await run.task
+
+        events = await read_all(sub)
+
+        assert events == [{"type": "stream:lagged", "resume_after": 0}]
+        assert sub.lagged
+
+
+class TestCancellation:
+    """Runs stop on request or when abandoned."""
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_run(self, broker):
+        run = broker.start(produce(1000, delay=0.01))
+        await asyncio.sleep(0.03)
+
+        assert broker.cancel(run.run_id, "cancel requested")
+        with pytest.raises(asyncio.CancelledError):
+            await run.task
+
+        events = await read_all(broker.subscribe(run.run_id))
+        assert events[-1] == {"type": "stream:cancelled", "reason": "cancel requested", "seq": run.stream.last_seq}
+        assert broker.cancels.get(run.run_id) is None
+        assert not broker.cancel(run.run_id)
+
+    @pytest.mark.asyncio
+    async def test_token_is_bound_in_run(self, broker):
+        seen = []
+
+        async def producer():
+            seen.append(current_cancel_token())
+            yield json.dumps({"type": "block_start"})
+
+        run = broker.start(producer())
+        await run.task
+
+        assert seen == [run.token]
+
+    @pytest.mark.asyncio
+    async def test_orphaned_run_is_cancelled(self, broker):
+        run = broker.start(produce(1000, delay=0.01))
+        sub = broker.subscribe(run.run_id, name="chat")
+        lines = sub.lines()
+        await lines.__anext__()
+        await lines.aclose()  # client disconnected
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(asyncio.shield(run.task), timeout=1)
+        assert run.token.reason == "client disconnected"
+        assert broker.get_stats()["orphan_cancels"] == 1
+
+    @pytest.mark.asyncio
+    async def test_resume_within_grace_keeps_run(self, broker):
+        run = broker.start(produce(20, delay=0.01))
+        sub = broker.subscribe(run.run_id, name="chat")
+        lines = sub.lines()
+        await lines.__anext__()
+        await lines.aclose()
+
+        events = await read_all(broker.subscribe(run.run_id, after_seq=1, name="resume"))
+
+        assert not run.token.cancelled
+        assert events[-1]["seq"] == 20
+
+
+class TestOwnership:
+    """Only the client that started a run can reach it."""
+
+    @pytest.mark.asyncio
+    async def test_get_owned(self, broker):
+        run = broker.start(produce(3), owner="user:1")
+
+        assert broker.get_owned(run.run_id, "user:1") is run
+        assert broker.get_owned(run.run_id, "user:2") is None
+        assert broker.get_owned(run.run_id, None) is None
+
+    @pytest.mark.asyncio
+    async def test_unowned_runs_are_not_reachable(self, broker):
+        run = broker.start(produce(3))
+
+        assert broker.get_owned(run.run_id, "ip:127.0.0.1") is None
+
+    @pytest.mark.asyncio
+    async def test_owner_kept_after_prune(self, broker):
+        run = broker.start(produce(3), owner="ip:10.0.0.1")
+        await run.task
+        broker.list_runs()  # Prunes the finished run; its stream stays replayable
+
+        assert broker.get_owned(run.run_id, "ip:10.0.0.1") is not None
+        assert broker.get_owned(run.run_id, "ip:10.0.0.2") is None
+
+    @pytest.mark.asyncio
+    async def test_list_runs_by_owner(self, broker):
+        mine = broker.start(produce(50, delay=0.01), owner="user:1")
+        broker.start(produce(50, delay=0.01), owner="user:2")
+
+        assert [r["run_id"] for r in broker.list_runs(owner="user:1")] == [mine.run_id]
+        for run in list(broker._runs.values()):
+            run.token.cancel("test done")
@@ -0,0 +1,120 @@
+"""
+Tests for the run-scoped context (project root, run id, user id).
+
+Covers:
+- Concurrent runs each see their own context, in tasks and tool threads
+- LangGraph config fallback, nothing outside a run
+- Step tracking resolves the run from the context
+- A node moving the project updates its run only, and the preview only if
+  it was showing that run
+- get_project_root() has no process-global fallback
+"""
+
+import asyncio
+import contextvars
+import uuid
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.run_context import (
+    RunContext, bind_run_context, current_run_context, run_project_root, RUN_CONTEXT_KEY,
+)
+from app.services import step_tracking
+from app.streaming.graph_events import GraphEventRenderer
+
+
+class TestScoping:
+    """Each run sees its own context."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_runs_are_isolated(self):
+        async def run(root):
+            bind_run_context(RunContext(run_id=root, project_root=root))
+            await asyncio.sleep(0.01)
+            in_thread = await asyncio.to_thread(run_project_root)
+            return run_project_root(), in_thread
+
+        results = await asyncio.gather(
+            asyncio.create_task(run("/projects/a"), context=contextvars.Context()),
+            asyncio.create_task(run("/projects/b"), context=contextvars.Context()),
+        )
+
+        assert results == [("/projects/a", "/projects/a"), ("/projects/b", "/projects/b")]
+
+    def test_config_fallback(self):
+        ctx = RunContext(project_root="/projects/c")
+        config = {"configurable": {RUN_CONTEXT_KEY: ctx}}
+
+        assert contextvars.Context().run(current_run_context, config) is ctx
+
+    def test_nothing_outside_a_run(self):
+        assert contextvars.Context().run(run_project_root) is None
+
+
+class TestStepTracking:
+    """Steps go to the calling run, not module state."""
+
+    def test_tracked_run_from_context(self):
+        run_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+        def tracked():
+            bind_run_context(RunContext(run_id=str(run_id), user_id=str(user_id)))
+            return step_tracking._tracked_run(), step_tracking.get_current_run_id()
+
+        assert contextvars.Context().run(tracked) == ((run_id, user_id), run_id)
+
+    def test_untracked_without_user(self):
+        def tracked():
+            bind_run_context(RunContext(run_id=str(uuid.uuid4())))
+            return step_tracking._tracked_run()
+
+        assert contextvars.Context().run(tracked) is None
+
+
+class TestProjectMove:
+    """Nodes reporting a new project path."""
+
+    def chain_end(self, path):
+        return {"event": "on_chain_end", "name": "coder",
+                "data": {"output": {"artifacts": {"project_path": path}}}}
+
+    def test_moves_own_run_and_following_preview(self, monkeypatch):
+        from app.services.preview_manager import preview_manager
+        monkeypatch.setattr(preview_manager, "current_project_path", "/projects/a")
+        ctx = RunContext(project_root="/projects/a")
+
+        GraphEventRenderer(run_context=ctx).render(self.chain_end("/projects/a/app"))
+
+        assert ctx.project_root == "/projects/a/app"
+        assert preview_manager.current_project_path == "/projects/a/app"
+
+    def test_does_not_hijack_another_projects_preview(self, monkeypatch):
+        from app.services.preview_manager import preview_manager
+        monkeypatch.setattr(preview_manager, "current_project_path", "/projects/b")
+        ctx = RunContext(project_root="/projects/a")
+
+        GraphEventRenderer(run_context=ctx).render(self.chain_end("/projects/a/app"))
+
+        assert ctx.project_root == "/projects/a/app"
+        assert preview_manager.current_project_path == "/projects/b"
+
+
+class TestProjectRoot:
+    """Coder tools resolve paths against the run only."""
+
+    def test_no_global_fallback(self, monkeypatch):
+        pytest.importorskip("langchain_core")
+        from app.agents.tools.coder.context import get_project_root
+        from app.services.preview_manager import preview_manager
+        monkeypatch.setattr(preview_manager, "current_project_path", "/projects/other")
+
+        def resolve():
+            outside = get_project_root()
+            bind_run_context(RunContext(project_root="/projects/mine"))
+            return outside, get_project_root()
+
+        assert contextvars.Context().run(resolve) == (None, "/projects/mine")
@@ -0,0 +1,150 @@
+"""
+Tests for run admission control (RunScheduler).
+
+Covers:
+- Global cap: excess runs queue and are admitted by tier priority
+- Per-user tier cap skips that user without blocking others
+- Full queue rejects up front with a retry hint
+- Queued runs stream run:queued / run:admitted before the pipeline
+- Leaving the queue (cancel / timeout) frees the place
+"""
+
+import asyncio
+import json
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.run_scheduler import RunScheduler, RunRejected
+
+TIERS = {
+    "free": {"max_concurrent_runs": 1, "run_priority": 0},
+    "pro": {"max_concurrent_runs": 2, "run_priority": 2},
+}
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault("max_concurrent", 1)
+    return RunScheduler(tier_limits=TIERS, **kwargs)
+
+
+async def producer(lines=("a\n", "b\n")):
+    for line in lines:
+        yield line
+
+
+class TestAdmission:
+    """Caps and ordering."""
+
+    @pytest.mark.asyncio
+    async def test_global_cap_queues_and_admits_by_priority(self):
+        scheduler = make_scheduler()
+        running = scheduler.submit("ip:1", "free")
+        free = scheduler.submit("ip:2", "free")
+        pro = scheduler.submit("user:3", "pro")
+
+        assert running.admitted.done()
+        assert scheduler.position(pro) == 1 and scheduler.position(free) == 2
+
+        scheduler.release(running)
+        assert pro.admitted.done() and not free.admitted.done()
+
+    @pytest.mark.asyncio
+    async def test_user_cap_does_not_block_others(self):
+        scheduler = make_scheduler(max_concurrent=3)
+        first = scheduler.submit("ip:1", "free")
+        second = scheduler.submit("ip:1", "free")
+        other = scheduler.submit("ip:2", "free")
+
+        assert first.admitted.done() and other.admitted.done()
+        assert not second.admitted.done()
+
+        scheduler.release(first)
+        assert second.admitted.done()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects(self):
+        scheduler = make_scheduler(max_queued=1, max_queued_per_user=1)
+        scheduler.submit("ip:1", "free")
+        scheduler.submit("ip:2", "free")
+
+        with pytest.raises(RunRejected) as exc:
+            scheduler.submit("ip:3", "free")
+
+        assert exc.value.retry_after_s > 0
+        assert scheduler.get_stats()["queued"] == 1
+        assert scheduler.get_stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_per_user_queue_limit(self):
+        scheduler = make_scheduler(max_queued_per_user=1)
+        scheduler.submit("ip:1", "free")
+        scheduler.submit("ip:1", "free")
+
+        with pytest.raises(RunRejected):
+            scheduler.submit("ip:1", "free")
+        scheduler.submit("ip:2", "free")  # Others can still queue
+
+
+class TestStreaming:
+    """What a queued run's stream carries."""
+
+    @pytest.mark.asyncio
+    async def test_queue_events_then_pipeline(self):
+        scheduler = make_scheduler()
+        running = scheduler.submit("ip:1", "free")
+        ticket = scheduler.submit("ip:2", "free")
+        stream = scheduler.run(ticket, producer())
+
+        queued = json.loads(await stream.__anext__())
+        assert queued["type"] == "run:queued" and queued["position"] == 1
+
+        scheduler.release(running)
+        admitted = json.loads(await stream.__anext__())
+        assert admitted["type"] == "run:admitted"
+        assert [line async for line in stream] == ["a\n", "b\n"]
+
+        stats = scheduler.get_stats()
+        assert stats["active"] == 0 and stats["admitted"] == 2
+
+    @pytest.mark.asyncio
+    async def test_admitted_run_streams_directly(self):
+        scheduler = make_scheduler()
+        ticket = scheduler.submit("ip:1", "free")
+
+        assert [line async for line in scheduler.run(ticket, producer())] == ["a\n", "b\n"]
+        assert scheduler.get_stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_while_queued_frees_place(self):
+        scheduler = make_scheduler()
+        scheduler.submit("ip:1", "free")
+        ticket = scheduler.submit("ip:2", "free")
+
+        async def drain():
+            async for _ in scheduler.run(ticket, producer()):
+                pass
+
+        task = asyncio.create_task(drain())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        stats = scheduler.get_stats()
+        assert stats["queued"] == 0 and stats["abandoned_in_queue"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_rejects(self):
+        scheduler = make_scheduler(queue_timeout_s=0.05)
+        scheduler.submit("ip:1", "free")
+        ticket = scheduler.submit("ip:2", "free")
+
+        lines = [json.loads(line) async for line in scheduler.run(ticket, producer())]
+
+        assert [line["type"] for line in lines] == ["run:queued", "run:rejected"]
+        assert scheduler.get_stats()["queue_timeouts"] == 1
+        assert scheduler.get_stats()["queued"] == 0
@@ -0,0 +1,103 @@
+"""
+Tests for deferred run setup (run:accepted first, setup phases concurrently).
+
+Covers:
+- Phases run concurrently and are reported with timings
+- await_workspace() waits for the git phase, never raises
+- Time-to-first-event is recorded once
+"""
+
+import time
+import asyncio
+import contextvars
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.run_setup import RunSetup, bind_run_setup, await_workspace, GRAPH, TRACKING, WORKSPACE
+
+
+async def slow(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def failing():
+    raise RuntimeError("no git")
+
+
+class TestPhases:
+    """Setup phases are timed and reported."""
+
+    @pytest.mark.asyncio
+    async def test_phases_run_concurrently(self):
+        setup = RunSetup()
+        start = time.perf_counter()
+        setup.start(GRAPH, slow("graph", 0.1))
+        setup.start(TRACKING, slow("run-id", 0.1))
+
+        assert await setup.wait(GRAPH) == "graph"
+        assert await setup.wait(TRACKING) == "run-id"
+        assert time.perf_counter() - start < 0.18
+
+        events = setup.drain()
+        assert {e["phase"] for e in events} == {GRAPH, TRACKING}
+        assert all(e["type"] == "run:setup" and e["status"] == "ok" for e in events)
+        assert setup.drain() == []
+
+    @pytest.mark.asyncio
+    async def test_unstarted_phase_is_none(self):
+        assert await RunSetup().wait(TRACKING) is None
+
+    @pytest.mark.asyncio
+    async def test_failure_is_reported(self):
+        reported = []
+        setup = RunSetup(on_phase=reported.append)
+        setup.start(GRAPH, failing())
+
+        with pytest.raises(RuntimeError):
+            await setup.wait(GRAPH)
+
+        assert reported[0]["status"] == "failed" and reported[0]["error"] == "no git"
+
+    @pytest.mark.asyncio
+    async def test_first_event_recorded_once(self):
+        setup = RunSetup()
+        setup.mark_first_event()
+        first = setup.first_event_ms
+        await asyncio.sleep(0.01)
+        setup.mark_first_event()
+
+        assert setup.first_event_ms == first
+
+
+class TestWorkspace:
+    """Writers wait for the run's branch; others don't."""
+
+    @pytest.mark.asyncio
+    async def test_waits_for_git_phase(self):
+        setup = RunSetup()
+        setup.start(WORKSPACE, slow(True, 0.05))
+
+        async def node():
+            bind_run_setup(setup)
+            await await_workspace()
+            return setup.phases.get(WORKSPACE)
+
+        phase = await asyncio.create_task(node(), context=contextvars.copy_context())
+        assert phase is not None and phase["status"] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_failed_git_phase_does_not_raise(self):
+        setup = RunSetup(on_phase=lambda e: None)
+        setup.start(WORKSPACE, failing())
+        bind_run_setup(setup)
+
+        await await_workspace()
+
+    @pytest.mark.asyncio
+    async def test_no_setup_is_noop(self):
+        await asyncio.create_task(await_workspace(), context=contextvars.Context())
@@ -0,0 +1,114 @@
+"""
+Tests for block_delta coalescing in StreamBlockManager.
+
+Covers:
+- Consecutive deltas merged within the time window / byte cap
+- Flush on block boundaries (no text lost, order preserved)
+- Coalescing disabled with a zero window
+"""
+
+import json
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.streaming.stream_events import StreamBlockManager, BlockType
+import app.streaming.stream_events as stream_events_module
+
+
+def parse(*chunks):
+    """NDJSON fragments -> list of event dicts."""
+    return [json.loads(line) for chunk in chunks if chunk for line in chunk.split("\n")]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class TestCoalescing:
+    """Deltas are buffered and merged."""
+
+    def test_deltas_within_window_are_merged(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(stream_events_module, "time", clock)
+        mgr = StreamBlockManager(coalesce_ms=40, coalesce_max_bytes=4096)
+        mgr.start_block(BlockType.THINKING, "Thinking...")
+
+        assert mgr.append_delta("a") is None
+        clock.now += 0.01
+        assert mgr.append_delta("b") is None
+        clock.now += 0.05
+        events = parse(mgr.append_delta("c"))
+
+        assert [e["content"] for e in events] == ["abc"]
+        assert mgr.pending_delta_deadline() is None
+
+    def test_byte_cap_flushes(self):
+        mgr = StreamBlockManager(coalesce_ms=10_000, coalesce_max_bytes=4)
+        mgr.start_block(BlockType.TEXT)
+
+        assert mgr.append_delta("ab") is None
+        events = parse(mgr.append_delta("cd"))
+
+        assert events[0]["content"] == "abcd"
+
+    def test_deadline_counts_down(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(stream_events_module, "time", clock)
+        mgr = StreamBlockManager(coalesce_ms=40)
+        mgr.start_block(BlockType.TEXT)
+        mgr.append_delta("x")
+        clock.now += 0.03
+
+        assert abs(mgr.pending_delta_deadline() - 0.01) < 1e-9
+
+
+class TestBlockBoundaries:
+    """Block boundaries always flush buffered text first."""
+
+    def test_end_block_flushes_before_block_end(self):
+        mgr = StreamBlockManager(coalesce_ms=10_000)
+        mgr.start_block(BlockType.TEXT)
+        mgr.append_delta("hello ")
+        mgr.append_delta("world")
+
+        events = parse(mgr.end_current_block())
+
+        assert [e["type"] for e in events] == ["block_delta", "block_end"]
+        assert events[0]["content"] == "hello world"
+        assert events[1]["final_content"] == "hello world"
+
+    def test_start_block_flushes_previous_block(self):
+        mgr = StreamBlockManager(coalesce_ms=10_000)
+        first = parse(mgr.start_block(BlockType.TEXT))[0]["id"]
+        mgr.append_delta("pending")
+
+        events = parse(mgr.start_block(BlockType.CODE))
+
+        assert [e["type"] for e in events] == ["block_delta", "block_end", "block_start"]
+        assert events[0]["id"] == first
+
+    def test_create_block_keeps_content(self):
+        mgr = StreamBlockManager(coalesce_ms=10_000)
+
+        events = parse(mgr.create_block(BlockType.PLAN, "Plan", "step 1"))
+
+        assert [e["type"] for e in events] == ["block_start", "block_delta", "block_end"]
+        assert events[1]["content"] == "step 1"
+
+    def test_zero_window_disables_coalescing(self):
+        mgr = StreamBlockManager(coalesce_ms=0)
+        mgr.start_block(BlockType.TEXT)
+
+        assert parse(mgr.append_delta("a"))[0]["content"] == "a"
+        assert parse(mgr.append_delta("b"))[0]["content"] == "b"
+        assert mgr.delta_events_out == 2
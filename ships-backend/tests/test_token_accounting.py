@@ -0,0 +1,136 @@
+"""
+Tests for per-node LLM usage accounting.
+
+Covers:
+- usage_metadata -> tokens (cached / thinking) and cost
+- Attribution to node, agent and tool-loop iteration from LangGraph metadata
+- Streamed chunk usage when the final message has none
+- Step rows claim a node's usage once; leftovers close with the node
+- Leftover usage steps are awaited by drain()
+"""
+
+import uuid
+import asyncio
+import pytest
+
+# Add parent to path for imports
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+
+from app.services.token_accounting import RunUsage, Usage, UsageCallbackHandler, usage_cost
+
+USAGE = {
+    "input_tokens": 1000,
+    "output_tokens": 300,
+    "total_tokens": 1300,
+    "input_token_details": {"cache_read": 800},
+    "output_token_details": {"reasoning": 200},
+}
+
+
+def call(handler, namespace, usage_metadata=USAGE, chunks=(), agent="coder"):
+    """One chat model call as LangChain reports it to the handler."""
+    run_id = uuid.uuid4()
+    metadata = {"langgraph_checkpoint_ns": namespace, "ships_agent": agent,
+                "ls_model_name": "gemini-3-flash-preview"}
+    handler.on_chat_model_start({}, [[]], run_id=run_id, metadata=metadata)
+    for chunk_usage in chunks:
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content="x", usage_metadata=chunk_usage))
+        handler.on_llm_new_token("x", chunk=chunk, run_id=run_id)
+    message = AIMessage(content="done", usage_metadata=usage_metadata)
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+
+class TestUsage:
+    """Token breakdown and cost."""
+
+    def test_from_metadata(self):
+        usage = Usage.from_metadata(USAGE, "gemini-3-flash-preview")
+
+        assert (usage.input_tokens, usage.cached_tokens, usage.thinking_tokens) == (1000, 800, 200)
+        assert usage.total_tokens == 1300
+        assert usage.cost_usd == pytest.approx(usage_cost("gemini-3-flash-preview", 1000, 800, 300))
+        assert usage.to_dict()["cache_hit_ratio"] == 0.8
+
+    def test_cached_tokens_are_cheaper(self):
+        assert usage_cost(None, 1000, 1000, 0) < usage_cost(None, 1000, 0, 0)
+
+
+class TestAttribution:
+    """Calls land on their node, agent and iteration."""
+
+    def test_tool_loop_iterations(self):
+        usage = RunUsage()
+        handler = UsageCallbackHandler(usage)
+
+        call(handler, "coder:task1|agent:a")
+        call(handler, "coder:task1|agent:b")
+        call(handler, "planner:task2", agent="planner")
+
+        assert [c["iteration"] for c in usage.calls] == [1, 2, 1]
+        assert usage.by_node["coder"].llm_calls == 2
+        assert usage.by_agent["planner"].input_tokens == 1000
+        assert usage.total.llm_calls == 3
+
+    def test_chunk_usage_fallback(self):
+        usage = RunUsage()
+        call(UsageCallbackHandler(usage), "fixer:t", usage_metadata=None, chunks=[
+            {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12},
+            {"input_tokens": 0, "output_tokens": 3, "total_tokens": 3},
+        ])
+
+        assert (usage.total.input_tokens, usage.total.output_tokens) == (10, 5)
+
+
+class TestClaims:
+    """Step rows and node ends share a node's usage without double counting."""
+
+    def test_claim_then_close(self):
+        usage = RunUsage()
+        handler = UsageCallbackHandler(usage)
+        call(handler, "orchestrator:t1", agent="orchestrator")
+
+        claimed = usage.claim("orchestrator")
+        assert claimed.llm_calls == 1
+        assert usage.claim("orchestrator") is None
+        assert usage.close("orchestrator:t1") is None
+
+    def test_unclaimed_usage_closes_with_node(self):
+        usage = RunUsage()
+        handler = UsageCallbackHandler(usage)
+        call(handler, "coder:t1|agent:a")
+        call(handler, "coder:t1|agent:b")
+
+        node, leftover, iterations = usage.close("coder:t1")
+
+        assert (node, leftover.llm_calls, iterations) == ("coder", 2, 2)
+
+    @pytest.mark.asyncio
+    async def test_leftover_step_is_drained(self, monkeypatch):
+        import app.services.step_tracking as step_tracking
+
+        recorded = []
+
+        async def slow_record_step(**kwargs):
+            await asyncio.sleep(0.05)
+            recorded.append(kwargs)
+
+        monkeypatch.setattr(step_tracking, "record_step", slow_record_step)
+        monkeypatch.setattr(step_tracking, "get_current_run_id", lambda: uuid.uuid4())
+        handler = UsageCallbackHandler(RunUsage())
+        node_run = uuid.uuid4()
+        handler.on_chain_start({}, {}, run_id=node_run, name="coder",
+                               metadata={"langgraph_node": "coder", "langgraph_checkpoint_ns": "coder:t1"})
+        call(handler, "coder:t1|agent:a")
+        handler.on_chain_end({}, run_id=node_run)
+
+        assert recorded == []
+        await handler.drain()
+
+        assert [(r["agent"], r["action"], r["usage"].llm_calls) for r in recorded] == [("coder", "llm_usage", 1)]